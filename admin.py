@@ -7,7 +7,9 @@ from sqlalchemy.exc import SQLAlchemyError
 from datetime import datetime, time
 from model import db, User, Event, UserRole, Ticket, Transaction, Scan, TicketType, Report, Organizer
 from flask_restful import Resource
-from flask_jwt_extended import jwt_required, get_jwt_identity
+from principal import principals, principal_required
+from user_directory import user_directory, parse_roles
+from csv_export import csv_response
 from flask import current_app
 # from report import get_event_report, ReportConfig, PDFReportGenerator, ChartGenerator, FileManager, EmailService, CSVExporter
 import logging
@@ -57,15 +59,6 @@ class AdminOperations:
             logger.error(f"Error retrieving event by ID: {e}")
             return None
 
-    def get_non_attendee_users(self):
-        """Retrieves all users who are not attendees."""
-        try:
-            users = User.query.filter(User.role != UserRole.ATTENDEE).all()
-            return [user.as_dict() for user in users]
-        except SQLAlchemyError as e:
-            logger.error(f"Error retrieving non-attendee users: {e}")
-            return []
-
     def search_user_by_email(self, email):
         """Searches for a user by their email address."""
         try:
@@ -139,55 +132,58 @@ class AdminOperations:
                 self.db.session.delete(user.organizer_profile)
             self.db.session.delete(user)
             self.db.session.commit()
+            principals.invalidate(organizer_id)
             return {"message": "Organizer deleted successfully"}, 200
         except Exception as e:
             self.db.session.rollback()
             logger.error(f"Error deleting organizer: {str(e)}")
             return {"message": "Failed to delete organizer", "error": str(e)}, 500
 
-    def get_users(self):
-        """Get list of all users."""
+    def get_user_page(self, roles, buckets):
+        """One directory page (search/role/cursor/limit from the query string) grouped into role buckets"""
+        search = request.args.get('search', '')
+        if request.args.get('role'):
+            try:
+                roles = [role for role in parse_roles(request.args.get('role')) if role in buckets]
+            except ValueError:
+                roles = []
+            if not roles:
+                return {"message": "Invalid role filter"}, 400
+        limit = user_directory.clamp(request.args.get('limit', type=int))
         try:
-            users = User.query.all()
-            result = []
-            for user in users:
-                user_data = user.as_dict()
-                user_data['is_organizer'] = user.role == UserRole.ORGANIZER
-                result.append(user_data)
-            return result
-        except Exception as e:
-            logger.error(f"Error fetching users: {str(e)}")
-            return []
+            users, next_cursor = user_directory.page(search, roles, request.args.get('cursor', type=int), limit)
+        except SQLAlchemyError as e:
+            logger.error(f"Error fetching users: {e}")
+            return {"message": "Failed to fetch users"}, 500
+
+        result = {bucket: [] for bucket in buckets.values()}
+        for user_dict in users:
+            result[buckets[UserRole(user_dict['role'])]].append(user_dict)
+        result.update({
+            "next_cursor": next_cursor,
+            "has_next": next_cursor is not None,
+            "limit": limit,
+            "estimated_total": user_directory.estimate_total(search, roles)
+        })
+        return result, 200
 
 class AdminGetOrganizerEvents(Resource):
-    @jwt_required()
+    @principal_required(UserRole.ADMIN, message="Admin access required")
     def get(self, organizer_id):
-        current_user_id = get_jwt_identity()
-        current_user = User.query.get(current_user_id)
-        if not current_user or current_user.role != UserRole.ADMIN:
-            return {"message": "Admin access required"}, 403
         admin_ops = AdminOperations(db)
         events = admin_ops.get_events_by_organizer(organizer_id)
         return events, 200
 
 class AdminGetAllEvents(Resource):
-    @jwt_required()
+    @principal_required(UserRole.ADMIN, message="Admin access required")
     def get(self):
-        current_user_id = get_jwt_identity()
-        current_user = User.query.get(current_user_id)
-        if not current_user or current_user.role != UserRole.ADMIN:
-            return {"message": "Admin access required"}, 403
         admin_ops = AdminOperations(db)
         events = admin_ops.get_all_events()
         return events, 200
 
 class AdminGetEventById(Resource):
-    @jwt_required()
+    @principal_required(UserRole.ADMIN, message="Admin access required")
     def get(self, event_id):
-        current_user_id = get_jwt_identity()
-        current_user = User.query.get(current_user_id)
-        if not current_user or current_user.role != UserRole.ADMIN:
-            return {"message": "Admin access required"}, 403
         admin_ops = AdminOperations(db)
         event = admin_ops.get_event_by_id(event_id)
         if event:
@@ -195,54 +191,37 @@ class AdminGetEventById(Resource):
         return {"message": "Event not found"}, 404
 
 class AdminGetNonAttendees(Resource):
-    @jwt_required()
+    @principal_required(UserRole.ADMIN, message="Admin access required")
     def get(self):
-        current_user_id = get_jwt_identity()
-        current_user = User.query.get(current_user_id)
-        if not current_user or current_user.role != UserRole.ADMIN:
-            return {"message": "Admin access required"}, 403
         admin_ops = AdminOperations(db)
-        users_list_of_dicts = admin_ops.get_non_attendee_users()
-        separated_users = {"organizers": [], "security": [], "admins": []}
-        for user_dict in users_list_of_dicts:
-            role = user_dict.get('role')
-            if role == UserRole.ORGANIZER.value:
-                separated_users["organizers"].append(user_dict)
-            elif role == UserRole.SECURITY.value:
-                separated_users["security"].append(user_dict)
-            elif role == UserRole.ADMIN.value:
-                separated_users["admins"].append(user_dict)
-        return separated_users, 200
+        return admin_ops.get_user_page(
+            [UserRole.ORGANIZER, UserRole.SECURITY, UserRole.ADMIN],
+            {UserRole.ORGANIZER: "organizers", UserRole.SECURITY: "security", UserRole.ADMIN: "admins"}
+        )
 
 class AdminGetUsers(Resource):
-    @jwt_required()
+    @principal_required(UserRole.ADMIN, message="Admin access required")
     def get(self):
-        current_user_id = get_jwt_identity()
-        current_user = User.query.get(current_user_id)
-        if not current_user or current_user.role != UserRole.ADMIN:
-            return {"message": "Admin access required"}, 403
         admin_ops = AdminOperations(db)
-        users_list_of_dicts = admin_ops.get_users()
-        categorized_users = {"admins": [], "organizers": [], "security": [], "attendees": []}
-        for user_dict in users_list_of_dicts:
-            role = user_dict.get("role")
-            if role == UserRole.ADMIN.value:
-                categorized_users["admins"].append(user_dict)
-            elif role == UserRole.ORGANIZER.value:
-                categorized_users["organizers"].append(user_dict)
-            elif role == UserRole.SECURITY.value:
-                categorized_users["security"].append(user_dict)
-            elif role == UserRole.ATTENDEE.value:
-                categorized_users["attendees"].append(user_dict)
-        return categorized_users, 200
+        return admin_ops.get_user_page(
+            None,
+            {UserRole.ADMIN: "admins", UserRole.ORGANIZER: "organizers",
+             UserRole.SECURITY: "security", UserRole.ATTENDEE: "attendees"}
+        )
+
+class AdminExportUsers(Resource):
+    @principal_required(UserRole.ADMIN, message="Admin access required")
+    def get(self):
+        try:
+            roles = parse_roles(request.args.get('role'))
+        except ValueError:
+            return {"message": "Invalid role filter"}, 400
+        filename = f"users_{datetime.utcnow().strftime('%Y%m%d_%H%M%S')}.csv"
+        return csv_response(user_directory.export_rows(request.args.get('search', ''), roles), filename)
 
 class AdminSearchUserByEmail(Resource):
-    @jwt_required()
+    @principal_required(UserRole.ADMIN, message="Admin access required")
     def get(self):
-        current_user_id = get_jwt_identity()
-        current_user = User.query.get(current_user_id)
-        if not current_user or current_user.role != UserRole.ADMIN:
-            return {"message": "Admin access required"}, 403
         email = request.args.get('email')
         if not email:
             return {"message": "Email parameter is required"}, 400
@@ -371,23 +350,15 @@ class AdminSearchUserByEmail(Resource):
 #             return {"status": "error", "message": f"An error occurred: {str(e)}"}, 500
 
 class AdminGetOrganizers(Resource):
-    @jwt_required()
+    @principal_required(UserRole.ADMIN, message="Admin access required")
     def get(self):
-        current_user_id = get_jwt_identity()
-        current_user = User.query.get(current_user_id)
-        if not current_user or current_user.role != UserRole.ADMIN:
-            return {"message": "Admin access required"}, 403
         admin_ops = AdminOperations(db)
         organizers = admin_ops.get_organizers()
         return organizers, 200
 
 class AdminDeleteOrganizer(Resource):
-    @jwt_required()
+    @principal_required(UserRole.ADMIN, message="Admin access required")
     def delete(self, organizer_id):
-        current_user_id = get_jwt_identity()
-        current_user = User.query.get(current_user_id)
-        if not current_user or current_user.role != UserRole.ADMIN:
-            return {"message": "Admin access required"}, 403
         admin_ops = AdminOperations(db)
         return admin_ops.delete_organizer(organizer_id)
 
@@ -398,6 +369,7 @@ def register_admin_resources(api):
     api.add_resource(AdminGetEventById, "/admin/events/<int:event_id>")
     api.add_resource(AdminGetNonAttendees, "/admin/users/non-attendees")
     api.add_resource(AdminSearchUserByEmail, "/admin/users/search")
+    api.add_resource(AdminExportUsers, "/admin/users/export")
     # api.add_resource(AdminReportResource, "/admin/reports/summary")
     # api.add_resource(AdminGenerateReportPDF, "/admin/reports/<int:event_id>/pdf")
     # api.add_resource(AdminExportAllReportsResource, "/admin/reports/export-all")
@@ -0,0 +1,174 @@
+"""
+Admin analytics job.
+
+Computes per-event and per-organizer sales totals for the whole platform from
+the sales rollups in two grouped statements and upserts them into
+`admin_event_metrics` / `admin_organizer_metrics`. The admin organizer and
+event lists page through those snapshots (joined to the live user and event
+rows, so new organizers and events show up immediately with zero totals)
+instead of aggregating every organizer's events on each request.
+"""
+import logging
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import func
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+
+from model import (db, User, UserRole, Organizer, Event, SalesRollup,
+                   AdminEventMetrics, AdminOrganizerMetrics)
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+class AdminAnalyticsService:
+    """Set-based organizer/event metrics with snapshot reads and paginated listings"""
+
+    UPSERT_BATCH_SIZE = 1000
+
+    def __init__(self, default_per_page: int = 20, max_per_page: int = 100):
+        self.default_per_page = default_per_page
+        self.max_per_page = max_per_page
+
+    def init_app(self, app):
+        self.default_per_page = app.config.get('ADMIN_ANALYTICS_PER_PAGE', self.default_per_page)
+        self.max_per_page = app.config.get('ADMIN_ANALYTICS_MAX_PER_PAGE', self.max_per_page)
+
+    @staticmethod
+    def _event_totals_subquery():
+        """All-time paid tickets, revenue and attendees per event from the daily rollups"""
+        return db.session.query(
+            SalesRollup.event_id.label('event_id'),
+            func.sum(SalesRollup.tickets_sold).label('tickets_sold'),
+            func.sum(SalesRollup.revenue).label('revenue'),
+            func.sum(SalesRollup.attendees).label('attendees')
+        ).filter(SalesRollup.granularity == 'day').group_by(SalesRollup.event_id).subquery()
+
+    def _upsert(self, model, key: str, rows: List[dict]) -> None:
+        for start in range(0, len(rows), self.UPSERT_BATCH_SIZE):
+            batch = rows[start:start + self.UPSERT_BATCH_SIZE]
+            stmt = pg_insert(model).values(batch)
+            stmt = stmt.on_conflict_do_update(
+                index_elements=[key],
+                set_={column: stmt.excluded[column] for column in batch[0] if column != key}
+            )
+            db.session.execute(stmt)
+
+    def refresh_all(self) -> int:
+        """Recompute metrics for every event and organizer; returns the number of events written"""
+        started = datetime.utcnow()
+        totals = self._event_totals_subquery()
+        tickets_sold = func.coalesce(totals.c.tickets_sold, 0)
+        revenue = func.coalesce(totals.c.revenue, 0)
+        attendees = func.coalesce(totals.c.attendees, 0)
+
+        # 1) Per event
+        event_rows = db.session.query(
+            Event.id, Event.organizer_id, tickets_sold, revenue, attendees
+        ).outerjoin(totals, totals.c.event_id == Event.id).all()
+
+        # 2) Per organizer, summed over their events
+        organizer_rows = db.session.query(
+            Organizer.user_id,
+            func.count(Event.id),
+            func.coalesce(func.sum(tickets_sold), 0),
+            func.coalesce(func.sum(revenue), 0),
+            func.coalesce(func.sum(attendees), 0)
+        ).outerjoin(
+            Event, Event.organizer_id == Organizer.id
+        ).outerjoin(
+            totals, totals.c.event_id == Event.id
+        ).group_by(Organizer.user_id).all()
+
+        self._upsert(AdminEventMetrics, 'event_id', [
+            {"event_id": event_id, "organizer_id": organizer_id, "tickets_sold": int(sold),
+             "revenue": event_revenue, "attendees": int(attended), "computed_at": started}
+            for event_id, organizer_id, sold, event_revenue, attended in event_rows
+        ])
+        self._upsert(AdminOrganizerMetrics, 'user_id', [
+            {"user_id": user_id, "event_count": int(event_count), "total_tickets_sold": int(sold),
+             "total_revenue": organizer_revenue, "total_attendees": int(attended), "computed_at": started}
+            for user_id, event_count, sold, organizer_revenue, attended in organizer_rows
+        ])
+        db.session.commit()
+
+        elapsed = (datetime.utcnow() - started).total_seconds()
+        logger.info(f"Admin analytics refreshed for {len(organizer_rows)} organizers and "
+                    f"{len(event_rows)} events in {elapsed:.2f}s")
+        return len(event_rows)
+
+    def snapshot_time(self) -> Optional[datetime]:
+        """When the metrics were last computed, or None before the first refresh"""
+        return db.session.query(func.max(AdminOrganizerMetrics.computed_at)).scalar()
+
+    def ensure_snapshot(self) -> Optional[datetime]:
+        """Compute the metrics inline if the background job has not produced them yet"""
+        computed_at = self.snapshot_time()
+        if computed_at is None:
+            try:
+                self.refresh_all()
+                computed_at = self.snapshot_time()
+            except Exception as e:
+                db.session.rollback()
+                logger.error(f"Initial admin analytics refresh failed: {e}")
+        return computed_at
+
+    def page_args(self, page: Optional[int], per_page: Optional[int]) -> Dict[str, int]:
+        return {
+            "page": max(page or 1, 1),
+            "per_page": min(max(per_page or self.default_per_page, 1), self.max_per_page)
+        }
+
+    # ===== READS =====
+    def organizer_page(self, page: Optional[int] = None, per_page: Optional[int] = None):
+        """Organizers by total revenue (highest first) with their snapshot totals"""
+        revenue = func.coalesce(AdminOrganizerMetrics.total_revenue, 0)
+        query = db.session.query(
+            User.id.label('organizer_id'),
+            User.full_name,
+            User.email,
+            User.phone_number,
+            func.coalesce(AdminOrganizerMetrics.event_count, 0).label('event_count'),
+            func.coalesce(AdminOrganizerMetrics.total_tickets_sold, 0).label('total_tickets_sold'),
+            revenue.label('total_revenue'),
+            func.coalesce(AdminOrganizerMetrics.total_attendees, 0).label('total_attendees')
+        ).outerjoin(
+            AdminOrganizerMetrics, AdminOrganizerMetrics.user_id == User.id
+        ).filter(
+            User.role == UserRole.ORGANIZER
+        ).order_by(revenue.desc(), User.id)
+        return query.paginate(**self.page_args(page, per_page), error_out=False)
+
+    def event_page(self, organizer_user_id: int, page: Optional[int] = None, per_page: Optional[int] = None):
+        """An organizer's events, most recent first, with their snapshot totals"""
+        query = db.session.query(
+            Event.id.label('event_id'),
+            Event.name,
+            Event.date,
+            Event.location,
+            func.coalesce(AdminEventMetrics.tickets_sold, 0).label('tickets_sold'),
+            func.coalesce(AdminEventMetrics.revenue, 0).label('revenue'),
+            func.coalesce(AdminEventMetrics.attendees, 0).label('attendees')
+        ).join(
+            Organizer, Organizer.id == Event.organizer_id
+        ).outerjoin(
+            AdminEventMetrics, AdminEventMetrics.event_id == Event.id
+        ).filter(
+            Organizer.user_id == organizer_user_id
+        ).order_by(Event.date.desc(), Event.id.desc())
+        return query.paginate(**self.page_args(page, per_page), error_out=False)
+
+    @staticmethod
+    def organizer_totals(organizer_user_id: int) -> Dict[str, Any]:
+        metrics = AdminOrganizerMetrics.query.get(organizer_user_id)
+        return {
+            "event_count": metrics.event_count if metrics else 0,
+            "total_tickets_sold": metrics.total_tickets_sold if metrics else 0,
+            "total_revenue": metrics.total_revenue if metrics else 0,
+            "total_attendees": metrics.total_attendees if metrics else 0
+        }
+
+
+# Initialize globally — must be attached via admin_analytics.init_app(app)
+admin_analytics = AdminAnalyticsService()
@@ -1,7 +1,6 @@
 from flask import jsonify, request, Response, send_file
 from flask_restful import Resource
 from flask_jwt_extended import jwt_required, get_jwt_identity
-from sqlalchemy import func
 from datetime import datetime
 import logging
 from typing import Dict, List, Optional, Any
@@ -13,10 +12,14 @@ import tempfile
 import os
 
 # Your application-specific imports
-from model import User, Event, Organizer, Report, db, Currency, ExchangeRate, Ticket, PaymentStatus
+from model import User, Event, Organizer, Report, Currency, ExchangeRate
 from pdf_utils import CSVExporter, PDFReportGenerator
 from email_utils import send_email_with_attachment
 from currency_routes import convert_ksh_to_target_currency
+from sales_facts import sales_facts
+from admin_analytics import admin_analytics
+from exchange_rates import exchange_rates
+from csv_export import csv_response, iter_csv
 
 logger = logging.getLogger(__name__)
 
@@ -70,42 +73,6 @@ class AdminReportService:
             logger.error(f"Error getting currency settings: {e}")
             return AdminReportService.get_default_currency()
 
-    @staticmethod
-    def get_actual_event_metrics(event_id: int) -> Dict[str, Any]:
-        """Get actual event metrics from database"""
-        try:
-            tickets_sold_count = Ticket.query.filter_by(
-                event_id=event_id,
-                payment_status=PaymentStatus.PAID
-            ).count()
-
-            paid_tickets = Ticket.query.filter_by(
-                event_id=event_id,
-                payment_status=PaymentStatus.PAID
-            ).all()
-
-            total_revenue = sum(ticket.total_price for ticket in paid_tickets)
-
-            attendees_count = Ticket.query.filter_by(
-                event_id=event_id,
-                scanned=True
-            ).count()
-
-            return {
-                'tickets_sold': tickets_sold_count,
-                'total_revenue': float(total_revenue),
-                'attendees': attendees_count,
-                'paid_tickets': paid_tickets
-            }
-        except Exception as e:
-            logger.error(f"Error getting actual event metrics for event {event_id}: {e}")
-            return {
-                'tickets_sold': 0,
-                'total_revenue': 0.0,
-                'attendees': 0,
-                'paid_tickets': []
-            }
-
     @staticmethod
     def convert_revenue_to_currency(ksh_amount: float, target_currency_code: str) -> Dict[str, Any]:
         """Convert KSH amount to target currency using the currency conversion API"""
@@ -146,6 +113,22 @@ class AdminReportService:
                 'conversion_rate': 1.0
             }
 
+    @staticmethod
+    def convert_revenues(ksh_amounts: Dict[Any, Any], target_currency_id: Optional[int]) -> tuple:
+        """Convert a batch of KSH amounts with one rate matrix; returns (amounts, code, symbol)"""
+        currency = Currency.query.get(target_currency_id) if target_currency_id else None
+        if currency and currency.code.value != 'KES':
+            try:
+                matrix = exchange_rates.matrix()
+                keys = list(ksh_amounts)
+                converted = matrix.convert_many([ksh_amounts[key] for key in keys],
+                                                [matrix.ids['KES']] * len(keys), currency.id)
+                return ({key: float(amount.quantize(Decimal('0.01'))) for key, amount in zip(keys, converted)},
+                        currency.code.value, currency.symbol)
+            except Exception as e:
+                logger.error(f"Error converting revenues to {currency.code.value}: {e}")
+        return {key: float(amount or 0) for key, amount in ksh_amounts.items()}, 'KES', 'KSh'
+
     @staticmethod
     def format_report_data_for_frontend(report_data: Dict[str, Any], config: AdminReportConfig) -> Dict[str, Any]:
         """Format report data to ensure frontend compatibility and apply final currency conversion."""
@@ -275,21 +258,25 @@ class AdminReportService:
             total_attendees = 0
             event_details = []
 
+            # One rollup query for all events instead of loading every paid ticket per event
+            totals_by_event = sales_facts.event_totals(event_ids=[event.id for event in events])
+
             for event in events:
-                metrics = AdminReportService.get_actual_event_metrics(event.id)
+                totals = totals_by_event.get(event.id, sales_facts.empty_totals())
+                revenue = float(totals['revenue'])
 
-                total_tickets_sold += metrics['tickets_sold']
-                total_revenue_ksh += metrics['total_revenue']
-                total_attendees += metrics['attendees']
+                total_tickets_sold += totals['tickets_sold']
+                total_revenue_ksh += revenue
+                total_attendees += totals['attendees']
 
                 event_details.append({
                     "event_id": event.id,
                     "event_name": event.name,
                     "event_date": event.date.isoformat() if event.date else None,
                     "location": event.location,
-                    "tickets_sold": metrics['tickets_sold'],
-                    "revenue_ksh": metrics['total_revenue'],
-                    "attendees": metrics['attendees']
+                    "tickets_sold": totals['tickets_sold'],
+                    "revenue_ksh": revenue,
+                    "attendees": totals['attendees']
                 })
             return {
                 "total_tickets_sold": total_tickets_sold,
@@ -307,16 +294,16 @@ class AdminReportService:
     def aggregate_event_reports(event: Event) -> Dict[str, Any]:
         """Aggregate data for a single event using actual database metrics."""
         try:
-            metrics = AdminReportService.get_actual_event_metrics(event.id)
+            totals = sales_facts.event_totals(event_ids=[event.id]).get(event.id, sales_facts.empty_totals())
 
             return {
                 "event_id": event.id,
                 "event_name": event.name,
                 "event_date": event.date.isoformat() if event.date else None,
                 "location": event.location,
-                "tickets_sold": metrics['tickets_sold'],
-                "attendees": metrics['attendees'],
-                "revenue_ksh": metrics['total_revenue'],
+                "tickets_sold": totals['tickets_sold'],
+                "attendees": totals['attendees'],
+                "revenue_ksh": float(totals['revenue']),
             }
 
         except Exception as e:
@@ -394,59 +381,63 @@ class AdminReportService:
             return {"error": "Failed to generate event report", "status": 500}
 
     @staticmethod
-    def generate_csv_report(report_data: Dict[str, Any]) -> str:
-        """Generate CSV content from report data"""
-        try:
-            csv_content = io.StringIO()
-
-            currency_symbol = report_data.get('currency_settings', {}).get('target_currency_symbol', 'KSh')
-            currency_name = report_data.get('currency_settings', {}).get('target_currency_name', 'Kenyan Shilling')
-
-            csv_content.write(f"Event Management System Report\n")
-            csv_content.write(f"Generated: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n")
-            csv_content.write(f"Currency: {currency_name} ({currency_symbol})\n\n")
+    def iter_csv_rows(report_data: Dict[str, Any]):
+        """Yield CSV rows for an event or organizer admin report"""
+        currency_symbol = report_data.get('currency_settings', {}).get('target_currency_symbol', 'KSh')
+        currency_name = report_data.get('currency_settings', {}).get('target_currency_name', 'Kenyan Shilling')
 
-            if 'event_info' in report_data:
-                event_info = report_data['event_info']
-                event_summary = report_data['event_summary']
+        yield ["Event Management System Report"]
+        yield ["Generated", datetime.now().strftime('%Y-%m-%d %H:%M:%S')]
+        yield ["Currency", f"{currency_name} ({currency_symbol})"]
+        yield []
 
-                csv_content.write("EVENT DETAILS\n")
-                csv_content.write(f"Event Name,{event_info['event_name']}\n")
-                csv_content.write(f"Event Date,{event_info['event_date']}\n")
-                csv_content.write(f"Location,{event_info['location']}\n")
-                csv_content.write(f"Organizer,{event_info['organizer_name']}\n\n")
-
-                csv_content.write("PERFORMANCE METRICS\n")
-                csv_content.write(f"Tickets Sold,{event_summary['tickets_sold']}\n")
-                csv_content.write(f"Total Revenue,{currency_symbol}{event_summary['revenue']:,.2f}\n")
-                csv_content.write(f"Attendees,{event_summary['attendees']}\n")
-                if event_summary['tickets_sold'] > 0:
-                    attendance_rate = (event_summary['attendees'] / event_summary['tickets_sold']) * 100
-                    csv_content.write(f"Attendance Rate,{attendance_rate:.1f}%\n")
-
-            elif 'organizer_info' in report_data:
-                organizer_info = report_data['organizer_info']
-                summary = report_data['summary']
-
-                csv_content.write("ORGANIZER DETAILS\n")
-                csv_content.write(f"Organizer Name,{organizer_info['organizer_name']}\n")
-                csv_content.write(f"Email,{organizer_info['email']}\n")
-                csv_content.write(f"Phone,{organizer_info['phone']}\n\n")
-
-                csv_content.write("SUMMARY METRICS\n")
-                csv_content.write(f"Total Events,{summary['event_count']}\n")
-                csv_content.write(f"Total Tickets Sold,{summary['total_tickets_sold']}\n")
-                csv_content.write(f"Total Revenue,{currency_symbol}{summary['total_revenue']:,.2f}\n")
-                csv_content.write(f"Total Attendees,{summary['total_attendees']}\n\n")
-
-                csv_content.write("EVENT BREAKDOWN\n")
-                csv_content.write("Event Name,Event Date,Location,Tickets Sold,Revenue,Attendees\n")
-
-                for event in summary['events']:
-                    csv_content.write(f"{event['event_name']},{event['event_date']},{event['location']},{event['tickets_sold']},{currency_symbol}{event['revenue']:,.2f},{event['attendees']}\n")
+        if 'event_info' in report_data:
+            event_info = report_data['event_info']
+            event_summary = report_data['event_summary']
+
+            yield ["EVENT DETAILS"]
+            yield ["Event Name", event_info['event_name']]
+            yield ["Event Date", event_info['event_date']]
+            yield ["Location", event_info['location']]
+            yield ["Organizer", event_info['organizer_name']]
+            yield []
+
+            yield ["PERFORMANCE METRICS"]
+            yield ["Tickets Sold", event_summary['tickets_sold']]
+            yield ["Total Revenue", f"{currency_symbol}{event_summary['revenue']:,.2f}"]
+            yield ["Attendees", event_summary['attendees']]
+            if event_summary['tickets_sold'] > 0:
+                attendance_rate = (event_summary['attendees'] / event_summary['tickets_sold']) * 100
+                yield ["Attendance Rate", f"{attendance_rate:.1f}%"]
 
-            return csv_content.getvalue()
+        elif 'organizer_info' in report_data:
+            organizer_info = report_data['organizer_info']
+            summary = report_data['summary']
+
+            yield ["ORGANIZER DETAILS"]
+            yield ["Organizer Name", organizer_info['organizer_name']]
+            yield ["Email", organizer_info['email']]
+            yield ["Phone", organizer_info['phone']]
+            yield []
+
+            yield ["SUMMARY METRICS"]
+            yield ["Total Events", summary['event_count']]
+            yield ["Total Tickets Sold", summary['total_tickets_sold']]
+            yield ["Total Revenue", f"{currency_symbol}{summary['total_revenue']:,.2f}"]
+            yield ["Total Attendees", summary['total_attendees']]
+            yield []
+
+            yield ["EVENT BREAKDOWN"]
+            yield ["Event Name", "Event Date", "Location", "Tickets Sold", "Revenue", "Attendees"]
+            for event in summary['events']:
+                yield [event['event_name'], event['event_date'], event['location'], event['tickets_sold'],
+                       f"{currency_symbol}{event['revenue']:,.2f}", event['attendees']]
 
+    @staticmethod
+    def generate_csv_report(report_data: Dict[str, Any]) -> str:
+        """Generate CSV content from report data"""
+        try:
+            return "".join(iter_csv(AdminReportService.iter_csv_rows(report_data)))
         except Exception as e:
             logger.error(f"Error generating CSV report: {e}")
             return "Error generating CSV report"
@@ -771,13 +762,9 @@ class AdminReportResource(Resource):
                 filename_prefix += f"_event{event_id}"
 
             if format_type.lower() == 'csv':
-                csv_content = AdminReportService.generate_csv_report(report_data)
-                return Response(
-                    csv_content,
-                    mimetype='text/csv',
-                    headers={
-                        'Content-Disposition': f'attachment; filename={filename_prefix}_{datetime.now().strftime("%Y%m%d%H%M%S")}.csv'
-                    }
+                return csv_response(
+                    AdminReportService.iter_csv_rows(report_data),
+                    f'{filename_prefix}_{datetime.now().strftime("%Y%m%d%H%M%S")}.csv'
                 )
             elif format_type.lower() == 'pdf':
                 pdf_content = AdminReportService.generate_pdf_report(report_data)
@@ -803,7 +790,7 @@ class AdminOrganizerListResource(Resource):
 
     @jwt_required()
     def get(self):
-        """Get list of all organizers with comprehensive metrics"""
+        """Get a page of organizers with metrics from the admin analytics snapshot"""
         current_user_id = get_jwt_identity()
         user = User.query.get(current_user_id)
 
@@ -811,67 +798,41 @@ class AdminOrganizerListResource(Resource):
             return {"message": "Admin access required"}, 403
         try:
             target_currency_id = request.args.get('currency_id', type=int)
-            target_currency_code = None
-            target_currency_symbol = 'KSh'
-            if target_currency_id:
-                currency_obj = Currency.query.get(target_currency_id)
-                if currency_obj:
-                    target_currency_code = currency_obj.code.value
-                    target_currency_symbol = currency_obj.symbol
-
-            organizers_query = db.session.query(
-                User.id,
-                User.full_name,
-                User.email,
-                User.phone_number,
-                func.count(Event.id).label('event_count')
-            ).select_from(User)\
-            .outerjoin(Organizer, User.id == Organizer.user_id)\
-            .outerjoin(Event, Organizer.id == Event.organizer_id)\
-            .filter(User.role == 'ORGANIZER')\
-            .group_by(User.id, User.full_name, User.email, User.phone_number)\
-            .all()
-            organizer_list = []
-            for org_user_record in organizers_query:
-                metrics_ksh = AdminReportService.aggregate_organizer_reports(org_user_record.id)
-
-                if "error" in metrics_ksh:
-                    logger.error(f"Error aggregating KSH metrics for organizer {org_user_record.id}: {metrics_ksh['error']}")
-                    continue
-
-                final_total_revenue = metrics_ksh.get('total_revenue_ksh', 0.0)
-                current_currency_code = 'KES'
-                current_currency_symbol = 'KSh'
-                if target_currency_code and target_currency_code.upper() != 'KES':
-                    conversion_result = AdminReportService.convert_revenue_to_currency(
-                        final_total_revenue, target_currency_code
-                    )
-                    final_total_revenue = conversion_result['converted_amount']
-                    current_currency_code = conversion_result['currency_code']
-                    current_currency_symbol = conversion_result['currency_symbol']
-                organizer_data = {
-                    "organizer_id": org_user_record.id,
-                    "name": org_user_record.full_name,
-                    "email": org_user_record.email,
-                    "phone": org_user_record.phone_number,
-                    "event_count": org_user_record.event_count,
-                    "metrics": {
-                        "total_tickets_sold": metrics_ksh.get('total_tickets_sold', 0),
-                        "total_revenue": final_total_revenue,
-                        "total_attendees": metrics_ksh.get('total_attendees', 0),
-                        "currency": current_currency_code,
-                        "currency_symbol": current_currency_symbol
-                    }
+            computed_at = admin_analytics.ensure_snapshot()
+            organizers = admin_analytics.organizer_page(
+                request.args.get('page', type=int), request.args.get('per_page', type=int)
+            )
+            revenue, currency_code, currency_symbol = AdminReportService.convert_revenues(
+                {row.organizer_id: row.total_revenue for row in organizers.items}, target_currency_id
+            )
+
+            organizer_list = [{
+                "organizer_id": row.organizer_id,
+                "name": row.full_name,
+                "email": row.email,
+                "phone": row.phone_number,
+                "event_count": row.event_count,
+                "metrics": {
+                    "total_tickets_sold": row.total_tickets_sold,
+                    "total_revenue": revenue[row.organizer_id],
+                    "total_attendees": row.total_attendees,
+                    "currency": currency_code,
+                    "currency_symbol": currency_symbol
                 }
-                organizer_list.append(organizer_data)
-            organizer_list.sort(key=lambda x: x['metrics']['total_revenue'], reverse=True)
+            } for row in organizers.items]
             return {
                 "organizers": organizer_list,
-                "total_count": len(organizer_list),
+                "total_count": organizers.total,
+                "pages": organizers.pages,
+                "current_page": organizers.page,
+                "per_page": organizers.per_page,
+                "has_next": organizers.has_next,
+                "has_prev": organizers.has_prev,
+                "metrics_computed_at": computed_at.isoformat() if computed_at else None,
                 "currency_info": {
                     "target_currency_id": target_currency_id,
-                    "target_currency": target_currency_code or 'KES',
-                    "target_currency_symbol": target_currency_symbol or 'KSh'
+                    "target_currency": currency_code,
+                    "target_currency_symbol": currency_symbol
                 }
             }
         except Exception as e:
@@ -883,7 +844,7 @@ class AdminEventListResource(Resource):
 
     @jwt_required()
     def get(self, organizer_id):
-        """Get list of events for a specific organizer with detailed metrics"""
+        """Get a page of an organizer's events with metrics from the admin analytics snapshot"""
         current_user_id = get_jwt_identity()
         user = User.query.get(current_user_id)
 
@@ -895,72 +856,53 @@ class AdminEventListResource(Resource):
                 return {"message": "Organizer not found"}, 404
 
             target_currency_id = request.args.get('currency_id', type=int)
-            target_currency_code = None
-            target_currency_symbol = 'KSh'
-            if target_currency_id:
-                currency_obj = Currency.query.get(target_currency_id)
-                if currency_obj:
-                    target_currency_code = currency_obj.code.value
-                    target_currency_symbol = currency_obj.symbol
-
-            events = AdminReportService.get_events_by_organizer(organizer_id)
-
-            event_list = []
-            for event in events:
-                event_metrics_ksh = AdminReportService.aggregate_event_reports(event)
-
-                if "error" in event_metrics_ksh:
-                    logger.error(f"Error aggregating KSH metrics for event {event.id}: {event_metrics_ksh['error']}")
-                    continue
-
-                final_event_revenue = event_metrics_ksh.get('revenue_ksh', 0.0)
-                current_currency_code = 'KES'
-                current_currency_symbol = 'KSh'
-                if target_currency_code and target_currency_code.upper() != 'KES':
-                    conversion_result = AdminReportService.convert_revenue_to_currency(
-                        final_event_revenue, target_currency_code
-                    )
-                    final_event_revenue = conversion_result['converted_amount']
-                    current_currency_code = conversion_result['currency_code']
-                    current_currency_symbol = conversion_result['currency_symbol']
-
-                event_data = {
-                    "event_id": event.id,
-                    "name": event.name,
-                    "event_date": event.date.isoformat() if event.date else None,
-                    "location": event.location,
-                    "status": event.status.value if hasattr(event, 'status') else 'ACTIVE',
-                    "metrics": {
-                        "tickets_sold": event_metrics_ksh.get('tickets_sold', 0),
-                        "revenue": final_event_revenue,
-                        "attendees": event_metrics_ksh.get('attendees', 0),
-                        "currency": current_currency_code,
-                        "currency_symbol": current_currency_symbol
-                    }
+            computed_at = admin_analytics.ensure_snapshot()
+            events = admin_analytics.event_page(
+                organizer_id, request.args.get('page', type=int), request.args.get('per_page', type=int)
+            )
+            totals = admin_analytics.organizer_totals(organizer_id)
+
+            # Page revenues and the organizer total are converted together with one rate
+            amounts = {row.event_id: row.revenue for row in events.items}
+            amounts['total'] = totals['total_revenue']
+            revenue, currency_code, currency_symbol = AdminReportService.convert_revenues(amounts, target_currency_id)
+
+            event_list = [{
+                "event_id": row.event_id,
+                "name": row.name,
+                "event_date": row.date.isoformat() if row.date else None,
+                "location": row.location,
+                "status": 'ACTIVE',  # Event has no status column; kept for response compatibility
+                "metrics": {
+                    "tickets_sold": row.tickets_sold,
+                    "revenue": revenue[row.event_id],
+                    "attendees": row.attendees,
+                    "currency": currency_code,
+                    "currency_symbol": currency_symbol
                 }
-                event_list.append(event_data)
-
-            event_list.sort(key=lambda x: x['event_date'] or '', reverse=True)
-
-            total_tickets_sold = sum(event['metrics']['tickets_sold'] for event in event_list)
-            total_revenue = sum(event['metrics']['revenue'] for event in event_list)
-            total_attendees = sum(event['metrics']['attendees'] for event in event_list)
+            } for row in events.items]
             return {
                 "organizer_id": organizer_id,
                 "organizer_name": organizer_user.full_name,
                 "events": event_list,
-                "total_count": len(event_list),
+                "total_count": events.total,
+                "pages": events.pages,
+                "current_page": events.page,
+                "per_page": events.per_page,
+                "has_next": events.has_next,
+                "has_prev": events.has_prev,
+                "metrics_computed_at": computed_at.isoformat() if computed_at else None,
                 "summary": {
-                    "total_tickets_sold": total_tickets_sold,
-                    "total_revenue": total_revenue,
-                    "total_attendees": total_attendees,
-                    "currency": target_currency_code or 'KES',
-                    "currency_symbol": target_currency_symbol or 'KSh'
+                    "total_tickets_sold": totals['total_tickets_sold'],
+                    "total_revenue": revenue['total'],
+                    "total_attendees": totals['total_attendees'],
+                    "currency": currency_code,
+                    "currency_symbol": currency_symbol
                 },
                 "currency_info": {
                     "target_currency_id": target_currency_id,
-                    "target_currency": target_currency_code or 'KES',
-                    "target_currency_symbol": target_currency_symbol or 'KSh'
+                    "target_currency": currency_code,
+                    "target_currency_symbol": currency_symbol
                 }
             }
         except Exception as e:
@@ -968,7 +910,6 @@ class AdminEventListResource(Resource):
             return {"message": "Failed to fetch event list", "error": str(e)}, 500
 
 def register_admin_report_resources(api):
-    """Register admin report resources with the Flask-RESTful API"""
-    api.add_resource(AdminReportResource, '/admin/reports')
-    api.add_resource(AdminOrganizerListResource, '/admin/organizers')
-    api.add_resource(AdminEventListResource, '/admin/organizers/<int:organizer_id>/events')
\ No newline at end of file
+    """Register admin report resources with the Flask-RESTful API (URL rules live in lazy_routes.ROUTE_GROUPS)"""
+    from lazy_routes import register_route_group
+    register_route_group(api, __name__)
\ No newline at end of file
@@ -1,6 +1,7 @@
 from model import (db, Event, TicketType, AIActionLog, AIActionStatus, AIIntentType,
                    Organizer, User, Partner, EventCollaboration, CollaborationType,
                    TicketTypeEnum, Category)
+from stats_engine import stats_engine
 from datetime import datetime
 import logging
 
@@ -118,6 +119,7 @@ class ActionExecutor:
             action.target_id = event.id
             
             db.session.commit()
+            stats_engine.record_event_created(event)
             
             return {
                 "success": True,
@@ -191,8 +193,10 @@ class ActionExecutor:
                 return {"success": False, "error": "Unauthorized"}
             
             event_name = event.name
+            organizer_id, event_date = event.organizer_id, event.date
             db.session.delete(event)
             db.session.commit()
+            stats_engine.record_event_deleted(organizer_id, event_date)
             
             return {
                 "success": True,
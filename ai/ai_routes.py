@@ -231,10 +231,6 @@ class AIInsightsResource(Resource):
 
 
 def register_ai_resources(api):
-    """Register all AI routes with Flask-RESTful API"""
-    api.add_resource(AIChatResource, '/ai/chat')
-    api.add_resource(AIConversationListResource, '/ai/conversations')
-    api.add_resource(AIConversationDetailResource, '/ai/conversations/<int:conversation_id>')
-    api.add_resource(AIActionConfirmResource, '/ai/actions/<int:action_id>/confirm')
-    api.add_resource(AIPendingActionsResource, '/ai/actions/pending')
-    api.add_resource(AIInsightsResource, '/ai/insights')
\ No newline at end of file
+    """Register all AI routes with Flask-RESTful API (URL rules live in lazy_routes.ROUTE_GROUPS)"""
+    from lazy_routes import register_route_group
+    register_route_group(api, __name__)
\ No newline at end of file
@@ -317,25 +317,35 @@ class CategoryAssistant:
             if not category:
                 return None
             
-            # Gather statistics (always available)
-            total_events = len(category.events) if hasattr(category, 'events') else 0
+            # Gather statistics (always available) - prefer the scheduled analytics snapshot
+            from model import CategoryAnalyticsSnapshot
+            snapshot = CategoryAnalyticsSnapshot.query.get(category_id)
             
-            future_events = 0
-            past_events = 0
-            if total_events > 0:
+            if snapshot:
+                stats = {
+                    "total_events": snapshot.total_events,
+                    "future_events": snapshot.active_events,
+                    "past_events": snapshot.total_events - snapshot.active_events,
+                    "popularity_score": snapshot.popularity_score,
+                    "trending_score": snapshot.trending_score,
+                    "total_tickets_sold": snapshot.total_tickets_sold,
+                    "recent_tickets_sold": snapshot.recent_tickets_sold,
+                    "trending_events": [e.get('name') for e in (snapshot.trending_events or [])[:3]]
+                }
+            else:
+                total_events = Event.query.filter_by(category_id=category_id).count()
                 future_events = Event.query.filter(
                     Event.category_id == category_id,
                     Event.date >= datetime.utcnow().date()
-                ).count()
-                past_events = total_events - future_events
-            
-            stats = {
-                "total_events": total_events,
-                "future_events": future_events,
-                "past_events": past_events,
-                "popularity_score": getattr(category, 'popularity_score', 0),
-                "trending_score": getattr(category, 'trending_score', 0)
-            }
+                ).count() if total_events else 0
+                
+                stats = {
+                    "total_events": total_events,
+                    "future_events": future_events,
+                    "past_events": total_events - future_events,
+                    "popularity_score": getattr(category, 'popularity_score', 0),
+                    "trending_score": getattr(category, 'trending_score', 0)
+                }
             
             # Try to generate AI insights
             insights_text = None
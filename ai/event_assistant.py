@@ -21,6 +21,8 @@ TicketTypeEnum, Partner, EventCollaboration, CollaborationType,
 AIAnalyticsCache, AIInsight, AIPricingRecommendation, CollaborationManager,
 Currency, ExchangeRate, Report, Transaction, User
 )
+from stats_engine import stats_engine
+from rate_limits import quotas, Limit
 
 logger = logging.getLogger(__name__)
 
@@ -43,17 +45,12 @@ class ComprehensiveEventAssistant:
     # ===== RATE LIMITING & CACHING =====
 
     def rate_limit(max_per_minute: int = 30):
-        """Decorator for rate limiting method calls"""
+        """Decorator for rate limiting method calls (one bucket shared by all workers)"""
         def decorator(func):
-            calls = []
+            limit = Limit(max_per_minute, 60)
             @wraps(func)
             def wrapper(self, *args, **kwargs):
-                now = time.time()
-                # Clean old calls
-                calls[:] = [call for call in calls if now - call < 60]
-                if len(calls) >= max_per_minute:
-                    raise Exception(f"Rate limit exceeded: {max_per_minute} calls per minute")
-                calls.append(now)
+                quotas.check(f"ai:{func.__name__}", 'all', limit)  # raises RateLimitExceeded
                 return func(self, *args, **kwargs)
             return wrapper
         return decorator
@@ -1848,6 +1845,8 @@ class ComprehensiveEventAssistant:
             event = AIEventManager.publish_draft(draft.id)
 
             if event:
+                stats_engine.record_event_created(event)
+
                 # Log the successful publication
                 organizer = Organizer.query.get(draft.organizer_id)
                 if organizer:
@@ -1,18 +1,22 @@
 """
 Enhanced LLM Client with Circuit Breaker Pattern and Async Support
 Prevents cascade failures and provides better error handling
+
+The OpenAI/httpx client is built on first use in each process, so importing
+the ai package doesn't load openai or httpx, and the background worker
+thread is started in the gunicorn worker that uses it rather than in the
+--preload master (where it would not survive the fork).
 """
 
-from openai import OpenAI, APIError, APIConnectionError, RateLimitError, APITimeoutError, AuthenticationError
 import logging
+import os
 import time
 from typing import List, Dict, Optional, Callable
 from datetime import datetime, timedelta
-from threading import Thread
+from threading import Lock, Thread
 from queue import Queue
 from config import Config
 from ai.utils.cache_manager import get_cache_manager
-import httpx
 
 logger = logging.getLogger(__name__)
 
@@ -92,6 +96,11 @@ class LLMClient:
         # Background task queue
         self.task_queue = Queue()
         self.background_worker = None
+
+        # OpenAI client, built on first use in each process (see client)
+        self._client = None
+        self._client_pid = None
+        self._client_lock = Lock()
         
         # Get API key based on provider
         if self.provider.lower() == "groq":
@@ -125,50 +134,67 @@ class LLMClient:
             self.cache = None
             logger.info("Cache disabled")
         
-        # Configure client
-        if self.enabled:
-            try:
-                # Use longer timeouts for background tasks
-                http_client = httpx.Client(
-                    timeout=httpx.Timeout(
-                        connect=30.0,  # Increased from 10s
-                        read=60.0,     # Increased from 30s
-                        write=30.0,    # Increased from 10s
-                        pool=10.0      # Increased from 5s
-                    ),
-                    limits=httpx.Limits(
-                        max_keepalive_connections=5,
-                        max_connections=10,
-                        keepalive_expiry=30.0
-                    ),
-                    follow_redirects=True,
-                    verify=True
-                )
-                
-                client_kwargs = {
-                    "api_key": self.api_key,
-                    "timeout": self.timeout,
-                    "max_retries": 0,
-                    "http_client": http_client
-                }
-                
-                if self.base_url:
-                    client_kwargs["base_url"] = self.base_url
-                
-                self.client = OpenAI(**client_kwargs)
-                logger.info(f"LLM Client initialized - Provider: {self.provider}, Model: {self.model}")
-                
-                # Start background worker
-                self._start_background_worker()
-                
-            except Exception as e:
-                logger.error(f"Failed to initialize OpenAI client: {e}")
-                self.client = None
-                self.enabled = False
-        else:
-            self.client = None
+        if not self.enabled:
             logger.warning(f"LLM Client disabled - API key not configured for {self.provider}")
-    
+
+    @property
+    def client(self):
+        """OpenAI client for this process, or None when AI is disabled or the client can't be built"""
+        if not self.enabled:
+            return None
+        if self._client_pid != os.getpid():
+            with self._client_lock:
+                if self._client_pid != os.getpid():
+                    self._client = self._build_client()
+                    self._client_pid = os.getpid()
+                    if self._client is None:
+                        self.enabled = False
+                    else:
+                        self.background_worker = None  # a thread inherited across fork isn't running here
+                        self._start_background_worker()
+        return self._client
+
+    def _build_client(self):
+        """Configure the OpenAI client (imports openai and httpx)"""
+        try:
+            import httpx
+            from openai import OpenAI
+
+            # Use longer timeouts for background tasks
+            http_client = httpx.Client(
+                timeout=httpx.Timeout(
+                    connect=30.0,  # Increased from 10s
+                    read=60.0,     # Increased from 30s
+                    write=30.0,    # Increased from 10s
+                    pool=10.0      # Increased from 5s
+                ),
+                limits=httpx.Limits(
+                    max_keepalive_connections=5,
+                    max_connections=10,
+                    keepalive_expiry=30.0
+                ),
+                follow_redirects=True,
+                verify=True
+            )
+
+            client_kwargs = {
+                "api_key": self.api_key,
+                "timeout": self.timeout,
+                "max_retries": 0,
+                "http_client": http_client
+            }
+
+            if self.base_url:
+                client_kwargs["base_url"] = self.base_url
+
+            client = OpenAI(**client_kwargs)
+            logger.info(f"LLM Client initialized - Provider: {self.provider}, Model: {self.model}")
+            return client
+
+        except Exception as e:
+            logger.error(f"Failed to initialize OpenAI client: {e}")
+            return None
+
     def _start_background_worker(self):
         """Start background worker thread for async tasks"""
         if self.background_worker is None or not self.background_worker.is_alive():
@@ -226,7 +252,7 @@ class LLMClient:
             callback: Function to call with result (receives response as argument)
             **kwargs: Additional parameters for chat_completion
         """
-        if not self.enabled:
+        if not self.enabled or not self.client:  # building the client starts the worker
             logger.warning("LLM not enabled - cannot queue async task")
             if callback:
                 callback(None)
@@ -263,6 +289,7 @@ class LLMClient:
         if not self.enabled or not self.client:
             logger.warning(f"LLM not enabled (Provider: {self.provider})")
             return fallback_response
+        from openai import APIError, APIConnectionError, RateLimitError, APITimeoutError, AuthenticationError
         
         # Check circuit breaker
         if not self.circuit_breaker.can_attempt():
@@ -11,7 +11,6 @@ from flask_sqlalchemy import SQLAlchemy
 from flask_restful import Api
 from flask_jwt_extended import JWTManager
 from flask_migrate import Migrate
-from flask_session import Session
 from flask_cors import CORS
 import cloudinary
 
@@ -27,16 +26,32 @@ from scan import register_ticket_validation_resources
 from mpesa_intergration import register_mpesa_routes
 from paystack import register_paystack_routes
 from ticket_type import register_ticket_type_resources
-from admin_report import register_admin_report_resources
 from resources import register_category_resources
 from resources import register_organizer_and_public_partner_resources
 from resources import register_admin_partner_resources
 from resources import register_event_resources
 from email_utils import mail
+from mail_dispatcher import mail_dispatcher
+from media_pipeline import media_pipeline
+from scheduler import job_scheduler
+from category_analytics import category_analytics
+from admin_analytics import admin_analytics
+from user_directory import user_directory
+from stats_engine import stats_engine
+from sales_facts import sales_facts
+from chart_service import chart_service
+from health_monitor import health_sampler
 from admin import register_admin_resources
 from currency_routes import register_currency_resources
-from organizer_report.organizer_report import ReportResourceRegistry
-from ai.ai_routes import register_ai_resources
+from exchange_rates import exchange_rates
+from rate_limits import quotas
+from credentials import credentials
+from session_store import session_store
+from principal import principals
+from organizer_report.report_jobs import report_jobs
+from organizer_report.report_schedules import report_schedules
+from organizer_report.artifact_store import artifact_store
+from lazy_routes import register_route_group
 
 # ✅ Updated stats import - using unified stats system
 from stats import register_unified_stats_resources
@@ -162,30 +177,53 @@ CORS(app,
          "https://ticketing-system-994g.onrender.com"  # Keep old Render URL for backward compatibility
      ]),
      supports_credentials=True,
-     expose_headers=["Set-Cookie"],
+     expose_headers=["Set-Cookie", "X-Next-Cursor", "X-Estimated-Total", "Link"],
      methods=["GET", "POST", "PUT", "DELETE", "OPTIONS"],
      allow_headers=["Content-Type", "Authorization"])
 
 # ✅ Initialize extensions
 db.init_app(app)
 
-# ✅ Enhanced Flask-Session configuration
-app.config['SESSION_TYPE'] = 'filesystem'
-app.config['SESSION_FILE_DIR'] = os.getenv('SESSION_DIR', '/tmp/flask_sessions')
-app.config['SESSION_PERMANENT'] = True
-app.config['SESSION_USE_SIGNER'] = True
-app.config['SESSION_KEY_PREFIX'] = 'session:'
-app.config['SESSION_FILE_THRESHOLD'] = 500
+# ✅ Server-side sessions (SESSION_BACKEND: postgres, cookie or flask_session)
+session_store.init_app(app)
 
-# Create session directory if it doesn't exist
-os.makedirs(app.config['SESSION_FILE_DIR'], exist_ok=True)
-
-session = Session()
 api = Api(app)
 jwt = JWTManager(app)
 migrate = Migrate(app, db)
 mail.init_app(app)
+mail_dispatcher.init_app(app)
 init_oauth(app)
+media_pipeline.init_app(app)
+category_analytics.init_app(app)
+admin_analytics.init_app(app)
+user_directory.init_app(app)
+stats_engine.init_app(app)
+sales_facts.init_app(app)
+chart_service.init_app(app)
+report_jobs.init_app(app)
+report_schedules.init_app(app)
+artifact_store.init_app(app)
+quotas.init_app(app)
+credentials.init_app(app)
+principals.init_app(app)
+exchange_rates.init_app(app)
+health_sampler.init_app(app)
+job_scheduler.init_app(app)
+job_scheduler.add_job('exchange_rates', exchange_rates.refresh,
+                      seconds=app.config['CURRENCY_UPDATE_INTERVAL'], run_on_start=True)
+job_scheduler.add_job('category_analytics', category_analytics.refresh_all,
+                      seconds=app.config['CATEGORY_ANALYTICS_INTERVAL'], run_on_start=True)
+job_scheduler.add_job('admin_analytics', admin_analytics.refresh_all,
+                      seconds=app.config['ADMIN_ANALYTICS_INTERVAL'], run_on_start=True)
+job_scheduler.add_job('stats', stats_engine.refresh_all,
+                      seconds=app.config['STATS_REFRESH_INTERVAL'], run_on_start=True)
+job_scheduler.add_job('report_job_cleanup', report_jobs.cleanup, seconds=600)
+job_scheduler.add_job('rate_limit_cleanup', quotas.purge, seconds=3600)
+job_scheduler.add_job('mail_cleanup', mail_dispatcher.purge, seconds=3600)
+job_scheduler.add_job('session_cleanup', session_store.purge_expired,
+                      seconds=app.config['SESSION_CLEANUP_INTERVAL'])
+job_scheduler.add_job('scheduled_reports', report_schedules.run_due,
+                      seconds=app.config['REPORT_SCHEDULE_INTERVAL'])
 
 # ✅ Cloudinary Configuration
 cloudinary.config(
@@ -276,68 +314,54 @@ def seed_currencies():
         return False
 
 def initialize_app():
-    """Initialize the application with enhanced error handling and graceful degradation"""
-    max_retries = 5
-    base_retry_delay = 2
-    
+    """Check the database once at startup and degrade gracefully if it is unreachable.
+
+    Schema creation and seeding are not done here any more: every worker used
+    to run db.create_all() and the currency check (with up to ~60s of backoff
+    sleeps) while booting. Run `flask --app app init-db` once per deploy instead.
+    """
     print("🚀 Starting application initialization...")
-    
-    for attempt in range(max_retries):
-        retry_delay = base_retry_delay * (2 ** attempt)  # Exponential backoff
-        
-        try:
-            with app.app_context():
-                print(f"🔄 Initialization attempt {attempt + 1}/{max_retries}...")
-                
-                # Test database connection with retries
-                print("🔍 Testing database connection...")
-                if not test_database_connection():
-                    raise Exception("Database connection failed after retries")
-                
+
+    try:
+        with app.app_context():
+            print("🔍 Testing database connection...")
+            if test_database_connection(max_retries=1):
                 print("✅ Database connection successful")
-                
-                # Create database tables
-                print("📋 Creating database tables...")
-                db.create_all()
-                print("✅ Database tables created/verified")
-                
-                # Initialize session
-                print("🔧 Initializing session...")
-                session.init_app(app)
-                print("✅ Session initialized")
-                
-                # Seed currencies
-                print("💱 Checking currency data...")
-                if seed_currencies():
-                    print("✅ Currency data ready")
-                else:
-                    print("⚠️ Currency seeding had issues, but continuing...")
-                
                 print("🎉 Application initialized successfully!")
                 return True
-                
-        except Exception as e:
-            print(f"❌ Initialization attempt {attempt + 1} failed: {e}")
-            
-            if attempt < max_retries - 1:
-                print(f"⏳ Retrying in {retry_delay} seconds...")
-                time.sleep(retry_delay)
-            else:
-                print("❌ All initialization attempts failed")
-                print("🔄 Attempting graceful degradation...")
-                
-                # Try minimal initialization as fallback
-                try:
-                    with app.app_context():
-                        session.init_app(app)
-                        print("⚠️ Running with minimal configuration (session only)")
-                        return False
-                except Exception as fallback_error:
-                    print(f"❌ Even minimal configuration failed: {fallback_error}")
-                    return False
-    
+            print("❌ Database connection failed")
+    except Exception as e:
+        print(f"❌ Initialization failed: {e}")
+
+    print("🔄 Attempting graceful degradation...")
+    try:
+        with app.app_context():
+            if app.config['SESSION_BACKEND'] == 'postgres':
+                session_store.use(app, 'cookie')  # sessions can't be stored without the database
+            print("⚠️ Running with minimal configuration (cookie sessions)")
+    except Exception as fallback_error:
+        print(f"❌ Even minimal configuration failed: {fallback_error}")
     return False
 
+def create_schema():
+    """Create missing tables and seed reference data"""
+    with app.app_context():
+        if not test_database_connection():
+            raise RuntimeError("Database connection failed after retries")
+        print("📋 Creating database tables...")
+        db.create_all()
+        print("✅ Database tables created/verified")
+        print("💱 Checking currency data...")
+        if seed_currencies():
+            print("✅ Currency data ready")
+        else:
+            print("⚠️ Currency seeding had issues, but continuing...")
+
+@app.cli.command('init-db')
+def init_db_command():
+    """Create tables and seed currencies (run once per deploy, before starting workers)"""
+    create_schema()
+
 # ✅ Register all routes
 print("📡 Registering application routes...")
 app.register_blueprint(auth_bp, url_prefix="/auth")
@@ -347,14 +371,14 @@ register_ticket_validation_resources(api)
 register_mpesa_routes(api, complete_ticket_operation)
 register_paystack_routes(api)
 register_ticket_type_resources(api)
-register_admin_report_resources(api)
+register_route_group(api, 'admin_report', app.config['LAZY_ROUTES'])
 register_admin_resources(api)
 register_currency_resources(api)
-register_ai_resources(api)
+register_route_group(api, 'ai.ai_routes', app.config['LAZY_ROUTES'])
 register_category_resources(api) 
 register_organizer_and_public_partner_resources(api)
 register_admin_partner_resources(api)
-ReportResourceRegistry.register_organizer_report_resources(api)
+register_route_group(api, 'organizer_report.organizer_report', app.config['LAZY_ROUTES'])
 
 # ✅ Updated stats registration - using unified stats system
 register_unified_stats_resources(api)
@@ -384,16 +408,16 @@ def detailed_health_check():
         "platform": "Koyeb"
     }
     
-    # Test database connection
-    try:
-        if test_database_connection(max_retries=1):
-            health_info["database"] = "connected"
-        else:
-            health_info["database"] = "connection failed"
-            health_info["status"] = "degraded"
-    except Exception as e:
-        health_info["database"] = f"error: {str(e)}"
+    # Database status from the worker's latest background health sample
+    sample = health_sampler.latest()
+    if sample["database"]["ok"]:
+        health_info["database"] = "connected"
+    else:
+        health_info["database"] = f"connection failed: {sample['database'].get('error')}"
         health_info["status"] = "degraded"
+    if sample["stale"]:
+        health_info["status"] = "degraded"  # the sampler thread has stopped reporting
+    health_info["sampled_at"] = sample["sampled_at"]
     
     # Add database URL info (without credentials)
     if DATABASE_URL:
@@ -409,19 +433,21 @@ def detailed_health_check():
 def readiness_check():
     """Kubernetes/Docker readiness probe"""
     try:
-        with app.app_context():
-            if test_database_connection(max_retries=1):
-                return {
-                    "status": "ready", 
-                    "api_version": "2.0",
-                    "stats_system": "unified",
-                    "platform": "Koyeb"
-                }, 200
-            else:
-                return {
-                    "status": "not ready", 
-                    "reason": "database unavailable"
-                }, 503
+        sample = health_sampler.latest()
+        if sample["database"]["ok"]:
+            return {
+                "status": "ready", 
+                "api_version": "2.0",
+                "stats_system": "unified",
+                "platform": "Koyeb",
+                "sampled_at": sample["sampled_at"]
+            }, 200
+        else:
+            return {
+                "status": "not ready", 
+                "reason": "database unavailable",
+                "sampled_at": sample["sampled_at"]
+            }, 503
     except Exception as e:
         return {
             "status": "not ready", 
@@ -502,6 +528,7 @@ if __name__ == "__main__":
     # Development mode
     print("🏃‍♂️ Running in development mode")
     print("📊 Using unified stats system v2.0")
+    create_schema()
     initialize_app()
     app.run(debug=True, host='0.0.0.0', port=int(os.getenv('PORT', 5000)))
 else:
@@ -3,10 +3,13 @@ from flask_jwt_extended import verify_jwt_in_request, get_jwt_identity, get_jwt,
 from email_validator import validate_email, EmailNotValidError
 import re
 import phonenumbers as pn
-from werkzeug.security import generate_password_hash, check_password_hash
 from functools import wraps
 from uuid import uuid4
 from model import db, User, UserRole, Organizer
+from principal import principals
+from credentials import credentials, CredentialsBusy
+from user_directory import user_directory, parse_roles
+from mail_dispatcher import mail_dispatcher
 from datetime import timedelta
 from oauth_config import oauth
 from flask_mail import Message
@@ -48,7 +51,8 @@ def generate_token(user):
         additional_claims={
             "email": user.email,
             "role": str(user.role.value),
-            "ai_enabled": user.ai_enabled
+            "ai_enabled": user.ai_enabled,
+            "ver": user.token_version or 0
         },
         expires_delta=timedelta(days=30)
     )
@@ -69,7 +73,7 @@ def google_login():
         
         # Debug logging
         logger.info(f"Initiating Google OAuth - State: {state}")
-        logger.debug(f"Session storage type: {current_app.config.get('SESSION_TYPE', 'unknown')}")
+        logger.debug(f"Session backend: {current_app.config.get('SESSION_BACKEND', 'unknown')}")
         logger.debug(f"Session contents after setting: {dict(session)}")
         
         # Verify session was saved
@@ -534,7 +538,7 @@ def debug_session_info():
                 "parsed_params": {k: v[0] if v else None for k, v in url_params.items()} if url_params else {}
             },
             "session_info": {
-                "session_type": current_app.config.get('SESSION_TYPE'),
+                "session_type": current_app.config.get('SESSION_BACKEND'),
                 "session_permanent": getattr(session, 'permanent', 'unknown'),
                 "session_keys": list(session.keys())
             },
@@ -656,7 +660,7 @@ def auth_health_check():
         
         health_data = {
             "status": "healthy" if session_working else "degraded",
-            "session_type": current_app.config.get('SESSION_TYPE', 'unknown'),
+            "session_type": current_app.config.get('SESSION_BACKEND', 'unknown'),
             "session_working": session_working,
             "google_oauth_configured": bool(
                 current_app.config.get('GOOGLE_CLIENT_ID') and 
@@ -793,7 +797,7 @@ def register():
         return jsonify({"msg": "Phone number already registered"}), 400
 
     # Hash Password
-    hashed_password = generate_password_hash(password)
+    hashed_password = credentials.hash_password(password)
 
     # Create and Save New User with AI enabled by default
     new_user = User(
@@ -873,7 +877,7 @@ def register_first_admin():
             return jsonify({"msg": "Admin already exists. First admin registration is no longer available."}), 403
         
         # Create new admin user with AI enabled
-        hashed_password = generate_password_hash(password)
+        hashed_password = credentials.hash_password(password)
         new_admin = User(
             email=email, 
             phone_number=phone, 
@@ -934,7 +938,7 @@ def register_admin():
         return jsonify({"msg": "Phone number already registered"}), 400
 
     # Hash password and create new admin user with AI enabled
-    hashed_password = generate_password_hash(password)
+    hashed_password = credentials.hash_password(password)
     new_admin = User(
         email=email, 
         phone_number=phone, 
@@ -961,12 +965,26 @@ def login():
     if not email or not password:
         return jsonify({"error": "Email and password are required"}), 400
 
-    # Find user with retry logic
+    # Locked-out emails/IPs are turned away before any hashing or database work
+    locked_for = credentials.locked_out(email, request.remote_addr)
+    if locked_for:
+        response = jsonify({"error": "Too many failed login attempts. Please try again later."})
+        response.headers['Retry-After'] = str(int(locked_for) + 1)
+        return response, 429
+
+    # Retry a dropped connection immediately; sleeping here would hold a request thread
     def get_user():
         return User.query.filter_by(email=email).first()
-    
-    user = db_query_with_retry(get_user)
-    if not user or not check_password_hash(user.password, password):
+
+    user = db_query_with_retry(get_user, max_retries=2, retry_delay=0)
+    try:
+        authenticated = credentials.authenticate(user, password)
+    except CredentialsBusy:
+        response = jsonify({"error": "Login is temporarily busy. Please try again."})
+        response.headers['Retry-After'] = '2'
+        return response, 503
+    if not authenticated:
+        credentials.record_failure(email, request.remote_addr)
         return jsonify({"error": "Invalid email or password"}), 401
 
     # Generate JWT token with AI settings
@@ -1059,6 +1077,7 @@ def register_organizer():
     try:
         # Update user role to ORGANIZER
         user.role = UserRole.ORGANIZER
+        principals.bump_version(user)
 
         # Handle company logo upload if provided
         logo_url = None
@@ -1148,7 +1167,7 @@ def register_security():
 
     try:
         # Hash password before storing
-        hashed_password = generate_password_hash(password)
+        hashed_password = credentials.hash_password(password)
 
         # Create a new security user with AI enabled
         new_user = User(
@@ -1172,7 +1191,6 @@ def register_security():
 
 @auth_bp.route('/forgot-password', methods=['POST'])
 def forgot_password():
-    from app import mail  # Import mail instance from app.py
     from itsdangerous import URLSafeTimedSerializer
 
     data = request.get_json()
@@ -1194,10 +1212,14 @@ def forgot_password():
 
     reset_link = f"{Config.FRONTEND_URL}/reset-password/{token}"
 
-    # Send email
+    # Queue the email; the mail dispatcher delivers it in the background
     msg = Message("Password Reset Request", recipients=[email])
     msg.body = f"Click the link to reset your password: {reset_link}"
-    mail.send(msg)
+    try:
+        mail_dispatcher.enqueue(msg)
+    except Exception as e:
+        logger.error(f"Failed to queue password reset email: {e}")
+        return jsonify({"msg": "Could not send reset email. Please try again."}), 500
 
     return jsonify({"msg": "Reset link sent to your email"}), 200
 
@@ -1235,7 +1257,7 @@ def reset_password(token):
 
     try:
         # Hash the new password
-        user.password = generate_password_hash(new_password)
+        user.password = credentials.hash_password(new_password)
         db.session.commit()
         return jsonify({"msg": "Password reset successful"}), 200
     except Exception as e:
@@ -1329,6 +1351,7 @@ def update_profile():
 
     try:
         db.session.commit()
+        principals.invalidate(user.id)
         logger.info(f"Profile updated for user: {user.email}, AI enabled: {user.ai_enabled}")
         return jsonify({"msg": "Profile updated successfully"}), 200
     except Exception as e:
@@ -1382,6 +1405,7 @@ def update_ai_preferences():
 
     try:
         db.session.commit()
+        principals.invalidate(user.id)
         logger.info(f"AI preferences updated for user: {user.email}")
         return jsonify({
             "msg": "AI preferences updated successfully",
@@ -1451,6 +1475,7 @@ def delete_organizer(organizer_id):
         # Then delete the user
         db.session.delete(user)
         db.session.commit()
+        principals.invalidate(organizer_id)
 
         return jsonify({"msg": "Organizer deleted successfully"}), 200
 
@@ -1462,38 +1487,31 @@ def delete_organizer(organizer_id):
 @jwt_required()
 @role_required('ADMIN')
 def get_users():
-    """Get list of all users with optional search"""
+    """Page through users with optional search and role filter (keyset on id, see user_directory.py)"""
     try:
-        search_query = request.args.get('search', '').lower()
-
-        # Base query
-        query = User.query
-
-        # Apply search filter if provided
-        if search_query:
-            query = query.filter(
-                db.or_(
-                    User.full_name.ilike(f'%{search_query}%'),
-                    User.email.ilike(f'%{search_query}%'),
-                    User.phone_number.ilike(f'%{search_query}%')
-                )
-            )
-
-        # Use retry logic for database query
-        def get_users():
-            return query.all()
-        
-        users = db_query_with_retry(get_users)
-
-        # Format response
-        result = []
-        for user in users:
-            user_data = user.as_dict()
-            # Add additional fields if needed
-            user_data['is_organizer'] = user.role == UserRole.ORGANIZER
-            result.append(user_data)
-
-        return jsonify(result), 200
+        search_query = request.args.get('search', '')
+        try:
+            roles = parse_roles(request.args.get('role'))
+        except ValueError:
+            return jsonify({"msg": "Invalid role filter"}), 400
+        limit = user_directory.clamp(request.args.get('limit', type=int))
+
+        def get_page():
+            return user_directory.page(search_query, roles, request.args.get('cursor', type=int), limit)
+
+        users, next_cursor = db_query_with_retry(get_page, max_retries=2, retry_delay=0)
+
+        # The body stays a plain list for existing clients; paging details travel in headers
+        response = jsonify(users)
+        estimated_total = user_directory.estimate_total(search_query, roles)
+        if estimated_total is not None:
+            response.headers['X-Estimated-Total'] = str(estimated_total)
+        if next_cursor is not None:
+            response.headers['X-Next-Cursor'] = str(next_cursor)
+            next_args = request.args.to_dict()
+            next_args.update(cursor=next_cursor, limit=limit)
+            response.headers['Link'] = f'<{url_for("auth.get_users", _external=True, **next_args)}>; rel="next"'
+        return response, 200
 
     except Exception as e:
         logger.error(f"Error fetching users: {str(e)}")
@@ -0,0 +1,74 @@
+"""
+Benchmark: cold vs warm vs cached chart renders through ChartService.
+
+Usage:
+    python -m benchmarks.chart_rendering [--runs 10] [--workers 1] [--types 6]
+
+Renders the four charts of an organizer report (tickets pie, revenue bar,
+payment method pie, sold-vs-attended comparison) for synthetic data. The
+first report through a fresh pool is the cold case (process spawn, font and
+style warm-up); later reports with new data are warm renders; re-exporting an
+identical report is served from the cache. An in-process service is measured
+alongside for comparison. No database is needed.
+"""
+import argparse
+import random
+import statistics
+import time
+
+from chart_service import ChartService
+
+
+def report_charts(seed, types):
+    rng = random.Random(seed)
+    names = [f"TYPE_{i}" for i in range(types)]
+    sold = {name: rng.randint(10, 500) for name in names}
+    return [
+        ('pie', {'labels': names, 'values': [float(v) for v in sold.values()]},
+         {'title': 'Tickets Sold by Type'}),
+        ('bar', {'labels': names, 'values': [rng.uniform(1000, 90000) for _ in names]},
+         {'title': 'Revenue by Ticket Type', 'xlabel': 'Ticket Type', 'ylabel': 'Revenue', 'currency_symbol': 'KSh'}),
+        ('pie', {'labels': ['MPESA', 'PAYSTACK'], 'values': [float(rng.randint(1, 300)), float(rng.randint(1, 300))]},
+         {'title': 'Payment Method Usage'}),
+        ('comparison', {'labels': names, 'sold': list(sold.values()),
+                        'attended': [rng.randint(0, v) for v in sold.values()]},
+         {'title': 'Tickets Sold vs Attendees'}),
+    ]
+
+
+def render_report(service, charts):
+    started = time.perf_counter()
+    for kind, data, options in charts:
+        if not service.render(kind, data, options):
+            raise RuntimeError(f"{kind} chart failed to render")
+    return (time.perf_counter() - started) * 1000
+
+
+def measure(label, service, runs, types):
+    cold = render_report(service, report_charts(0, types))
+    warm = [render_report(service, report_charts(seed, types)) for seed in range(1, runs + 1)]
+    cached = [render_report(service, report_charts(seed, types)) for seed in range(1, runs + 1)]
+    service.shutdown()
+
+    print(f"{label:<10} cold {cold:9.1f}ms   warm median {statistics.median(warm):8.1f}ms   "
+          f"cached median {statistics.median(cached):6.2f}ms   (per 4-chart report)")
+    return service.stats()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--runs', type=int, default=10)
+    parser.add_argument('--workers', type=int, default=1)
+    parser.add_argument('--types', type=int, default=6, help="ticket types per chart")
+    args = parser.parse_args()
+
+    cache_size = 8 * (args.runs + 1)
+    measure('inline', ChartService(cache_size=cache_size, inline=True), args.runs, args.types)
+    stats = measure(f"pool x{args.workers}", ChartService(workers=args.workers, cache_size=cache_size),
+                    args.runs, args.types)
+    print(f"cache: {stats['cache_entries']} charts, {stats['cache_bytes'] / 1024:.0f} KiB, "
+          f"hit rate {stats['hit_rate']}")
+
+
+if __name__ == '__main__':
+    main()
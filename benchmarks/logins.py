@@ -0,0 +1,88 @@
+"""
+Benchmark: password verification throughput per hash method.
+
+Usage:
+    python -m benchmarks.logins [--runs 40] [--threads 1 4 8]
+                                [--email user@example.com --password secret]
+
+For each hash method, hashes one password and verifies it from 1, 4 and 8
+threads at once through the credentials pool, printing logins/second and
+the per-login p95 (including time spent waiting for a pool slot). The
+configured PASSWORD_HASH_METHOD is listed first; compare it with werkzeug's
+default and a pbkdf2 setting before changing it.
+
+With --email/--password it also posts real logins to /auth/login through
+the test client. Use an account whose password is known; failed attempts
+count toward the lockout buckets.
+"""
+import argparse
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from app import app
+from credentials import credentials
+
+METHODS = ('scrypt:32768:8:1', 'pbkdf2:sha256:600000', 'pbkdf2:sha256:260000')
+
+
+def measure(method, runs, threads):
+    configured = credentials.method
+    credentials.method = method
+    try:
+        password_hash = credentials.hash_password('benchmark-password')
+    finally:
+        credentials.method = configured
+
+    def login(_):
+        started = time.perf_counter()
+        assert credentials.verify(password_hash, 'benchmark-password')
+        return (time.perf_counter() - started) * 1000
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        timings = list(pool.map(login, range(runs)))
+    elapsed = time.perf_counter() - started
+    print(f"{method:<22} threads={threads:<3} logins/s={runs / elapsed:8.1f}  "
+          f"median={statistics.median(timings):8.2f}ms  p95={sorted(timings)[int(len(timings) * 0.95) - 1]:8.2f}ms")
+
+
+def end_to_end(email, password, runs, threads):
+    def login(_):
+        client = app.test_client()
+        started = time.perf_counter()
+        response = client.post('/auth/login', json={"email": email, "password": password})
+        return (time.perf_counter() - started) * 1000, response.status_code
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        results = list(pool.map(login, range(runs)))
+    elapsed = time.perf_counter() - started
+    timings = [timing for timing, _ in results]
+    statuses = sorted({status for _, status in results})
+    print(f"{'/auth/login':<22} threads={threads:<3} logins/s={runs / elapsed:8.1f}  "
+          f"median={statistics.median(timings):8.2f}ms  p95={sorted(timings)[int(len(timings) * 0.95) - 1]:8.2f}ms  "
+          f"status={statuses}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--runs', type=int, default=40)
+    parser.add_argument('--threads', type=int, nargs='+', default=[1, 4, 8])
+    parser.add_argument('--email')
+    parser.add_argument('--password')
+    args = parser.parse_args()
+
+    print(f"pool: {credentials.workers} workers, queue {credentials.queue}")
+    methods = [credentials.method] + [method for method in METHODS if method != credentials.method]
+    for method in methods:
+        for threads in args.threads:
+            measure(method, args.runs, threads)
+
+    if args.email and args.password:
+        for threads in args.threads:
+            end_to_end(args.email, args.password, args.runs, threads)
+
+
+if __name__ == "__main__":
+    main()
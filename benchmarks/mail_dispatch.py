@@ -0,0 +1,114 @@
+"""
+Benchmark: outbound mail throughput, one SMTP connection per message vs the dispatcher.
+
+Usage:
+    pip install aiosmtpd
+    python -m benchmarks.mail_dispatch [--messages 200] [--port 8025] [--attachment-kb 0]
+
+Starts a local aiosmtpd sink that accepts and discards mail, points
+Flask-Mail at it and sends the same messages two ways:
+
+    direct      - mail.send(msg) for each message, the previous behaviour
+    dispatcher  - mail_dispatcher.enqueue(msg) for each message; the
+                  background worker drains the queue over one connection
+
+It prints the time a request spends per message (send or enqueue), overall
+messages/second until the sink has received everything, and how many SMTP
+connections were opened. Run it against a development database: anything
+already queued there is delivered to the sink too. Benchmark rows are
+deleted afterwards.
+"""
+import argparse
+import os
+import statistics
+import time
+
+from flask_mail import Message
+
+from app import app
+from email_utils import mail
+from mail_dispatcher import mail_dispatcher
+from model import db, OutboundEmail
+
+SUBJECT = 'Mail dispatch benchmark'
+
+
+class SinkHandler:
+    """Counts messages and client connections, discards everything"""
+
+    def __init__(self):
+        self.messages = 0
+        self.peers = set()
+
+    async def handle_DATA(self, server, session, envelope):
+        self.messages += 1
+        self.peers.add(session.peer)
+        return '250 Message accepted for delivery'
+
+
+def build_message(index, attachment):
+    msg = Message(subject=f"{SUBJECT} #{index}", recipients=[f"bench{index}@example.com"])
+    msg.body = "Benchmark message body.\n" * 20
+    if attachment:
+        msg.attach(filename='ticket.png', content_type='image/png', data=attachment)
+    return msg
+
+
+def wait_for(handler, expected, timeout=300):
+    deadline = time.perf_counter() + timeout
+    while handler.messages < expected and time.perf_counter() < deadline:
+        time.sleep(0.01)
+
+
+def run(label, handler, send, messages, attachment):
+    handler.messages, handler.peers = 0, set()
+    timings = []
+    started = time.perf_counter()
+    for index in range(messages):
+        msg = build_message(index, attachment)
+        sent_at = time.perf_counter()
+        send(msg)
+        timings.append((time.perf_counter() - sent_at) * 1000)
+    wait_for(handler, messages)
+    elapsed = time.perf_counter() - started
+    print(f"{label:<11} per-call median={statistics.median(timings):8.3f}ms  "
+          f"p95={sorted(timings)[int(len(timings) * 0.95) - 1]:8.3f}ms  "
+          f"messages/s={handler.messages / elapsed:8.1f}  delivered={handler.messages}/{messages}  "
+          f"connections={len(handler.peers)}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--messages', type=int, default=200)
+    parser.add_argument('--port', type=int, default=8025)
+    parser.add_argument('--attachment-kb', type=int, default=0, help="attach a random blob, like a ticket QR code")
+    args = parser.parse_args()
+
+    try:
+        from aiosmtpd.controller import Controller
+    except ImportError:
+        parser.error("the SMTP sink needs aiosmtpd: pip install aiosmtpd")
+
+    handler = SinkHandler()
+    controller = Controller(handler, hostname='127.0.0.1', port=args.port)
+    controller.start()
+    app.config.update(MAIL_SERVER='127.0.0.1', MAIL_PORT=args.port, MAIL_USE_TLS=False, MAIL_USE_SSL=False,
+                      MAIL_USERNAME=None, MAIL_PASSWORD=None, MAIL_SUPPRESS_SEND=False)
+    mail.init_app(app)  # rebuild Flask-Mail's state from the sink settings
+    mail_dispatcher.sync = False
+    attachment = os.urandom(args.attachment_kb * 1024) if args.attachment_kb else None
+
+    try:
+        with app.app_context():
+            run('direct', handler, mail.send, args.messages, attachment)
+            run('dispatcher', handler, mail_dispatcher.enqueue, args.messages, attachment)
+    finally:
+        mail_dispatcher.shutdown()
+        controller.stop()
+        with app.app_context():
+            OutboundEmail.query.filter(OutboundEmail.subject.like(f"{SUBJECT}%")).delete(synchronize_session=False)
+            db.session.commit()
+
+
+if __name__ == "__main__":
+    main()
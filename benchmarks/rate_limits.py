@@ -0,0 +1,85 @@
+"""
+Benchmark: rate limiter overhead per request, per quota backend.
+
+Usage:
+    python -m benchmarks.rate_limits [--runs 2000] [--threads 8]
+
+For each backend, times single-threaded `quotas.consume` calls against a
+bucket that never runs dry (the cost every limited request pays) and counts
+the statements each call issues. It then drains one small bucket from
+several threads at once and checks that exactly `capacity` calls got
+through, i.e. that concurrent takes never oversell the bucket. Benchmark
+buckets are deleted afterwards.
+"""
+import argparse
+import statistics
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from sqlalchemy import event as sa_event
+
+from app import app
+from model import db, RateLimitBucket
+from rate_limits import BACKENDS, Limit, quotas
+
+
+def measure(label, runs):
+    statements = []
+
+    def count_statement(*_):
+        statements.append(1)
+
+    limit = Limit(runs * 10, 1)  # never empties during the run
+    scope = f"bench:{uuid.uuid4().hex[:8]}"
+    engine = db.engine
+    sa_event.listen(engine, 'before_cursor_execute', count_statement)
+    try:
+        timings = []
+        for _ in range(runs):
+            started = time.perf_counter()
+            quotas.consume(scope, 'overhead', limit)
+            timings.append((time.perf_counter() - started) * 1000)
+    finally:
+        sa_event.remove(engine, 'before_cursor_execute', count_statement)
+
+    print(f"{label:<10} statements/call={len(statements) / runs:<4.1f} "
+          f"median={statistics.median(timings):7.3f}ms  p95={sorted(timings)[int(len(timings) * 0.95) - 1]:7.3f}ms")
+
+
+def contention(label, threads, capacity=50):
+    limit = Limit(capacity, 3600)  # refills too slowly to matter during the run
+    scope = f"bench:{uuid.uuid4().hex[:8]}"
+
+    def take(_):
+        with app.app_context():
+            return quotas.consume(scope, 'contention', limit).allowed
+
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        allowed = sum(pool.map(take, range(capacity * 3)))
+    verdict = "ok" if allowed == capacity else "OVERSOLD" if allowed > capacity else "UNDERSOLD"
+    print(f"{label:<10} {threads} threads, capacity {capacity}: {allowed} allowed ({verdict})")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--runs', type=int, default=2000)
+    parser.add_argument('--threads', type=int, default=8)
+    args = parser.parse_args()
+
+    configured = quotas.backend
+    quotas.enabled = True
+    with app.app_context():
+        try:
+            for name, backend in BACKENDS.items():
+                quotas.backend = backend()
+                measure(name, args.runs)
+                contention(name, args.threads)
+        finally:
+            quotas.backend = configured
+            RateLimitBucket.query.filter(RateLimitBucket.key.like('bench:%')).delete(synchronize_session=False)
+            db.session.commit()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+"""
+Benchmark: per-metric DatabaseQueryService calls vs ReportQueryEngine.
+
+Usage:
+    python -m benchmarks.report_queries <event_id> [--days 365] [--runs 20]
+
+Runs both paths against the configured database for the same event and date
+range, checks that they agree, and prints statement counts and timings.
+"""
+import argparse
+import statistics
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import event as sa_event
+
+from app import app
+from model import db
+from organizer_report.services import DatabaseQueryService
+from organizer_report.report_queries import ReportQueryEngine
+
+
+def legacy_path(event_id, start_date, end_date):
+    tickets = dict(DatabaseQueryService.get_tickets_sold_by_type(event_id, start_date, end_date))
+    revenue = {k: float(v) for k, v in DatabaseQueryService.get_revenue_by_type(event_id, start_date, end_date)}
+    attendees = dict(DatabaseQueryService.get_attendees_by_type(event_id, start_date, end_date))
+    methods = dict(DatabaseQueryService.get_payment_method_usage(event_id, start_date, end_date))
+    total_revenue = DatabaseQueryService.get_total_revenue(event_id, start_date, end_date)
+    total_tickets = DatabaseQueryService.get_total_tickets_sold(event_id, start_date, end_date)
+    total_attendees = DatabaseQueryService.get_total_attendees(event_id, start_date, end_date)
+    return {
+        'total_tickets_sold': total_tickets,
+        'number_of_attendees': total_attendees,
+        'total_revenue': float(total_revenue),
+        'tickets_by_type': tickets,
+        'revenue_by_type': revenue,
+        'attendees_by_type': attendees,
+        'payment_method_usage': methods,
+    }
+
+
+def engine_path(event_id, start_date, end_date):
+    data = ReportQueryEngine.as_processed_data(
+        ReportQueryEngine.aggregate_event(event_id, start_date, end_date)
+    )
+    data.pop('attendance_rate')
+    data['total_revenue'] = float(data['total_revenue'])
+    return data
+
+
+def measure(label, func, runs, *args):
+    statements = []
+
+    def count_statement(*_):
+        statements.append(1)
+
+    engine = db.engine
+    sa_event.listen(engine, 'before_cursor_execute', count_statement)
+    try:
+        timings = []
+        result = None
+        for _ in range(runs):
+            statements.clear()
+            started = time.perf_counter()
+            result = func(*args)
+            timings.append((time.perf_counter() - started) * 1000)
+            db.session.rollback()
+    finally:
+        sa_event.remove(engine, 'before_cursor_execute', count_statement)
+
+    print(f"{label:<24} statements={len(statements):<3} "
+          f"median={statistics.median(timings):8.2f}ms  p95={sorted(timings)[int(len(timings) * 0.95) - 1]:8.2f}ms")
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('event_id', type=int)
+    parser.add_argument('--days', type=int, default=365)
+    parser.add_argument('--runs', type=int, default=20)
+    args = parser.parse_args()
+
+    end_date = datetime.utcnow()
+    start_date = end_date - timedelta(days=args.days)
+
+    with app.app_context():
+        legacy = measure('DatabaseQueryService', legacy_path, args.runs, args.event_id, start_date, end_date)
+        single = measure('ReportQueryEngine', engine_path, args.runs, args.event_id, start_date, end_date)
+
+    mismatches = [key for key in legacy if legacy[key] != single[key]]
+    if mismatches:
+        for key in mismatches:
+            print(f"MISMATCH {key}: legacy={legacy[key]!r} engine={single[key]!r}")
+    else:
+        print("Results match")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+"""
+Benchmark: request latency per session backend.
+
+Usage:
+    python -m benchmarks.sessions [--runs 500]
+
+Registers three throwaway routes on the app and calls them through the test
+client with a session cookie already set, for each SESSION_BACKEND:
+
+    untouched  - the common API request: cookie sent, session never used
+    read       - reads a value (the OAuth callback)
+    write      - stores a value (the OAuth login redirect)
+
+flask_session runs with SESSION_TYPE=filesystem in a temporary directory,
+which is the setup the postgres backend replaces.
+"""
+import argparse
+import statistics
+import tempfile
+import time
+
+from flask import session
+
+from app import app
+from model import db, ServerSession
+from session_store import session_store
+
+SCENARIOS = ('untouched', 'read', 'write')
+BASE_URL = 'https://localhost'  # session cookies are Secure outside development
+
+
+def bench_view(scenario):
+    if scenario == 'read':
+        return {"state": session.get('oauth_state')}
+    if scenario == 'write':
+        session['oauth_state'] = str(time.perf_counter())
+    return {"ok": True}
+
+
+def measure(backend, runs):
+    session_store.use(app, backend)
+    client = app.test_client()
+    client.get('/_bench/session/write', base_url=BASE_URL)  # establish the cookie
+    for scenario in SCENARIOS:
+        timings = []
+        for _ in range(runs):
+            started = time.perf_counter()
+            response = client.get(f'/_bench/session/{scenario}', base_url=BASE_URL)
+            timings.append((time.perf_counter() - started) * 1000)
+            assert response.status_code == 200, response.status_code
+        print(f"{backend:<14} {scenario:<10} median={statistics.median(timings):7.3f}ms  "
+              f"p95={sorted(timings)[int(len(timings) * 0.95) - 1]:7.3f}ms")
+
+    cookie = client.get_cookie(app.config.get('SESSION_COOKIE_NAME', 'session'))
+    if backend == 'postgres' and cookie is not None:
+        with app.app_context():
+            ServerSession.query.filter_by(sid=cookie.value).delete()
+            db.session.commit()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--runs', type=int, default=500)
+    args = parser.parse_args()
+
+    app.add_url_rule('/_bench/session/<scenario>', 'bench_session', bench_view)
+    configured = app.config['SESSION_BACKEND']
+    with tempfile.TemporaryDirectory() as session_dir:
+        app.config.update(SESSION_TYPE='filesystem', SESSION_FILE_DIR=session_dir)
+        try:
+            for backend in session_store.BACKENDS:
+                measure(backend, args.runs)
+        finally:
+            session_store.use(app, configured)
+
+
+if __name__ == "__main__":
+    main()
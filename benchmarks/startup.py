@@ -0,0 +1,157 @@
+"""
+Benchmark: worker startup cost, with and without lazy route loading.
+
+Usage:
+    python -m benchmarks.startup [--runs 5] [--top 15] [--record]
+                                 [--history benchmarks/results/startup.jsonl]
+
+Imports app.py in a fresh interpreter under `python -X importtime`, once
+with LAZY_ROUTES on and once with it off, and prints for each mode:
+
+    import app  - median and p95 wall time of the import (everything
+                  gunicorn --preload does before forking)
+    maxrss      - peak resident memory of the child after the import
+    modules     - modules imported, and whether the heavy optional stacks
+                  (matplotlib, ReportLab, pandas, OpenAI/httpx, ...) were
+    top         - the slowest top-level imports by cumulative time
+
+app.py checks the database while it imports, so point DATABASE_URL at a
+development database (or accept the connection timeout in every run).
+
+--record appends the results, with the current git commit, to the history
+file as one JSON line and prints the change against the previous entry, so
+regressions in import time show up from one commit to the next.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+MARKER = 'STARTUP_BENCHMARK '
+HEAVY = ('matplotlib', 'numpy', 'reportlab', 'pandas', 'openai', 'httpx', 'qrcode', 'PIL')
+DEFAULT_HISTORY = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'results', 'startup.jsonl')
+
+CHILD = f"""
+import json, resource, sys, time
+started = time.perf_counter()
+import app
+elapsed = time.perf_counter() - started
+print({MARKER!r} + json.dumps({{
+    'seconds': elapsed,
+    'maxrss_kb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+    'modules': sorted(sys.modules),
+}}), flush=True)
+"""
+
+
+def parse_importtime(stderr):
+    """Top-level imports as {module: cumulative microseconds} from -X importtime output"""
+    cumulative = {}
+    for line in stderr.splitlines():
+        # "import time:   self [us] |  cumulative | imported package", nesting shown by indentation
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        fields = line[len('import time:'):].split('|')
+        if len(fields) != 3:
+            continue
+        name = fields[2]
+        if name.startswith('  '):
+            continue  # nested import, already counted in its parent's cumulative time
+        cumulative[name.strip()] = int(fields[1])
+    return cumulative
+
+
+def run_once(lazy):
+    env = dict(os.environ, LAZY_ROUTES='True' if lazy else 'False')
+    completed = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', CHILD],
+        cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+        env=env, capture_output=True, text=True
+    )
+    result = next((json.loads(line[len(MARKER):]) for line in completed.stdout.splitlines()
+                   if line.startswith(MARKER)), None)
+    if result is None:
+        sys.exit(f"import app failed (LAZY_ROUTES={lazy}):\n{completed.stderr[-2000:]}")
+    result['imports'] = parse_importtime(completed.stderr)
+    return result
+
+
+def measure(lazy, runs, top):
+    results = [run_once(lazy) for _ in range(runs)]
+    timings = sorted(result['seconds'] * 1000 for result in results)
+    modules = results[-1]['modules']
+    heavy = sorted({name.split('.')[0] for name in modules if name.split('.')[0] in HEAVY})
+    slowest = sorted(results[-1]['imports'].items(), key=lambda item: item[1], reverse=True)[:top]
+    summary = {
+        'median_ms': round(statistics.median(timings), 1),
+        'p95_ms': round(timings[max(int(len(timings) * 0.95) - 1, 0)], 1),
+        'maxrss_kb': int(statistics.median(result['maxrss_kb'] for result in results)),
+        'modules': len(modules),
+        'heavy': heavy,
+        'top': [[name, round(us / 1000, 1)] for name, us in slowest],
+    }
+    label = 'lazy' if lazy else 'eager'
+    print(f"{label:<6} import app median={summary['median_ms']:8.1f}ms  p95={summary['p95_ms']:8.1f}ms  "
+          f"maxrss={summary['maxrss_kb'] / 1024:7.1f}MB  modules={summary['modules']}  "
+          f"heavy={','.join(heavy) or '-'}")
+    for name, ms in summary['top']:
+        print(f"         {ms:9.1f}ms  {name}")
+    return label, summary
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def record(history, results):
+    previous = None
+    if os.path.exists(history):
+        with open(history) as f:
+            lines = [line for line in f if line.strip()]
+        previous = json.loads(lines[-1]) if lines else None
+
+    entry = {
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'commit': git_commit(),
+        'python': sys.version.split()[0],
+        'results': {label: {key: value for key, value in summary.items() if key != 'top'}
+                    for label, summary in results.items()},
+    }
+    os.makedirs(os.path.dirname(history) or '.', exist_ok=True)
+    with open(history, 'a') as f:
+        f.write(json.dumps(entry) + '\n')
+    print(f"recorded to {history}")
+
+    if previous:
+        print(f"change since {previous.get('commit')} ({previous.get('timestamp')}):")
+        for label, summary in entry['results'].items():
+            before = previous.get('results', {}).get(label)
+            if not before:
+                continue
+            print(f"  {label:<6} median {summary['median_ms'] - before['median_ms']:+8.1f}ms  "
+                  f"maxrss {(summary['maxrss_kb'] - before['maxrss_kb']) / 1024:+7.1f}MB  "
+                  f"modules {summary['modules'] - before['modules']:+d}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--top', type=int, default=15, help="slowest top-level imports to list")
+    parser.add_argument('--record', action='store_true', help="append the results to the history file")
+    parser.add_argument('--history', default=DEFAULT_HISTORY)
+    args = parser.parse_args()
+
+    results = dict(measure(lazy, args.runs, args.top) for lazy in (True, False))
+    if args.record:
+        record(args.history, results)
+
+
+if __name__ == "__main__":
+    main()
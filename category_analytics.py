@@ -0,0 +1,212 @@
+"""
+Category analytics job.
+
+Computes popularity, trending events (recent sales velocity + likes) and ticket
+totals for every category in two grouped statements, and upserts the results
+into `category_analytics_snapshots`. CategoryResource and the AI assistants read
+the snapshot instead of aggregating per category on demand; confirmed sales
+bump the counters incrementally between scheduled refreshes.
+"""
+import logging
+from collections import Counter
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+
+from sqlalchemy import func
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+
+from model import (db, Category, CategoryAnalyticsSnapshot, Event, Ticket,
+                   PaymentStatus, event_likes)
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+PAID_STATUSES = [PaymentStatus.COMPLETED, PaymentStatus.PAID]
+
+
+def popularity_score(active_events: int, total_tickets: int) -> float:
+    """Same weighting as the original Category.calculate_popularity"""
+    return min(1.0, active_events * 0.3 + total_tickets * 0.001)
+
+
+class CategoryAnalyticsService:
+    """Set-based category aggregation with snapshot reads and incremental updates"""
+
+    def __init__(self, window_days: int = 7, trending_limit: int = 10, like_weight: float = 2.0):
+        self.window_days = window_days
+        self.trending_limit = trending_limit
+        self.like_weight = like_weight
+
+    def init_app(self, app):
+        self.window_days = app.config.get('CATEGORY_TRENDING_WINDOW_DAYS', self.window_days)
+        self.trending_limit = app.config.get('CATEGORY_TRENDING_LIMIT', self.trending_limit)
+        self.like_weight = app.config.get('CATEGORY_TRENDING_LIKE_WEIGHT', self.like_weight)
+
+    def _event_activity_subqueries(self, since: datetime):
+        """Per-event paid ticket totals (all-time and within the window) and like counts"""
+        sales = db.session.query(
+            Ticket.event_id.label('event_id'),
+            func.sum(Ticket.quantity).label('tickets_sold'),
+            func.coalesce(func.sum(Ticket.quantity).filter(Ticket.purchase_date >= since), 0).label('recent_sold')
+        ).filter(
+            Ticket.payment_status.in_(PAID_STATUSES)
+        ).group_by(Ticket.event_id).subquery()
+
+        likes = db.session.query(
+            event_likes.c.event_id.label('event_id'),
+            func.count().label('likes')
+        ).group_by(event_likes.c.event_id).subquery()
+
+        return sales, likes
+
+    def refresh_all(self) -> int:
+        """Recompute snapshots for all categories; returns the number of categories written"""
+        started = datetime.utcnow()
+        today = started.date()
+        since = started - timedelta(days=self.window_days)
+        sales, likes = self._event_activity_subqueries(since)
+
+        tickets_sold = func.coalesce(sales.c.tickets_sold, 0)
+        recent_sold = func.coalesce(sales.c.recent_sold, 0)
+        like_count = func.coalesce(likes.c.likes, 0)
+        is_active = Event.date >= today
+
+        # 1) Category totals
+        totals = db.session.query(
+            Category.id.label('category_id'),
+            func.count(Event.id).label('total_events'),
+            func.count(Event.id).filter(is_active).label('active_events'),
+            func.coalesce(func.sum(tickets_sold), 0).label('total_tickets_sold'),
+            func.coalesce(func.sum(recent_sold), 0).label('recent_tickets_sold'),
+            func.coalesce(func.sum(like_count), 0).label('total_likes'),
+            func.coalesce(func.sum(like_count).filter(is_active), 0).label('active_likes')
+        ).outerjoin(
+            Event, Event.category_id == Category.id
+        ).outerjoin(
+            sales, sales.c.event_id == Event.id
+        ).outerjoin(
+            likes, likes.c.event_id == Event.id
+        ).group_by(Category.id).all()
+
+        # 2) Top-N upcoming events per category by sales velocity + likes
+        score_expr = recent_sold + like_count * self.like_weight
+        ranked = db.session.query(
+            Event.id.label('event_id'),
+            Event.name.label('name'),
+            Event.category_id.label('category_id'),
+            recent_sold.label('recent_sold'),
+            like_count.label('likes'),
+            score_expr.label('score'),
+            func.row_number().over(
+                partition_by=Event.category_id,
+                order_by=[score_expr.desc(), Event.date.asc()]
+            ).label('rank')
+        ).outerjoin(
+            sales, sales.c.event_id == Event.id
+        ).outerjoin(
+            likes, likes.c.event_id == Event.id
+        ).filter(
+            Event.category_id.isnot(None),
+            is_active
+        ).subquery()
+
+        trending_rows = db.session.query(ranked).filter(
+            ranked.c.rank <= self.trending_limit,
+            ranked.c.score > 0
+        ).order_by(ranked.c.category_id, ranked.c.rank).all()
+
+        top_score = max((float(row.score) for row in trending_rows), default=0.0)
+        trending_by_category: Dict[int, List[dict]] = {}
+        for row in trending_rows:
+            trending_by_category.setdefault(row.category_id, []).append({
+                "event_id": row.event_id,
+                "name": row.name,
+                "recent_tickets_sold": int(row.recent_sold),
+                "likes": int(row.likes),
+                "score": round(float(row.score) / top_score, 4) if top_score else 0.0
+            })
+
+        # Category trending score is velocity relative to the hottest category
+        velocities = {
+            row.category_id: float(row.recent_tickets_sold) + float(row.active_likes) * self.like_weight
+            for row in totals
+        }
+        max_velocity = max(velocities.values(), default=0.0)
+
+        snapshots = []
+        for row in totals:
+            snapshots.append({
+                "category_id": row.category_id,
+                "total_events": int(row.total_events),
+                "active_events": int(row.active_events),
+                "total_tickets_sold": int(row.total_tickets_sold),
+                "recent_tickets_sold": int(row.recent_tickets_sold),
+                "total_likes": int(row.total_likes),
+                "popularity_score": popularity_score(int(row.active_events), int(row.total_tickets_sold)),
+                "trending_score": round(velocities[row.category_id] / max_velocity, 4) if max_velocity else 0.0,
+                "trending_events": trending_by_category.get(row.category_id, []),
+                "window_days": self.window_days,
+                "computed_at": started,
+                "updated_at": started
+            })
+
+        if not snapshots:
+            return 0
+
+        stmt = pg_insert(CategoryAnalyticsSnapshot).values(snapshots)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[CategoryAnalyticsSnapshot.category_id],
+            set_={column: stmt.excluded[column] for column in snapshots[0] if column != 'category_id'}
+        )
+        db.session.execute(stmt)
+
+        # Keep the denormalized Category scores in step for callers that read them directly
+        db.session.bulk_update_mappings(Category, [
+            {"id": s["category_id"], "popularity_score": s["popularity_score"], "trending_score": s["trending_score"]}
+            for s in snapshots
+        ])
+        db.session.commit()
+
+        elapsed = (datetime.utcnow() - started).total_seconds()
+        logger.info(f"Category analytics refreshed for {len(snapshots)} categories in {elapsed:.2f}s")
+        return len(snapshots)
+
+    def record_sales(self, tickets) -> None:
+        """Apply newly confirmed tickets to the snapshots without a full refresh"""
+        try:
+            per_event = Counter()
+            for ticket in tickets:
+                per_event[ticket.event_id] += ticket.quantity or 0
+            if not per_event:
+                return
+
+            per_category = Counter()
+            for event_id, category_id in db.session.query(Event.id, Event.category_id).filter(
+                Event.id.in_(list(per_event)), Event.category_id.isnot(None)
+            ):
+                per_category[category_id] += per_event[event_id]
+
+            for category_id, quantity in per_category.items():
+                new_total = CategoryAnalyticsSnapshot.total_tickets_sold + quantity
+                CategoryAnalyticsSnapshot.query.filter_by(category_id=category_id).update({
+                    "total_tickets_sold": new_total,
+                    "recent_tickets_sold": CategoryAnalyticsSnapshot.recent_tickets_sold + quantity,
+                    "popularity_score": func.least(1.0, CategoryAnalyticsSnapshot.active_events * 0.3 + new_total * 0.001),
+                    "updated_at": datetime.utcnow()
+                }, synchronize_session=False)
+            db.session.commit()
+        except Exception as e:
+            # Analytics must never break payment confirmation; the next refresh catches up
+            db.session.rollback()
+            logger.error(f"Failed to apply incremental category analytics: {e}")
+
+    @staticmethod
+    def get_snapshot(category_id: int) -> Optional[CategoryAnalyticsSnapshot]:
+        return CategoryAnalyticsSnapshot.query.get(category_id)
+
+    @staticmethod
+    def get_snapshots() -> Dict[int, CategoryAnalyticsSnapshot]:
+        return {s.category_id: s for s in CategoryAnalyticsSnapshot.query.all()}
+
+
+category_analytics = CategoryAnalyticsService()
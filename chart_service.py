@@ -0,0 +1,467 @@
+"""
+Chart rendering service.
+
+Report charts are drawn in a small dedicated process pool whose workers load
+matplotlib (Agg backend), the font cache and the style sheet once at start-up
+and return PNG bytes instead of writing temp files. Rendered images are cached
+per process in an LRU keyed by a hash of (chart type, data, style, currency),
+so re-exporting a report reuses its charts. Cold, warm and cached render
+timings are kept for `ChartService.stats()` and benchmarks/chart_rendering.py.
+matplotlib and numpy are imported by the first render (or warm-up) in a
+process, so the web workers that only hand charts to the pool never load them.
+"""
+import hashlib
+import json
+import logging
+import multiprocessing
+import os
+import statistics
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeoutError
+from concurrent.futures.process import BrokenProcessPool
+from io import BytesIO
+from threading import Lock
+from typing import Any, Dict, Optional
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+PNG_SIGNATURE = b'\x89PNG\r\n\x1a\n'
+
+# Modern, professional color palette with better contrast
+COLORS_PALETTE = [
+    '#2E86AB',  # Blue
+    '#A23B72',  # Purple
+    '#F18F01',  # Orange
+    '#C73E1D',  # Red
+    '#1B998B',  # Teal
+    '#8E7CC3',  # Light Purple
+    '#F4A261',  # Light Orange
+    '#E76F51',  # Coral
+    '#264653',  # Dark Teal
+    '#E9C46A'   # Yellow
+]
+DARK_BACKGROUND = '#1e1e1e'
+
+# Set once per process by warm_renderer
+_warmed_styles = set()
+
+# Bound by _load_matplotlib on the first render in this process
+np = path_effects = font_manager = FuncFormatter = plt = None
+
+
+def _load_matplotlib() -> None:
+    global np, path_effects, font_manager, FuncFormatter, plt
+    if plt is not None:
+        return
+    import matplotlib
+    matplotlib.use('Agg')
+    import numpy as np
+    import matplotlib.patheffects as path_effects
+    from matplotlib import font_manager
+    from matplotlib.ticker import FuncFormatter
+    import matplotlib.pyplot as plt  # last, so `plt is not None` means everything is bound
+
+
+def _resolve_style(style: Optional[str]) -> str:
+    _load_matplotlib()
+    if style and (style == 'default' or style in plt.style.available):
+        return style
+    if style:
+        logger.warning(f"Unknown matplotlib style '{style}', using default")
+    return 'default'
+
+
+def warm_renderer(style: str = 'default') -> None:
+    """Pool initializer: load fonts, the style sheet and the Agg renderer before the first real chart"""
+    style = _resolve_style(style)
+    if style in _warmed_styles:
+        return
+    for weight in ('normal', 'bold'):
+        font_manager.findfont(font_manager.FontProperties(family='sans-serif', weight=weight))
+    with plt.style.context(style):
+        fig, ax = plt.subplots(figsize=(2, 2))
+        try:
+            ax.set_title('warm-up', fontweight='bold')
+            ax.bar(['a', 'b'], [1, 2])
+            ax.text(0, 1, '0.0%', fontsize=11, fontweight='bold')
+            fig.savefig(BytesIO(), format='png', dpi=72)
+        finally:
+            plt.close(fig)
+    _warmed_styles.add(style)
+
+
+# ===== RENDERERS =====
+def _draw_pie(data: Dict[str, Any], options: Dict[str, Any]):
+    labels, sizes = data['labels'], data['values']
+    # Use square figure size to ensure perfect circle
+    fig, ax = plt.subplots(figsize=(10, 10))
+
+    wedges, texts, autotexts = ax.pie(
+        sizes,
+        labels=labels,
+        autopct='%1.1f%%',
+        colors=COLORS_PALETTE[:len(labels)],
+        startangle=90,
+        explode=[0.05] * len(labels) if len(labels) > 1 else None,
+        shadow=True,  # Add subtle shadow for depth
+        textprops={'fontsize': 10, 'fontweight': 'bold'},
+        pctdistance=0.85,  # Move percentage text closer to edge
+        labeldistance=1.1   # Move labels slightly outward
+    )
+
+    # Style the percentage text for better readability
+    for autotext in autotexts:
+        autotext.set_color('white')
+        autotext.set_fontweight('bold')
+        autotext.set_fontsize(11)
+        # Add a subtle outline to make text more readable
+        autotext.set_path_effects([
+            path_effects.Stroke(linewidth=2, foreground='black'),
+            path_effects.Normal()
+        ])
+
+    for text in texts:
+        text.set_fontsize(11)
+        text.set_fontweight('bold')
+        text.set_color('#333333')
+
+    ax.set_title(options['title'], fontsize=18, fontweight='bold', pad=25, color='#2E86AB')
+
+    # Ensure perfect circle by setting equal aspect ratio and limits
+    ax.set_aspect('equal')
+    ax.set_xlim(-1.5, 1.5)
+    ax.set_ylim(-1.5, 1.5)
+    for spine in ax.spines.values():
+        spine.set_visible(False)
+
+    fig.tight_layout()
+    return fig
+
+
+def _style_bar_axes(ax, title: str, xlabel: str, ylabel: str):
+    ax.set_title(title, fontsize=18, fontweight='bold', pad=25, color='#2E86AB')
+    ax.set_xlabel(xlabel, fontsize=14, fontweight='bold', color='#333333')
+    ax.set_ylabel(ylabel, fontsize=14, fontweight='bold', color='#333333')
+
+    ax.grid(True, linestyle='--', alpha=0.7, color='#cccccc')
+    ax.set_axisbelow(True)  # Put grid behind bars
+
+    ax.spines['top'].set_visible(False)
+    ax.spines['right'].set_visible(False)
+    ax.spines['left'].set_color('#cccccc')
+    ax.spines['bottom'].set_color('#cccccc')
+
+
+def _draw_bar(data: Dict[str, Any], options: Dict[str, Any]):
+    categories, values = data['labels'], data['values']
+    ylabel = options['ylabel']
+    currency_symbol = options.get('currency_symbol', 'KSh')
+    is_revenue = 'Revenue' in ylabel
+
+    fig, ax = plt.subplots(figsize=(12, 8))
+    bar_colors = [COLORS_PALETTE[i % len(COLORS_PALETTE)] for i in range(len(categories))]
+    bars = ax.bar(categories, values, color=bar_colors, alpha=0.8, edgecolor='white', linewidth=2)
+
+    # Add value labels on top of bars
+    for bar in bars:
+        height = bar.get_height()
+        if height > 0:  # Only show labels for positive values
+            label_text = f'{currency_symbol}{height:,.0f}' if is_revenue else f'{height:,.0f}'
+            ax.text(bar.get_x() + bar.get_width() / 2., height + max(values) * 0.01,
+                    label_text,
+                    ha='center', va='bottom', fontweight='bold', fontsize=11, color='#333333')
+
+    _style_bar_axes(ax, options['title'], options['xlabel'], ylabel)
+
+    # Rotate x-axis labels for better readability
+    plt.setp(ax.get_xticklabels(), rotation=45, ha='right', fontsize=11)
+    ax.tick_params(axis='y', labelsize=11)
+
+    # Set y-axis to start from 0 and add some padding at the top
+    ax.set_ylim(0, max(values) * 1.1)
+
+    if is_revenue:
+        ax.yaxis.set_major_formatter(FuncFormatter(lambda x, p: f'{currency_symbol}{x:,.0f}'))
+
+    fig.tight_layout()
+    return fig
+
+
+def _draw_comparison(data: Dict[str, Any], options: Dict[str, Any]):
+    categories = data['labels']
+    sold_counts, attended_counts = data['sold'], data['attended']
+    max_value = max(max(sold_counts), max(attended_counts))
+
+    fig, ax = plt.subplots(figsize=(14, 8))
+    x = np.arange(len(categories))
+    width = 0.35
+
+    bars1 = ax.bar(x - width / 2, sold_counts, width,
+                   label='Tickets Sold', color='#2E86AB', alpha=0.8,
+                   edgecolor='white', linewidth=2)
+    bars2 = ax.bar(x + width / 2, attended_counts, width,
+                   label='Attendees', color='#F18F01', alpha=0.8,
+                   edgecolor='white', linewidth=2)
+
+    for bars in [bars1, bars2]:
+        for bar in bars:
+            height = bar.get_height()
+            if height > 0:
+                ax.text(bar.get_x() + bar.get_width() / 2., height + max_value * 0.01,
+                        f'{int(height)}', ha='center', va='bottom',
+                        fontweight='bold', fontsize=11, color='#333333')
+
+    _style_bar_axes(ax, options['title'], 'Ticket Type', 'Count')
+
+    ax.set_xticks(x)
+    ax.set_xticklabels(categories, rotation=45, ha='right', fontsize=11)
+    ax.tick_params(axis='y', labelsize=11)
+
+    legend = ax.legend(loc='upper left', frameon=True, fancybox=True, shadow=True,
+                       fontsize=12, title_fontsize=12)
+    legend.get_frame().set_facecolor('white')
+    legend.get_frame().set_alpha(0.9)
+
+    ax.set_ylim(0, max_value * 1.15)
+
+    fig.tight_layout()
+    return fig
+
+
+def _dark_figure(title: str):
+    fig, ax = plt.subplots(figsize=(8, 8), facecolor=DARK_BACKGROUND)
+    ax.set_facecolor(DARK_BACKGROUND)
+    ax.set_title(title, color='#ffffff', fontsize=18, weight='bold', pad=20)
+    return fig, ax
+
+
+def _draw_revenue_donut(data: Dict[str, Any], options: Dict[str, Any]):
+    values = data['values']
+    total = sum(values)
+    currency_symbol = options.get('currency_symbol', '$')
+    fig, ax = _dark_figure(options['title'])
+
+    def autopct(pct):
+        absolute = int(pct / 100. * total)
+        return f'{pct:.1f}%\n({currency_symbol}{absolute:.0f})' if pct > 5 else ''
+
+    ax.pie(
+        values,
+        labels=data['labels'],
+        colors=data['colors'],
+        autopct=autopct,
+        startangle=90,
+        pctdistance=0.85,
+        textprops={'color': '#cccccc', 'fontsize': 10, 'weight': 'bold'},
+        wedgeprops={'linewidth': 2, 'edgecolor': '#2a2a2a'}
+    )
+    ax.add_artist(plt.Circle((0, 0), 0.65, fc='#2a2a2a', linewidth=2, edgecolor=DARK_BACKGROUND))
+    ax.text(0, 0, f'Total Revenue\n{currency_symbol}{total:,.2f}', ha='center', va='center',
+            color='#ffffff', fontsize=12, weight='bold')
+    ax.axis('equal')
+
+    fig.tight_layout()
+    return fig
+
+
+def _draw_no_data_donut(data: Dict[str, Any], options: Dict[str, Any]):
+    fig, ax = _dark_figure(options['title'])
+    ax.add_patch(plt.Circle((0, 0), 0.8, fc='#404040', linewidth=3, edgecolor='#606060'))
+    ax.text(0, 0.1, "No Revenue Data", ha='center', va='center', color='#ffffff', fontsize=16, weight='bold')
+    ax.text(0, -0.1, "Available", ha='center', va='center', color='#cccccc', fontsize=12)
+    if data.get('total_tickets', 0) > 0:
+        ax.text(0, -0.3, f"Tickets Sold: {data['total_tickets']}", ha='center', va='center',
+                color='#99ccff', fontsize=10)
+
+    ax.set_xlim(-1.2, 1.2)
+    ax.set_ylim(-1.2, 1.2)
+    ax.axis('equal')
+    ax.axis('off')
+
+    fig.tight_layout()
+    return fig
+
+
+def _draw_error_donut(data: Dict[str, Any], options: Dict[str, Any]):
+    fig, ax = _dark_figure(options['title'])
+    ax.text(0, 0.1, "Chart Generation Error", ha='center', va='center', color='#ff6b6b', fontsize=14, weight='bold')
+    ax.text(0, -0.1, "Please check data format", ha='center', va='center', color='#ff9999', fontsize=10)
+    ax.add_patch(plt.Polygon([[-0.1, -0.4], [0.1, -0.4], [0, -0.6]], closed=True, fill=True, color='#ff6b6b'))
+    ax.text(0, -0.5, '!', ha='center', va='center', color=DARK_BACKGROUND, fontsize=12, weight='bold')
+
+    ax.set_xlim(-1, 1)
+    ax.set_ylim(-1, 1)
+    ax.axis('equal')
+    ax.axis('off')
+
+    fig.tight_layout()
+    return fig
+
+
+RENDERERS = {
+    'pie': _draw_pie,
+    'bar': _draw_bar,
+    'comparison': _draw_comparison,
+    'revenue_donut': _draw_revenue_donut,
+    'no_data_donut': _draw_no_data_donut,
+    'error_donut': _draw_error_donut,
+}
+
+
+def render_chart(kind: str, data: Dict[str, Any], options: Dict[str, Any]) -> bytes:
+    """Draw one chart and return it as PNG bytes (runs in the pool or inline)"""
+    style = _resolve_style(options.get('style'))
+    warm_renderer(style)
+    with plt.style.context(style):
+        fig = RENDERERS[kind](data, options)
+        try:
+            buffer = BytesIO()
+            fig.savefig(buffer, format='png', dpi=options.get('dpi', 72), bbox_inches='tight',
+                        facecolor=fig.get_facecolor(), edgecolor='none')
+        finally:
+            plt.close(fig)
+    return buffer.getvalue()
+
+
+# ===== SERVICE =====
+class ChartService:
+    """Renders charts in a warmed process pool and caches the PNG bytes"""
+
+    TIMING_SAMPLES = 200
+
+    def __init__(self, workers: int = 1, cache_size: int = 128, timeout: int = 30,
+                 inline: bool = False, style: str = 'default'):
+        self.workers = workers
+        self.cache_size = cache_size
+        self.timeout = timeout
+        self.inline = inline
+        self.style = style
+        self._cache: "OrderedDict[str, bytes]" = OrderedDict()
+        self._executor = None
+        self._pid = None
+        self._cold = True
+        self._lock = Lock()
+        self._timings = {name: deque(maxlen=self.TIMING_SAMPLES) for name in ('cold', 'warm', 'cached')}
+
+    def init_app(self, app):
+        app.config.setdefault('CHART_RENDER_WORKERS', 1)
+        app.config.setdefault('CHART_RENDER_SYNC', False)
+        app.config.setdefault('CHART_RENDER_TIMEOUT', 30)
+        app.config.setdefault('CHART_CACHE_SIZE', 128)
+        self.workers = app.config['CHART_RENDER_WORKERS']
+        self.inline = app.config['CHART_RENDER_SYNC'] or self.workers < 1
+        self.timeout = app.config['CHART_RENDER_TIMEOUT']
+        self.cache_size = app.config['CHART_CACHE_SIZE']
+
+    @staticmethod
+    def cache_key(kind: str, data: Dict[str, Any], options: Dict[str, Any]) -> str:
+        """Hash of chart type, data, style and currency/labels; identical charts share a key"""
+        raw = json.dumps([kind, data, options], sort_keys=True, default=str, separators=(',', ':'))
+        return hashlib.sha256(raw.encode()).hexdigest()
+
+    def render(self, kind: str, data: Dict[str, Any], options: Dict[str, Any]) -> Optional[bytes]:
+        """PNG bytes for a chart, from the cache when an identical chart was rendered before"""
+        options = {'style': self.style, **options}
+        key = self.cache_key(kind, data, options)
+        started = time.perf_counter()
+        with self._lock:
+            image = self._cache.get(key)
+            if image is not None:
+                self._cache.move_to_end(key)
+        if image is not None:
+            self._record('cached', started)
+            return image
+
+        try:
+            image, cold = self._render(kind, data, options)
+        except Exception as e:
+            logger.error(f"Error rendering {kind} chart '{options.get('title')}': {e}", exc_info=True)
+            return None
+        if not image.startswith(PNG_SIGNATURE):
+            logger.error(f"Renderer returned an invalid image for {kind} chart '{options.get('title')}'")
+            return None
+
+        self._record('cold' if cold else 'warm', started)
+        with self._lock:
+            self._cache[key] = image
+            self._cache.move_to_end(key)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        return image
+
+    def _render(self, kind: str, data: Dict[str, Any], options: Dict[str, Any]):
+        """Returns (png, cold) where cold marks the first render of a fresh pool or process"""
+        with self._lock:
+            cold, self._cold = self._cold, False
+        if self.inline:
+            return render_chart(kind, data, options), cold
+        try:
+            executor, started_pool = self._get_executor()
+            future = executor.submit(render_chart, kind, data, options)
+            return future.result(timeout=self.timeout), cold or started_pool
+        except (BrokenProcessPool, FutureTimeoutError) as e:
+            # A crashed or hung renderer must not fail the report; draw this one in-process
+            logger.warning(f"Chart pool unavailable ({e!r}); rendering {kind} chart inline")
+            self.shutdown(wait=False)
+            return render_chart(kind, data, options), True
+
+    def _get_executor(self):
+        # One pool per gunicorn worker; spawned children start with a clean matplotlib state
+        with self._lock:
+            started_pool = False
+            if self._executor is None or self._pid != os.getpid():
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=multiprocessing.get_context('spawn'),
+                    initializer=warm_renderer,
+                    initargs=(self.style,)
+                )
+                self._pid = os.getpid()
+                started_pool = True
+            return self._executor, started_pool
+
+    def _record(self, kind: str, started: float) -> None:
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        with self._lock:
+            self._timings[kind].append(elapsed_ms)
+        if kind == 'cold':
+            logger.info(f"Cold chart render took {elapsed_ms:.1f}ms")
+
+    def stats(self) -> Dict[str, Any]:
+        """Render counts and timings (ms) for cold renders, warm renders and cache hits"""
+        with self._lock:
+            timings = {name: list(samples) for name, samples in self._timings.items()}
+            cached_entries = len(self._cache)
+            cached_bytes = sum(len(image) for image in self._cache.values())
+        summary = {
+            name: {
+                'count': len(samples),
+                'median_ms': round(statistics.median(samples), 2) if samples else None,
+                'max_ms': round(max(samples), 2) if samples else None,
+            }
+            for name, samples in timings.items()
+        }
+        renders = summary['cold']['count'] + summary['warm']['count']
+        lookups = renders + summary['cached']['count']
+        summary['hit_rate'] = round(summary['cached']['count'] / lookups, 3) if lookups else None
+        summary['cache_entries'] = cached_entries
+        summary['cache_bytes'] = cached_bytes
+        summary['mode'] = 'inline' if self.inline else f"pool x{self.workers}"
+        return summary
+
+    def clear_cache(self) -> None:
+        with self._lock:
+            self._cache.clear()
+
+    def shutdown(self, wait: bool = True) -> None:
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=wait, cancel_futures=not wait)
+                self._executor = None
+            self._cold = True
+
+
+# Initialize globally — must be attached via chart_service.init_app(app)
+chart_service = ChartService()
@@ -39,7 +39,16 @@ class Config:
     
     # Email timeout and retry configuration
     MAIL_TIMEOUT = int(os.getenv("MAIL_TIMEOUT", "30"))
-    MAIL_MAX_EMAILS = int(os.getenv("MAIL_MAX_EMAILS", "50"))
+    MAIL_MAX_EMAILS = int(os.getenv("MAIL_MAX_EMAILS", "50"))  # messages per SMTP connection before reconnecting
+
+    # Outbound mail queue (see mail_dispatcher.py)
+    MAIL_DISPATCH_SYNC = os.getenv("MAIL_DISPATCH_SYNC", "False").lower() in ("true", "1")
+    MAIL_DISPATCH_BATCH_SIZE = int(os.getenv("MAIL_DISPATCH_BATCH_SIZE", "50"))
+    MAIL_DISPATCH_POLL_INTERVAL = int(os.getenv("MAIL_DISPATCH_POLL_INTERVAL", "5"))
+    MAIL_DISPATCH_MAX_ATTEMPTS = int(os.getenv("MAIL_DISPATCH_MAX_ATTEMPTS", "6"))
+    MAIL_DISPATCH_RETRY_BASE = int(os.getenv("MAIL_DISPATCH_RETRY_BASE", "30"))  # seconds, doubled per attempt
+    MAIL_DISPATCH_RETRY_MAX = int(os.getenv("MAIL_DISPATCH_RETRY_MAX", "3600"))
+    MAIL_DISPATCH_RETENTION_DAYS = int(os.getenv("MAIL_DISPATCH_RETENTION_DAYS", "7"))
 
     # Database Configuration
     # Priority: DATABASE_URL > EXTERNAL_DATABASE_URL > fallback
@@ -141,6 +150,12 @@ class Config:
     
     SESSION_PERMANENT = True
 
+    # Session backend: postgres (shared server-side table), cookie (signed, stateless)
+    # or flask_session (the SESSION_TYPE setup above)
+    SESSION_BACKEND = os.getenv("SESSION_BACKEND", "postgres")
+    SESSION_CLEANUP_INTERVAL = int(os.getenv("SESSION_CLEANUP_INTERVAL", "3600"))
+    SESSION_CLEANUP_BATCH_SIZE = int(os.getenv("SESSION_CLEANUP_BATCH_SIZE", "1000"))
+
     # Frontend Configuration
     FRONTEND_URL = os.getenv('FRONTEND_URL', 'https://pulse-ticket-verse.netlify.app')
     
@@ -157,6 +172,9 @@ class Config:
     CURRENCY_API_KEY = os.getenv("CURRENCY_API_KEY")
     CURRENCY_API_BASE_URL = os.getenv("CURRENCY_API_BASE_URL", "https://api.currencyapi.com/v3")
     CURRENCY_UPDATE_INTERVAL = int(os.getenv("CURRENCY_UPDATE_INTERVAL", "3600"))  # 1 hour
+    EXCHANGE_RATE_LOCAL_TTL = int(os.getenv("EXCHANGE_RATE_LOCAL_TTL", "60"))  # per-worker copy of the shared table
+    EXCHANGE_RATE_MAX_AGE = int(os.getenv("EXCHANGE_RATE_MAX_AGE", "7200"))  # older rates are refetched on read
+    EXCHANGE_RATE_CHECK_INTERVAL = int(os.getenv("EXCHANGE_RATE_CHECK_INTERVAL", "5"))  # probe for changes by other workers
 
     # File Upload Configuration
     MAX_CONTENT_LENGTH = int(os.getenv("MAX_CONTENT_LENGTH", "16777216"))  # 16MB
@@ -169,10 +187,70 @@ class Config:
     CLOUDINARY_API_SECRET = os.getenv('CLOUDINARY_API_SECRET')
     CLOUDINARY_TIMEOUT = int(os.getenv("CLOUDINARY_TIMEOUT", "30"))
 
-    # API Rate Limiting
-    RATELIMIT_STORAGE_URL = REDIS_URL or "memory://"
-    RATELIMIT_STRATEGY = "fixed-window"
+    # Media pipeline (background image processing/upload)
+    MEDIA_STORAGE_BACKEND = os.getenv("MEDIA_STORAGE_BACKEND", "cloudinary")  # cloudinary | local
+    MEDIA_STAGING_DIR = os.getenv("MEDIA_STAGING_DIR", os.path.join(tempfile.gettempdir(), "media_staging"))
+    MEDIA_LOCAL_ROOT = os.getenv("MEDIA_LOCAL_ROOT", os.path.join(tempfile.gettempdir(), "media"))
+    MEDIA_LOCAL_BASE_URL = os.getenv("MEDIA_LOCAL_BASE_URL", "/media")
+    MEDIA_PLACEHOLDER_URL = os.getenv("MEDIA_PLACEHOLDER_URL")
+    MEDIA_MAX_DIMENSION = int(os.getenv("MEDIA_MAX_DIMENSION", "1600"))
+    MEDIA_THUMBNAIL_SIZE = int(os.getenv("MEDIA_THUMBNAIL_SIZE", "400"))
+    MEDIA_MAX_FILE_SIZE = int(os.getenv("MEDIA_MAX_FILE_SIZE", str(5 * 1024 * 1024)))
+    MEDIA_WORKERS = int(os.getenv("MEDIA_WORKERS", "2"))
+    MEDIA_PIPELINE_SYNC = os.getenv("MEDIA_PIPELINE_SYNC", "False").lower() in ("true", "1")
+
+    # Authenticated principal cache (per worker, see principal.py)
+    PRINCIPAL_CACHE_TTL = int(os.getenv("PRINCIPAL_CACHE_TTL", "30"))
+    PRINCIPAL_CACHE_SIZE = int(os.getenv("PRINCIPAL_CACHE_SIZE", "10000"))
+
+    # API Rate Limiting - token buckets shared by all workers (see rate_limits.py)
+    RATELIMIT_ENABLED = os.getenv("RATELIMIT_ENABLED", "True").lower() in ("true", "1")
+    RATELIMIT_BACKEND = os.getenv("RATELIMIT_BACKEND", "postgres")  # postgres | memory (single process only)
+    RATELIMIT_IDLE_SECONDS = int(os.getenv("RATELIMIT_IDLE_SECONDS", "86400"))
     RATELIMIT_DEFAULT = os.getenv("RATELIMIT_DEFAULT", "1000 per hour")
+    CURRENCY_API_RATE_LIMIT = os.getenv("CURRENCY_API_RATE_LIMIT", "30 per hour")
+    MPESA_STK_RATE_LIMIT = os.getenv("MPESA_STK_RATE_LIMIT", "3 per minute")  # per phone number
+
+    # Password hashing and login lockouts (see credentials.py)
+    PASSWORD_HASH_METHOD = os.getenv("PASSWORD_HASH_METHOD", "scrypt:32768:8:1")
+    PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", "2"))  # per gunicorn worker
+    PASSWORD_HASH_QUEUE = int(os.getenv("PASSWORD_HASH_QUEUE", "16"))
+    PASSWORD_HASH_TIMEOUT = int(os.getenv("PASSWORD_HASH_TIMEOUT", "5"))  # seconds to wait for a slot
+    LOGIN_FAILURE_LIMIT_EMAIL = os.getenv("LOGIN_FAILURE_LIMIT_EMAIL", "5 per 15 minutes")
+    LOGIN_FAILURE_LIMIT_IP = os.getenv("LOGIN_FAILURE_LIMIT_IP", "30 per 15 minutes")
+
+    # Background jobs
+    SCHEDULER_ENABLED = os.getenv("SCHEDULER_ENABLED", "True").lower() in ("true", "1")
+    CATEGORY_ANALYTICS_INTERVAL = int(os.getenv("CATEGORY_ANALYTICS_INTERVAL", "900"))  # 15 minutes
+    CATEGORY_TRENDING_WINDOW_DAYS = int(os.getenv("CATEGORY_TRENDING_WINDOW_DAYS", "7"))
+    CATEGORY_TRENDING_LIMIT = int(os.getenv("CATEGORY_TRENDING_LIMIT", "10"))
+    CATEGORY_TRENDING_LIKE_WEIGHT = float(os.getenv("CATEGORY_TRENDING_LIKE_WEIGHT", "2.0"))
+    ADMIN_ANALYTICS_INTERVAL = int(os.getenv("ADMIN_ANALYTICS_INTERVAL", "300"))  # 5 minutes
+    ADMIN_ANALYTICS_PER_PAGE = int(os.getenv("ADMIN_ANALYTICS_PER_PAGE", "20"))
+    ADMIN_ANALYTICS_MAX_PER_PAGE = int(os.getenv("ADMIN_ANALYTICS_MAX_PER_PAGE", "100"))
+    USER_DIRECTORY_PAGE_SIZE = int(os.getenv("USER_DIRECTORY_PAGE_SIZE", "50"))
+    USER_DIRECTORY_MAX_PAGE_SIZE = int(os.getenv("USER_DIRECTORY_MAX_PAGE_SIZE", "200"))
+    STATS_CACHE_TTL = int(os.getenv("STATS_CACHE_TTL", "60"))  # dashboard stats served without recomputing
+    STATS_CACHE_MAX_STALE = int(os.getenv("STATS_CACHE_MAX_STALE", "3600"))  # served while refreshing in background
+    STATS_REFRESH_INTERVAL = int(os.getenv("STATS_REFRESH_INTERVAL", "900"))  # full recompute incl. organizer counters
+    HEALTH_SAMPLE_INTERVAL = int(os.getenv("HEALTH_SAMPLE_INTERVAL", "10"))  # per-worker health sampler period
+    REPORT_JOB_WORKERS = int(os.getenv("REPORT_JOB_WORKERS", "1"))  # processes per gunicorn worker
+    REPORT_JOB_SYNC = os.getenv("REPORT_JOB_SYNC", "False").lower() in ("true", "1")
+    REPORT_JOB_TIMEOUT = int(os.getenv("REPORT_JOB_TIMEOUT", "900"))  # seconds without progress
+    REPORT_JOB_RETENTION_HOURS = int(os.getenv("REPORT_JOB_RETENTION_HOURS", "24"))
+    REPORT_SCHEDULE_HOUR = int(os.getenv("REPORT_SCHEDULE_HOUR", "2"))  # off-peak hour, server local time
+    REPORT_SCHEDULE_INTERVAL = int(os.getenv("REPORT_SCHEDULE_INTERVAL", "900"))  # how often due reports are checked
+    REPORT_SCHEDULE_BATCH_SIZE = int(os.getenv("REPORT_SCHEDULE_BATCH_SIZE", "200"))
+    CHART_RENDER_WORKERS = int(os.getenv("CHART_RENDER_WORKERS", "1"))  # 0 renders in-process
+    CHART_RENDER_SYNC = os.getenv("CHART_RENDER_SYNC", "False").lower() in ("true", "1")
+    CHART_RENDER_TIMEOUT = int(os.getenv("CHART_RENDER_TIMEOUT", "30"))
+    CHART_CACHE_SIZE = int(os.getenv("CHART_CACHE_SIZE", "128"))  # rendered charts kept per process
+    CSV_EXPORT_BATCH_SIZE = int(os.getenv("CSV_EXPORT_BATCH_SIZE", "1000"))  # rows per server-side cursor fetch
+    CSV_EXPORT_CHUNK_SIZE = int(os.getenv("CSV_EXPORT_CHUNK_SIZE", "65536"))  # characters per response chunk
+    CSV_EXPORT_GZIP = os.getenv("CSV_EXPORT_GZIP", "True").lower() in ("true", "1")
+    REPORT_ARTIFACT_DIR = os.getenv("REPORT_ARTIFACT_DIR", os.path.join(tempfile.gettempdir(), "report_artifacts"))
+    REPORT_ARTIFACT_MAX_BYTES = int(os.getenv("REPORT_ARTIFACT_MAX_BYTES", str(512 * 1024 * 1024)))
+    LAZY_ROUTES = os.getenv("LAZY_ROUTES", "True").lower() in ("true", "1")  # report/AI modules import on first request
 
     # Logging Configuration
     LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO")
@@ -308,6 +386,7 @@ class Config:
     def get_session_config_info(cls):
         """Get information about current session configuration"""
         return {
+            "session_backend": cls.SESSION_BACKEND,
             "session_type": cls.SESSION_TYPE,
             "has_redis": cls._has_redis,
             "session_dir": getattr(cls, 'SESSION_FILE_DIR', None),
@@ -328,6 +407,7 @@ class DevelopmentConfig(Config):
     SESSION_COOKIE_SAMESITE = "Lax"
     
     # Force filesystem sessions in development for easier debugging
+    SESSION_BACKEND = os.getenv("SESSION_BACKEND", "flask_session")
     SESSION_TYPE = "filesystem"
     SESSION_FILE_DIR = os.path.join(tempfile.gettempdir(), "flask_sessions_dev")
     
@@ -363,11 +443,21 @@ class TestingConfig(Config):
     # Use in-memory database for testing
     SQLALCHEMY_DATABASE_URI = "sqlite:///:memory:"
     
-    # Use in-memory sessions for testing
-    SESSION_TYPE = "null"  # No session persistence needed for tests
+    # Signed cookie sessions for testing - no session persistence needed
+    SESSION_BACKEND = "cookie"
+    SESSION_TYPE = "null"
     
     # Disable external services in testing
     MAIL_SUPPRESS_SEND = True
+    MAIL_DISPATCH_SYNC = True
+    MEDIA_STORAGE_BACKEND = "local"
+    MEDIA_PIPELINE_SYNC = True
+    SCHEDULER_ENABLED = False
+    REPORT_JOB_SYNC = True
+    CHART_RENDER_SYNC = True
+    RATELIMIT_BACKEND = "memory"  # no Postgres upserts on SQLite
+    PASSWORD_HASH_METHOD = "pbkdf2:sha256:1000"  # keeps test fixtures fast
+    LAZY_ROUTES = False  # import errors in report/AI modules fail at app creation
     WTF_CSRF_ENABLED = False
 
 
@@ -0,0 +1,172 @@
+"""
+Password credentials.
+
+Hashing and verification run on a small per-worker thread pool
+(PASSWORD_HASH_WORKERS). hashlib's scrypt and pbkdf2 release the GIL, so the
+pool bounds how many cores logins can take at once and leaves the rest of the
+gunicorn threads free for checkout during on-sale spikes. When more than
+PASSWORD_HASH_QUEUE requests are already waiting, callers get CredentialsBusy
+(answered with 503 + Retry-After) instead of piling up.
+
+PASSWORD_HASH_METHOD sets the werkzeug hash parameters. A successful login
+whose stored hash uses other parameters is rehashed in the background and
+written with a compare-and-set UPDATE, so concurrent logins or a password
+reset racing the upgrade can never overwrite a newer hash.
+
+Failed logins take a token from per-email and per-IP buckets in the shared
+quota store (rate_limits.py). Once a bucket is empty the key is also blocked
+in-process until it refills, so a brute-force burst is rejected before any
+hashing or database work; successful logins cost no quota writes at all.
+"""
+import logging
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from threading import BoundedSemaphore, Lock
+from typing import Dict, Optional, Tuple
+
+from flask import current_app
+from werkzeug.security import check_password_hash, generate_password_hash
+
+from model import db, User
+from rate_limits import quotas
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+class CredentialsBusy(Exception):
+    """The hashing pool is saturated; the caller should retry shortly"""
+
+
+class CredentialService:
+    """Bounded-pool password hashing with rehash-on-login and failed-login lockouts"""
+
+    def __init__(self, method: str = 'scrypt:32768:8:1', workers: int = 2, queue: int = 16, timeout: int = 5):
+        self.method = method
+        self.workers = workers
+        self.queue = queue
+        self.timeout = timeout
+        self.email_limit = '5 per 15 minutes'
+        self.ip_limit = '30 per 15 minutes'
+        self._pool = None
+        self._pid = None
+        self._slots = BoundedSemaphore(workers + queue)
+        self._blocked: Dict[str, float] = {}
+        self._lock = Lock()
+        self._dummy_hash = None
+
+    def init_app(self, app):
+        app.config.setdefault('PASSWORD_HASH_METHOD', self.method)
+        app.config.setdefault('PASSWORD_HASH_WORKERS', self.workers)
+        app.config.setdefault('PASSWORD_HASH_QUEUE', self.queue)
+        app.config.setdefault('PASSWORD_HASH_TIMEOUT', self.timeout)
+        app.config.setdefault('LOGIN_FAILURE_LIMIT_EMAIL', self.email_limit)
+        app.config.setdefault('LOGIN_FAILURE_LIMIT_IP', self.ip_limit)
+        self.method = app.config['PASSWORD_HASH_METHOD']
+        self.workers = app.config['PASSWORD_HASH_WORKERS']
+        self.queue = app.config['PASSWORD_HASH_QUEUE']
+        self.timeout = app.config['PASSWORD_HASH_TIMEOUT']
+        self.email_limit = app.config['LOGIN_FAILURE_LIMIT_EMAIL']
+        self.ip_limit = app.config['LOGIN_FAILURE_LIMIT_IP']
+        self._slots = BoundedSemaphore(self.workers + self.queue)
+        self._dummy_hash = None
+
+    # ===== POOL =====
+    def _executor(self) -> ThreadPoolExecutor:
+        # Threads don't survive the --preload fork, so each worker builds its own pool
+        if self._pid != os.getpid():
+            with self._lock:
+                if self._pid != os.getpid():
+                    self._pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='password-hash')
+                    self._pid = os.getpid()
+        return self._pool
+
+    def _run(self, func, *args):
+        if not self._slots.acquire(timeout=self.timeout):
+            raise CredentialsBusy("Password hashing pool is saturated")
+        try:
+            future = self._executor().submit(func, *args)
+        except BaseException:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda _: self._slots.release())
+        return future.result()
+
+    # ===== HASHING =====
+    def hash_password(self, password: str) -> str:
+        return self._run(generate_password_hash, password, self.method)
+
+    def needs_rehash(self, password_hash: str) -> bool:
+        return password_hash.split('$', 1)[0] != self.method
+
+    def verify(self, password_hash: Optional[str], password: str) -> bool:
+        """Check a password; with no stored hash a dummy one is checked so timing doesn't reveal the account"""
+        if not password_hash:
+            if self._dummy_hash is None:
+                self._dummy_hash = self._run(generate_password_hash, os.urandom(16).hex(), self.method)
+            self._run(check_password_hash, self._dummy_hash, password)
+            return False
+        return self._run(check_password_hash, password_hash, password)
+
+    def _upgrade(self, app, user_id: int, old_hash: str, password: str) -> None:
+        new_hash = generate_password_hash(password, self.method)
+        with app.app_context():
+            try:
+                # Only replaces the hash we verified against; a concurrent reset or upgrade wins
+                updated = User.query.filter(
+                    User.id == user_id, User.password == old_hash
+                ).update({User.password: new_hash}, synchronize_session=False)
+                db.session.commit()
+                if updated:
+                    logger.info(f"Upgraded password hash for user {user_id} to {self.method.split(':', 1)[0]}")
+            except Exception as e:
+                db.session.rollback()
+                logger.error(f"Password hash upgrade failed for user {user_id}: {e}")
+
+    # ===== LOGIN =====
+    def _keys(self, email: str, ip: Optional[str]) -> Tuple[Tuple[str, str], ...]:
+        return (('login_failures:email', email.strip().lower()), ('login_failures:ip', ip or 'unknown'))
+
+    def locked_out(self, email: str, ip: Optional[str]) -> float:
+        """Seconds until this email/IP may try again, 0 when not blocked (in-process check, no I/O)"""
+        now = time.monotonic()
+        wait = 0.0
+        for scope, identity in self._keys(email, ip):
+            until = self._blocked.get(f"{scope}:{identity}")
+            if until is not None:
+                if until > now:
+                    wait = max(wait, until - now)
+                else:
+                    self._blocked.pop(f"{scope}:{identity}", None)
+        return wait
+
+    def record_failure(self, email: str, ip: Optional[str]) -> float:
+        """Count a failed login in the shared buckets; returns the lockout in seconds (0 if none)"""
+        wait = 0.0
+        for (scope, identity), limit in zip(self._keys(email, ip), (self.email_limit, self.ip_limit)):
+            result = quotas.consume(scope, identity, limit)
+            if not result.allowed:
+                now = time.monotonic()
+                with self._lock:
+                    if len(self._blocked) >= 10000:
+                        self._blocked = {key: until for key, until in self._blocked.items() if until > now}
+                    self._blocked[f"{scope}:{identity}"] = now + result.retry_after
+                wait = max(wait, result.retry_after)
+        return wait
+
+    def authenticate(self, user: Optional[User], password: str) -> bool:
+        """Verify a login and schedule a hash upgrade when the parameters changed"""
+        stored = user.password if user is not None else None
+        if not self.verify(stored, password):
+            return False
+        if self.needs_rehash(stored):
+            try:
+                self._executor().submit(self._upgrade, current_app._get_current_object(), user.id, stored, password)
+            except RuntimeError as e:
+                logger.warning(f"Could not schedule password hash upgrade: {e}")
+        return True
+
+
+# Initialize globally — must be attached via credentials.init_app(app)
+credentials = CredentialService()
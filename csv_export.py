@@ -0,0 +1,185 @@
+"""
+Streaming CSV exports.
+
+Rows come from generators (server-side cursors for ticket and attendee lists,
+report sections for summaries), are encoded by csv.writer a chunk at a time
+and sent as a chunked response, gzip-compressed on the fly when the client
+accepts it. Memory stays bounded by one chunk and one cursor batch no matter
+how large the export is.
+"""
+import csv
+import logging
+import zlib
+from datetime import date, datetime
+from decimal import Decimal
+from enum import Enum
+from typing import Any, Iterable, Iterator, List, Optional, Sequence
+
+from flask import Response, current_app, request, stream_with_context
+from sqlalchemy import func, select
+
+from model import db, Ticket, TicketType, Transaction, Scan, User, PaymentStatus
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+PAID_STATUSES = [PaymentStatus.COMPLETED, PaymentStatus.PAID]
+
+TICKET_EXPORT_HEADER = ['Ticket ID', 'Ticket Type', 'Quantity', 'Amount', 'Payment Status', 'Payment Method',
+                        'Purchase Date', 'Buyer Name', 'Buyer Email', 'Buyer Phone', 'Scanned']
+ATTENDEE_EXPORT_HEADER = ['Ticket ID', 'Ticket Type', 'Quantity', 'Attendee Name', 'Email', 'Phone',
+                          'First Scanned At', 'Last Scanned At', 'Scan Count']
+
+
+class _ChunkBuffer:
+    """File-like sink for csv.writer that hands back what has been written so far"""
+
+    def __init__(self):
+        self.parts: List[str] = []
+        self.size = 0
+
+    def write(self, value: str) -> None:
+        self.parts.append(value)
+        self.size += len(value)
+
+    def drain(self) -> str:
+        chunk = ''.join(self.parts)
+        self.parts, self.size = [], 0
+        return chunk
+
+
+def cell(value: Any) -> Any:
+    """Plain CSV value for enums, dates, decimals and NULLs"""
+    if value is None:
+        return ''
+    if isinstance(value, Enum):
+        return value.value
+    if isinstance(value, datetime):
+        return value.strftime('%Y-%m-%d %H:%M:%S')
+    if isinstance(value, date):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return f"{value:.2f}"
+    return value
+
+
+def iter_csv(rows: Iterable[Sequence[Any]], chunk_size: int = 65536) -> Iterator[str]:
+    """Encode rows with csv.writer, yielding text chunks of roughly chunk_size characters"""
+    buffer = _ChunkBuffer()
+    writer = csv.writer(buffer)
+    for row in rows:
+        writer.writerow([cell(value) for value in row])
+        if buffer.size >= chunk_size:
+            yield buffer.drain()
+    tail = buffer.drain()
+    if tail:
+        yield tail
+
+
+def gzip_stream(chunks: Iterable[str]) -> Iterator[bytes]:
+    """Gzip text chunks on the fly"""
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 16 + zlib.MAX_WBITS)  # 16 + MAX_WBITS writes a gzip container
+    for chunk in chunks:
+        data = compressor.compress(chunk.encode('utf-8'))
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def stream_rows(statement, batch_size: Optional[int] = None) -> Iterator[tuple]:
+    """Run a select on a server-side cursor and yield its rows a batch at a time"""
+    batch_size = batch_size or current_app.config.get('CSV_EXPORT_BATCH_SIZE', 1000)
+    result = db.session.execute(statement.execution_options(stream_results=True, yield_per=batch_size))
+    try:
+        for row in result:
+            yield tuple(row)
+    finally:
+        result.close()
+
+
+def safe_filename(name: str) -> str:
+    return "".join(c for c in name if c.isalnum() or c in (' ', '-', '_', '.')).strip().replace(' ', '_')
+
+
+def csv_response(rows: Iterable[Sequence[Any]], filename: str, compress: Optional[bool] = None) -> Response:
+    """Chunked text/csv attachment streamed from a row generator
+
+    compress defaults to gzip when CSV_EXPORT_GZIP is on and the client sends
+    Accept-Encoding: gzip.
+    """
+    config = current_app.config
+    if compress is None:
+        compress = config.get('CSV_EXPORT_GZIP', True) and 'gzip' in request.accept_encodings
+
+    body = iter_csv(rows, config.get('CSV_EXPORT_CHUNK_SIZE', 65536))
+    headers = {
+        'Content-Disposition': f'attachment; filename="{safe_filename(filename)}"',
+        'Cache-Control': 'no-store',
+        'Vary': 'Accept-Encoding',
+        'X-Accel-Buffering': 'no'  # let nginx pass chunks straight through
+    }
+    if compress:
+        body = gzip_stream(body)
+        headers['Content-Encoding'] = 'gzip'
+    else:
+        body = (chunk.encode('utf-8') for chunk in body)
+
+    # stream_with_context keeps the request (and its DB session) alive until the last chunk
+    return Response(stream_with_context(body), mimetype='text/csv', headers=headers)
+
+
+# ===== EXPORT SOURCES =====
+def ticket_rows(event_id: int, paid_only: bool = True) -> Iterator[Sequence[Any]]:
+    """Header plus one row per ticket for an event, read through a server-side cursor"""
+    statement = select(
+        Ticket.id,
+        TicketType.type_name,
+        Ticket.quantity,
+        TicketType.price * Ticket.quantity,
+        Ticket.payment_status,
+        Transaction.payment_method,
+        Ticket.purchase_date,
+        User.full_name,
+        func.coalesce(Ticket.email, User.email),
+        func.coalesce(Ticket.phone_number, User.phone_number),
+        Ticket.scanned
+    ).select_from(Ticket).join(
+        TicketType, Ticket.ticket_type_id == TicketType.id
+    ).join(
+        Transaction, Ticket.transaction_id == Transaction.id
+    ).join(
+        User, Ticket.user_id == User.id
+    ).where(Ticket.event_id == event_id).order_by(Ticket.id)
+    if paid_only:
+        statement = statement.where(Ticket.payment_status.in_(PAID_STATUSES))
+
+    yield TICKET_EXPORT_HEADER
+    for row in stream_rows(statement):
+        yield row[:-1] + ('Yes' if row[-1] else 'No',)
+
+
+def attendee_rows(event_id: int) -> Iterator[Sequence[Any]]:
+    """Header plus one row per scanned ticket for an event, in order of first scan"""
+    first_scan = func.min(Scan.scanned_at)
+    statement = select(
+        Ticket.id,
+        TicketType.type_name,
+        Ticket.quantity,
+        User.full_name,
+        func.coalesce(Ticket.email, User.email),
+        func.coalesce(Ticket.phone_number, User.phone_number),
+        first_scan,
+        func.max(Scan.scanned_at),
+        func.count(Scan.id)
+    ).select_from(Ticket).join(
+        Scan, Scan.ticket_id == Ticket.id
+    ).join(
+        TicketType, Ticket.ticket_type_id == TicketType.id
+    ).join(
+        User, Ticket.user_id == User.id
+    ).where(Ticket.event_id == event_id).group_by(
+        Ticket.id, TicketType.id, User.id
+    ).order_by(first_scan, Ticket.id)
+
+    yield ATTENDEE_EXPORT_HEADER
+    yield from stream_rows(statement)
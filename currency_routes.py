@@ -5,116 +5,30 @@ from flask_restful import Resource
 from flask_jwt_extended import jwt_required
 from model import db, Currency, CurrencyCode
 from config import Config
-import requests
-from datetime import datetime, timedelta
-import time
+from datetime import datetime
+from exchange_rates import exchange_rates, PIVOT_CURRENCY
 
 # Logger setup
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-# In-memory cache for exchange rates
-class ExchangeRateCache:
-    def __init__(self, cache_duration_minutes=60):
-        self.cache = {}
-        self.cache_duration = timedelta(minutes=cache_duration_minutes)
-        self.last_api_call = {}
-        self.min_api_interval = 10  # Minimum seconds between API calls
-    
-    def get_cached_rate(self, from_currency, to_currency):
-        """Get cached exchange rate if available and not expired"""
-        cache_key = f"{from_currency}_{to_currency}"
-        
-        if cache_key in self.cache:
-            cached_data = self.cache[cache_key]
-            if datetime.now() - cached_data['timestamp'] < self.cache_duration:
-                logger.info(f"Using cached rate for {from_currency} to {to_currency}")
-                return cached_data['rate']
-        
-        return None
-    
-    def set_cached_rate(self, from_currency, to_currency, rate):
-        """Cache the exchange rate"""
-        cache_key = f"{from_currency}_{to_currency}"
-        self.cache[cache_key] = {
-            'rate': rate,
-            'timestamp': datetime.now()
-        }
-        logger.info(f"Cached rate for {from_currency} to {to_currency}: {rate}")
-    
-    def can_make_api_call(self, currency_pair):
-        """Check if enough time has passed since last API call for this pair"""
-        if currency_pair not in self.last_api_call:
-            return True
-        
-        time_since_last = time.time() - self.last_api_call[currency_pair]
-        return time_since_last >= self.min_api_interval
-    
-    def record_api_call(self, currency_pair):
-        """Record the timestamp of an API call"""
-        self.last_api_call[currency_pair] = time.time()
-
-# Global cache instance
-rate_cache = ExchangeRateCache(cache_duration_minutes=60)
-
 def get_exchange_rate(from_currency, to_currency, use_fallback=True):
     """
-    Get exchange rate from CurrencyAPI with caching and rate limiting.
+    Get an exchange rate from the shared rate table.
+
+    The table holds USD rates for every currency, refreshed from CurrencyAPI by
+    the `exchange_rates` job; any other pair is a cross rate through USD.
     """
     if from_currency == to_currency:
         return Decimal('1')
 
-    # Check cache first
-    cached_rate = rate_cache.get_cached_rate(from_currency, to_currency)
-    if cached_rate:
-        return cached_rate
-
-    # Check if we can make an API call (rate limiting)
-    currency_pair = f"{from_currency}_{to_currency}"
-    if not rate_cache.can_make_api_call(currency_pair):
-        logger.warning(f"Rate limited - using fallback for {from_currency} to {to_currency}")
-        if use_fallback:
-            return get_fallback_rate(from_currency, to_currency)
-        raise Exception(f"Rate limited and no fallback available for {from_currency} to {to_currency}")
-
-    url = "https://api.currencyapi.com/v3/latest"
-    params = {"base_currency": from_currency}
-    headers = {"apikey": Config.CURRENCY_API_KEY}
-
     try:
-        # Record API call attempt
-        rate_cache.record_api_call(currency_pair)
-        
-        response = requests.get(url, params=params, headers=headers, timeout=10)
-        response.raise_for_status()
-        data = response.json()
-
-        if to_currency not in data["data"]:
-            raise ValueError(f"Currency '{to_currency}' not found in exchange rates.")
-
-        rate = Decimal(str(data["data"][to_currency]["value"]))
-        
-        # Cache the successful result
-        rate_cache.set_cached_rate(from_currency, to_currency, rate)
-        
-        return rate
-        
-    except requests.exceptions.HTTPError as e:
-        if e.response.status_code == 429:
-            logger.error(f"Rate limit exceeded for {from_currency} to {to_currency}")
-            if use_fallback:
-                return get_fallback_rate(from_currency, to_currency)
-            raise Exception(f"Rate limit exceeded: {str(e)}")
-        else:
-            logger.error(f"HTTP error fetching exchange rate from {from_currency} to {to_currency}: {str(e)}")
-            if use_fallback:
-                return get_fallback_rate(from_currency, to_currency)
-            raise
-    except Exception as e:
-        logger.error(f"Error fetching exchange rate from {from_currency} to {to_currency}: {str(e)}")
+        return exchange_rates.rate(from_currency, to_currency)
+    except KeyError:
+        logger.warning(f"No stored rate for {from_currency} to {to_currency}")
         if use_fallback:
             return get_fallback_rate(from_currency, to_currency)
-        raise
+        raise Exception(f"No exchange rate available for {from_currency} to {to_currency}")
 
 def get_fallback_rate(from_currency, to_currency):
     """
@@ -201,25 +115,22 @@ class CurrencyListResource(Resource):
             
             currency_list = []
             failed_currencies = []
-            
+            matrix = exchange_rates.matrix()
+
             for currency in currencies:
                 currency_code = currency.code.value
                 try:
-                    # Get exchange rate from KSH to this currency
                     if currency_code == "KES":
                         rate = Decimal('1')
                         rate_source = "base_currency"
                     else:
-                        # Two-step conversion: KSH → USD → Target Currency
-                        ksh_to_usd_rate = get_exchange_rate("KES", "USD")
-                        if currency_code == "USD":
-                            rate = ksh_to_usd_rate
-                            rate_source = "api_or_cache"
-                        else:
-                            usd_to_target_rate = get_exchange_rate("USD", currency_code)
-                            rate = ksh_to_usd_rate * usd_to_target_rate
-                            rate_source = "api_or_cache"
-                    
+                        try:
+                            rate = matrix.cross_rate("KES", currency_code)
+                            rate_source = "rate_table"
+                        except KeyError:
+                            rate = get_fallback_rate("KES", currency_code)
+                            rate_source = "fallback"
+
                     currency_list.append({
                         "id": currency.id,
                         "code": currency_code,
@@ -229,7 +140,7 @@ class CurrencyListResource(Resource):
                         "description": f"1 KSH = {float(rate)} {currency_code}",
                         "rate_source": rate_source
                     })
-                    
+
                 except Exception as e:
                     logger.warning(f"Could not fetch rate for {currency_code}: {str(e)}")
                     failed_currencies.append(currency_code)
@@ -242,14 +153,15 @@ class CurrencyListResource(Resource):
                         "description": f"Rate unavailable for {currency_code}",
                         "rate_source": "unavailable"
                     })
-            
+
             return {
                 "message": "Active currencies with exchange rates retrieved successfully",
                 "data": {
                     "base_currency": "KES",
                     "currencies": currency_list,
                     "total_currencies": len(currency_list),
-                    "failed_currencies": failed_currencies if failed_currencies else None
+                    "failed_currencies": failed_currencies if failed_currencies else None,
+                    "rates_effective_at": matrix.effective_at.isoformat() if matrix.effective_at else None
                 }
             }, 200
             
@@ -323,7 +235,7 @@ class CurrencyConvertResource(Resource):
                         }
                     },
                     "overall_conversion_rate": float(overall_rate),
-                    "source": "currencyapi.com (cached or fallback)"
+                    "source": "currencyapi.com (shared rate table or fallback)"
                 }
             }, 200
             
@@ -344,17 +256,15 @@ class CurrencyStatusResource(Resource):
         except Exception as e:
             db_status = f"error ({e})"
 
-        # Check external API status
-        external_api_status = "unknown"
-        try:
-            if Config.CURRENCY_API_KEY:
-                # Use a minimal test call with caching
-                test_rate = get_exchange_rate("USD", "EUR", use_fallback=False)
-                external_api_status = "reachable"
-            else:
-                external_api_status = "API Key missing"
-        except Exception as e:
-            external_api_status = f"error ({e})"
+        matrix = exchange_rates.matrix()
+        if not Config.CURRENCY_API_KEY:
+            external_api_status = "API Key missing"
+        elif matrix.effective_at is None:
+            external_api_status = "no rates fetched yet"
+        elif exchange_rates.is_stale(matrix):
+            external_api_status = "stale (refresh failing?)"
+        else:
+            external_api_status = "ok"
 
         return {
             "message": "Currency service status",
@@ -362,42 +272,46 @@ class CurrencyStatusResource(Resource):
                 "database_connection": db_status,
                 "external_currency_api": external_api_status,
                 "base_currency": "KES",
-                "conversion_method": "KSH → USD → Target Currency",
-                "cache_status": f"{len(rate_cache.cache)} rates cached",
+                "conversion_method": f"Cross rates through {PIVOT_CURRENCY}",
+                "cache_status": f"{len(matrix.rates)} rates cached",
+                "rates_effective_at": matrix.effective_at.isoformat() if matrix.effective_at else None,
+                "rates_version": matrix.version,
                 "fallback_available": True
             }
         }, 200
 
 class CurrencyCacheResource(Resource):
     """
-    API resource to manage the currency cache.
+    API resource to inspect the shared rate table and this worker's copy of it.
     """
     @jwt_required()
     def get(self):
         """Get cache status"""
-        cache_info = []
-        for key, value in rate_cache.cache.items():
-            cache_info.append({
-                "currency_pair": key,
-                "rate": float(value['rate']),
-                "timestamp": value['timestamp'].isoformat(),
-                "age_minutes": (datetime.now() - value['timestamp']).total_seconds() / 60
-            })
-        
+        matrix = exchange_rates.matrix()
+        age_minutes = (datetime.utcnow() - matrix.effective_at).total_seconds() / 60 if matrix.effective_at else None
+        cache_info = [{
+            "currency_pair": f"{PIVOT_CURRENCY}_{code}",
+            "rate": float(rate),
+            "timestamp": matrix.effective_at.isoformat() if matrix.effective_at else None,
+            "age_minutes": age_minutes
+        } for code, rate in sorted(matrix.rates.items())]
+
         return {
             "message": "Currency cache status",
             "data": {
-                "cache_entries": len(rate_cache.cache),
-                "cache_duration_minutes": rate_cache.cache_duration.total_seconds() / 60,
+                "cache_entries": len(matrix.rates),
+                "cache_duration_minutes": exchange_rates.max_age / 60,
+                "local_copy_ttl_seconds": exchange_rates.local_ttl,
+                "source": matrix.source,
+                "rates_version": matrix.version,
                 "cached_rates": cache_info
             }
         }, 200
-    
+
     @jwt_required()
     def delete(self):
-        """Clear the cache"""
-        rate_cache.cache.clear()
-        rate_cache.last_api_call.clear()
+        """Drop this worker's copy; the next read reloads the shared table"""
+        exchange_rates.invalidate()
         return {"message": "Currency cache cleared successfully"}, 200
 
 def register_currency_resources(api):
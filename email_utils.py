@@ -4,6 +4,7 @@ import logging
 from flask_mail import Mail, Message
 from config import Config  # Ensure MAIL_DEFAULT_SENDER is set
 from flask import current_app
+from mail_dispatcher import mail_dispatcher
 
 # Initialize Mail globally — must be attached via mail.init_app(app)
 mail = Mail()
@@ -14,7 +15,7 @@ logger = logging.getLogger(__name__)
 
 
 def send_email(recipient: str, subject: str, body: str, is_html: bool = False) -> bool:
-    """Send a basic email (text or HTML)."""
+    """Queue a basic email (text or HTML) for the mail dispatcher."""
     try:
         msg = Message(
             subject=subject,
@@ -26,11 +27,11 @@ def send_email(recipient: str, subject: str, body: str, is_html: bool = False) -
         else:
             msg.body = body
 
-        mail.send(msg)
-        logger.info(f"Email sent to {recipient}")
+        mail_dispatcher.enqueue(msg)
+        logger.info(f"Email queued for {recipient}")
         return True
     except Exception as e:
-        logger.error(f"Failed to send email to {recipient}: {e}")
+        logger.error(f"Failed to queue email to {recipient}: {e}")
         return False
 
 
@@ -43,8 +44,9 @@ def send_email_with_attachment(
     is_html: bool = False
 ) -> bool:
     """
-    Send an email with support for HTML or plain text content,
+    Queue an email with support for HTML or plain text content,
     a single attachment via file path, or multiple attachments via a list.
+    Attachments are read now, so the file may be removed once this returns.
 
     `attachments` should be a list of dicts with keys:
     - 'filename': str
@@ -91,10 +93,10 @@ def send_email_with_attachment(
                 except KeyError as ke:
                     logger.warning(f"Attachment missing key: {ke} — Skipped.")
 
-        # Send the email
-        mail.send(msg)
-        logger.info(f"Email with attachment(s) sent to {recipient}")
+        # Queue the email; the dispatcher sends it in the background
+        mail_dispatcher.enqueue(msg)
+        logger.info(f"Email with attachment(s) queued for {recipient}")
         return True
     except Exception as e:
-        logger.error(f"Failed to send email with attachment to {recipient}: {e}")
+        logger.error(f"Failed to queue email with attachment to {recipient}: {e}")
         return False
@@ -0,0 +1,347 @@
+"""
+Exchange rate service.
+
+currencyapi's `latest` endpoint returns the whole rate table for a base
+currency, so one request against USD prices every currency we support. The
+table is written to the `exchange_rates` table (one active USD -> X row per
+currency, updated in place), which every gunicorn worker reads; each worker
+keeps a short-lived in-process copy. A scheduled job refreshes the table, and
+a Postgres advisory lock makes sure only one worker calls the API at a time.
+Any other pair is derived locally as a cross rate through USD. Manual
+overrides (`set_rate`) are stored as the same USD -> X rows and hold until
+the next scheduled refresh; workers notice them, and any other change to
+the table, through a cheap max(updated_at) probe every few seconds.
+
+Every conversion in the app goes through the resulting RateMatrix: a
+versioned, immutable array of USD rates indexed by currency id, with
+`convert_many` for converting whole listings or report columns at once.
+"""
+import hashlib
+import json
+import logging
+import time
+from dataclasses import dataclass, field, replace
+from datetime import datetime, timedelta
+from decimal import Decimal
+from threading import Lock
+from types import MappingProxyType
+from typing import Any, Dict, List, Mapping, Optional, Sequence, Tuple
+
+import requests
+from sqlalchemy import and_, func, select
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+
+from model import db, Currency, CurrencyCode, ExchangeRate
+from rate_limits import quotas
+from scheduler import advisory_lock
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+PIVOT_CURRENCY = 'USD'
+API_SOURCE = 'currencyapi.com'
+MANUAL_SOURCE = 'manual'
+
+
+@dataclass(frozen=True)
+class RateMatrix:
+    """
+    Immutable USD rates as a dense array indexed by currency id.
+
+    `usd[currency_id]` is the units of that currency per USD (None when the
+    currency has no rate), so a conversion is two array reads and a multiply.
+    `version` is a hash of the rates, the same on every worker that loaded
+    the same table.
+    """
+    usd: Tuple[Optional[Decimal], ...] = ()
+    ids: Mapping[str, int] = field(default_factory=lambda: MappingProxyType({}))
+    version: str = ''
+    effective_at: Optional[datetime] = None
+    source: Optional[str] = None
+    updated_at: Optional[datetime] = None  # newest row update included
+    loaded_at: float = 0.0  # monotonic time this process read it
+
+    @classmethod
+    def build(cls, ids: Dict[str, int], rates_by_id: Dict[int, Decimal],
+              effective_at: Optional[datetime], source: Optional[str],
+              updated_at: Optional[datetime] = None) -> 'RateMatrix':
+        usd: List[Optional[Decimal]] = [None] * (max(ids.values(), default=-1) + 1)
+        for currency_id, rate in rates_by_id.items():
+            usd[currency_id] = rate
+        raw = json.dumps(sorted((currency_id, str(rate)) for currency_id, rate in rates_by_id.items()))
+        return cls(
+            usd=tuple(usd),
+            ids=MappingProxyType(dict(ids)),
+            version=hashlib.sha256(raw.encode()).hexdigest()[:16],
+            effective_at=effective_at,
+            source=source,
+            updated_at=updated_at,
+            loaded_at=time.monotonic()
+        )
+
+    @property
+    def rates(self) -> Dict[str, Decimal]:
+        """USD rates by currency code, for currencies that have one"""
+        return {code: self.usd[currency_id] for code, currency_id in self.ids.items()
+                if self.usd[currency_id] is not None}
+
+    def _usd(self, currency_id: int) -> Decimal:
+        rate = self.usd[currency_id] if 0 <= currency_id < len(self.usd) else None
+        if rate is None:
+            raise KeyError(currency_id)
+        return rate
+
+    def rate_between(self, from_id: int, to_id: int) -> Decimal:
+        """Rate between two currency ids; raises KeyError when either has no rate"""
+        if from_id == to_id:
+            return Decimal('1')
+        return self._usd(to_id) / self._usd(from_id)
+
+    def cross_rate(self, from_currency: str, to_currency: str) -> Decimal:
+        """Rate between two currency codes; raises KeyError for unknown codes"""
+        if from_currency == to_currency:
+            return Decimal('1')
+        return self.rate_between(self.ids[from_currency], self.ids[to_currency])
+
+    def convert(self, amount: Any, from_id: int, to_id: int) -> Decimal:
+        return Decimal(str(amount)) * self.rate_between(from_id, to_id)
+
+    def convert_many(self, amounts: Sequence[Any], from_ids: Sequence[int], to_id: int) -> List[Decimal]:
+        """Convert amounts[i] from currency from_ids[i] into to_id, one rate lookup per source currency"""
+        if len(amounts) != len(from_ids):
+            raise ValueError("amounts and from_ids must be the same length")
+        factors: Dict[int, Decimal] = {}
+        converted = []
+        for amount, from_id in zip(amounts, from_ids):
+            factor = factors.get(from_id)
+            if factor is None:
+                factor = factors[from_id] = self.rate_between(from_id, to_id)
+            converted.append(Decimal(str(amount or 0)) * factor)
+        return converted
+
+
+class ExchangeRateService:
+    """Shared, periodically refreshed USD rate table served as an in-process RateMatrix"""
+
+    def __init__(self, local_ttl: int = 60, max_age: int = 7200, timeout: int = 10, check_interval: int = 5):
+        self.local_ttl = local_ttl
+        self.check_interval = check_interval
+        self.max_age = max_age
+        self.timeout = timeout
+        self.api_key = None
+        self.base_url = None
+        self.api_limit = '30 per hour'
+        self._matrix = RateMatrix()
+        self._checked_at = 0.0
+        self._lock = Lock()
+
+    def init_app(self, app):
+        app.config.setdefault('CURRENCY_UPDATE_INTERVAL', 3600)
+        app.config.setdefault('EXCHANGE_RATE_LOCAL_TTL', self.local_ttl)
+        self.local_ttl = app.config['EXCHANGE_RATE_LOCAL_TTL']
+        app.config.setdefault('EXCHANGE_RATE_CHECK_INTERVAL', self.check_interval)
+        self.check_interval = app.config['EXCHANGE_RATE_CHECK_INTERVAL']
+        # Past two missed refreshes, readers fetch on demand (still single-flight)
+        self.max_age = app.config.get('EXCHANGE_RATE_MAX_AGE', 2 * app.config['CURRENCY_UPDATE_INTERVAL'])
+        self.api_key = app.config.get('CURRENCY_API_KEY')
+        self.base_url = app.config.get('CURRENCY_API_BASE_URL', 'https://api.currencyapi.com/v3')
+        self.api_limit = app.config.get('CURRENCY_API_RATE_LIMIT', self.api_limit)
+
+    # ===== FETCH / STORE =====
+    def _fetch(self) -> Dict[str, Decimal]:
+        quotas.check('currencyapi', 'latest', self.api_limit)  # the API plan's quota is per key, not per worker
+        response = requests.get(
+            f"{self.base_url.rstrip('/')}/latest",
+            params={'base_currency': PIVOT_CURRENCY},
+            headers={'apikey': self.api_key},
+            timeout=self.timeout
+        )
+        response.raise_for_status()
+        return {code: Decimal(str(entry['value'])) for code, entry in response.json()['data'].items()}
+
+    def refresh(self) -> int:
+        """Fetch the USD table and store it for every known currency; returns the number of rates stored"""
+        if not self.api_key:
+            logger.warning("CURRENCY_API_KEY is not set; exchange rates not refreshed")
+            return 0
+
+        fetched = self._fetch()
+        with db.engine.connect() as connection:
+            currencies = {code.value: currency_id
+                          for currency_id, code in connection.execute(select(Currency.id, Currency.code))}
+        pivot_id = currencies.get(PIVOT_CURRENCY)
+        if pivot_id is None:
+            raise RuntimeError(f"{PIVOT_CURRENCY} is missing from the currencies table")
+
+        now = datetime.utcnow()
+        rows = [{
+            'from_currency_id': pivot_id,
+            'to_currency_id': currency_id,
+            'rate': fetched[code],
+            'effective_date': now,
+            'source': API_SOURCE,
+            'is_active': True,
+            'created_at': now,
+            'updated_at': now
+        } for code, currency_id in currencies.items() if code in fetched]
+        if not rows:
+            return 0
+
+        self._store(rows)
+
+        rates_by_id = {currency_id: fetched[code] for code, currency_id in currencies.items() if code in fetched}
+        rates_by_id[pivot_id] = Decimal('1')
+        with self._lock:
+            self._matrix = RateMatrix.build(currencies, rates_by_id, now, API_SOURCE, now)
+        logger.info(f"Exchange rates refreshed: {len(rows)} {PIVOT_CURRENCY} rates from {API_SOURCE}")
+        return len(rows)
+
+    @staticmethod
+    def _store(rows: List[Dict[str, Any]]) -> None:
+        """Upsert active USD -> X rows (one per currency)"""
+        stmt = pg_insert(ExchangeRate).values(rows)
+        stmt = stmt.on_conflict_do_update(
+            constraint='uix_active_exchange_rate',
+            set_={'rate': stmt.excluded.rate, 'effective_date': stmt.excluded.effective_date,
+                  'source': stmt.excluded.source, 'updated_at': stmt.excluded.updated_at}
+        )
+        # Own transaction: refreshes run in the middle of requests and must not commit their pending changes
+        with db.engine.begin() as connection:
+            connection.execute(stmt)
+
+    def set_rate(self, from_currency_id: int, to_currency_id: int, rate: Any, source: str = MANUAL_SOURCE) -> ExchangeRate:
+        """Override a rate by hand until the next scheduled refresh
+
+        Only pairs with USD on one side can be stored (X -> USD is stored as
+        its inverse); any other pair is a cross rate and raises ValueError.
+        """
+        rate = Decimal(str(rate))
+        if rate <= 0:
+            raise ValueError("Exchange rate must be positive")
+        with db.engine.connect() as connection:
+            pivot_id = connection.execute(
+                select(Currency.id).where(Currency.code == CurrencyCode(PIVOT_CURRENCY))
+            ).scalar()
+        if pivot_id is None:
+            raise RuntimeError(f"{PIVOT_CURRENCY} is missing from the currencies table")
+        if from_currency_id == pivot_id and to_currency_id != pivot_id:
+            currency_id = to_currency_id
+        elif to_currency_id == pivot_id and from_currency_id != pivot_id:
+            currency_id, rate = from_currency_id, Decimal('1') / rate
+        else:
+            raise ValueError(f"Only {PIVOT_CURRENCY} rates are stored; other pairs are derived as cross rates")
+
+        now = datetime.utcnow()
+        self._store([{
+            'from_currency_id': pivot_id,
+            'to_currency_id': currency_id,
+            'rate': rate,
+            'effective_date': now,
+            'source': source,
+            'is_active': True,
+            'created_at': now,
+            'updated_at': now
+        }])  # own transaction, so unrelated pending ORM changes are never committed with it
+        self.invalidate()  # other workers pick it up through _changed_elsewhere
+        logger.info(f"Exchange rate {PIVOT_CURRENCY} -> currency {currency_id} set to {rate} ({source})")
+        return ExchangeRate.query.filter_by(
+            from_currency_id=pivot_id, to_currency_id=currency_id, is_active=True
+        ).first()
+
+    def _load(self) -> RateMatrix:
+        """Read the shared table from the database in one query"""
+        pivot_id = select(Currency.id).where(
+            Currency.code == CurrencyCode(PIVOT_CURRENCY)
+        ).scalar_subquery()
+        # Own connection, so a failed read can't abort the request's transaction
+        with db.engine.connect() as connection:
+            rows = connection.execute(select(
+                Currency.id, Currency.code, ExchangeRate.rate, ExchangeRate.effective_date, ExchangeRate.source,
+                ExchangeRate.updated_at
+            ).outerjoin(ExchangeRate, and_(
+                ExchangeRate.to_currency_id == Currency.id,
+                ExchangeRate.from_currency_id == pivot_id,
+                ExchangeRate.is_active.is_(True)
+            ))).all()
+
+        ids, rates_by_id = {}, {}
+        effective_at, source, updated_at = None, None, None
+        for currency_id, code, rate, effective_date, rate_source, row_updated_at in rows:
+            ids[code.value] = currency_id
+            if code.value == PIVOT_CURRENCY:
+                rates_by_id[currency_id] = Decimal('1')
+            elif rate is not None:
+                rates_by_id[currency_id] = Decimal(str(rate))
+            if effective_date is not None and (effective_at is None or effective_date < effective_at):
+                effective_at, source = effective_date, rate_source  # the table is as old as its oldest rate
+            if row_updated_at is not None and (updated_at is None or row_updated_at > updated_at):
+                updated_at = row_updated_at
+        return RateMatrix.build(ids, rates_by_id, effective_at, source, updated_at)
+
+    def _changed_elsewhere(self, matrix: RateMatrix) -> bool:
+        """Whether the shared table changed after `matrix` was read; probed at most every check_interval"""
+        now = time.monotonic()
+        if now - self._checked_at < self.check_interval:
+            return False
+        self._checked_at = now
+        try:
+            # Own connection, so a failed probe can't abort the request's transaction
+            with db.engine.connect() as connection:
+                changed_at = connection.execute(
+                    select(func.max(ExchangeRate.updated_at)).where(
+                        ExchangeRate.from_currency_id == select(Currency.id).where(
+                            Currency.code == CurrencyCode(PIVOT_CURRENCY)
+                        ).scalar_subquery(),
+                        ExchangeRate.is_active.is_(True)
+                    )
+                ).scalar()
+        except Exception as e:
+            logger.warning(f"Could not check exchange rates for changes: {e}")
+            return False
+        return changed_at is not None and (matrix.updated_at is None or changed_at > matrix.updated_at)
+
+    # ===== READ =====
+    def is_stale(self, matrix: RateMatrix) -> bool:
+        return matrix.effective_at is None or datetime.utcnow() - matrix.effective_at > timedelta(seconds=self.max_age)
+
+    def matrix(self) -> RateMatrix:
+        """Current rate matrix: in-process copy, else the shared table, refreshing it if too old"""
+        matrix = self._matrix
+        if time.monotonic() - matrix.loaded_at < self.local_ttl and not self._changed_elsewhere(matrix):
+            return matrix
+
+        try:
+            matrix = self._load()
+            if self.is_stale(matrix):
+                with advisory_lock('exchange_rates') as acquired:
+                    if acquired and self.refresh():
+                        return self._matrix
+                    if not acquired:
+                        # Another worker is fetching; use what is stored until it lands
+                        logger.info("Exchange rates are stale and being refreshed elsewhere; using stored rates")
+        except Exception as e:
+            logger.error(f"Could not load or refresh exchange rates: {e}")
+            if matrix is self._matrix:
+                # Keep serving the old copy and retry after the local TTL rather than on every read
+                matrix = replace(matrix, loaded_at=time.monotonic())
+
+        with self._lock:
+            self._matrix = matrix
+        return matrix
+
+    def rate(self, from_currency: str, to_currency: str) -> Decimal:
+        """Cross rate for a pair; raises KeyError when either currency has no rate"""
+        return self.matrix().cross_rate(from_currency, to_currency)
+
+    def cached(self) -> RateMatrix:
+        """This process's copy as is, without reading the database"""
+        return self._matrix
+
+    def invalidate(self) -> None:
+        """Drop this process's copy so the next read goes to the shared table"""
+        with self._lock:
+            self._matrix = RateMatrix()
+
+
+# Initialize globally — must be attached via exchange_rates.init_app(app)
+exchange_rates = ExchangeRateService()
@@ -0,0 +1,151 @@
+"""
+Background health sampling.
+
+Each gunicorn worker runs one daemon thread (started lazily on the first
+request, since threads don't survive the --preload fork) that periodically
+records CPU, memory and disk usage, a timed `SELECT 1`, the SQLAlchemy pool
+counters, the LLM circuit breaker state and cache hit rates. The health
+endpoints and the Docker HEALTHCHECK return the latest sample instead of
+probing anything on the request thread; CPU is measured with psutil's
+non-blocking `cpu_percent(interval=None)` over the time between samples.
+"""
+import logging
+import os
+import threading
+import time
+from datetime import datetime
+from typing import Any, Dict, Optional, Tuple
+
+import psutil
+from sqlalchemy import text
+
+from model import db
+from ai.llm_client import llm_client
+from chart_service import chart_service
+from exchange_rates import exchange_rates
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+def overall_status(cpu: float, memory: float, database_ok: bool) -> str:
+    """Same thresholds as the original SystemHealthResource"""
+    if cpu > 90 or memory > 90 or not database_ok:
+        return "unhealthy"
+    if cpu > 80 or memory > 80:
+        return "warning"
+    return "healthy"
+
+
+class HealthSampler:
+    """Per-worker background sampler serving the latest health snapshot"""
+
+    def __init__(self, interval: int = 10):
+        self.app = None
+        self.interval = interval
+        self._latest: Optional[Tuple[float, Dict[str, Any]]] = None
+        self._pid = None
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        self.app = app
+        app.config.setdefault('HEALTH_SAMPLE_INTERVAL', self.interval)
+        self.interval = app.config['HEALTH_SAMPLE_INTERVAL']
+        app.before_request(self._ensure_started)
+
+    def _ensure_started(self):
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            psutil.cpu_percent(interval=None)  # prime the counter the first sample is measured against
+            self._latest = None  # a sample inherited from the preloading master describes another process
+            self._stop.clear()
+            threading.Thread(target=self._run, name='health-sampler', daemon=True).start()
+            self._pid = os.getpid()
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                self.sample()
+            except Exception as e:
+                logger.error(f"Health sampling failed: {e}")
+            self._stop.wait(self.interval)
+
+    # ===== SAMPLING =====
+    def _database(self) -> Dict[str, Any]:
+        started = time.perf_counter()
+        try:
+            with self.app.app_context():
+                with db.engine.connect() as connection:
+                    connection.execute(text("SELECT 1"))
+                pool = db.engine.pool
+                pool_stats = {
+                    name: getattr(pool, name)()
+                    for name in ('size', 'checkedin', 'checkedout', 'overflow')
+                    if callable(getattr(pool, name, None))
+                }
+            return {"ok": True, "latency_ms": round((time.perf_counter() - started) * 1000, 1), "pool": pool_stats}
+        except Exception as e:
+            return {"ok": False, "error": str(e)[:200], "pool": {}}
+
+    @staticmethod
+    def _caches() -> Dict[str, Any]:
+        charts = chart_service.stats()
+        matrix = exchange_rates.cached()  # never triggers a load or fetch from the sampler
+        return {
+            "charts": {"hit_rate": charts['hit_rate'], "entries": charts['cache_entries']},
+            "exchange_rates": {
+                "rates": len(matrix.rates),
+                "version": matrix.version,
+                "effective_at": matrix.effective_at.isoformat() if matrix.effective_at else None,
+                "stale": exchange_rates.is_stale(matrix)
+            }
+        }
+
+    def sample(self) -> Dict[str, Any]:
+        """Collect a sample now and make it the latest"""
+        cpu = psutil.cpu_percent(interval=None)
+        memory = psutil.virtual_memory()
+        disk = psutil.disk_usage('/')
+        database = self._database()
+
+        try:
+            with self.app.app_context():
+                caches = self._caches()
+        except Exception as e:
+            caches = {"error": str(e)[:200]}
+
+        sample = {
+            "overall": overall_status(cpu, memory.percent, database["ok"]),
+            "sampled_at": datetime.utcnow().isoformat(),
+            "worker_pid": os.getpid(),
+            "system": {
+                "cpu": round(cpu, 1),
+                "memory": round(memory.percent, 1),
+                "disk": round((disk.used / disk.total) * 100, 1)
+            },
+            "database": database,
+            "llm": {"enabled": llm_client.enabled, **llm_client.circuit_breaker.get_state()},
+            "caches": caches
+        }
+        self._latest = (time.monotonic(), sample)
+        return sample
+
+    def latest(self) -> Dict[str, Any]:
+        """The most recent sample (taken inline only before the first one exists)"""
+        if self._latest is None:
+            self.sample()
+        sampled, sample = self._latest
+        age = time.monotonic() - sampled
+        return {**sample, "age_seconds": round(age, 1), "stale": age > 3 * self.interval}
+
+    def shutdown(self):
+        self._stop.set()
+        self._pid = None
+
+
+# Initialize globally — must be attached via health_sampler.init_app(app)
+health_sampler = HealthSampler()
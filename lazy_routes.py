@@ -0,0 +1,104 @@
+"""
+Deferred route registration.
+
+The organizer report, admin report and AI resources pull in ReportLab,
+pandas and matplotlib when their modules are imported, which used to happen
+for every process that imported app.py (gunicorn master, `flask` CLI
+commands, scripts and benchmarks) whether or not any report was ever served.
+Their URL rules are listed here, so with LAZY_ROUTES on app.py registers a
+stub per resource instead: the stub imports its module on the first request
+to any of its URLs and hands that request to the real resource. Endpoint
+names and URL rules are the same either way, so `url_for` and clients can't
+tell the difference.
+
+With LAZY_ROUTES off (or when a module registers itself) the real classes
+are registered directly from the same table.
+"""
+import importlib
+import logging
+from threading import Lock
+from typing import Dict, Tuple, Type
+
+from flask import abort, request
+from flask_restful import Resource
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# module -> (resource class, URL rule) in registration order
+ROUTE_GROUPS: Dict[str, Tuple[Tuple[str, str], ...]] = {
+    'admin_report': (
+        ('AdminReportResource', '/admin/reports'),
+        ('AdminOrganizerListResource', '/admin/organizers'),
+        ('AdminEventListResource', '/admin/organizers/<int:organizer_id>/events'),
+    ),
+    'ai.ai_routes': (
+        ('AIChatResource', '/ai/chat'),
+        ('AIConversationListResource', '/ai/conversations'),
+        ('AIConversationDetailResource', '/ai/conversations/<int:conversation_id>'),
+        ('AIActionConfirmResource', '/ai/actions/<int:action_id>/confirm'),
+        ('AIPendingActionsResource', '/ai/actions/pending'),
+        ('AIInsightsResource', '/ai/insights'),
+    ),
+    'organizer_report.organizer_report': (
+        ('GenerateReportResource', '/reports/generate'),
+        ('ReportJobStatusResource', '/reports/jobs/<string:job_id>'),
+        ('ReportJobDownloadResource', '/reports/jobs/<string:job_id>/download'),
+        ('GetReportsResource', '/reports'),
+        ('GetReportResource', '/reports/<int:report_id>'),
+        ('ExportReportResource', '/reports/<int:report_id>/export'),
+        ('OrganizerSummaryReportResource', '/reports/organizer/summary'),
+        ('EventReportsResource', '/reports/events/<int:event_id>'),
+        ('EventListExportResource', '/reports/events/<int:event_id>/<any(tickets, attendees):list_name>/export'),
+        ('ReportSubscriptionResource', '/reports/subscriptions'),
+        ('ReportSubscriptionDetailResource', '/reports/subscriptions/<int:subscription_id>'),
+        ('LatestEventReportResource', '/reports/events/<int:event_id>/latest'),
+    ),
+}
+
+# Stubs accept every method and answer 405 for the ones the real resource doesn't implement
+STUB_METHODS = frozenset({'GET', 'HEAD', 'POST', 'PUT', 'PATCH', 'DELETE'})
+
+_resolved: Dict[Tuple[str, str], Type[Resource]] = {}
+_lock = Lock()
+
+
+def resolve(module_name: str, class_name: str) -> Type[Resource]:
+    """Import a resource's module (once) and return the class"""
+    key = (module_name, class_name)
+    resource = _resolved.get(key)
+    if resource is None:
+        with _lock:
+            resource = _resolved.get(key)
+            if resource is None:
+                logger.info(f"Loading {module_name} for {class_name}")
+                resource = getattr(importlib.import_module(module_name), class_name)
+                _resolved[key] = resource
+    return resource
+
+
+def lazy_resource(module_name: str, class_name: str) -> Type[Resource]:
+    """Stand-in resource with the real one's name (and so its endpoint) that imports it on first use"""
+
+    def dispatch_request(self, *args, **kwargs):
+        resource = resolve(module_name, class_name)
+        method = 'GET' if request.method == 'HEAD' else request.method
+        if method not in (resource.methods or ()):
+            abort(405)
+        return resource().dispatch_request(*args, **kwargs)
+
+    return type(class_name, (Resource,), {
+        '__module__': __name__,
+        '__doc__': f"Deferred {module_name}.{class_name}",
+        'methods': set(STUB_METHODS),
+        'dispatch_request': dispatch_request,
+    })
+
+
+def register_route_group(api, module_name: str, lazy: bool = False) -> None:
+    """Register a module's resources, as stubs when `lazy`"""
+    for class_name, url in ROUTE_GROUPS[module_name]:
+        if lazy:
+            api.add_resource(lazy_resource(module_name, class_name), url)
+        else:
+            api.add_resource(resolve(module_name, class_name), url)
@@ -0,0 +1,248 @@
+"""
+Outbound mail queue.
+
+`mail.send(msg)` opened an SMTP connection (EHLO, STARTTLS, AUTH) for every
+message, inside the request that triggered it. Send paths now call
+`mail_dispatcher.enqueue(msg)`, which stores the rendered MIME message in
+`outbound_emails` and returns at once. A daemon thread in each gunicorn
+worker (started lazily; threads don't survive the --preload fork) claims
+due rows with FOR UPDATE SKIP LOCKED, so workers never send the same row
+twice, and sends them over one SMTP connection that stays open for as
+long as there is work, reconnecting after MAIL_MAX_EMAILS messages.
+
+Transient failures (connection drops, 4xx replies) are retried with
+exponential backoff up to MAIL_DISPATCH_MAX_ATTEMPTS; 5xx replies and
+refused recipients fail the row immediately. A row left in 'sending' by a
+worker that died is picked up again once its lease expires. With
+MAIL_DISPATCH_SYNC the queue is drained inline (tests, single-process
+scripts).
+"""
+import logging
+import os
+import random
+import smtplib
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import List, Optional, Tuple
+
+from flask import current_app
+from flask_mail import Connection, Message, sanitize_address, sanitize_addresses
+from sqlalchemy import or_, select
+
+from model import db, OutboundEmail
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+class MailDispatcher:
+    """Persistent outbound queue drained in batches over a reused SMTP connection"""
+
+    def __init__(self, batch_size: int = 50, poll_interval: int = 5, max_attempts: int = 6,
+                 retry_base: int = 30, retry_max: int = 3600, lease: int = 300, retention_days: int = 7):
+        self.app = None
+        self.sync = False
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+        self.max_attempts = max_attempts
+        self.retry_base = retry_base
+        self.retry_max = retry_max
+        self.lease = lease
+        self.retention_days = retention_days
+        self._pid = None
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        self.app = app
+        app.config.setdefault('MAIL_DISPATCH_SYNC', self.sync)
+        app.config.setdefault('MAIL_DISPATCH_BATCH_SIZE', self.batch_size)
+        app.config.setdefault('MAIL_DISPATCH_POLL_INTERVAL', self.poll_interval)
+        app.config.setdefault('MAIL_DISPATCH_MAX_ATTEMPTS', self.max_attempts)
+        app.config.setdefault('MAIL_DISPATCH_RETRY_BASE', self.retry_base)
+        app.config.setdefault('MAIL_DISPATCH_RETRY_MAX', self.retry_max)
+        app.config.setdefault('MAIL_DISPATCH_RETENTION_DAYS', self.retention_days)
+        self.sync = app.config['MAIL_DISPATCH_SYNC']
+        self.batch_size = app.config['MAIL_DISPATCH_BATCH_SIZE']
+        self.poll_interval = app.config['MAIL_DISPATCH_POLL_INTERVAL']
+        self.max_attempts = app.config['MAIL_DISPATCH_MAX_ATTEMPTS']
+        self.retry_base = app.config['MAIL_DISPATCH_RETRY_BASE']
+        self.retry_max = app.config['MAIL_DISPATCH_RETRY_MAX']
+        self.retention_days = app.config['MAIL_DISPATCH_RETENTION_DAYS']
+        app.before_request(self._ensure_started)
+
+    # ===== QUEUE =====
+    def enqueue(self, msg: Message) -> int:
+        """Store a message for delivery and return its queue id; raises if it could not be queued"""
+        recipients = list(sanitize_addresses(msg.send_to))
+        if not recipients:
+            raise ValueError("Message has no recipients")
+        if msg.date is None:
+            msg.date = time.time()  # the Date header reflects when it was queued, not when a retry succeeds
+
+        # Own connection and transaction, so the caller's db.session is left alone
+        with db.engine.begin() as connection:
+            email_id = connection.execute(
+                OutboundEmail.__table__.insert().values(
+                    sender=sanitize_address(msg.sender),
+                    recipients=recipients,
+                    subject=(msg.subject or '')[:255],
+                    message=msg.as_bytes(),
+                    status='queued',
+                    attempts=0,
+                    next_attempt_at=datetime.utcnow(),
+                    created_at=datetime.utcnow()
+                ).returning(OutboundEmail.id)
+            ).scalar()
+
+        if self.sync:
+            self.dispatch_pending()
+        else:
+            self._ensure_started()
+            self._wake.set()
+        return email_id
+
+    def _claim(self, limit: int) -> List[tuple]:
+        """Lease up to `limit` due messages to this worker"""
+        table = OutboundEmail.__table__
+        now = datetime.utcnow()
+        due = select(table.c.id).where(
+            or_(table.c.status == 'queued', table.c.status == 'sending'),
+            table.c.next_attempt_at <= now
+        ).order_by(table.c.next_attempt_at).limit(limit).with_for_update(skip_locked=True)
+        with db.engine.begin() as connection:
+            return connection.execute(
+                table.update().where(table.c.id.in_(due)).values(
+                    status='sending',
+                    attempts=table.c.attempts + 1,
+                    next_attempt_at=now + timedelta(seconds=self.lease)
+                ).returning(table.c.id, table.c.sender, table.c.recipients, table.c.message, table.c.attempts)
+            ).all()
+
+    def _backoff(self, attempts: int) -> timedelta:
+        delay = min(self.retry_base * 2 ** (attempts - 1), self.retry_max)
+        return timedelta(seconds=delay * random.uniform(0.8, 1.2))
+
+    def _record(self, sent: List[int], errors: List[Tuple[tuple, str, bool]]) -> None:
+        table = OutboundEmail.__table__
+        now = datetime.utcnow()
+        with db.engine.begin() as connection:
+            if sent:
+                connection.execute(table.update().where(table.c.id.in_(sent)).values(
+                    status='sent', sent_at=now, message=None, last_error=None
+                ))
+            for row, error, permanent in errors:
+                if permanent or row.attempts >= self.max_attempts:
+                    values = {'status': 'failed'}
+                    logger.error(f"Giving up on email {row.id} to {row.recipients} after {row.attempts} attempt(s): {error}")
+                else:
+                    values = {'status': 'queued', 'next_attempt_at': now + self._backoff(row.attempts)}
+                connection.execute(table.update().where(table.c.id == row.id).values(last_error=error[:1000], **values))
+
+    # ===== SENDING =====
+    @staticmethod
+    def _open() -> Connection:
+        connection = Connection(current_app.extensions['mail'])
+        connection.__enter__()  # host stays None when MAIL_SUPPRESS_SEND is on
+        return connection
+
+    @staticmethod
+    def _close(connection: Optional[Connection]) -> None:
+        if connection is None:
+            return
+        try:
+            connection.__exit__(None, None, None)
+        except (smtplib.SMTPException, OSError):
+            if connection.host is not None:
+                connection.host.close()
+
+    def dispatch_pending(self) -> int:
+        """Send everything that is due, one SMTP connection for the whole run; returns the number sent"""
+        total = 0
+        connection = None
+        sent_on_connection = 0
+        max_emails = current_app.extensions['mail'].max_emails
+        try:
+            while True:
+                batch = self._claim(self.batch_size)
+                if not batch:
+                    break
+                sent, errors = [], []
+                for index, row in enumerate(batch):
+                    try:
+                        if connection is None:
+                            connection = self._open()
+                            sent_on_connection = 0
+                        if connection.host is not None:
+                            connection.host.sendmail(row.sender, row.recipients, row.message)
+                        sent_on_connection += 1
+                        sent.append(row.id)
+                    except smtplib.SMTPRecipientsRefused as e:
+                        errors.append((row, f"Recipients refused: {e.recipients}", True))
+                    except smtplib.SMTPResponseException as e:
+                        errors.append((row, f"{e.smtp_code} {e.smtp_error!r}", e.smtp_code >= 500))
+                        if e.smtp_code < 500:
+                            self._close(connection)
+                            connection = None
+                    except (smtplib.SMTPException, OSError) as e:
+                        # Connection-level failure: retry this batch later rather than reconnecting per message
+                        errors.extend((pending, str(e) or e.__class__.__name__, False) for pending in batch[index:])
+                        self._close(connection)
+                        connection = None
+                        break
+                    if connection is not None and max_emails and sent_on_connection >= max_emails:
+                        self._close(connection)
+                        connection = None
+                self._record(sent, errors)
+                total += len(sent)
+                if len(batch) < self.batch_size or len(errors) == len(batch):
+                    break
+        finally:
+            self._close(connection)
+        if total:
+            logger.info(f"Dispatched {total} email(s)")
+        return total
+
+    # ===== WORKER =====
+    def _ensure_started(self):
+        if self.sync or self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._stop.clear()
+            threading.Thread(target=self._run, name='mail-dispatcher', daemon=True).start()
+            self._pid = os.getpid()
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                with self.app.app_context():
+                    self.dispatch_pending()
+            except Exception as e:
+                logger.error(f"Mail dispatch failed: {e}")
+            self._wake.wait(self.poll_interval)
+            self._wake.clear()
+
+    def purge(self) -> int:
+        """Delete sent and failed messages older than MAIL_DISPATCH_RETENTION_DAYS (scheduled job)"""
+        table = OutboundEmail.__table__
+        cutoff = datetime.utcnow() - timedelta(days=self.retention_days)
+        with db.engine.begin() as connection:
+            removed = connection.execute(table.delete().where(
+                table.c.status.in_(('sent', 'failed')), table.c.created_at < cutoff
+            )).rowcount
+        if removed:
+            logger.info(f"Removed {removed} old outbound emails")
+        return removed
+
+    def shutdown(self):
+        self._stop.set()
+        self._wake.set()
+        self._pid = None
+
+
+# Initialize globally — must be attached via mail_dispatcher.init_app(app)
+mail_dispatcher = MailDispatcher()
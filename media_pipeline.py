@@ -0,0 +1,245 @@
+"""
+Async media pipeline for event images and partner logos.
+
+Uploaded files are staged to local temp storage on the request thread and the
+create/update request returns straight away with a placeholder. A background
+worker pool then resizes the image, generates a thumbnail, uploads both to the
+configured storage backend (Cloudinary, or the local filesystem stand-in used
+in tests/development) and patches the owning Event/Partner row.
+"""
+import os
+import uuid
+import logging
+import tempfile
+from io import BytesIO
+from dataclasses import dataclass
+from concurrent.futures import ThreadPoolExecutor
+from threading import Lock
+from typing import Optional, Dict, Any
+
+import cloudinary.uploader
+from flask import current_app, send_from_directory
+from PIL import Image, ImageOps
+
+from model import db, Event, Partner
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif', 'webp'}
+
+
+def allowed_file(filename):
+    return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
+
+
+# ===== STORAGE BACKENDS =====
+class CloudinaryMediaStorage:
+    """Uploads processed media to Cloudinary"""
+
+    def upload(self, data: bytes, folder: str, name: str) -> str:
+        result = cloudinary.uploader.upload(
+            BytesIO(data),
+            folder=folder,
+            public_id=name.rsplit('.', 1)[0],
+            resource_type="image",
+            timeout=current_app.config.get('CLOUDINARY_TIMEOUT', 30)
+        )
+        return result.get("secure_url")
+
+
+class LocalMediaStorage:
+    """Filesystem stand-in for Cloudinary (tests and local development)"""
+
+    def __init__(self, root: str, base_url: str):
+        self.root = root
+        self.base_url = base_url.rstrip('/')
+
+    def upload(self, data: bytes, folder: str, name: str) -> str:
+        directory = os.path.join(self.root, folder)
+        os.makedirs(directory, exist_ok=True)
+        with open(os.path.join(directory, name), 'wb') as f:
+            f.write(data)
+        return f"{self.base_url}/{folder}/{name}"
+
+
+# ===== PIPELINE =====
+@dataclass
+class StagedUpload:
+    """A file accepted on the request thread and waiting for processing"""
+    token: str
+    path: str
+    extension: str
+    folder: str
+
+
+class MediaPipeline:
+    """Stages uploads and processes them in a background worker pool"""
+
+    # target name -> (model, image column, thumbnail column)
+    TARGETS = {
+        'event': (Event, 'image', 'image_thumbnail'),
+        'partner': (Partner, 'logo_url', 'logo_thumbnail_url'),
+    }
+
+    def __init__(self):
+        self.app = None
+        self.storage = None
+        self._executor = None
+        self._lock = Lock()
+
+    def init_app(self, app):
+        self.app = app
+        app.config.setdefault('MEDIA_STORAGE_BACKEND', 'cloudinary')
+        app.config.setdefault('MEDIA_STAGING_DIR', os.path.join(tempfile.gettempdir(), 'media_staging'))
+        app.config.setdefault('MEDIA_LOCAL_ROOT', os.path.join(tempfile.gettempdir(), 'media'))
+        app.config.setdefault('MEDIA_LOCAL_BASE_URL', '/media')
+        app.config.setdefault('MEDIA_PLACEHOLDER_URL', None)
+        app.config.setdefault('MEDIA_MAX_DIMENSION', 1600)
+        app.config.setdefault('MEDIA_THUMBNAIL_SIZE', 400)
+        app.config.setdefault('MEDIA_MAX_FILE_SIZE', 5 * 1024 * 1024)
+        app.config.setdefault('MEDIA_WORKERS', 2)
+        app.config.setdefault('MEDIA_PIPELINE_SYNC', False)
+
+        os.makedirs(app.config['MEDIA_STAGING_DIR'], exist_ok=True)
+
+        if app.config['MEDIA_STORAGE_BACKEND'] == 'local':
+            self.storage = LocalMediaStorage(app.config['MEDIA_LOCAL_ROOT'], app.config['MEDIA_LOCAL_BASE_URL'])
+            base_url = app.config['MEDIA_LOCAL_BASE_URL'].rstrip('/')
+            if base_url.startswith('/'):
+                app.add_url_rule(
+                    f"{base_url}/<path:filename>",
+                    'local_media',
+                    lambda filename: send_from_directory(app.config['MEDIA_LOCAL_ROOT'], filename)
+                )
+        else:
+            self.storage = CloudinaryMediaStorage()
+
+    @property
+    def placeholder_url(self) -> Optional[str]:
+        return self.app.config.get('MEDIA_PLACEHOLDER_URL') if self.app else None
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        # Created lazily so each gunicorn worker gets its own pool after fork
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self.app.config['MEDIA_WORKERS'],
+                    thread_name_prefix='media-pipeline'
+                )
+            return self._executor
+
+    def stage(self, file, folder: str) -> Optional[StagedUpload]:
+        """Validate an uploaded file and copy it to local staging storage"""
+        if not file or file.filename == '':
+            return None
+        if not allowed_file(file.filename):
+            raise ValueError("Invalid file type. Allowed types: PNG, JPG, JPEG, GIF, WEBP")
+
+        token = uuid.uuid4().hex
+        extension = file.filename.rsplit('.', 1)[1].lower()
+        path = os.path.join(self.app.config['MEDIA_STAGING_DIR'], f"{token}.{extension}")
+        file.save(path)
+
+        if os.path.getsize(path) > self.app.config['MEDIA_MAX_FILE_SIZE']:
+            os.remove(path)
+            raise ValueError("File too large")
+
+        return StagedUpload(token=token, path=path, extension=extension, folder=folder)
+
+    def submit(self, staged: Optional[StagedUpload], target: str, target_id: int) -> Optional[Dict[str, Any]]:
+        """Queue a staged upload for processing; the target row is patched when done"""
+        if staged is None:
+            return None
+        if target not in self.TARGETS:
+            raise ValueError(f"Unknown media target: {target}")
+
+        if self.app.config['MEDIA_PIPELINE_SYNC']:
+            self._process(staged, target, target_id)
+        else:
+            self._get_executor().submit(self._process, staged, target, target_id)
+
+        return {"media_job_id": staged.token, "status": "processing"}
+
+    def discard(self, staged: Optional[StagedUpload]):
+        """Drop a staged file when the owning request fails"""
+        if staged and os.path.exists(staged.path):
+            os.remove(staged.path)
+
+    def _render(self, staged: StagedUpload):
+        """Resize the image and build its thumbnail as (image, ext, thumbnail, ext)"""
+        max_dimension = self.app.config['MEDIA_MAX_DIMENSION']
+        thumbnail_size = self.app.config['MEDIA_THUMBNAIL_SIZE']
+
+        with Image.open(staged.path) as img:
+            # Animated GIFs are uploaded as-is; only the thumbnail is re-encoded
+            if staged.extension == 'gif':
+                with open(staged.path, 'rb') as f:
+                    image_bytes = f.read()
+                image_ext = 'gif'
+                frame = img.convert('RGBA')
+            else:
+                frame = ImageOps.exif_transpose(img)
+                if frame.mode not in ('RGB', 'RGBA'):
+                    frame = frame.convert('RGBA' if 'transparency' in img.info else 'RGB')
+                resized = frame.copy()
+                resized.thumbnail((max_dimension, max_dimension))
+                image_bytes, image_ext = self._encode(resized)
+
+            thumb = frame.copy()
+            thumb.thumbnail((thumbnail_size, thumbnail_size))
+            thumb_bytes, thumb_ext = self._encode(thumb)
+
+        return image_bytes, image_ext, thumb_bytes, thumb_ext
+
+    @staticmethod
+    def _encode(img):
+        buffer = BytesIO()
+        if img.mode == 'RGBA':
+            img.save(buffer, format='PNG', optimize=True)
+            return buffer.getvalue(), 'png'
+        img.save(buffer, format='JPEG', quality=85, optimize=True)
+        return buffer.getvalue(), 'jpg'
+
+    def _process(self, staged: StagedUpload, target: str, target_id: int):
+        model, image_column, thumbnail_column = self.TARGETS[target]
+
+        with self.app.app_context():
+            try:
+                image_bytes, image_ext, thumb_bytes, thumb_ext = self._render(staged)
+                image_url = self.storage.upload(image_bytes, staged.folder, f"{staged.token}.{image_ext}")
+                thumb_url = self.storage.upload(thumb_bytes, f"{staged.folder}/thumbnails", f"{staged.token}.{thumb_ext}")
+
+                record = model.query.get(target_id)
+                if record is None:
+                    logger.warning(f"{target} {target_id} no longer exists; dropping media job {staged.token}")
+                    return
+                setattr(record, image_column, image_url)
+                setattr(record, thumbnail_column, thumb_url)
+                db.session.commit()
+                logger.info(f"Media job {staged.token} finished for {target} {target_id}")
+
+            except Exception as e:
+                db.session.rollback()
+                logger.error(f"Media job {staged.token} failed for {target} {target_id}: {e}")
+                # Don't leave the placeholder behind as if it were the real image
+                try:
+                    record = model.query.get(target_id)
+                    if record is not None and self.placeholder_url and getattr(record, image_column) == self.placeholder_url:
+                        setattr(record, image_column, None)
+                        db.session.commit()
+                except Exception:
+                    db.session.rollback()
+            finally:
+                db.session.remove()
+                self.discard(staged)
+
+    def shutdown(self, wait: bool = True):
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=wait)
+                self._executor = None
+
+
+# Initialize globally — must be attached via media_pipeline.init_app(app)
+media_pipeline = MediaPipeline()
@@ -0,0 +1,34 @@
+"""Add server sessions
+
+Revision ID: 3f8a1c5e7d92
+Revises: e6b2d9f41c38
+Create Date: 2026-10-18 20:05:13.448310
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3f8a1c5e7d92'
+down_revision = 'e6b2d9f41c38'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('server_sessions',
+    sa.Column('sid', sa.String(length=64), nullable=False),
+    sa.Column('data', sa.Text(), nullable=False),
+    sa.Column('expires_at', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('sid')
+    )
+    with op.batch_alter_table('server_sessions', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_server_sessions_expires_at'), ['expires_at'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('server_sessions', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_server_sessions_expires_at'))
+
+    op.drop_table('server_sessions')
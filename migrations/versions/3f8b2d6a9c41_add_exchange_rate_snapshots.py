@@ -0,0 +1,39 @@
+"""Add exchange rate snapshots
+
+Revision ID: 3f8b2d6a9c41
+Revises: b1e7d3f5a208
+Create Date: 2026-10-18 15:02:37.518204
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision = '3f8b2d6a9c41'
+down_revision = 'b1e7d3f5a208'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('exchange_rate_snapshots',
+    sa.Column('id', sa.String(length=64), nullable=False),
+    sa.Column('base_currency', sa.String(length=3), nullable=False),
+    sa.Column('rates', postgresql.JSONB(astext_type=sa.Text()), nullable=False),
+    sa.Column('source', sa.String(length=100), nullable=True),
+    sa.Column('captured_at', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('reports', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('rate_snapshot_id', sa.String(length=64), nullable=True))
+        batch_op.create_index(batch_op.f('ix_reports_rate_snapshot_id'), ['rate_snapshot_id'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('reports', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_reports_rate_snapshot_id'))
+        batch_op.drop_column('rate_snapshot_id')
+
+    op.drop_table('exchange_rate_snapshots')
@@ -0,0 +1,32 @@
+"""Add media thumbnail columns
+
+Revision ID: 3f9c1d2b7a41
+Revises: ae26ecd575c7
+Create Date: 2026-10-18 09:12:40.118203
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3f9c1d2b7a41'
+down_revision = 'ae26ecd575c7'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('event', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('image_thumbnail', sa.String(length=255), nullable=True))
+
+    with op.batch_alter_table('partners', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('logo_thumbnail_url', sa.String(length=500), nullable=True))
+
+
+def downgrade():
+    with op.batch_alter_table('partners', schema=None) as batch_op:
+        batch_op.drop_column('logo_thumbnail_url')
+
+    with op.batch_alter_table('event', schema=None) as batch_op:
+        batch_op.drop_column('image_thumbnail')
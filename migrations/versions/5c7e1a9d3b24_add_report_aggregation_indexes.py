@@ -0,0 +1,31 @@
+"""Add report aggregation indexes
+
+Revision ID: 5c7e1a9d3b24
+Revises: 8b2e4f6a9c13
+Create Date: 2026-10-18 11:02:17.530466
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = '5c7e1a9d3b24'
+down_revision = '8b2e4f6a9c13'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('ticket', schema=None) as batch_op:
+        batch_op.create_index('idx_ticket_event_status_purchase', ['event_id', 'payment_status', 'purchase_date'], unique=False)
+
+    with op.batch_alter_table('scan', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_scan_ticket_id'), ['ticket_id'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('scan', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_scan_ticket_id'))
+
+    with op.batch_alter_table('ticket', schema=None) as batch_op:
+        batch_op.drop_index('idx_ticket_event_status_purchase')
@@ -0,0 +1,35 @@
+"""Add user directory indexes
+
+Revision ID: 5d1f8b3a9c20
+Revises: 7c2e4a9b1d63
+Create Date: 2026-10-18 21:36:02.418377
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = '5d1f8b3a9c20'
+down_revision = '7c2e4a9b1d63'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    with op.batch_alter_table('user', schema=None) as batch_op:
+        batch_op.create_index('idx_user_role_id', ['role', 'id'], unique=False)
+        batch_op.create_index('idx_user_full_name_trgm', ['full_name'], unique=False, postgresql_using='gin',
+                              postgresql_ops={'full_name': 'gin_trgm_ops'})
+        batch_op.create_index('idx_user_email_trgm', ['email'], unique=False, postgresql_using='gin',
+                              postgresql_ops={'email': 'gin_trgm_ops'})
+        batch_op.create_index('idx_user_phone_number_trgm', ['phone_number'], unique=False, postgresql_using='gin',
+                              postgresql_ops={'phone_number': 'gin_trgm_ops'})
+
+
+def downgrade():
+    with op.batch_alter_table('user', schema=None) as batch_op:
+        batch_op.drop_index('idx_user_phone_number_trgm', postgresql_using='gin')
+        batch_op.drop_index('idx_user_email_trgm', postgresql_using='gin')
+        batch_op.drop_index('idx_user_full_name_trgm', postgresql_using='gin')
+        batch_op.drop_index('idx_user_role_id')
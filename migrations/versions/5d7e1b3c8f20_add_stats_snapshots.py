@@ -0,0 +1,29 @@
+"""Add stats snapshots
+
+Revision ID: 5d7e1b3c8f20
+Revises: c4a81e6f2b95
+Create Date: 2026-10-18 18:12:40.527193
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision = '5d7e1b3c8f20'
+down_revision = 'c4a81e6f2b95'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('stats_snapshots',
+    sa.Column('key', sa.String(length=100), nullable=False),
+    sa.Column('data', postgresql.JSONB(astext_type=sa.Text()), nullable=False),
+    sa.Column('computed_at', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('key')
+    )
+
+
+def downgrade():
+    op.drop_table('stats_snapshots')
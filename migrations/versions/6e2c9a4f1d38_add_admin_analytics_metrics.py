@@ -0,0 +1,56 @@
+"""Add admin analytics metrics
+
+Revision ID: 6e2c9a4f1d38
+Revises: 3f8b2d6a9c41
+Create Date: 2026-10-18 15:48:12.306917
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '6e2c9a4f1d38'
+down_revision = '3f8b2d6a9c41'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('admin_event_metrics',
+    sa.Column('event_id', sa.Integer(), nullable=False),
+    sa.Column('organizer_id', sa.Integer(), nullable=False),
+    sa.Column('tickets_sold', sa.Integer(), nullable=False),
+    sa.Column('revenue', sa.Numeric(precision=14, scale=2), nullable=False),
+    sa.Column('attendees', sa.Integer(), nullable=False),
+    sa.Column('computed_at', sa.DateTime(), nullable=False),
+    sa.ForeignKeyConstraint(['event_id'], ['event.id'], ondelete='CASCADE'),
+    sa.ForeignKeyConstraint(['organizer_id'], ['organizer.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('event_id')
+    )
+    with op.batch_alter_table('admin_event_metrics', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_admin_event_metrics_organizer_id'), ['organizer_id'], unique=False)
+
+    op.create_table('admin_organizer_metrics',
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('event_count', sa.Integer(), nullable=False),
+    sa.Column('total_tickets_sold', sa.Integer(), nullable=False),
+    sa.Column('total_revenue', sa.Numeric(precision=14, scale=2), nullable=False),
+    sa.Column('total_attendees', sa.Integer(), nullable=False),
+    sa.Column('computed_at', sa.DateTime(), nullable=False),
+    sa.ForeignKeyConstraint(['user_id'], ['user.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('user_id')
+    )
+    with op.batch_alter_table('admin_organizer_metrics', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_admin_organizer_metrics_total_revenue'), ['total_revenue'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('admin_organizer_metrics', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_admin_organizer_metrics_total_revenue'))
+
+    op.drop_table('admin_organizer_metrics')
+    with op.batch_alter_table('admin_event_metrics', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_admin_event_metrics_organizer_id'))
+
+    op.drop_table('admin_event_metrics')
@@ -0,0 +1,26 @@
+"""Add user token version
+
+Revision ID: 7c2e4a9b1d63
+Revises: 3f8a1c5e7d92
+Create Date: 2026-10-18 20:41:27.905114
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '7c2e4a9b1d63'
+down_revision = '3f8a1c5e7d92'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('user', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('token_version', sa.Integer(), server_default='0', nullable=False))
+
+
+def downgrade():
+    with op.batch_alter_table('user', schema=None) as batch_op:
+        batch_op.drop_column('token_version')
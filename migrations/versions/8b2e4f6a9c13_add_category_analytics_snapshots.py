@@ -0,0 +1,39 @@
+"""Add category analytics snapshots
+
+Revision ID: 8b2e4f6a9c13
+Revises: 3f9c1d2b7a41
+Create Date: 2026-10-18 10:04:51.502117
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision = '8b2e4f6a9c13'
+down_revision = '3f9c1d2b7a41'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('category_analytics_snapshots',
+    sa.Column('category_id', sa.Integer(), nullable=False),
+    sa.Column('total_events', sa.Integer(), nullable=False),
+    sa.Column('active_events', sa.Integer(), nullable=False),
+    sa.Column('total_tickets_sold', sa.Integer(), nullable=False),
+    sa.Column('recent_tickets_sold', sa.Integer(), nullable=False),
+    sa.Column('total_likes', sa.Integer(), nullable=False),
+    sa.Column('popularity_score', sa.Float(), nullable=False),
+    sa.Column('trending_score', sa.Float(), nullable=False),
+    sa.Column('trending_events', postgresql.JSONB(astext_type=sa.Text()), nullable=True),
+    sa.Column('window_days', sa.Integer(), nullable=False),
+    sa.Column('computed_at', sa.DateTime(), nullable=False),
+    sa.Column('updated_at', sa.DateTime(), nullable=False),
+    sa.ForeignKeyConstraint(['category_id'], ['category.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('category_id')
+    )
+
+
+def downgrade():
+    op.drop_table('category_analytics_snapshots')
@@ -0,0 +1,51 @@
+"""Add report subscriptions
+
+Revision ID: 8b5f0d3e7a62
+Revises: 6e2c9a4f1d38
+Create Date: 2026-10-18 16:31:54.771203
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8b5f0d3e7a62'
+down_revision = '6e2c9a4f1d38'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('report_subscriptions',
+    sa.Column('id', sa.Integer(), autoincrement=True, nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('event_id', sa.Integer(), nullable=False),
+    sa.Column('frequency', sa.String(length=10), nullable=False),
+    sa.Column('target_currency', sa.String(length=3), nullable=False),
+    sa.Column('is_active', sa.Boolean(), nullable=False),
+    sa.Column('next_run_at', sa.DateTime(), nullable=False),
+    sa.Column('last_run_at', sa.DateTime(), nullable=True),
+    sa.Column('last_report_id', sa.Integer(), nullable=True),
+    sa.Column('last_error', sa.Text(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.Column('updated_at', sa.DateTime(), nullable=False),
+    sa.ForeignKeyConstraint(['event_id'], ['event.id'], ondelete='CASCADE'),
+    sa.ForeignKeyConstraint(['last_report_id'], ['reports.id'], ondelete='SET NULL'),
+    sa.ForeignKeyConstraint(['user_id'], ['user.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('user_id', 'event_id', 'frequency', name='uq_report_subscription')
+    )
+    with op.batch_alter_table('report_subscriptions', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_report_subscriptions_event_id'), ['event_id'], unique=False)
+        batch_op.create_index(batch_op.f('ix_report_subscriptions_next_run_at'), ['next_run_at'], unique=False)
+        batch_op.create_index(batch_op.f('ix_report_subscriptions_user_id'), ['user_id'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('report_subscriptions', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_report_subscriptions_user_id'))
+        batch_op.drop_index(batch_op.f('ix_report_subscriptions_next_run_at'))
+        batch_op.drop_index(batch_op.f('ix_report_subscriptions_event_id'))
+
+    op.drop_table('report_subscriptions')
@@ -0,0 +1,33 @@
+"""Add organizer stats
+
+Revision ID: 9a3c6e2f4b17
+Revises: 5d7e1b3c8f20
+Create Date: 2026-10-18 18:47:09.381052
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '9a3c6e2f4b17'
+down_revision = '5d7e1b3c8f20'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('organizer_stats',
+    sa.Column('organizer_id', sa.Integer(), nullable=False),
+    sa.Column('event_count', sa.Integer(), nullable=False),
+    sa.Column('upcoming_events', sa.Integer(), nullable=False),
+    sa.Column('revenue', sa.Numeric(precision=14, scale=2), nullable=False),
+    sa.Column('computed_at', sa.DateTime(), nullable=False),
+    sa.Column('updated_at', sa.DateTime(), nullable=False),
+    sa.ForeignKeyConstraint(['organizer_id'], ['organizer.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('organizer_id')
+    )
+
+
+def downgrade():
+    op.drop_table('organizer_stats')
@@ -0,0 +1,80 @@
+"""Add sales facts and rollups
+
+Revision ID: 9d4a6c2e8f17
+Revises: 5c7e1a9d3b24
+Create Date: 2026-10-18 12:20:41.904512
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision = '9d4a6c2e8f17'
+down_revision = '5c7e1a9d3b24'
+branch_labels = None
+depends_on = None
+
+# The enum type already exists for transaction.payment_method
+payment_method = postgresql.ENUM('MPESA', 'PAYSTACK', name='paymentmethod', create_type=False)
+
+
+def upgrade():
+    op.create_table('sales_facts',
+    sa.Column('id', sa.BigInteger(), autoincrement=True, nullable=False),
+    sa.Column('kind', sa.String(length=20), nullable=False),
+    sa.Column('ticket_id', sa.Integer(), nullable=False),
+    sa.Column('event_id', sa.Integer(), nullable=False),
+    sa.Column('ticket_type_id', sa.Integer(), nullable=False),
+    sa.Column('transaction_id', sa.Integer(), nullable=True),
+    sa.Column('payment_method', payment_method, nullable=False),
+    sa.Column('currency_code', sa.String(length=3), nullable=False),
+    sa.Column('quantity', sa.Integer(), nullable=False),
+    sa.Column('amount', sa.Numeric(precision=12, scale=2), nullable=False),
+    sa.Column('occurred_at', sa.DateTime(), nullable=False),
+    sa.Column('recorded_at', sa.DateTime(), nullable=False),
+    sa.ForeignKeyConstraint(['event_id'], ['event.id'], ondelete='CASCADE'),
+    sa.ForeignKeyConstraint(['ticket_id'], ['ticket.id'], ondelete='CASCADE'),
+    sa.ForeignKeyConstraint(['ticket_type_id'], ['ticket_type.id'], ondelete='CASCADE'),
+    sa.ForeignKeyConstraint(['transaction_id'], ['transaction.id'], ondelete='SET NULL'),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('kind', 'ticket_id', name='uq_sales_fact_kind_ticket')
+    )
+    with op.batch_alter_table('sales_facts', schema=None) as batch_op:
+        batch_op.create_index('idx_sales_fact_event_occurred', ['event_id', 'occurred_at'], unique=False)
+        batch_op.create_index(batch_op.f('ix_sales_facts_occurred_at'), ['occurred_at'], unique=False)
+
+    op.create_table('sales_rollups',
+    sa.Column('id', sa.BigInteger(), autoincrement=True, nullable=False),
+    sa.Column('granularity', sa.String(length=10), nullable=False),
+    sa.Column('bucket_start', sa.DateTime(), nullable=False),
+    sa.Column('event_id', sa.Integer(), nullable=False),
+    sa.Column('ticket_type_id', sa.Integer(), nullable=False),
+    sa.Column('payment_method', payment_method, nullable=False),
+    sa.Column('currency_code', sa.String(length=3), nullable=False),
+    sa.Column('tickets_sold', sa.Integer(), nullable=False),
+    sa.Column('quantity_sold', sa.Integer(), nullable=False),
+    sa.Column('revenue', sa.Numeric(precision=14, scale=2), nullable=False),
+    sa.Column('attendees', sa.Integer(), nullable=False),
+    sa.Column('updated_at', sa.DateTime(), nullable=False),
+    sa.ForeignKeyConstraint(['event_id'], ['event.id'], ondelete='CASCADE'),
+    sa.ForeignKeyConstraint(['ticket_type_id'], ['ticket_type.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('granularity', 'bucket_start', 'event_id', 'ticket_type_id', 'payment_method',
+                        'currency_code', name='uq_sales_rollup_bucket')
+    )
+    with op.batch_alter_table('sales_rollups', schema=None) as batch_op:
+        batch_op.create_index('idx_sales_rollup_event_bucket', ['event_id', 'granularity', 'bucket_start'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('sales_rollups', schema=None) as batch_op:
+        batch_op.drop_index('idx_sales_rollup_event_bucket')
+
+    op.drop_table('sales_rollups')
+    with op.batch_alter_table('sales_facts', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_sales_facts_occurred_at'))
+        batch_op.drop_index('idx_sales_fact_event_occurred')
+
+    op.drop_table('sales_facts')
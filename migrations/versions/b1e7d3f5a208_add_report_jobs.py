@@ -0,0 +1,66 @@
+"""Add report jobs
+
+Revision ID: b1e7d3f5a208
+Revises: 9d4a6c2e8f17
+Create Date: 2026-10-18 13:41:09.277351
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision = 'b1e7d3f5a208'
+down_revision = '9d4a6c2e8f17'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('report_jobs',
+    sa.Column('id', sa.String(length=32), nullable=False),
+    sa.Column('requested_by', sa.Integer(), nullable=False),
+    sa.Column('event_id', sa.Integer(), nullable=False),
+    sa.Column('ticket_type_id', sa.Integer(), nullable=True),
+    sa.Column('start_date', sa.DateTime(), nullable=False),
+    sa.Column('end_date', sa.DateTime(), nullable=False),
+    sa.Column('is_single_day', sa.Boolean(), nullable=False),
+    sa.Column('target_currency', sa.String(length=3), nullable=False),
+    sa.Column('send_email', sa.Boolean(), nullable=False),
+    sa.Column('recipient_email', sa.String(length=255), nullable=True),
+    sa.Column('dedup_key', sa.String(length=40), nullable=False),
+    sa.Column('status', sa.String(length=20), nullable=False),
+    sa.Column('progress', sa.Integer(), nullable=False),
+    sa.Column('stage', sa.String(length=50), nullable=True),
+    sa.Column('report_id', sa.Integer(), nullable=True),
+    sa.Column('pdf_path', sa.String(length=500), nullable=True),
+    sa.Column('csv_path', sa.String(length=500), nullable=True),
+    sa.Column('result', postgresql.JSONB(astext_type=sa.Text()), nullable=True),
+    sa.Column('error', sa.Text(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.Column('started_at', sa.DateTime(), nullable=True),
+    sa.Column('finished_at', sa.DateTime(), nullable=True),
+    sa.Column('updated_at', sa.DateTime(), nullable=False),
+    sa.ForeignKeyConstraint(['event_id'], ['event.id'], ondelete='CASCADE'),
+    sa.ForeignKeyConstraint(['report_id'], ['reports.id'], ondelete='SET NULL'),
+    sa.ForeignKeyConstraint(['requested_by'], ['user.id'], ),
+    sa.ForeignKeyConstraint(['ticket_type_id'], ['ticket_type.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('report_jobs', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_report_jobs_dedup_key'), ['dedup_key'], unique=False)
+        batch_op.create_index(batch_op.f('ix_report_jobs_event_id'), ['event_id'], unique=False)
+        batch_op.create_index(batch_op.f('ix_report_jobs_requested_by'), ['requested_by'], unique=False)
+        batch_op.create_index('uq_report_job_active_key', ['dedup_key'], unique=True,
+                              postgresql_where=sa.text("status IN ('queued', 'running')"))
+
+
+def downgrade():
+    with op.batch_alter_table('report_jobs', schema=None) as batch_op:
+        batch_op.drop_index('uq_report_job_active_key')
+        batch_op.drop_index(batch_op.f('ix_report_jobs_requested_by'))
+        batch_op.drop_index(batch_op.f('ix_report_jobs_event_id'))
+        batch_op.drop_index(batch_op.f('ix_report_jobs_dedup_key'))
+
+    op.drop_table('report_jobs')
@@ -0,0 +1,29 @@
+"""Add report history indexes
+
+Revision ID: c4a81e6f2b95
+Revises: 8b5f0d3e7a62
+Create Date: 2026-10-18 17:05:23.118640
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = 'c4a81e6f2b95'
+down_revision = '8b5f0d3e7a62'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('reports', schema=None) as batch_op:
+        batch_op.create_index('idx_report_organizer_event_timestamp', ['organizer_id', 'event_id', 'timestamp', 'id'], unique=False)
+        batch_op.create_index('idx_report_organizer_timestamp', ['organizer_id', 'timestamp', 'id'], unique=False)
+        batch_op.create_index('idx_report_timestamp_id', ['timestamp', 'id'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('reports', schema=None) as batch_op:
+        batch_op.drop_index('idx_report_timestamp_id')
+        batch_op.drop_index('idx_report_organizer_timestamp')
+        batch_op.drop_index('idx_report_organizer_event_timestamp')
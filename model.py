@@ -1,10 +1,8 @@
 from flask_sqlalchemy import SQLAlchemy
-from werkzeug.security import generate_password_hash, check_password_hash
 from datetime import datetime, timedelta
 import enum
 from sqlalchemy.dialects.postgresql import JSONB
 from sqlalchemy.orm import validates
-from decimal import Decimal
 
 # Initialize SQLAlchemy
 db = SQLAlchemy()
@@ -107,6 +105,18 @@ event_likes = db.Table(
 
 # ===== CORE MODELS =====
 class User(db.Model):
+    __table_args__ = (
+        # Keyset pages through the directory, optionally filtered by role (see user_directory.py)
+        db.Index('idx_user_role_id', 'role', 'id'),
+        # Trigram indexes let the directory's substring search avoid a sequential scan
+        db.Index('idx_user_full_name_trgm', 'full_name', postgresql_using='gin',
+                 postgresql_ops={'full_name': 'gin_trgm_ops'}),
+        db.Index('idx_user_email_trgm', 'email', postgresql_using='gin',
+                 postgresql_ops={'email': 'gin_trgm_ops'}),
+        db.Index('idx_user_phone_number_trgm', 'phone_number', postgresql_using='gin',
+                 postgresql_ops={'phone_number': 'gin_trgm_ops'}),
+    )
+
     id = db.Column(db.Integer, primary_key=True, autoincrement=True)
     email = db.Column(db.String(255), nullable=False, unique=True)
     password = db.Column(db.String(255))
@@ -120,6 +130,8 @@ class User(db.Model):
     ai_enabled = db.Column(db.Boolean, default=True)
     ai_language_preference = db.Column(db.String(10), default='en')
     ai_notification_preference = db.Column(db.Boolean, default=True)
+    # Bumped on role changes; tokens carry it as the `ver` claim (see principal.py)
+    token_version = db.Column(db.Integer, nullable=False, default=0, server_default='0')
     # Relationships
     tickets = db.relationship('Ticket', backref='buyer', lazy=True)
     transactions = db.relationship('Transaction', back_populates='user', lazy=True)
@@ -134,10 +146,12 @@ class User(db.Model):
     ai_feedback = db.relationship('AIFeedback', backref='user', lazy=True, cascade="all, delete")
 
     def set_password(self, password):
-        self.password = generate_password_hash(password)
+        from credentials import credentials  # credentials imports model
+        self.password = credentials.hash_password(password)
 
     def check_password(self, password):
-        return check_password_hash(self.password, password)
+        from credentials import credentials
+        return credentials.verify(self.password, password)
 
     def as_dict(self):
         return {
@@ -210,6 +224,25 @@ class ExchangeRate(db.Model):
             "effective_date": self.effective_date.isoformat()
         }
 
+class ExchangeRateSnapshot(db.Model):
+    """Immutable KES-based rates used to convert reports; the id is a hash of the rates"""
+    __tablename__ = 'exchange_rate_snapshots'
+
+    id = db.Column(db.String(64), primary_key=True)
+    base_currency = db.Column(db.String(3), nullable=False, default='KES')
+    rates = db.Column(JSONB, nullable=False)  # {code: [kes_to_usd, usd_to_code]} as decimal strings
+    source = db.Column(db.String(100), nullable=True)
+    captured_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+
+    def as_dict(self):
+        return {
+            "id": self.id,
+            "base_currency": self.base_currency,
+            "rates": self.rates,
+            "source": self.source,
+            "captured_at": self.captured_at.isoformat()
+        }
+
 class Organizer(db.Model):
     id = db.Column(db.Integer, primary_key=True, autoincrement=True)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False, unique=True)
@@ -279,8 +312,9 @@ class Category(db.Model):
             raise ValueError(f"{key} must be between 0 and 1")
         return value
 
-    def as_dict(self):
-        return {
+    def as_dict(self, snapshot=None):
+        """Serialize the category; pass its analytics snapshot to avoid loading events"""
+        data = {
             "id": self.id,
             "name": self.name,
             "description": self.description,
@@ -288,13 +322,28 @@ class Category(db.Model):
             "ai_suggested_keywords": self.ai_suggested_keywords,
             "popularity_score": self.popularity_score,
             "trending_score": self.trending_score,
-            "events_count": len(self.events),
+            "events_count": snapshot.total_events if snapshot else len(self.events),
             "created_at": self.created_at.isoformat(),
             "updated_at": self.updated_at.isoformat()
         }
+        if snapshot:
+            data.update({
+                "popularity_score": snapshot.popularity_score,
+                "trending_score": snapshot.trending_score,
+                "active_events_count": snapshot.active_events,
+                "total_tickets_sold": snapshot.total_tickets_sold,
+                "analytics_computed_at": snapshot.computed_at.isoformat() if snapshot.computed_at else None
+            })
+        return data
     
     def get_trending_events(self, limit=10):
-        """Get trending events in this category"""
+        """Get trending events in this category (from the analytics snapshot when available)"""
+        snapshot = CategoryAnalyticsSnapshot.query.get(self.id)
+        if snapshot and snapshot.trending_events:
+            event_ids = [entry['event_id'] for entry in snapshot.trending_events[:limit]]
+            events = {e.id: e for e in Event.query.filter(Event.id.in_(event_ids)).all()}
+            return [events[event_id] for event_id in event_ids if event_id in events]
+
         return Event.query.filter_by(
             category_id=self.id
         ).order_by(Event.date.desc()).limit(limit).all()
@@ -302,6 +351,11 @@ class Category(db.Model):
     def calculate_popularity(self):
         """Calculate popularity based on events and engagement"""
         from sqlalchemy import func
+
+        # Served from the scheduled analytics job when it has run
+        snapshot = CategoryAnalyticsSnapshot.query.get(self.id)
+        if snapshot:
+            return snapshot.popularity_score
         
         # Count active future events
         active_events = Event.query.filter(
@@ -319,6 +373,41 @@ class Category(db.Model):
         db.session.commit()
         return self.popularity_score
 
+class CategoryAnalyticsSnapshot(db.Model):
+    """Per-category popularity, trending and sales totals computed by the analytics job"""
+    __tablename__ = 'category_analytics_snapshots'
+
+    category_id = db.Column(db.Integer, db.ForeignKey('category.id', ondelete='CASCADE'), primary_key=True)
+    total_events = db.Column(db.Integer, nullable=False, default=0)
+    active_events = db.Column(db.Integer, nullable=False, default=0)
+    total_tickets_sold = db.Column(db.Integer, nullable=False, default=0)
+    recent_tickets_sold = db.Column(db.Integer, nullable=False, default=0)
+    total_likes = db.Column(db.Integer, nullable=False, default=0)
+    popularity_score = db.Column(db.Float, nullable=False, default=0.0)
+    trending_score = db.Column(db.Float, nullable=False, default=0.0)
+    # Format: [{"event_id": 1, "name": "...", "recent_tickets_sold": 10, "likes": 3, "score": 0.8}]
+    trending_events = db.Column(JSONB, nullable=True)
+    window_days = db.Column(db.Integer, nullable=False, default=7)
+    computed_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False)
+
+    category = db.relationship('Category', backref=db.backref('analytics_snapshot', uselist=False, passive_deletes=True))
+
+    def as_dict(self):
+        return {
+            "category_id": self.category_id,
+            "total_events": self.total_events,
+            "active_events": self.active_events,
+            "total_tickets_sold": self.total_tickets_sold,
+            "recent_tickets_sold": self.recent_tickets_sold,
+            "total_likes": self.total_likes,
+            "popularity_score": self.popularity_score,
+            "trending_score": self.trending_score,
+            "trending_events": self.trending_events or [],
+            "window_days": self.window_days,
+            "computed_at": self.computed_at.isoformat() if self.computed_at else None
+        }
+
 class AICategoryInsight(db.Model):
     """AI-generated insights specific to categories"""
     __tablename__ = 'ai_category_insights'
@@ -385,6 +474,7 @@ class Partner(db.Model):
     company_name = db.Column(db.String(255), nullable=False)
     company_description = db.Column(db.Text, nullable=True)
     logo_url = db.Column(db.String(500), nullable=True)
+    logo_thumbnail_url = db.Column(db.String(500), nullable=True)
     website_url = db.Column(db.String(500), nullable=True)
     contact_email = db.Column(db.String(255), nullable=True)
     contact_person = db.Column(db.String(255), nullable=True)
@@ -435,6 +525,7 @@ class Partner(db.Model):
             "organizer_id": self.organizer_id,
             "company_name": self.company_name,
             "logo_url": self.logo_url,
+            "logo_thumbnail_url": self.logo_thumbnail_url,
             "website_url": self.website_url,
             "total_collaborations": len([c for c in self.collaborations if c.is_active]),
             "ai_partnership_score": self.ai_partnership_score,
@@ -1091,6 +1182,7 @@ class Event(db.Model):
     location = db.Column(db.Text, nullable=False)
     amenities = db.Column(db.JSON, nullable=True)
     image = db.Column(db.String(255), nullable=True)
+    image_thumbnail = db.Column(db.String(255), nullable=True)
     organizer_id = db.Column(db.Integer, db.ForeignKey('organizer.id'), nullable=False)
     featured = db.Column(db.Boolean, default=False, nullable=False)
     category_id = db.Column(db.Integer, db.ForeignKey('category.id'), nullable=True)
@@ -1613,15 +1705,11 @@ class TicketType(db.Model):
         if self.currency_id == target_currency_id:
             return self.price
 
-        rate = ExchangeRate.query.filter_by(
-            from_currency_id=self.currency_id,
-            to_currency_id=target_currency_id,
-            is_active=True
-        ).order_by(ExchangeRate.effective_date.desc()).first()
-
-        if rate:
-            return self.price * rate.rate
-        return self.price
+        from exchange_rates import exchange_rates  # imports this module
+        try:
+            return exchange_rates.matrix().convert(self.price, self.currency_id, target_currency_id)
+        except KeyError:
+            return self.price
 
     def as_dict(self):
         return {
@@ -1649,6 +1737,8 @@ class Report(db.Model):
     total_tickets_sold = db.Column(db.Integer, nullable=False, default=0)
     number_of_attendees = db.Column(db.Integer, nullable=True, default=0)
     report_data = db.Column(JSONB, nullable=False, default=dict)
+    # Exchange rate snapshot the report's figures were converted with (see rate_snapshot.py)
+    rate_snapshot_id = db.Column(db.String(64), nullable=True, index=True)
     timestamp = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
     report_date = db.Column(db.Date, nullable=True)
     # AI-generated insights
@@ -1661,6 +1751,13 @@ class Report(db.Model):
     converted_currency = db.relationship('Currency', foreign_keys=[converted_currency_id], backref='converted_reports', lazy=True)
     generating_action = db.relationship('AIActionLog', foreign_keys=[generated_by_ai_action_id], backref='generated_reports')
 
+    __table_args__ = (
+        # Keyset pagination of report history on (timestamp, id), newest first
+        db.Index('idx_report_organizer_event_timestamp', 'organizer_id', 'event_id', 'timestamp', 'id'),
+        db.Index('idx_report_organizer_timestamp', 'organizer_id', 'timestamp', 'id'),
+        db.Index('idx_report_timestamp_id', 'timestamp', 'id'),
+    )
+
     def as_dict(self):
         return {
             "id": self.id,
@@ -1670,6 +1767,98 @@ class Report(db.Model):
             "ai_insights": self.ai_insights
         }
 
+class ReportJob(db.Model):
+    """Background report generation request with progress and produced artifacts"""
+    __tablename__ = 'report_jobs'
+
+    id = db.Column(db.String(32), primary_key=True)
+    requested_by = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False, index=True)
+    event_id = db.Column(db.Integer, db.ForeignKey('event.id', ondelete='CASCADE'), nullable=False, index=True)
+    ticket_type_id = db.Column(db.Integer, db.ForeignKey('ticket_type.id'), nullable=True)
+    start_date = db.Column(db.DateTime, nullable=False)
+    end_date = db.Column(db.DateTime, nullable=False)
+    is_single_day = db.Column(db.Boolean, default=False, nullable=False)
+    target_currency = db.Column(db.String(3), nullable=False, default='KES')
+    send_email = db.Column(db.Boolean, default=False, nullable=False)
+    recipient_email = db.Column(db.String(255), nullable=True)
+    # sha1 of (event, range, ticket type, currency); unique among active jobs
+    dedup_key = db.Column(db.String(40), nullable=False, index=True)
+    status = db.Column(db.String(20), nullable=False, default='queued')  # queued, running, completed, failed
+    progress = db.Column(db.Integer, nullable=False, default=0)
+    stage = db.Column(db.String(50), nullable=True)
+    report_id = db.Column(db.Integer, db.ForeignKey('reports.id', ondelete='SET NULL'), nullable=True)
+    pdf_path = db.Column(db.String(500), nullable=True)
+    csv_path = db.Column(db.String(500), nullable=True)
+    result = db.Column(JSONB, nullable=True)
+    error = db.Column(db.Text, nullable=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    started_at = db.Column(db.DateTime, nullable=True)
+    finished_at = db.Column(db.DateTime, nullable=True)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False)
+
+    __table_args__ = (
+        # Cross-worker dedup: only one queued/running job per key
+        db.Index('uq_report_job_active_key', 'dedup_key', unique=True,
+                 postgresql_where=db.text("status IN ('queued', 'running')")),
+    )
+
+    @property
+    def is_finished(self):
+        return self.status in ('completed', 'failed')
+
+    def as_dict(self):
+        return {
+            "job_id": self.id,
+            "event_id": self.event_id,
+            "status": self.status,
+            "progress": self.progress,
+            "stage": self.stage,
+            "report_id": self.report_id,
+            "target_currency": self.target_currency,
+            "start_date": self.start_date.isoformat(),
+            "end_date": self.end_date.isoformat(),
+            "error": self.error,
+            "created_at": self.created_at.isoformat() if self.created_at else None,
+            "started_at": self.started_at.isoformat() if self.started_at else None,
+            "finished_at": self.finished_at.isoformat() if self.finished_at else None
+        }
+
+class ReportSubscription(db.Model):
+    """Daily/weekly report an organizer wants pre-generated for an event by the off-peak batch"""
+    __tablename__ = 'report_subscriptions'
+
+    id = db.Column(db.Integer, primary_key=True, autoincrement=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id', ondelete='CASCADE'), nullable=False, index=True)
+    event_id = db.Column(db.Integer, db.ForeignKey('event.id', ondelete='CASCADE'), nullable=False, index=True)
+    frequency = db.Column(db.String(10), nullable=False)  # daily, weekly
+    target_currency = db.Column(db.String(3), nullable=False, default='KES')
+    is_active = db.Column(db.Boolean, default=True, nullable=False)
+    next_run_at = db.Column(db.DateTime, nullable=False, index=True)
+    last_run_at = db.Column(db.DateTime, nullable=True)
+    last_report_id = db.Column(db.Integer, db.ForeignKey('reports.id', ondelete='SET NULL'), nullable=True)
+    last_error = db.Column(db.Text, nullable=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False)
+
+    last_report = db.relationship('Report', foreign_keys=[last_report_id], lazy=True)
+
+    __table_args__ = (
+        db.UniqueConstraint('user_id', 'event_id', 'frequency', name='uq_report_subscription'),
+    )
+
+    def as_dict(self):
+        return {
+            "id": self.id,
+            "event_id": self.event_id,
+            "frequency": self.frequency,
+            "target_currency": self.target_currency,
+            "is_active": self.is_active,
+            "next_run_at": self.next_run_at.isoformat(),
+            "last_run_at": self.last_run_at.isoformat() if self.last_run_at else None,
+            "last_report_id": self.last_report_id,
+            "last_error": self.last_error
+        }
+
 class Ticket(db.Model):
     id = db.Column(db.Integer, primary_key=True, autoincrement=True)
     phone_number = db.Column(db.String(255), nullable=True)
@@ -1692,6 +1881,11 @@ class Ticket(db.Model):
     ai_actions = db.relationship('AIActionLog', backref='ticket', lazy=True,
                                 foreign_keys='AIActionLog.ticket_id')
 
+    __table_args__ = (
+        # Event report aggregation filters on all three columns
+        db.Index('idx_ticket_event_status_purchase', 'event_id', 'payment_status', 'purchase_date'),
+    )
+
     @property
     def total_price(self):
         ticket_type = TicketType.query.get(self.ticket_type_id)
@@ -1747,7 +1941,7 @@ class Transaction(db.Model):
 
 class Scan(db.Model):
     id = db.Column(db.Integer, primary_key=True, autoincrement=True)
-    ticket_id = db.Column(db.Integer, db.ForeignKey('ticket.id'), nullable=False)
+    ticket_id = db.Column(db.Integer, db.ForeignKey('ticket.id'), nullable=False, index=True)
     scanned_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
     scanned_by = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
 
@@ -1758,6 +1952,150 @@ class Scan(db.Model):
             "scanned_at": self.scanned_at.isoformat()
         }
 
+class SalesFact(db.Model):
+    """Append-only sale and attendance events; source of truth for sales_rollups"""
+    __tablename__ = 'sales_facts'
+
+    id = db.Column(db.BigInteger, primary_key=True, autoincrement=True)
+    kind = db.Column(db.String(20), nullable=False)  # 'sale' or 'attendance'
+    ticket_id = db.Column(db.Integer, db.ForeignKey('ticket.id', ondelete='CASCADE'), nullable=False)
+    event_id = db.Column(db.Integer, db.ForeignKey('event.id', ondelete='CASCADE'), nullable=False)
+    ticket_type_id = db.Column(db.Integer, db.ForeignKey('ticket_type.id', ondelete='CASCADE'), nullable=False)
+    transaction_id = db.Column(db.Integer, db.ForeignKey('transaction.id', ondelete='SET NULL'), nullable=True)
+    payment_method = db.Column(db.Enum(PaymentMethod), nullable=False)
+    currency_code = db.Column(db.String(3), nullable=False, default='KES')
+    quantity = db.Column(db.Integer, nullable=False, default=1)
+    amount = db.Column(db.Numeric(12, 2), nullable=False, default=0)
+    occurred_at = db.Column(db.DateTime, nullable=False, index=True)
+    recorded_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+
+    __table_args__ = (
+        # One sale and one attendance fact per ticket keeps writes and backfills idempotent
+        db.UniqueConstraint('kind', 'ticket_id', name='uq_sales_fact_kind_ticket'),
+        db.Index('idx_sales_fact_event_occurred', 'event_id', 'occurred_at'),
+    )
+
+class SalesRollup(db.Model):
+    """Hourly/daily sales and attendance per (event, ticket type, payment method, currency)"""
+    __tablename__ = 'sales_rollups'
+
+    id = db.Column(db.BigInteger, primary_key=True, autoincrement=True)
+    granularity = db.Column(db.String(10), nullable=False)  # 'hour' or 'day'
+    bucket_start = db.Column(db.DateTime, nullable=False)
+    event_id = db.Column(db.Integer, db.ForeignKey('event.id', ondelete='CASCADE'), nullable=False)
+    ticket_type_id = db.Column(db.Integer, db.ForeignKey('ticket_type.id', ondelete='CASCADE'), nullable=False)
+    payment_method = db.Column(db.Enum(PaymentMethod), nullable=False)
+    currency_code = db.Column(db.String(3), nullable=False, default='KES')
+    tickets_sold = db.Column(db.Integer, nullable=False, default=0)
+    quantity_sold = db.Column(db.Integer, nullable=False, default=0)
+    revenue = db.Column(db.Numeric(14, 2), nullable=False, default=0)
+    attendees = db.Column(db.Integer, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False)
+
+    __table_args__ = (
+        db.UniqueConstraint('granularity', 'bucket_start', 'event_id', 'ticket_type_id', 'payment_method',
+                            'currency_code', name='uq_sales_rollup_bucket'),
+        db.Index('idx_sales_rollup_event_bucket', 'event_id', 'granularity', 'bucket_start'),
+    )
+
+    def as_dict(self):
+        return {
+            "granularity": self.granularity,
+            "bucket_start": self.bucket_start.isoformat(),
+            "event_id": self.event_id,
+            "ticket_type_id": self.ticket_type_id,
+            "payment_method": self.payment_method.value,
+            "currency_code": self.currency_code,
+            "tickets_sold": self.tickets_sold,
+            "quantity_sold": self.quantity_sold,
+            "revenue": float(self.revenue),
+            "attendees": self.attendees
+        }
+
+
+class AdminEventMetrics(db.Model):
+    """Per-event sales totals for the admin dashboards, refreshed by the admin analytics job"""
+    __tablename__ = 'admin_event_metrics'
+
+    event_id = db.Column(db.Integer, db.ForeignKey('event.id', ondelete='CASCADE'), primary_key=True)
+    organizer_id = db.Column(db.Integer, db.ForeignKey('organizer.id', ondelete='CASCADE'), nullable=False, index=True)
+    tickets_sold = db.Column(db.Integer, nullable=False, default=0)
+    revenue = db.Column(db.Numeric(14, 2), nullable=False, default=0)  # KES
+    attendees = db.Column(db.Integer, nullable=False, default=0)
+    computed_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+
+
+class AdminOrganizerMetrics(db.Model):
+    """Per-organizer sales totals for the admin dashboards, refreshed by the admin analytics job"""
+    __tablename__ = 'admin_organizer_metrics'
+
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id', ondelete='CASCADE'), primary_key=True)
+    event_count = db.Column(db.Integer, nullable=False, default=0)
+    total_tickets_sold = db.Column(db.Integer, nullable=False, default=0)
+    total_revenue = db.Column(db.Numeric(14, 2), nullable=False, default=0, index=True)  # KES
+    total_attendees = db.Column(db.Integer, nullable=False, default=0)
+    computed_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+
+
+class OrganizerStats(db.Model):
+    """Per-organizer dashboard counters; refreshed by the stats job and bumped on event creation and sales"""
+    __tablename__ = 'organizer_stats'
+
+    organizer_id = db.Column(db.Integer, db.ForeignKey('organizer.id', ondelete='CASCADE'), primary_key=True)
+    event_count = db.Column(db.Integer, nullable=False, default=0)
+    upcoming_events = db.Column(db.Integer, nullable=False, default=0)
+    revenue = db.Column(db.Numeric(14, 2), nullable=False, default=0)
+    computed_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False)
+
+
+class StatsSnapshot(db.Model):
+    """Dashboard statistics computed by the stats engine, shared by all workers"""
+    __tablename__ = 'stats_snapshots'
+
+    key = db.Column(db.String(100), primary_key=True)
+    data = db.Column(JSONB, nullable=False)
+    computed_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+
+
+class RateLimitBucket(db.Model):
+    """Token bucket for one rate limit key, shared by all workers (see rate_limits.py)"""
+    __tablename__ = 'rate_limit_buckets'
+
+    key = db.Column(db.String(255), primary_key=True)
+    tokens = db.Column(db.Float, nullable=False)
+    allowed = db.Column(db.Boolean, nullable=False, default=True)  # outcome of the last take
+    updated_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow, index=True)
+
+
+class ServerSession(db.Model):
+    """Server-side Flask session, keyed by the id in the session cookie (see session_store.py)"""
+    __tablename__ = 'server_sessions'
+
+    sid = db.Column(db.String(64), primary_key=True)
+    data = db.Column(db.Text, nullable=False)
+    expires_at = db.Column(db.DateTime, nullable=False, index=True)
+
+
+class OutboundEmail(db.Model):
+    """Queued outgoing email as raw MIME, sent in batches by the mail dispatcher (see mail_dispatcher.py)"""
+    __tablename__ = 'outbound_emails'
+    __table_args__ = (
+        db.Index('idx_outbound_email_status_next_attempt', 'status', 'next_attempt_at'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True, autoincrement=True)
+    sender = db.Column(db.String(255), nullable=False)
+    recipients = db.Column(db.JSON, nullable=False)
+    subject = db.Column(db.String(255))
+    message = db.Column(db.LargeBinary)  # cleared once sent
+    status = db.Column(db.String(20), nullable=False, default='queued')  # queued | sending | sent | failed
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    next_attempt_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    last_error = db.Column(db.Text)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    sent_at = db.Column(db.DateTime)
+
 # ===== AI-SPECIFIC MODELS =====
 class AIConversation(db.Model):
     """Stores AI chat conversations for context and history"""
@@ -2577,32 +2915,14 @@ class CurrencyConverter:
         if from_currency_id == to_currency_id:
             return amount
 
-        rate = ExchangeRate.query.filter_by(
-            from_currency_id=from_currency_id,
-            to_currency_id=to_currency_id,
-            is_active=True
-        ).order_by(ExchangeRate.effective_date.desc()).first()
-
-        if rate:
-            return Decimal(str(amount)) * rate.rate
-        return amount
+        from exchange_rates import exchange_rates  # imports this module
+        try:
+            return exchange_rates.matrix().convert(amount, from_currency_id, to_currency_id)
+        except KeyError:
+            return amount
 
     @staticmethod
-    def update_exchange_rate(from_currency_id, to_currency_id, new_rate, source="API"):
-        ExchangeRate.query.filter_by(
-            from_currency_id=from_currency_id,
-            to_currency_id=to_currency_id,
-            is_active=True
-        ).update({'is_active': False})
-
-        new_exchange_rate = ExchangeRate(
-            from_currency_id=from_currency_id,
-            to_currency_id=to_currency_id,
-            rate=Decimal(str(new_rate)),
-            source=source,
-            is_active=True
-        )
-
-        db.session.add(new_exchange_rate)
-        db.session.commit()
-        return new_exchange_rate
\ No newline at end of file
+    def update_exchange_rate(from_currency_id, to_currency_id, new_rate, source="manual"):
+        """Override a USD rate (either direction); see ExchangeRateService.set_rate"""
+        from exchange_rates import exchange_rates
+        return exchange_rates.set_rate(from_currency_id, to_currency_id, new_rate, source)
\ No newline at end of file
@@ -10,6 +10,7 @@ from dotenv import load_dotenv
 import os
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from config import Config
+from rate_limits import quotas
 # from ticket import complete_ticket_operation
 # Load environment variables from .env file
 load_dotenv()
@@ -79,6 +80,14 @@ class STKPush(Resource):
         if not phone_number or not amount or not transaction_id:
             return {"error": "Phone number, amount, and transaction_id are required"}, 400
 
+        # Each push rings the customer's phone; cap them per number across all workers
+        quota = quotas.consume('mpesa:stk_push', phone_number, Config.MPESA_STK_RATE_LIMIT)
+        if not quota.allowed:
+            return {
+                "error": "Too many payment requests for this phone number. Please wait and try again.",
+                "retry_after": int(quota.headers['Retry-After'])
+            }, 429
+
         # Get access token for M-Pesa API
         access_token = get_access_token()
         headers = {
@@ -0,0 +1,183 @@
+"""
+Rendered report artifact store.
+
+A report's PDF/CSV is determined by its `report_data`, its rate snapshot,
+the currency and the template version. Reports regenerated on the same day
+are updated in place, so the ref key includes a digest of the report data
+and snapshot id: an updated report simply misses and is rendered again. The
+first export writes the bytes to `objects/<sha256 of content>`; a ref named
+by the hash of (report id, content digest, format, currency, template
+version) points at it. Later
+downloads are served from disk with the content hash as a strong ETag, so
+conditional and Range requests work. Least-recently-served objects are
+evicted once the store grows past REPORT_ARTIFACT_MAX_BYTES.
+"""
+import os
+import json
+import hashlib
+import logging
+import tempfile
+from dataclasses import dataclass
+from threading import Lock
+from typing import Any, Optional
+
+from flask import send_file
+
+logger = logging.getLogger(__name__)
+
+MIMETYPES = {'pdf': 'application/pdf', 'csv': 'text/csv'}
+
+
+@dataclass
+class Artifact:
+    path: str
+    etag: str
+    size: int
+
+
+class ArtifactStore:
+    """Content-addressed filesystem cache for rendered report files"""
+
+    # Eviction trims down to this fraction of the limit so it doesn't run on every write
+    LOW_WATERMARK = 0.9
+
+    def __init__(self):
+        self.root = None
+        self.max_bytes = 0
+        self._lock = Lock()
+
+    def init_app(self, app):
+        app.config.setdefault('REPORT_ARTIFACT_DIR', os.path.join(tempfile.gettempdir(), 'report_artifacts'))
+        app.config.setdefault('REPORT_ARTIFACT_MAX_BYTES', 512 * 1024 * 1024)
+        self.root = app.config['REPORT_ARTIFACT_DIR']
+        self.max_bytes = app.config['REPORT_ARTIFACT_MAX_BYTES']
+        os.makedirs(os.path.join(self.root, 'objects'), exist_ok=True)
+        os.makedirs(os.path.join(self.root, 'refs'), exist_ok=True)
+
+    @staticmethod
+    def content_digest(report_data: Any, rate_snapshot_id: Optional[str]) -> str:
+        """Digest of what a rendered file depends on; changes whenever the report is regenerated"""
+        raw = json.dumps(report_data, sort_keys=True, default=str) + f"|{rate_snapshot_id or ''}"
+        return hashlib.sha256(raw.encode()).hexdigest()
+
+    @staticmethod
+    def artifact_key(report_id: int, digest: str, format_type: str, currency: str, template_version: int) -> str:
+        raw = f"{report_id}|{digest}|{format_type}|{(currency or 'KES').upper()}|v{template_version}"
+        return hashlib.sha256(raw.encode()).hexdigest()
+
+    def _ref_path(self, key: str) -> str:
+        return os.path.join(self.root, 'refs', key)
+
+    def _object_path(self, name: str) -> str:
+        return os.path.join(self.root, 'objects', name)
+
+    @staticmethod
+    def _write_atomic(path: str, content: bytes) -> None:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix='.tmp_')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(content)
+            os.replace(tmp_path, path)
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    # ===== LOOKUP / STORE =====
+    def get(self, report_id: int, digest: str, format_type: str, currency: str,
+            template_version: int) -> Optional[Artifact]:
+        key = self.artifact_key(report_id, digest, format_type, currency, template_version)
+        try:
+            with open(self._ref_path(key)) as f:
+                name = f.read().strip()
+            path = self._object_path(name)
+            size = os.path.getsize(path)
+            os.utime(path)  # mark as recently served for LRU eviction
+        except FileNotFoundError:
+            return None
+        return Artifact(path=path, etag=os.path.basename(name).split('.')[0], size=size)
+
+    def put(self, report_id: int, digest: str, format_type: str, currency: str, template_version: int,
+            content: bytes) -> Artifact:
+        digest = hashlib.sha256(content).hexdigest()
+        name = os.path.join(digest[:2], f"{digest}.{format_type}")
+        path = self._object_path(name)
+        if not os.path.exists(path):
+            self._write_atomic(path, content)
+        else:
+            os.utime(path)
+        self._write_atomic(
+            self._ref_path(self.artifact_key(report_id, digest, format_type, currency, template_version)),
+            name.encode()
+        )
+        logger.info(f"Stored {format_type} artifact for report {report_id} ({currency}): {len(content)} bytes")
+        self.evict()
+        return Artifact(path=path, etag=digest, size=len(content))
+
+    # ===== EVICTION =====
+    def evict(self) -> int:
+        """Drop least-recently-served objects until the store fits; returns bytes freed"""
+        with self._lock:
+            objects = []
+            for dirpath, _, filenames in os.walk(self._object_path('')):
+                for filename in filenames:
+                    if filename.startswith('.tmp_'):
+                        continue
+                    path = os.path.join(dirpath, filename)
+                    try:
+                        stat = os.stat(path)
+                    except FileNotFoundError:
+                        continue
+                    objects.append((stat.st_mtime, stat.st_size, path))
+
+            total = sum(size for _, size, _ in objects)
+            if total <= self.max_bytes:
+                return 0
+
+            target = self.max_bytes * self.LOW_WATERMARK
+            freed = 0
+            for _, size, path in sorted(objects):
+                if total - freed <= target:
+                    break
+                try:
+                    os.remove(path)
+                    freed += size
+                except FileNotFoundError:
+                    pass
+
+            self._remove_dangling_refs()
+            logger.info(f"Report artifact store evicted {freed} bytes ({total - freed} bytes remain)")
+            return freed
+
+    def _remove_dangling_refs(self) -> None:
+        refs_dir = self._ref_path('')
+        for key in os.listdir(refs_dir):
+            ref_path = os.path.join(refs_dir, key)
+            try:
+                with open(ref_path) as f:
+                    name = f.read().strip()
+                if not os.path.exists(self._object_path(name)):
+                    os.remove(ref_path)
+            except (FileNotFoundError, IsADirectoryError):
+                continue
+
+    # ===== SERVING =====
+    @staticmethod
+    def send(artifact: Artifact, format_type: str, download_name: str):
+        """Attachment response with a strong ETag; answers If-None-Match with 304 and Range with 206"""
+        response = send_file(
+            artifact.path,
+            mimetype=MIMETYPES[format_type],
+            as_attachment=True,
+            download_name=download_name,
+            conditional=True,
+            etag=artifact.etag
+        )
+        response.cache_control.private = True
+        response.cache_control.no_cache = True  # revalidate with the ETag instead of re-downloading
+        return response
+
+
+# Initialize globally — must be attached via artifact_store.init_app(app)
+artifact_store = ArtifactStore()
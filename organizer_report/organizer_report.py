@@ -2,13 +2,20 @@ from flask import request, jsonify, send_file, current_app, after_this_request,
 
 from flask_restful import Resource
 from flask_jwt_extended import jwt_required, get_jwt_identity
-from model import db, Event, User, Report, Organizer, Currency, UserRole, Ticket, Transaction, CurrencyCode, TicketType ,Scan
+from model import db, Event, User, Report, Organizer, Currency, UserRole, Transaction, CurrencyCode, Scan, ReportSubscription
 from .services import ReportService, DatabaseQueryService
+from .report_jobs import report_jobs
+from .report_schedules import report_schedules, FREQUENCIES
 from .utils import DateUtils, DateValidator, AuthorizationMixin
 from .report_generators import ReportConfig, PDFReportGenerator, CSVReportGenerator, ChartGenerator # Import ChartGenerator
-from currency_routes import convert_ksh_to_target_currency
+from sales_facts import sales_facts
+from csv_export import csv_response, iter_csv, ticket_rows, attendee_rows
+from .artifact_store import artifact_store, MIMETYPES
+from .report_queries import ReportIndexQuery
+from rate_snapshot import rate_snapshots
+from principal import current_principal
 
-from sqlalchemy import func, cast, String, or_
+from sqlalchemy import or_
 
 from reportlab.lib.pagesizes import A4
 import logging
@@ -16,8 +23,7 @@ from typing import Optional, Dict, Any, Union, List, Tuple
 from datetime import datetime, timedelta, time as dt_time
 import os
 import tempfile
-import threading
-from decimal import Decimal
+from io import BytesIO
 import matplotlib.pyplot as plt # Import matplotlib
 from contextlib import contextmanager # Import contextmanager
 import time  # Fix: Import time for time.time()
@@ -30,7 +36,6 @@ class GenerateReportResource(Resource):
     @jwt_required()
     def post(self):
         try:
-            start_time = datetime.now()
             current_user_id = get_jwt_identity()
             current_user = User.query.get(current_user_id)
             if not current_user:
@@ -94,278 +99,121 @@ class GenerateReportResource(Resource):
                     return {'error': f'Invalid target currency code "{target_currency_code}"'}, 400
             else:
                 target_currency_code = 'KES'
-                target_currency = Currency.query.filter_by(
-                    code=CurrencyCode('KES'),
-                    is_active=True
-                ).first()
-
-            config = ReportConfig(include_email=send_email)
-            report_service = ReportService(config)
-            result = report_service.generate_complete_report(
+
+            job, created = report_jobs.enqueue(
+                requested_by=current_user_id,
                 event_id=event_id,
-                organizer_id=current_user_id,
                 start_date=start_date,
                 end_date=end_date,
-                session=db.session,
                 ticket_type_id=ticket_type_id,
-                target_currency_code='KES',
-                send_email=False,
+                target_currency=target_currency_code,
+                is_single_day=bool(specific_date_str),
+                send_email=bool(send_email),
                 recipient_email=recipient_email
             )
 
-            if not result['success']:
-                logger.error(f"GenerateReportResource: Failed to generate report data for event {event_id}: {result.get('error')}")
-                return {'error': result.get('error', 'Failed to generate report')}, 500
-
-            report_id = result.get('database_id')
-            if not report_id:
-                logger.error(f"GenerateReportResource: Report data generated successfully but no database_id returned for event {event_id}.")
-                return {'error': 'Report generated but could not retrieve ID'}, 500
-
-            report_data = result.get('report_data', {})
-            total_revenue_ksh = report_data.get('total_revenue', 0)
-            total_tickets_sold = report_data.get('total_tickets_sold', 0)
-
-            actual_attendee_count = report_data.get('attendee_count', 0)
-            if actual_attendee_count == 0:
-                actual_attendee_count = report_data.get('number_of_attendees', 0)
-                if actual_attendee_count == 0:
-                    actual_attendee_count = report_data.get('total_attendees', 0)
-
-            logger.info(f"GenerateReportResource: Extracted attendee count from report data: {actual_attendee_count}")
-            logger.info(f"GenerateReportResource: Available report data keys: {list(report_data.keys())}")
-
-            base_currency = 'KES'
-            converted_amount = Decimal(str(total_revenue_ksh))
-            ksh_to_usd_rate = Decimal('1')
-            usd_to_target_rate = Decimal('1')
-            overall_conversion_rate = Decimal('1')
-
-            try:
-                if target_currency_code != 'KES' and total_revenue_ksh > 0:
-                    logger.info(f"GenerateReportResource: Converting {total_revenue_ksh} KES to {target_currency_code}")
-                    converted_amount, ksh_to_usd_rate, usd_to_target_rate = convert_ksh_to_target_currency(
-                        total_revenue_ksh,
-                        target_currency_code
-                    )
-                    overall_conversion_rate = ksh_to_usd_rate * usd_to_target_rate
-                    logger.info(f"GenerateReportResource: Conversion successful - {total_revenue_ksh} KES = {converted_amount} {target_currency_code}")
-                else:
-                    converted_amount = Decimal(str(total_revenue_ksh))
-                    logger.info(f"GenerateReportResource: No conversion needed - amount stays {total_revenue_ksh} KES")
-            except Exception as e:
-                logger.warning(f"GenerateReportResource: Currency conversion failed for {target_currency_code}: {str(e)}")
-                converted_amount = Decimal(str(total_revenue_ksh))
-                target_currency_code = 'KES'
-
-            # ===== NEW: EXTRACT AND PROCESS CHART DATA =====
-            def convert_chart_data_currency(data_dict, conversion_func):
-                """Helper function to convert currency values in chart data"""
-                converted_dict = {}
-                for key, value in data_dict.items():
-                    if isinstance(value, (int, float)) and value > 0:
-                        try:
-                            converted_value, _, _ = conversion_func(float(value), target_currency_code)
-                            converted_dict[key] = float(converted_value.quantize(Decimal('0.01')))
-                        except Exception as e:
-                            logger.warning(f"Failed to convert {key} value {value}: {e}")
-                            converted_dict[key] = float(value)
-                    else:
-                        converted_dict[key] = value
-                return converted_dict
-
-            # Extract chart data from report_data
-            tickets_sold_by_type = report_data.get('tickets_sold_by_type', {})
-            revenue_by_ticket_type = report_data.get('revenue_by_ticket_type', {})
-            attendees_by_ticket_type = report_data.get('attendees_by_ticket_type', {})
-            payment_method_usage = report_data.get('payment_method_usage', {})
-            
-            # Alternative keys that might be used in your report_data
-            if not tickets_sold_by_type:
-                tickets_sold_by_type = report_data.get('ticket_sales_by_type', {})
-            if not revenue_by_ticket_type:
-                revenue_by_ticket_type = report_data.get('revenue_by_type', {})
-            if not attendees_by_ticket_type:
-                attendees_by_ticket_type = report_data.get('attendee_breakdown', {})
-            if not payment_method_usage:
-                payment_method_usage = report_data.get('payment_methods', {})
-
-            # Convert revenue data to target currency if needed
-            if target_currency_code != 'KES' and revenue_by_ticket_type:
-                revenue_by_ticket_type = convert_chart_data_currency(
-                    revenue_by_ticket_type, 
-                    convert_ksh_to_target_currency
-                )
-
-            # Create chart data structure
-            chart_data = {
-                'tickets_sold_by_type': tickets_sold_by_type,
-                'revenue_by_ticket_type': revenue_by_ticket_type,
-                'attendees_by_ticket_type': attendees_by_ticket_type,
-                'payment_method_usage': payment_method_usage,
-                # Additional chart data that might be useful
-                'daily_sales': report_data.get('daily_sales', {}),
-                'hourly_sales': report_data.get('hourly_sales', {}),
-                'sales_trends': report_data.get('sales_trends', []),
-            }
-
-            # If no detailed data exists, create basic chart data from totals
-            if not any([tickets_sold_by_type, revenue_by_ticket_type, attendees_by_ticket_type]):
-                logger.info("GenerateReportResource: No detailed chart data found, creating basic chart data")
-                
-                # Try to get ticket types for this event
-                try:
-                    from model import TicketType  # Adjust import based on your model structure
-                    ticket_types = TicketType.query.filter_by(event_id=event_id).all()
-                    
-                    if ticket_types:
-                        # Distribute totals evenly among ticket types (this is a fallback)
-                        type_count = len(ticket_types)
-                        for ticket_type in ticket_types:
-                            type_name = ticket_type.name
-                            chart_data['tickets_sold_by_type'][type_name] = total_tickets_sold // type_count
-                            chart_data['revenue_by_ticket_type'][type_name] = float(converted_amount) / type_count
-                            chart_data['attendees_by_ticket_type'][type_name] = actual_attendee_count // type_count
-                    else:
-                        # No ticket types, use general data
-                        chart_data['tickets_sold_by_type'] = {'General': total_tickets_sold}
-                        chart_data['revenue_by_ticket_type'] = {'General': float(converted_amount)}
-                        chart_data['attendees_by_ticket_type'] = {'General': actual_attendee_count}
-                        
-                except Exception as e:
-                    logger.warning(f"Failed to create fallback chart data: {e}")
-                    chart_data['tickets_sold_by_type'] = {'General': total_tickets_sold}
-                    chart_data['revenue_by_ticket_type'] = {'General': float(converted_amount)}
-                    chart_data['attendees_by_ticket_type'] = {'General': actual_attendee_count}
+            if created:
+                logger.info(f"GenerateReportResource: Queued report job {job.id} for event {event_id}.")
+            else:
+                logger.info(f"GenerateReportResource: Reusing active report job {job.id} for event {event_id}.")
 
-            logger.info(f"GenerateReportResource: Chart data prepared: {list(chart_data.keys())}")
-            # ===== END CHART DATA PROCESSING =====
+            response_data = ReportJobStatusResource.job_payload(job)
+            response_data.update({
+                'message': 'Report generation queued. Poll the status URL for progress.' if created
+                           else 'An identical report is already being generated.',
+                'deduplicated': not created
+            })
+            return response_data, 202
+        except Exception as e:
+            logger.error(f"GenerateReportResource: Unhandled error: {e}", exc_info=True)
+            return {'error': 'Internal server error'}, 500
 
-            base_url = request.url_root.rstrip('/')
-            pdf_download_url = f"{base_url}/reports/{report_id}/export?format=pdf&currency={target_currency_code}"
-            csv_download_url = f"{base_url}/reports/{report_id}/export?format=csv&currency={target_currency_code}"
 
-            response_data = {
-                'message': 'Report generation initiated. You can download the report using the provided links.',
-                'report_id': report_id,
-                'report_data_summary': {
-                    'total_tickets_sold': total_tickets_sold,
-                    'total_revenue_original': float(total_revenue_ksh),
-                    'total_revenue_converted': float(converted_amount.quantize(Decimal('0.01'))),
-                    'number_of_attendees': actual_attendee_count,
-                    'original_currency': 'KES',
-                    'target_currency': target_currency_code,
-                    'currency_symbol': target_currency.symbol if target_currency else 'KSh'
-                },
-                'report_period': {
-                    'start_date': start_date.isoformat(),
-                    'end_date': end_date.isoformat(),
-                    'is_single_day': bool(specific_date_str)
-                },
-                'currency_conversion': {
-                    'original_amount': float(total_revenue_ksh),
-                    'original_currency': 'KES',
-                    'converted_amount': float(converted_amount.quantize(Decimal('0.01'))),
-                    'converted_currency': target_currency_code,
-                    'conversion_steps': {
-                        'ksh_to_usd_rate': float(ksh_to_usd_rate),
-                        'usd_to_target_rate': float(usd_to_target_rate),
-                        'overall_conversion_rate': float(overall_conversion_rate)
-                    },
-                    'conversion_successful': target_currency_code != 'KES' or total_revenue_ksh == 0
-                },
-                'download_links': {
-                    'pdf_url': pdf_download_url,
-                    'csv_url': csv_download_url
-                },
-                'email_sent': False,
-                # ===== NEW: ADD CHART DATA TO RESPONSE =====
-                'chart_data': chart_data,
-                'has_detailed_data': bool(any([
-                    report_data.get('tickets_sold_by_type'),
-                    report_data.get('revenue_by_ticket_type'),
-                    report_data.get('attendees_by_ticket_type')
-                ]))
-                # ===== END NEW CHART DATA =====
+class ReportJobStatusResource(Resource):
+    """
+    API resource for polling a background report job.
+    """
+    @staticmethod
+    def job_payload(job) -> Dict[str, Any]:
+        base_url = request.url_root.rstrip('/')
+        payload = job.as_dict()
+        payload['status_url'] = f"{base_url}/reports/jobs/{job.id}"
+        if job.status == 'completed':
+            payload.update(job.result or {})
+            payload['download_links'] = {
+                'pdf_url': f"{base_url}/reports/jobs/{job.id}/download?format=pdf",
+                'csv_url': f"{base_url}/reports/jobs/{job.id}/download?format=csv",
+                'export_pdf_url': f"{base_url}/reports/{job.report_id}/export?format=pdf&currency={job.target_currency}",
+                'export_csv_url': f"{base_url}/reports/{job.report_id}/export?format=csv&currency={job.target_currency}"
             }
+        return payload
 
-            if send_email:
-                def async_send_email():
-                    try:
-                        from app import app
-                        with app.app_context():
-                            email_report_data = report_data.copy()
-                            email_report_data.update({
-                                'event_name': event.name,
-                                'currency_symbol': target_currency.symbol if target_currency else 'KSh',
-                                'total_revenue': float(converted_amount.quantize(Decimal('0.01'))),
-                                'currency': target_currency_code,
-                                'target_currency': target_currency_code,
-                                'report_period_start': start_date.strftime('%Y-%m-%d'),
-                                'report_period_end': end_date.strftime('%Y-%m-%d'),
-                                'conversion_rate': float(overall_conversion_rate) if overall_conversion_rate != 1 else None,
-                                'base_currency': 'KES',
-                                'base_currency_symbol': 'KSh',
-                                'original_revenue': float(total_revenue_ksh) if target_currency_code != 'KES' else None,
-                                'original_currency': 'KES' if target_currency_code != 'KES' else None,
-                                'conversion_rate_used': float(overall_conversion_rate) if overall_conversion_rate != 1 else None,
-                                'currency_conversion_source': 'currencyapi.com (with fallback)',
-                                'attendee_count': actual_attendee_count,
-                                'number_of_attendees': actual_attendee_count,
-                            })
-
-                            if target_currency_code != 'KES' and email_report_data.get('revenue_by_type'):
-                                converted_revenue_by_type = {}
-                                for ticket_type, original_revenue in email_report_data['revenue_by_type'].items():
-                                    try:
-                                        converted_revenue, _, _ = convert_ksh_to_target_currency(
-                                            float(original_revenue), target_currency_code
-                                        )
-                                        converted_revenue_by_type[ticket_type] = float(converted_revenue.quantize(Decimal('0.01')))
-                                    except Exception as e:
-                                        logger.warning(f"Failed to convert revenue for {ticket_type}: {e}")
-                                        converted_revenue_by_type[ticket_type] = float(original_revenue)
-                                email_report_data['revenue_by_type'] = converted_revenue_by_type
-
-                            email_sent = report_service.send_report_email(
-                                report_data=email_report_data,
-                                pdf_path='',
-                                csv_path='',
-                                recipient_email=recipient_email
-                            )
-
-                            if email_sent:
-                                logger.info(f"GenerateReportResource: Background email sent to {recipient_email} for report {report_id}")
-                            else:
-                                logger.error(f"GenerateReportResource: Email sending failed for report {report_id}")
-                    except Exception as e:
-                        logger.error(f"GenerateReportResource: Email sending failed for report {report_id}: {e}", exc_info=True)
+    @staticmethod
+    def get_authorized_job(job_id):
+        """Return (job, error_response); only the requester or an admin may see a job"""
+        current_user = User.query.get(get_jwt_identity())
+        if not current_user:
+            return None, ({'error': 'User not found'}, 404)
+        job = report_jobs.get(job_id)
+        if not job:
+            return None, ({'error': 'Report job not found'}, 404)
+        if job.requested_by != current_user.id and current_user.role != UserRole.ADMIN:
+            logger.warning(f"ReportJobStatusResource: User {current_user.id} unauthorized to access report job {job_id}.")
+            return None, ({'error': 'Unauthorized to access this report job'}, 403)
+        return job, None
 
-                threading.Thread(target=async_send_email).start()
-                response_data['email_sent'] = True
+    @jwt_required()
+    def get(self, job_id):
+        job, error = self.get_authorized_job(job_id)
+        if error:
+            return error
+        return self.job_payload(job), 200
 
-            duration = (datetime.now() - start_time).total_seconds()
-            logger.info(f"GenerateReportResource: Report generation request processed in {duration:.2f} seconds for report {report_id}")
-            logger.info(f"GenerateReportResource: Final API response attendee count: {actual_attendee_count}")
-            logger.info(f"GenerateReportResource: Chart data included: {bool(chart_data)}")
 
-            return response_data, 200
-        except Exception as e:
-            logger.error(f"GenerateReportResource: Unhandled error: {e}", exc_info=True)
-            return {'error': 'Internal server error'}, 500
+class ReportJobDownloadResource(Resource):
+    """
+    API resource for downloading the PDF/CSV produced by a completed report job.
+    """
+    @jwt_required()
+    def get(self, job_id):
+        job, error = ReportJobStatusResource.get_authorized_job(job_id)
+        if error:
+            return error
+        if job.status != 'completed':
+            return {'error': f'Report job is {job.status}', 'progress': job.progress}, 409
+
+        format_type = request.args.get('format', 'pdf').lower()
+        if format_type not in ('pdf', 'csv'):
+            return {'error': 'Invalid format. Use pdf or csv'}, 400
+
+        path = job.pdf_path if format_type == 'pdf' else job.csv_path
+        if not path or not os.path.exists(path):
+            logger.warning(f"ReportJobDownloadResource: {format_type} artifact for job {job_id} is no longer available.")
+            return {'error': 'Report file is no longer available; use the export link instead'}, 410
+
+        return send_file(
+            path,
+            mimetype='application/pdf' if format_type == 'pdf' else 'text/csv',
+            as_attachment=True,
+            download_name=f"event_report_{job.event_id}_{job.report_id}.{format_type}"
+        )
 
 
 class GetReportsResource(Resource, AuthorizationMixin):
     """
-    API resource for retrieving a list of generated reports.
-    Includes download URLs for PDF and CSV for each report.
-    Supports date filtering, specific date queries, and flexible limiting.
+    API resource for the report history index.
+    Returns summary columns only (the full report is fetched from /reports/<id>),
+    newest first, keyset-paginated with an opaque `cursor`.
+    Supports event, scope and date filtering.
     """
+    DEFAULT_LIMIT = 20
+    MAX_LIMIT = 100
+
     @jwt_required()
     def get(self):
         try:
             current_user_id = get_jwt_identity()
-            current_user = User.query.get(current_user_id)
+            current_user = current_principal()
             if not current_user:
                 logger.warning(f"GetReportsResource: User with ID {current_user_id} not found.")
                 return {'error': 'User not found'}, 404
@@ -377,8 +225,7 @@ class GetReportsResource(Resource, AuthorizationMixin):
             end_date_str = request.args.get('end_date')
             specific_date_str = request.args.get('specific_date')
             limit_str = request.args.get('limit')
-            get_all = request.args.get('get_all', 'false').lower() == 'true'
-            offset = request.args.get('offset', 0, type=int)
+            cursor = request.args.get('cursor')
             target_currency_id = request.args.get('target_currency_id', type=int)
 
             # Handle date filtering
@@ -399,29 +246,24 @@ class GetReportsResource(Resource, AuthorizationMixin):
                     return error, error.get('status', 400)
 
             # Handle limit parameter
-            limit = None
-            if not get_all:
-                if limit_str:
-                    try:
-                        limit = int(limit_str)
-                        if limit <= 0:
-                            logger.warning(f"GetReportsResource: Invalid limit value: {limit_str}")
-                            return {'error': 'Limit must be a positive integer'}, 400
-                    except ValueError:
-                        logger.warning(f"GetReportsResource: Invalid limit format: {limit_str}")
-                        return {'error': 'Limit must be a valid integer'}, 400
-                else:
-                    limit = 10  # Default to 10 most recent reports
-
-            # Build base query based on user role
-            if current_user.role == UserRole.ADMIN:
-                query = Report.query
-            else:
-                organizer = Organizer.query.filter_by(user_id=current_user_id).first()
-                if not organizer:
+            limit = self.DEFAULT_LIMIT
+            if limit_str:
+                try:
+                    limit = int(limit_str)
+                except ValueError:
+                    logger.warning(f"GetReportsResource: Invalid limit format: {limit_str}")
+                    return {'error': 'Limit must be a valid integer'}, 400
+                if limit <= 0:
+                    logger.warning(f"GetReportsResource: Invalid limit value: {limit_str}")
+                    return {'error': 'Limit must be a positive integer'}, 400
+                limit = min(limit, self.MAX_LIMIT)
+
+            owner_id = None
+            if current_user.role != UserRole.ADMIN:
+                if current_user.organizer_id is None:
                     logger.warning(f"GetReportsResource: Organizer profile not found for user {current_user_id}.")
                     return {'error': 'Organizer profile not found for this user'}, 403
-                query = Report.query.filter_by(organizer_id=organizer.id)
+                owner_id = current_user.id
 
             # Apply event filter
             if event_id:
@@ -429,95 +271,81 @@ class GetReportsResource(Resource, AuthorizationMixin):
                 if not event:
                     logger.warning(f"GetReportsResource: Event with ID {event_id} not found for filtering reports.")
                     return {'error': 'Event not found'}, 404
-                if not (event.organizer_id == (organizer.id if organizer else None) or current_user.role == UserRole.ADMIN):
+                if not self.check_event_ownership(event, current_user):
                     logger.warning(f"GetReportsResource: User {current_user_id} unauthorized to access reports for event {event_id}.")
                     return {'error': 'Unauthorized to access reports for this event'}, 403
-                query = query.filter_by(event_id=event_id)
-
-            # Apply scope filter
-            if scope:
-                query = query.filter_by(report_scope=scope)
 
-            # Apply date filters
-            if start_date and end_date:
-                query = query.filter(Report.timestamp.between(start_date, end_date))
-
-            # Order by timestamp descending (most recent first)
-            query = query.order_by(Report.timestamp.desc())
-
-            # Get total count before applying limit/offset
-            total_count = query.count()
-
-            # Apply offset and limit
-            if offset:
-                query = query.offset(offset)
-            if limit:
-                query = query.limit(limit)
+            try:
+                rows, next_cursor = ReportIndexQuery.page(
+                    owner_id=owner_id,
+                    event_id=event_id,
+                    scope=scope,
+                    start_date=start_date,
+                    end_date=end_date,
+                    cursor=cursor,
+                    limit=limit
+                )
+            except ValueError as e:
+                logger.warning(f"GetReportsResource: {e}")
+                return {'error': 'Invalid cursor'}, 400
 
-            reports = query.all()
+            # Optional display currency: the whole page is converted with one rate snapshot
+            target_currency = Currency.query.get(target_currency_id) if target_currency_id else None
+            snapshot = rate_snapshots.current() if target_currency else None
 
-            # Build response data
-            reports_data = []
             base_url = request.url_root.rstrip('/')
-            for report in reports:
-                report_dict = report.as_dict(target_currency_id=target_currency_id)
-                report_dict['pdf_download_url'] = f"{base_url}/api/v1/reports/{report.id}/export?format=pdf"
-                report_dict['csv_download_url'] = f"{base_url}/api/v1/reports/{report.id}/export?format=csv"
+            reports_data = []
+            for row in rows:
+                base_currency = row.base_currency.value if row.base_currency else 'KES'
+                report_dict = {
+                    'id': row.id,
+                    'event_id': row.event_id,
+                    'event_name': row.event_name,
+                    'ticket_type_id': row.ticket_type_id,
+                    'report_scope': row.report_scope,
+                    'report_date': row.report_date.isoformat() if row.report_date else None,
+                    'timestamp': row.timestamp.isoformat(),
+                    'total_tickets_sold': row.total_tickets_sold,
+                    'number_of_attendees': row.number_of_attendees or 0,
+                    'total_revenue': float(row.total_revenue),
+                    'currency': base_currency,
+                    'rate_snapshot_id': row.rate_snapshot_id,
+                    'detail_url': f"{base_url}/reports/{row.id}",
+                    'pdf_download_url': f"{base_url}/reports/{row.id}/export?format=pdf",
+                    'csv_download_url': f"{base_url}/reports/{row.id}/export?format=csv"
+                }
+                if snapshot:
+                    target_code = target_currency.code.value
+                    try:
+                        report_dict['converted_revenue'] = float(snapshot.convert(row.total_revenue, target_code, base_currency))
+                        report_dict['converted_currency'] = target_code
+                    except KeyError:
+                        logger.warning(f"GetReportsResource: No {base_currency} -> {target_code} rate in snapshot {snapshot.id[:12]}")
                 reports_data.append(report_dict)
 
-            # Enhanced logging with filter information
-            filter_info = []
-            if event_id:
-                filter_info.append(f"event_id={event_id}")
-            if scope:
-                filter_info.append(f"scope={scope}")
-            if specific_date_str:
-                filter_info.append(f"specific_date={specific_date_str}")
-            elif start_date_str or end_date_str:
-                filter_info.append(f"date_range={start_date_str} to {end_date_str}")
-            if limit:
-                filter_info.append(f"limit={limit}")
-            if offset:
-                filter_info.append(f"offset={offset}")
-
-            filters_applied = ", ".join(filter_info) if filter_info else "no filters"
-            logger.info(f"GetReportsResource: Retrieved {len(reports_data)} reports for user {current_user_id} with {filters_applied}.")
+            filter_info = [f"{name}={value}" for name, value in (
+                ('event_id', event_id), ('scope', scope), ('specific_date', specific_date_str),
+                ('start_date', start_date_str), ('end_date', end_date_str), ('cursor', cursor)
+            ) if value]
+            logger.info(f"GetReportsResource: Retrieved {len(reports_data)} reports for user {current_user_id} "
+                        f"with {', '.join(filter_info) or 'no filters'}.")
 
-            response_data = {
+            return {
                 'reports': reports_data,
-                'total_count': total_count,
                 'total_reports_returned': len(reports_data),
                 'limit': limit,
-                'offset': offset,
-                'is_limited': bool(limit),
-                'limit_applied': limit
-            }
-
-            # Add query parameters info to response
-            query_info = {
-                'event_id': event_id,
-                'scope': scope,
-                'limit': limit,
-                'offset': offset,
-                'get_all': get_all,
-                'target_currency_id': target_currency_id
-            }
-
-            if specific_date_str:
-                query_info.update({
+                'next_cursor': next_cursor,
+                'has_more': next_cursor is not None,
+                'query_info': {
+                    'event_id': event_id,
+                    'scope': scope,
                     'specific_date': specific_date_str,
-                    'is_single_day': True
-                })
-            elif start_date_str or end_date_str:
-                query_info.update({
                     'start_date': start_date_str,
                     'end_date': end_date_str,
-                    'is_single_day': False
-                })
-
-            response_data['query_info'] = query_info
-
-            return response_data, 200
+                    'cursor': cursor,
+                    'target_currency_id': target_currency_id
+                }
+            }, 200
 
         except Exception as e:
             logger.error(f"GetReportsResource: Error: {e}", exc_info=True)
@@ -736,11 +564,22 @@ class ExportReportResource(Resource):
 
             # Get export format and currency from query parameters
             export_format = request.args.get('format', 'pdf').lower()
-            target_currency = request.args.get('currency', 'KES')
+            target_currency = request.args.get('currency', 'KES').upper()
             
             if export_format not in ['pdf', 'csv']:
                 return {'error': 'Invalid format. Use "pdf" or "csv"'}, 400
 
+            # Only supported currencies, so arbitrary strings can't mint new artifact keys
+            try:
+                currency_supported = Currency.query.filter_by(
+                    code=CurrencyCode(target_currency), is_active=True
+                ).first() is not None
+            except ValueError:
+                currency_supported = False
+            if not currency_supported:
+                logger.warning(f"ExportReportResource: Unsupported currency '{target_currency}'.")
+                return {'error': f'Invalid or inactive currency "{target_currency}"'}, 400
+
             # Get report data (this should be stored in your report record or regenerated)
             report_data = report.report_data if hasattr(report, 'report_data') else {}
             
@@ -765,143 +604,114 @@ class ExportReportResource(Resource):
                     
                 report_data = result.get('report_data', {})
 
+            download_name = self._download_name(event, export_format)
+            template_version = (PDFReportGenerator if export_format == 'pdf' else CSVReportGenerator).TEMPLATE_VERSION
+
+            # Saved reports are served from the artifact store, keyed by a digest of their current data
+            cacheable = bool(report.report_data)
+            if cacheable:
+                digest = artifact_store.content_digest(report.report_data, report.rate_snapshot_id)
+                artifact = artifact_store.get(report_id, digest, export_format, target_currency, template_version)
+                if artifact:
+                    logger.info(f"ExportReportResource: Serving stored {export_format} for report {report_id}")
+                    return artifact_store.send(artifact, export_format, download_name)
+
             if export_format == 'pdf':
-                return self._export_pdf(report_data, report.event_id, target_currency)
+                content = self._render_pdf(report_data, report.event_id, target_currency)
             else:
-                return self._export_csv(report_data, report.event_id, target_currency)
+                content = self._render_csv(report_data, report.event_id)
+            if content is None:
+                return {'error': f'Failed to generate {export_format.upper()} report'}, 500
+
+            if cacheable:
+                artifact = artifact_store.put(report_id, digest, export_format, target_currency, template_version, content)
+                return artifact_store.send(artifact, export_format, download_name)
+
+            response = make_response(content)
+            response.headers['Content-Type'] = MIMETYPES[export_format]
+            response.headers['Content-Disposition'] = f'attachment; filename="{download_name}"'
+            response.headers['Content-Length'] = len(content)
+            return response
                 
         except Exception as e:
             logger.error(f"ExportReportResource: Unhandled error: {e}", exc_info=True)
             return {'error': 'Internal server error'}, 500
 
-    def _export_pdf(self, report_data, event_id, target_currency='KES'):
-        """Export report as PDF"""
-        try:
-            # Create a temporary file for the PDF
-            import tempfile
-            with tempfile.NamedTemporaryFile(delete=False, suffix='.pdf') as tmp_pdf_file:
-                
-                # Generate charts if needed
-                chart_paths = []
-                try:
-                    # ChartGenerator is already imported at the top
-                    # Ensure matplotlib is imported for ChartGenerator
-                    import matplotlib.pyplot as plt
-                    from contextlib import contextmanager
+    @staticmethod
+    def _download_name(event, export_format):
+        safe_event_name = "".join(c for c in event.name if c.isalnum() or c in (' ', '-', '_')).rstrip()
+        return f"Report_{safe_event_name}_{datetime.now().strftime('%Y%m%d')}.{export_format}"
 
-                    config = ReportConfig(include_charts=True)
-                    chart_generator = ChartGenerator(config)
-                    
-                    # Explicitly call the method that creates all charts
-                    chart_paths = chart_generator.create_all_charts(report_data)
-                    logger.info(f"ExportReportResource: Generated {len(chart_paths)} charts for PDF export")
-                        
-                except ImportError as import_error:
-                    logger.warning(f"ExportReportResource: Failed to import ChartGenerator or matplotlib: {import_error}")
-                    chart_paths = []
-                except Exception as chart_error:
-                    logger.warning(f"ExportReportResource: Chart generation failed: {chart_error}", exc_info=True)
-                    chart_paths = []
-
-                # Initialize PDF generator
-                config = ReportConfig(include_charts=bool(chart_paths))
-                pdf_generator = PDFReportGenerator(config)
-                
-                # Generate PDF with all required parameters
-                file_path = pdf_generator.generate_pdf(
-                    report_data=report_data,
-                    chart_paths=chart_paths,
-                    output_path=tmp_pdf_file.name,
-                    session=db.session,
-                    event_id=event_id,
-                    target_currency=target_currency
-                )
-                
-                if not file_path:
-                    logger.error(f"ExportReportResource: PDF generation failed for report with event_id {event_id}")
-                    return {'error': 'Failed to generate PDF'}, 500
+    def _render_pdf(self, report_data, event_id, target_currency='KES') -> Optional[bytes]:
+        """Render the report PDF in memory"""
+        try:
+            # Charts are rendered in memory; repeat exports hit the chart cache
+            chart_images = []
+            try:
+                chart_generator = ChartGenerator(ReportConfig(include_charts=True))
+                chart_images = chart_generator.create_all_charts(report_data)
+                logger.info(f"ExportReportResource: Generated {len(chart_images)} charts for PDF export")
+            except Exception as chart_error:
+                logger.warning(f"ExportReportResource: Chart generation failed: {chart_error}", exc_info=True)
+                chart_images = []
+
+            pdf_generator = PDFReportGenerator(ReportConfig(include_charts=bool(chart_images)))
+            buffer = BytesIO()
+            if not pdf_generator.generate_pdf(
+                report_data=report_data,
+                chart_images=chart_images,
+                output_path=buffer,
+                session=db.session,
+                event_id=event_id,
+                target_currency=target_currency
+            ):
+                logger.error(f"ExportReportResource: PDF generation failed for report with event_id {event_id}")
+                return None
 
-                # Read the generated PDF file
-                with open(file_path, 'rb') as pdf_file:
-                    pdf_content = pdf_file.read()
+            logger.info(f"ExportReportResource: Successfully generated PDF for event {event_id}")
+            return buffer.getvalue()
 
-                # Clean up temporary file
-                try:
-                    os.unlink(file_path)
-                    # Clean up chart files
-                    for chart_path in chart_paths:
-                        if os.path.exists(chart_path):
-                            os.unlink(chart_path)
-                except Exception as cleanup_error:
-                    logger.warning(f"ExportReportResource: Failed to cleanup files: {cleanup_error}")
-
-                # Get event name for filename
-                event = Event.query.get(event_id)
-                event_name = event.name if event else f"Event_{event_id}"
-                safe_event_name = "".join(c for c in event_name if c.isalnum() or c in (' ', '-', '_')).rstrip()
-                
-                # Create response
-                response = make_response(pdf_content)
-                response.headers['Content-Type'] = 'application/pdf'
-                response.headers['Content-Disposition'] = f'attachment; filename="Report_{safe_event_name}_{datetime.now().strftime("%Y%m%d")}.pdf"'
-                response.headers['Content-Length'] = len(pdf_content)
-                
-                logger.info(f"ExportReportResource: Successfully generated PDF for event {event_id}")
-                return response
-                
         except Exception as e:
             logger.error(f"ExportReportResource: Error generating PDF for event {event_id}: {e}", exc_info=True)
-            return {'error': 'Failed to generate PDF report'}, 500
+            return None
 
-    def _export_csv(self, report_data, event_id, target_currency='KES'):
-        """Export report as CSV"""
+    def _render_csv(self, report_data, event_id) -> Optional[bytes]:
+        """Render the report CSV in memory (a summary, so it is small)"""
         try:
-            # Create a temporary file for the CSV
-            import tempfile
-            with tempfile.NamedTemporaryFile(delete=False, suffix='.csv', mode='w', encoding='utf-8') as tmp_csv_file:
-                
-                # Initialize CSV generator
-                csv_generator = CSVReportGenerator()
-                
-                # Generate CSV with all required parameters
-                file_path = csv_generator.generate_csv(
-                    report_data=report_data,
-                    output_path=tmp_csv_file.name,
-                    session=db.session,
-                    event_id=event_id
-                )
-                
-                if not file_path:
-                    logger.error(f"ExportReportResource: CSV generation failed for event {event_id}")
-                    return {'error': 'Failed to generate CSV'}, 500
+            rows = CSVReportGenerator.report_rows(report_data, db.session, event_id)
+            return "".join(iter_csv(rows)).encode('utf-8')
+        except Exception as e:
+            logger.error(f"ExportReportResource: Error generating CSV for event {event_id}: {e}", exc_info=True)
+            return None
 
-                # Read the generated CSV file
-                with open(file_path, 'r', encoding='utf-8') as csv_file:
-                    csv_content = csv_file.read()
 
-                # Clean up temporary file
-                try:
-                    os.unlink(file_path)
-                except Exception as cleanup_error:
-                    logger.warning(f"ExportReportResource: Failed to cleanup CSV file: {cleanup_error}")
+class EventListExportResource(Resource, AuthorizationMixin):
+    """
+    Streams an event's ticket list (/tickets/export) or attendee list
+    (/attendees/export) as CSV without loading it into memory.
+    """
+    EXPORTS = {
+        'tickets': ticket_rows,
+        'attendees': attendee_rows,
+    }
 
-                # Get event name for filename
-                event = Event.query.get(event_id)
-                event_name = event.name if event else f"Event_{event_id}"
-                safe_event_name = "".join(c for c in event_name if c.isalnum() or c in (' ', '-', '_')).rstrip()
-                
-                # Create response
-                response = make_response(csv_content)
-                response.headers['Content-Type'] = 'text/csv'
-                response.headers['Content-Disposition'] = f'attachment; filename="Report_{safe_event_name}_{datetime.now().strftime("%Y%m%d")}.csv"'
-                response.headers['Content-Length'] = len(csv_content.encode('utf-8'))
-                
-                logger.info(f"ExportReportResource: Successfully generated CSV for event {event_id}")
-                return response
-                
-        except Exception as e:
-            logger.error(f"ExportReportResource: Error generating CSV for event {event_id}: {e}", exc_info=True)
-            return {'error': 'Failed to generate CSV report'}, 500
+    @jwt_required()
+    def get(self, event_id, list_name):
+        current_user = self.get_current_user()
+        if not current_user:
+            return {'error': 'User not found'}, 404
+
+        event = Event.query.get(event_id)
+        if not event:
+            return {'error': 'Event not found'}, 404
+        if not self.check_event_ownership(event, current_user):
+            logger.warning(f"EventListExportResource: User {current_user.id} unauthorized to export {list_name} for event {event_id}.")
+            return {'error': 'Unauthorized to export this event'}, 403
+
+        rows = self.EXPORTS[list_name](event_id)
+        filename = f"{event.name}_{list_name}_{datetime.now().strftime('%Y%m%d')}.csv"
+        logger.info(f"EventListExportResource: Streaming {list_name} for event {event_id} to user {current_user.id}")
+        return csv_response(rows, filename)
 
 
 class OrganizerSummaryReportResource(Resource, AuthorizationMixin):
@@ -934,26 +744,13 @@ class OrganizerSummaryReportResource(Resource, AuthorizationMixin):
         events_summary = []
         organizer_events = Event.query.filter_by(organizer_id=organizer.id).all()
 
+        # Paid ticket counts and price * quantity revenue for every event from the sales rollups
+        totals_by_event = sales_facts.event_totals(organizer_id=organizer.id)
+
         for event in organizer_events:
-            # Count only PAID tickets (following DatabaseQueryService approach)
-            event_tickets = (db.session.query(func.count(Ticket.id))
-                           .filter(
-                               Ticket.event_id == event.id,
-                               cast(Ticket.payment_status, String).ilike("paid")
-                           )
-                           .scalar()) or 0
-
-            # Calculate revenue using ticket price * quantity for PAID tickets only
-            event_revenue_query = (db.session.query(func.sum(TicketType.price * Ticket.quantity))
-                                  .select_from(Ticket)
-                                  .join(TicketType, Ticket.ticket_type_id == TicketType.id)
-                                  .filter(
-                                      Ticket.event_id == event.id,
-                                      cast(Ticket.payment_status, String).ilike("paid")
-                                  )
-                                  .scalar())
-            
-            event_revenue = float(event_revenue_query) if event_revenue_query else 0.0
+            totals = totals_by_event.get(event.id, sales_facts.empty_totals())
+            event_tickets = totals['tickets_sold']
+            event_revenue = float(totals['revenue'])
 
             total_tickets_sold += event_tickets
             total_revenue += event_revenue
@@ -1184,14 +981,122 @@ class EventReportsResource(Resource, AuthorizationMixin):
             logger.error(f"EventReportsResource: Error retrieving reports for event {event_id} for user {current_user_id}: {e}", exc_info=True)
             return {'error': 'Internal server error'}, 500
         
+class ReportSubscriptionResource(Resource, AuthorizationMixin):
+    """
+    API resource for listing and creating scheduled (daily/weekly) report subscriptions.
+    """
+    @jwt_required()
+    def get(self):
+        current_user = self.get_current_user()
+        if not current_user:
+            return {'error': 'User not found'}, 404
+
+        query = ReportSubscription.query.filter_by(user_id=current_user.id, is_active=True)
+        event_id = request.args.get('event_id', type=int)
+        if event_id:
+            query = query.filter_by(event_id=event_id)
+        subscriptions = query.order_by(ReportSubscription.event_id, ReportSubscription.frequency).all()
+        return {'subscriptions': [subscription.as_dict() for subscription in subscriptions]}, 200
+
+    @jwt_required()
+    def post(self):
+        current_user = self.get_current_user()
+        if not current_user:
+            return {'error': 'User not found'}, 404
+
+        data = request.get_json() or {}
+        event_id = data.get('event_id')
+        frequency = (data.get('frequency') or 'daily').lower()
+        target_currency_code = data.get('target_currency') or 'KES'
+
+        if not event_id:
+            return {'error': 'Event ID is required'}, 400
+        if frequency not in FREQUENCIES:
+            return {'error': f'Invalid frequency. Use one of: {", ".join(FREQUENCIES)}'}, 400
+
+        event = Event.query.get(event_id)
+        if not event:
+            return {'error': 'Event not found'}, 404
+        if not self.check_event_ownership(event, current_user):
+            logger.warning(f"ReportSubscriptionResource: User {current_user.id} unauthorized to schedule reports for event {event_id}.")
+            return {'error': 'Unauthorized to schedule reports for this event'}, 403
+
+        try:
+            target_currency = Currency.query.filter_by(code=CurrencyCode(target_currency_code), is_active=True).first()
+        except ValueError:
+            return {'error': f'Invalid target currency code "{target_currency_code}"'}, 400
+        if not target_currency:
+            return {'error': f'Target currency "{target_currency_code}" not found or not active'}, 400
+
+        subscription = report_schedules.subscribe(current_user.id, event_id, frequency, target_currency_code)
+        logger.info(f"ReportSubscriptionResource: User {current_user.id} subscribed to {frequency} reports for event {event_id}.")
+        return subscription.as_dict(), 201
+
+
+class ReportSubscriptionDetailResource(Resource, AuthorizationMixin):
+    """
+    API resource for cancelling a scheduled report subscription.
+    """
+    @jwt_required()
+    def delete(self, subscription_id):
+        current_user = self.get_current_user()
+        if not current_user:
+            return {'error': 'User not found'}, 404
+
+        subscription = ReportSubscription.query.get(subscription_id)
+        if not subscription or not subscription.is_active:
+            return {'error': 'Subscription not found'}, 404
+        if subscription.user_id != current_user.id and current_user.role != UserRole.ADMIN:
+            return {'error': 'Unauthorized to cancel this subscription'}, 403
+
+        report_schedules.unsubscribe(subscription)
+        return {'message': 'Subscription cancelled', 'subscription': subscription.as_dict()}, 200
+
+
+class LatestEventReportResource(Resource, AuthorizationMixin):
+    """
+    API resource for the latest pre-generated scheduled report of an event.
+    Serves the saved report; nothing is recomputed.
+    """
+    @jwt_required()
+    def get(self, event_id):
+        current_user = self.get_current_user()
+        if not current_user:
+            return {'error': 'User not found'}, 404
+
+        event = Event.query.get(event_id)
+        if not event:
+            return {'error': 'Event not found'}, 404
+        if not self.check_event_ownership(event, current_user):
+            logger.warning(f"LatestEventReportResource: User {current_user.id} unauthorized to view reports for event {event_id}.")
+            return {'error': 'Unauthorized to view reports for this event'}, 403
+
+        frequency = request.args.get('frequency')
+        user_id = None if current_user.role == UserRole.ADMIN else current_user.id
+        subscription, report = report_schedules.latest_report(event_id, user_id, frequency)
+        if not report:
+            return {'error': 'No scheduled report has been generated for this event yet'}, 404
+
+        base_url = request.url_root.rstrip('/')
+        currency = subscription.target_currency
+        return {
+            'report_id': report.id,
+            'event_id': event_id,
+            'event_name': event.name,
+            'generated_at': subscription.last_run_at.isoformat() if subscription.last_run_at else None,
+            'subscription': subscription.as_dict(),
+            'report_data': report.report_data,
+            'download_links': {
+                'export_pdf_url': f"{base_url}/reports/{report.id}/export?format=pdf&currency={currency}",
+                'export_csv_url': f"{base_url}/reports/{report.id}/export?format=csv&currency={currency}"
+            }
+        }, 200
+
+
 class ReportResourceRegistry:
     """Registry for report-related API resources"""
     @staticmethod
     def register_organizer_report_resources(api):
-        """Register all report resources with the API"""
-        api.add_resource(GenerateReportResource, '/reports/generate')
-        api.add_resource(GetReportsResource, '/reports')
-        api.add_resource(GetReportResource, '/reports/<int:report_id>')
-        api.add_resource(ExportReportResource, '/reports/<int:report_id>/export')
-        api.add_resource(OrganizerSummaryReportResource, '/reports/organizer/summary')
-        api.add_resource(EventReportsResource, '/reports/events/<int:event_id>')
\ No newline at end of file
+        """Register all report resources with the API (URL rules live in lazy_routes.ROUTE_GROUPS)"""
+        from lazy_routes import register_route_group
+        register_route_group(api, __name__)
\ No newline at end of file
@@ -1,32 +1,24 @@
-import matplotlib
-matplotlib.use('Agg')
 from reportlab.lib import colors
 from reportlab.lib.pagesizes import letter, A4
 from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer, Image, PageBreak
 from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
 from reportlab.lib.units import inch
 from reportlab.lib.enums import TA_CENTER
-import matplotlib.pyplot as plt
-import matplotlib.patheffects as path_effects
 import pandas as pd
-import os
 from datetime import datetime
 import csv
 from decimal import Decimal
 from io import StringIO, BytesIO
-import tempfile
 from typing import Dict, List, Optional, Tuple, Any, Union
 from model import Ticket, Transaction, Scan, PaymentStatus, Currency, CurrencyCode, Event
-from contextlib import contextmanager
 from .config import ReportConfig
+from chart_service import chart_service
 import logging
-import time
 from sqlalchemy.orm import Session
 from sqlalchemy import func, cast, String
-import numpy as np
 
-# Import currency conversion functions from the currency module
-from currency_routes import convert_ksh_to_target_currency, get_exchange_rate
+# Reports convert currency with a single exchange rate snapshot
+from rate_snapshot import rate_snapshots
 
 # Optional: Import psutil for memory logging
 try:
@@ -387,73 +379,47 @@ class ReportDataProcessor:
             if not currency_obj:
                 logger.warning(f"Target currency {target_currency} not found in database. Keeping original KES values.")
                 return report_data
+            # Every figure is converted with the snapshot the report was built with
+            snapshot = rate_snapshots.for_report(report_data)
+            if not snapshot.has(target_currency):
+                logger.warning(f"No {target_currency} rate in snapshot {snapshot.id[:12]}. Keeping original KES values.")
+                return report_data
             # Store original currency info
             report_data['original_currency'] = "KES"
             report_data['currency'] = target_currency
             report_data['currency_symbol'] = currency_obj.symbol
+            report_data['rate_snapshot_id'] = snapshot.id
             # Convert total revenue
             if 'total_revenue' in report_data and report_data['total_revenue']:
-                try:
-                    ksh_amount = Decimal(str(report_data['total_revenue']))
-                    converted_amount, ksh_to_usd_rate, usd_to_target_rate = convert_ksh_to_target_currency(
-                        ksh_amount, target_currency
-                    )
-                    report_data['converted_revenue'] = float(converted_amount)
-                    report_data['total_revenue'] = float(converted_amount)  # Update main revenue field
-                    # Store conversion rates for transparency
-                    report_data['conversion_rates'] = {
-                        'ksh_to_usd': float(ksh_to_usd_rate),
-                        'usd_to_target': float(usd_to_target_rate),
-                        'overall_rate': float(ksh_to_usd_rate * usd_to_target_rate)
-                    }
-                    logger.info(f"Converted total revenue from KES {ksh_amount} to {target_currency} {converted_amount}")
-                except Exception as e:
-                    logger.error(f"Error converting total revenue to {target_currency}: {e}")
-                    # Keep original values if conversion fails
-                    report_data['conversion_error'] = str(e)
+                converted_amount = snapshot.convert(report_data['total_revenue'], target_currency)
+                report_data['converted_revenue'] = float(converted_amount)
+                report_data['total_revenue'] = float(converted_amount)  # Update main revenue field
+                # Store conversion rates for transparency
+                report_data['conversion_rates'] = snapshot.conversion_rates(target_currency)
+                logger.info(f"Converted total revenue to {target_currency} {converted_amount}")
             # Convert revenue by ticket type
             if 'revenue_by_ticket_type' in report_data and report_data['revenue_by_ticket_type']:
-                converted_revenue_by_type = {}
-                for ticket_type, ksh_revenue in report_data['revenue_by_ticket_type'].items():
-                    try:
-                        ksh_amount = Decimal(str(ksh_revenue))
-                        converted_amount, _, _ = convert_ksh_to_target_currency(ksh_amount, target_currency)
-                        converted_revenue_by_type[ticket_type] = float(converted_amount)
-                    except Exception as e:
-                        logger.warning(f"Error converting revenue for ticket type {ticket_type}: {e}")
-                        converted_revenue_by_type[ticket_type] = float(ksh_revenue)  # Keep original
-                report_data['revenue_by_ticket_type'] = converted_revenue_by_type
+                report_data['revenue_by_ticket_type'] = {
+                    ticket_type: float(amount) for ticket_type, amount in
+                    snapshot.convert_many(report_data['revenue_by_ticket_type'], target_currency).items()
+                }
             # Convert ticket prices for display in summary table
             if 'ticket_type_prices' in report_data:
-                converted_prices = {}
-                for ticket_type, ksh_price in report_data['ticket_type_prices'].items():
-                    try:
-                        ksh_amount = Decimal(str(ksh_price))
-                        converted_amount, _, _ = convert_ksh_to_target_currency(ksh_amount, target_currency)
-                        converted_prices[ticket_type] = float(converted_amount)
-                    except Exception as e:
-                        logger.warning(f"Error converting price for ticket type {ticket_type}: {e}")
-                        converted_prices[ticket_type] = float(ksh_price)  # Keep original
-
-                report_data['converted_ticket_type_prices'] = converted_prices
+                report_data['converted_ticket_type_prices'] = {
+                    ticket_type: float(amount) for ticket_type, amount in
+                    snapshot.convert_many(report_data['ticket_type_prices'], target_currency).items()
+                }
             # Convert daily revenue if present
             if 'daily_revenue' in report_data and report_data['daily_revenue']:
-                converted_daily_revenue = {}
-                for date_str, daily_data in report_data['daily_revenue'].items():
-                    if isinstance(daily_data, dict) and 'revenue' in daily_data:
-                        try:
-                            ksh_amount = Decimal(str(daily_data['revenue']))
-                            converted_amount, _, _ = convert_ksh_to_target_currency(ksh_amount, target_currency)
-                            converted_daily_revenue[date_str] = {
-                                **daily_data,
-                                'revenue': float(converted_amount)
-                            }
-                        except Exception as e:
-                            logger.warning(f"Error converting daily revenue for {date_str}: {e}")
-                            converted_daily_revenue[date_str] = daily_data  # Keep original
-                    else:
-                        converted_daily_revenue[date_str] = daily_data
-                report_data['daily_revenue'] = converted_daily_revenue
+                daily_revenue = report_data['daily_revenue']
+                converted = snapshot.convert_many({
+                    date_str: daily_data['revenue'] for date_str, daily_data in daily_revenue.items()
+                    if isinstance(daily_data, dict) and 'revenue' in daily_data
+                }, target_currency)
+                report_data['daily_revenue'] = {
+                    date_str: {**daily_data, 'revenue': float(converted[date_str])} if date_str in converted else daily_data
+                    for date_str, daily_data in daily_revenue.items()
+                }
             logger.info(f"Successfully converted report data to {target_currency}")
         except Exception as e:
             logger.error(f"Error in currency conversion process: {e}")
@@ -480,209 +446,51 @@ class ReportDataProcessor:
         return attendees
 
 class ChartGenerator:
+    """Validates chart data and renders it through the shared chart service as PNG bytes"""
+
     def __init__(self, config: ReportConfig):
         self.config = config
-        self._setup_matplotlib()
-
-    def _setup_matplotlib(self):
-        try:
-            plt.style.use(self.config.chart_style if self.config.chart_style else 'default')
-        except Exception as e:
-            logger.warning(f"Failed to apply matplotlib style: {e}")
-
-    @contextmanager
-    def _chart_context(self, figsize: Tuple[int, int] = (10, 8)):
-        fig, ax = plt.subplots(figsize=figsize)
-        try:
-            yield fig, ax
-        finally:
-            plt.close(fig)
 
-    def _save_chart_safely(self, fig, title: str) -> Optional[str]:
-        try:
-            tmp_file = tempfile.NamedTemporaryFile(
-                suffix='.png',
-                prefix=f'chart_{title.replace(" ", "_")}_',
-                delete=False
-            )
-            tmp_filename = tmp_file.name
-            tmp_file.close()
-            fig.savefig(tmp_filename, dpi=self.config.chart_dpi, bbox_inches='tight')
-            plt.close(fig)
-            if os.path.exists(tmp_filename) and os.path.getsize(tmp_filename) > 0:
-                logger.info(f"Successfully created chart: {tmp_filename}")
-                return tmp_filename
-            else:
-                logger.error(f"Failed to create chart file: {tmp_filename}")
-                try:
-                    os.remove(tmp_filename)
-                except:
-                    pass
-                return None
-        except Exception as e:
-            logger.error(f"Error saving chart '{title}': {e}", exc_info=True)
-            return None
+    def _render(self, kind: str, data: Dict[str, Any], **options) -> Optional[bytes]:
+        options.update(style=self.config.chart_style or 'default', dpi=self.config.chart_dpi)
+        image = chart_service.render(kind, data, options)
+        if image:
+            logger.info(f"Rendered chart '{options['title']}' ({len(image)} bytes)")
+        return image
 
-    def create_pie_chart(self, data: Dict[str, Union[int, float]], title: str) -> Optional[str]:
+    def create_pie_chart(self, data: Dict[str, Union[int, float]], title: str) -> Optional[bytes]:
         if not data:
             logger.info(f"No data provided for pie chart '{title}'. Skipping chart generation.")
             return None
         try:
-            labels = list(data.keys())
-            sizes = [float(v) for v in data.values()]
-            filtered_labels_sizes = [(lbl, sz) for lbl, sz in zip(labels, sizes) if sz > 0]
+            filtered_labels_sizes = [(str(lbl), float(sz)) for lbl, sz in data.items() if float(sz) > 0]
             if not filtered_labels_sizes:
                 logger.info(f"All data values are zero for pie chart '{title}'. Skipping chart generation.")
                 return None
             labels, sizes = zip(*filtered_labels_sizes)
-
-            # Use square figure size to ensure perfect circle
-            with self._chart_context((10, 10)) as (fig, ax):
-                # Modern, professional color palette with better contrast
-                colors_palette = [
-                    '#2E86AB',  # Blue
-                    '#A23B72',  # Purple
-                    '#F18F01',  # Orange
-                    '#C73E1D',  # Red
-                    '#1B998B',  # Teal
-                    '#8E7CC3',  # Light Purple
-                    '#F4A261',  # Light Orange
-                    '#E76F51',  # Coral
-                    '#264653',  # Dark Teal
-                    '#E9C46A'   # Yellow
-                ]
-
-                # Use only the number of colors we need
-                colors_list = colors_palette[:len(labels)]
-
-                # Create pie chart with better styling
-                wedges, texts, autotexts = ax.pie(
-                    sizes,
-                    labels=labels,
-                    autopct='%1.1f%%',
-                    colors=colors_list,
-                    startangle=90,
-                    explode=[0.05] * len(labels) if len(labels) > 1 else None,
-                    shadow=True,  # Add subtle shadow for depth
-                    textprops={'fontsize': 10, 'fontweight': 'bold'},
-                    pctdistance=0.85,  # Move percentage text closer to edge
-                    labeldistance=1.1   # Move labels slightly outward
-                )
-
-                # Style the percentage text for better readability
-                for autotext in autotexts:
-                    autotext.set_color('white')
-                    autotext.set_fontweight('bold')
-                    autotext.set_fontsize(11)
-                    # Add a subtle outline to make text more readable
-                    autotext.set_path_effects([
-                        path_effects.Stroke(linewidth=2, foreground='black'),
-                        path_effects.Normal()
-                    ])
-
-                # Style the labels
-                for text in texts:
-                    text.set_fontsize(11)
-                    text.set_fontweight('bold')
-                    text.set_color('#333333')
-
-                # Enhanced title styling
-                ax.set_title(
-                    title,
-                    fontsize=18,
-                    fontweight='bold',
-                    pad=25,
-                    color='#2E86AB'
-                )
-
-                # Ensure perfect circle by setting equal aspect ratio and limits
-                ax.set_aspect('equal')
-                ax.set_xlim(-1.5, 1.5)
-                ax.set_ylim(-1.5, 1.5)
-
-                # Remove spines for clean look
-                for spine in ax.spines.values():
-                    spine.set_visible(False)
-
-                plt.tight_layout()
-                return self._save_chart_safely(fig, title)
-
+            return self._render('pie', {'labels': list(labels), 'values': list(sizes)}, title=title)
         except Exception as e:
             logger.error(f"Error creating pie chart '{title}': {e}", exc_info=True)
             return None
 
-    def create_bar_chart(self, data: Dict[str, Union[float, int]], title: str, xlabel: str, ylabel: str, currency_symbol: str = 'KSh') -> Optional[str]:
+    def create_bar_chart(self, data: Dict[str, Union[float, int]], title: str, xlabel: str, ylabel: str, currency_symbol: str = 'KSh') -> Optional[bytes]:
         if not data:
             logger.info(f"No data provided for bar chart '{title}'. Skipping chart generation.")
             return None
         try:
-            categories = list(data.keys())
-            values = [float(v) for v in data.values()]
-
-            with self._chart_context((12, 8)) as (fig, ax):
-                # Use the same professional color palette
-                colors_palette = [
-                    '#2E86AB', '#A23B72', '#F18F01', '#C73E1D', '#1B998B',
-                    '#8E7CC3', '#F4A261', '#E76F51', '#264653', '#E9C46A'
-                ]
-                bar_colors = [colors_palette[i % len(colors_palette)] for i in range(len(categories))]
-
-                # Create bars with enhanced styling
-                bars = ax.bar(categories, values, color=bar_colors, alpha=0.8, edgecolor='white', linewidth=2)
-
-                # Add value labels on top of bars
-                for bar in bars:
-                    height = bar.get_height()
-                    if height > 0:  # Only show labels for positive values
-                        if 'Revenue' in ylabel:
-                            label_text = f'{currency_symbol}{height:,.0f}'
-                        else:
-                            label_text = f'{height:,.0f}'
-
-                        ax.text(bar.get_x() + bar.get_width()/2., height + max(values) * 0.01,
-                                label_text,
-                                ha='center', va='bottom', fontweight='bold', fontsize=11, color='#333333')
-
-                # Enhanced title and labels
-                ax.set_title(title, fontsize=18, fontweight='bold', pad=25, color='#2E86AB')
-                ax.set_xlabel(xlabel, fontsize=14, fontweight='bold', color='#333333')
-                ax.set_ylabel(ylabel, fontsize=14, fontweight='bold', color='#333333')
-
-                # Improve grid and styling
-                ax.grid(True, linestyle='--', alpha=0.7, color='#cccccc')
-                ax.set_axisbelow(True)  # Put grid behind bars
-
-                # Style the axes
-                ax.spines['top'].set_visible(False)
-                ax.spines['right'].set_visible(False)
-                ax.spines['left'].set_color('#cccccc')
-                ax.spines['bottom'].set_color('#cccccc')
-
-                # Rotate x-axis labels for better readability
-                plt.xticks(rotation=45, ha='right', fontsize=11)
-                plt.yticks(fontsize=11)
-
-                # Set y-axis to start from 0 and add some padding at the top
-                ax.set_ylim(0, max(values) * 1.1)
-
-                # Format y-axis for currency if needed
-                if 'Revenue' in ylabel:
-                    ax.yaxis.set_major_formatter(plt.FuncFormatter(lambda x, p: f'{currency_symbol}{x:,.0f}'))
-
-                plt.tight_layout()
-                return self._save_chart_safely(fig, title)
-
+            chart_data = {'labels': [str(k) for k in data.keys()], 'values': [float(v) for v in data.values()]}
+            return self._render('bar', chart_data, title=title, xlabel=xlabel, ylabel=ylabel,
+                                currency_symbol=currency_symbol)
         except Exception as e:
             logger.error(f"Error creating bar chart '{title}': {e}", exc_info=True)
             return None
 
-    def create_comparison_chart(self, sold_data: Dict[str, int], attended_data: Dict[str, int], title: str) -> Optional[str]:
+    def create_comparison_chart(self, sold_data: Dict[str, int], attended_data: Dict[str, int], title: str) -> Optional[bytes]:
         if not sold_data and not attended_data:
             logger.info(f"No data provided for comparison chart '{title}'. Skipping chart generation.")
             return None
         try:
-            all_ticket_types = sorted(list(set(sold_data.keys()) | set(attended_data.keys())))
-            categories = all_ticket_types
+            categories = sorted(set(sold_data.keys()) | set(attended_data.keys()))
             sold_counts = [int(sold_data.get(t, 0)) for t in categories]
             attended_counts = [int(attended_data.get(t, 0)) for t in categories]
 
@@ -690,97 +498,43 @@ class ChartGenerator:
                 logger.info(f"No valid data to plot for comparison chart '{title}'. Skipping.")
                 return None
 
-            with self._chart_context((14, 8)) as (fig, ax):
-                x = np.arange(len(categories))
-                width = 0.35
-
-                # Enhanced color scheme for comparison
-                sold_color = '#2E86AB'      # Professional blue
-                attended_color = '#F18F01'   # Professional orange
-
-                # Create bars with enhanced styling
-                bars1 = ax.bar(x - width/2, sold_counts, width,
-                            label='Tickets Sold', color=sold_color, alpha=0.8,
-                            edgecolor='white', linewidth=2)
-                bars2 = ax.bar(x + width/2, attended_counts, width,
-                            label='Attendees', color=attended_color, alpha=0.8,
-                            edgecolor='white', linewidth=2)
-
-                # Add value labels on bars
-                for bars in [bars1, bars2]:
-                    for bar in bars:
-                        height = bar.get_height()
-                        if height > 0:
-                            ax.text(bar.get_x() + bar.get_width()/2., height + max(max(sold_counts), max(attended_counts)) * 0.01,
-                                    f'{int(height)}', ha='center', va='bottom',
-                                    fontweight='bold', fontsize=11, color='#333333')
-
-                # Enhanced styling
-                ax.set_title(title, fontsize=18, fontweight='bold', pad=25, color='#2E86AB')
-                ax.set_xlabel('Ticket Type', fontsize=14, fontweight='bold', color='#333333')
-                ax.set_ylabel('Count', fontsize=14, fontweight='bold', color='#333333')
-
-                # Improve grid and axes
-                ax.grid(True, linestyle='--', alpha=0.7, color='#cccccc')
-                ax.set_axisbelow(True)
-
-                # Style the axes
-                ax.spines['top'].set_visible(False)
-                ax.spines['right'].set_visible(False)
-                ax.spines['left'].set_color('#cccccc')
-                ax.spines['bottom'].set_color('#cccccc')
-
-                # Set ticks and labels
-                ax.set_xticks(x)
-                ax.set_xticklabels(categories, rotation=45, ha='right', fontsize=11)
-                ax.tick_params(axis='y', labelsize=11)
-
-                # Enhanced legend
-                legend = ax.legend(loc='upper left', frameon=True, fancybox=True, shadow=True,
-                                fontsize=12, title_fontsize=12)
-                legend.get_frame().set_facecolor('white')
-                legend.get_frame().set_alpha(0.9)
-
-                # Set y-axis limits with padding
-                max_value = max(max(sold_counts) if sold_counts else [0],
-                            max(attended_counts) if attended_counts else [0])
-                ax.set_ylim(0, max_value * 1.15)
-
-                plt.tight_layout()
-                return self._save_chart_safely(fig, title)
-
+            chart_data = {'labels': [str(c) for c in categories], 'sold': sold_counts, 'attended': attended_counts}
+            return self._render('comparison', chart_data, title=title)
         except Exception as e:
             logger.error(f"Error creating comparison chart '{title}': {e}", exc_info=True)
             return None
 
-    def create_all_charts(self, report_data: dict) -> List[str]:
-        chart_paths = []
+    def create_all_charts(self, report_data: dict) -> List[bytes]:
+        chart_images = []
         currency_symbol = report_data.get('currency_symbol', 'KSh')  # Default to KSh instead of $
         if 'tickets_by_type' in report_data:
-            path = self.create_pie_chart(report_data['tickets_by_type'], title="Tickets Sold by Type")
-            if path: chart_paths.append(path)
+            image = self.create_pie_chart(report_data['tickets_by_type'], title="Tickets Sold by Type")
+            if image: chart_images.append(image)
         if 'revenue_by_type' in report_data:
-            path = self.create_bar_chart(
+            image = self.create_bar_chart(
                 report_data['revenue_by_type'],
                 title="Revenue by Ticket Type",
                 xlabel="Ticket Type",
                 ylabel="Revenue",
                 currency_symbol=currency_symbol
             )
-            if path: chart_paths.append(path)
+            if image: chart_images.append(image)
         if 'payment_method_usage' in report_data:
-            path = self.create_pie_chart(report_data['payment_method_usage'], title="Payment Method Usage")
-            if path: chart_paths.append(path)
+            image = self.create_pie_chart(report_data['payment_method_usage'], title="Payment Method Usage")
+            if image: chart_images.append(image)
         if 'attendees_by_type' in report_data and 'tickets_by_type' in report_data:
-            path = self.create_comparison_chart(
+            image = self.create_comparison_chart(
                 sold_data=report_data['tickets_by_type'],
                 attended_data=report_data['attendees_by_type'],
                 title="Tickets Sold vs Attendees"
             )
-            if path: chart_paths.append(path)
-        return chart_paths
+            if image: chart_images.append(image)
+        return chart_images
 
 class PDFReportGenerator:
+    # Part of the artifact store key; bump when the PDF layout changes so stored PDFs are re-rendered
+    TEMPLATE_VERSION = 1
+
     def __init__(self, config: ReportConfig):
         self.config = config
         self.styles = getSampleStyleSheet()
@@ -999,50 +753,24 @@ class PDFReportGenerator:
             tables.append(("Payment Method Usage", table))
         return tables
 
-    def _add_charts_to_story(self, story, chart_paths):
-        if not chart_paths or not self.config.include_charts:
+    def _add_charts_to_story(self, story, chart_images: List[bytes]):
+        if not chart_images or not self.config.include_charts:
             return
         story.append(Paragraph("VISUAL ANALYTICS", self.subtitle_style))
-        for i, chart_path in enumerate(chart_paths):
-            if not chart_path:
-                continue
-            max_retries = 3
-            retry_count = 0
-            while retry_count < max_retries:
-                if os.path.exists(chart_path) and os.path.getsize(chart_path) > 0:
-                    try:
-                        with open(chart_path, 'rb') as f:
-                            header = f.read(8)
-                            if header.startswith(b'\x89PNG\r\n\x1a\n'):
-                                break
-                    except Exception as e:
-                        logger.warning(f"File verification failed for {chart_path}: {e}")
-                retry_count += 1
-                if retry_count < max_retries:
-                    time.sleep(0.1)
-            if retry_count >= max_retries:
-                logger.error(f"Could not verify chart file after {max_retries} attempts: {chart_path}")
+        for i, chart_image in enumerate(chart_images):
+            if not chart_image or not chart_image.startswith(b'\x89PNG\r\n\x1a\n'):
+                logger.error(f"Skipping invalid chart image #{i + 1}")
                 continue
             try:
-                img = Image(chart_path, width=6*inch, height=4.5*inch)
+                img = Image(BytesIO(chart_image), width=6*inch, height=4.5*inch)
                 story.append(img)
                 story.append(Spacer(1, 20))
-                if (i + 1) % 2 == 0 and i < len(chart_paths) - 1:
+                if (i + 1) % 2 == 0 and i < len(chart_images) - 1:
                     story.append(PageBreak())
-                logger.info(f"Successfully added chart to PDF: {chart_path}")
             except Exception as img_e:
-                logger.error(f"Error adding image {chart_path} to PDF: {img_e}", exc_info=True)
-
-    def _cleanup_chart_files(self, chart_paths):
-        for chart_path in chart_paths:
-            if chart_path and os.path.exists(chart_path):
-                try:
-                    os.remove(chart_path)
-                    logger.debug(f"Cleaned up chart file: {chart_path}")
-                except Exception as cleanup_error:
-                    logger.warning(f"Failed to cleanup chart file {chart_path}: {cleanup_error}")
+                logger.error(f"Error adding chart image #{i + 1} to PDF: {img_e}", exc_info=True)
 
-    def generate_pdf(self, report_data: Dict[str, Any], chart_paths: List[str], output_path: str, session: Session, event_id: int, target_currency: str = "KES") -> Optional[str]:
+    def generate_pdf(self, report_data: Dict[str, Any], chart_images: List[bytes], output_path: str, session: Session, event_id: int, target_currency: str = "KES") -> Optional[str]:
         try:
             processed_data = ReportDataProcessor.process_report_data(
                 report_data=report_data,
@@ -1096,8 +824,8 @@ class PDFReportGenerator:
                 story.append(PageBreak())
 
             # Visual Analytics (Charts)
-            if chart_paths:
-                self._add_charts_to_story(story, chart_paths)
+            if chart_images:
+                self._add_charts_to_story(story, chart_images)
 
             # Detailed Breakdown (Tables)
             story.append(PageBreak())
@@ -1119,81 +847,91 @@ class PDFReportGenerator:
             story.append(Paragraph(footer_text, self.normal_style))
 
             doc.build(story)
-            self._cleanup_chart_files(chart_paths)
             return output_path
 
         except Exception as e:
             logger.error(f"Error generating PDF report: {e}", exc_info=True)
-            self._cleanup_chart_files(chart_paths)
             return None
 
 class CSVReportGenerator:
+    # Part of the artifact store key; bump when the CSV columns change
+    TEMPLATE_VERSION = 1
+
+    @staticmethod
+    def iter_rows(processed_data: Dict[str, Any]):
+        """Yield the report's CSV rows section by section"""
+        # Report Summary
+        yield ['Report Summary']
+        yield ['Metric', 'Value']
+        yield ['Event Name', processed_data.get('event_name', 'N/A')]
+        yield ['Report Period Start', processed_data.get('filter_start_date', 'N/A')]
+        yield ['Report Period End', processed_data.get('filter_end_date', 'N/A')]
+        yield ['Total Tickets Sold', processed_data.get('total_tickets_sold', 0)]
+        currency_symbol = processed_data.get('currency_symbol', '$')
+        yield ['Total Revenue', f"{currency_symbol}{processed_data.get('total_revenue', 0.0):.2f}"]
+        yield ['Total Attendees', processed_data.get('number_of_attendees', 0)]
+        total_tickets_sold = processed_data.get('total_tickets_sold', 0)
+        number_of_attendees = processed_data.get('number_of_attendees', 0)
+        attendance_rate = (float(number_of_attendees) / total_tickets_sold * 100) if total_tickets_sold > 0 else 0.0
+        yield ['Attendance Rate', f"{attendance_rate:.1f}%"]
+        yield ['Currency', f"{processed_data.get('currency', 'USD')} ({currency_symbol})"]
+        yield []
+        # Ticket Sales Breakdown
+        if processed_data.get('tickets_by_type'):
+            yield ['Ticket Sales Breakdown']
+            yield ['Ticket Type', 'Tickets Sold', 'Percentage']
+            tickets_sold_by_type = processed_data['tickets_by_type']
+            total_tickets_breakdown = sum(tickets_sold_by_type.values())
+            for ticket_type, count in tickets_sold_by_type.items():
+                percentage = (float(count) / total_tickets_breakdown * 100) if total_tickets_breakdown > 0 else 0.0
+                yield [ticket_type, count, f"{percentage:.1f}%"]
+            yield []
+        # Revenue Breakdown
+        if processed_data.get('revenue_by_type'):
+            yield ['Revenue Breakdown']
+            yield ['Ticket Type', 'Revenue', 'Percentage']
+            revenue_by_ticket_type = processed_data['revenue_by_type']
+            total_revenue_breakdown = sum(revenue_by_ticket_type.values())
+            for ticket_type, revenue in revenue_by_ticket_type.items():
+                percentage = (revenue / total_revenue_breakdown * 100) if total_revenue_breakdown > 0 else 0.0
+                yield [ticket_type, f"{currency_symbol}{revenue:.2f}", f"{percentage:.1f}%"]
+            yield []
+        # Payment Method Usage
+        if processed_data.get('payment_method_usage'):
+            yield ['Payment Method Usage']
+            yield ['Payment Method', 'Transactions', 'Percentage']
+            payment_method_usage = processed_data['payment_method_usage']
+            total_transactions_usage = sum(payment_method_usage.values())
+            for method, count in payment_method_usage.items():
+                percentage = (float(count) / total_transactions_usage * 100) if total_transactions_usage > 0 else 0.0
+                yield [method, count, f"{percentage:.1f}%"]
+            yield []
+        # Daily Revenue
+        if processed_data.get('daily_revenue'):
+            yield ['Daily Revenue']
+            yield ['Date', 'Revenue', 'Tickets Sold']
+            sorted_daily_revenue = sorted(processed_data['daily_revenue'].items())
+            for date_str, daily_data in sorted_daily_revenue:
+                daily_revenue = float(daily_data.get('revenue', 0.0))
+                daily_tickets = int(daily_data.get('tickets_sold', 0))
+                yield [date_str, f"{currency_symbol}{daily_revenue:.2f}", daily_tickets]
+            yield []
+
+    @staticmethod
+    def report_rows(report_data: Dict[str, Any], session: Session, event_id: int):
+        processed_data = ReportDataProcessor.process_report_data(
+            session=session,
+            event_id=event_id,
+            report_data=report_data
+        )
+        return CSVReportGenerator.iter_rows(processed_data)
+
     @staticmethod
     def generate_csv(report_data: Dict[str, Any], output_path: str, session: Session, event_id: int) -> Optional[str]:
         try:
-            processed_data = ReportDataProcessor.process_report_data(
-                session=session,
-                event_id=event_id,
-                report_data=report_data
-            )
+            rows = CSVReportGenerator.report_rows(report_data, session, event_id)
             with open(output_path, 'w', newline='', encoding='utf-8') as csvfile:
-                writer = csv.writer(csvfile)
-                # Report Summary
-                writer.writerow(['Report Summary'])
-                writer.writerow(['Metric', 'Value'])
-                writer.writerow(['Event Name', processed_data.get('event_name', 'N/A')])
-                writer.writerow(['Report Period Start', processed_data.get('filter_start_date', 'N/A')])
-                writer.writerow(['Report Period End', processed_data.get('filter_end_date', 'N/A')])
-                writer.writerow(['Total Tickets Sold', processed_data.get('total_tickets_sold', 0)])
-                currency_symbol = processed_data.get('currency_symbol', '$')
-                writer.writerow(['Total Revenue', f"{currency_symbol}{processed_data.get('total_revenue', 0.0):.2f}"])
-                writer.writerow(['Total Attendees', processed_data.get('number_of_attendees', 0)])
-                total_tickets_sold = processed_data.get('total_tickets_sold', 0)
-                number_of_attendees = processed_data.get('number_of_attendees', 0)
-                attendance_rate = (float(number_of_attendees) / total_tickets_sold * 100) if total_tickets_sold > 0 else 0.0
-                writer.writerow(['Attendance Rate', f"{attendance_rate:.1f}%"])
-                writer.writerow(['Currency', f"{processed_data.get('currency', 'USD')} ({currency_symbol})"])
-                writer.writerow([])
-                # Ticket Sales Breakdown
-                if processed_data.get('tickets_by_type'):
-                    writer.writerow(['Ticket Sales Breakdown'])
-                    writer.writerow(['Ticket Type', 'Tickets Sold', 'Percentage'])
-                    tickets_sold_by_type = processed_data['tickets_by_type']
-                    total_tickets_breakdown = sum(tickets_sold_by_type.values())
-                    for ticket_type, count in tickets_sold_by_type.items():
-                        percentage = (float(count) / total_tickets_breakdown * 100) if total_tickets_breakdown > 0 else 0.0
-                        writer.writerow([ticket_type, count, f"{percentage:.1f}%"])
-                    writer.writerow([])
-                # Revenue Breakdown
-                if processed_data.get('revenue_by_type'):
-                    writer.writerow(['Revenue Breakdown'])
-                    writer.writerow(['Ticket Type', 'Revenue', 'Percentage'])
-                    revenue_by_ticket_type = processed_data['revenue_by_type']
-                    total_revenue_breakdown = sum(revenue_by_ticket_type.values())
-                    for ticket_type, revenue in revenue_by_ticket_type.items():
-                        percentage = (revenue / total_revenue_breakdown * 100) if total_revenue_breakdown > 0 else 0.0
-                        writer.writerow([ticket_type, f"{currency_symbol}{revenue:.2f}", f"{percentage:.1f}%"])
-                    writer.writerow([])
-                # Payment Method Usage
-                if processed_data.get('payment_method_usage'):
-                    writer.writerow(['Payment Method Usage'])
-                    writer.writerow(['Payment Method', 'Transactions', 'Percentage'])
-                    payment_method_usage = processed_data['payment_method_usage']
-                    total_transactions_usage = sum(payment_method_usage.values())
-                    for method, count in payment_method_usage.items():
-                        percentage = (float(count) / total_transactions_usage * 100) if total_transactions_usage > 0 else 0.0
-                        writer.writerow([method, count, f"{percentage:.1f}%"])
-                    writer.writerow([])
-                # Daily Revenue
-                if processed_data.get('daily_revenue'):
-                    writer.writerow(['Daily Revenue'])
-                    writer.writerow(['Date', 'Revenue', 'Tickets Sold'])
-                    sorted_daily_revenue = sorted(processed_data['daily_revenue'].items())
-                    for date_str, daily_data in sorted_daily_revenue:
-                        daily_revenue = float(daily_data.get('revenue', 0.0))
-                        daily_tickets = int(daily_data.get('tickets_sold', 0))
-                        writer.writerow([date_str, f"{currency_symbol}{daily_revenue:.2f}", daily_tickets])
-                    writer.writerow([])
+                csv.writer(csvfile).writerows(rows)
             return output_path
         except Exception as e:
             logger.error(f"Error generating CSV report: {e}", exc_info=True)
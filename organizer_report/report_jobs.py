@@ -0,0 +1,392 @@
+"""
+Background report jobs.
+
+GenerateReportResource records a `ReportJob` row and returns immediately; the
+report data, charts, PDF, CSV and optional email are produced in a process
+pool (charting is CPU bound and would otherwise hold a gunicorn thread and
+the GIL). Repeated requests from the same user for the same (event, date
+range, ticket type, currency, email recipient) are deduplicated across
+workers by a partial unique index on active jobs, and clients poll the job
+for progress and download the artifacts when done. The requester is part of
+the key because only they (or an admin) may read the job, and the recipient
+because each request's email delivery has to be honoured.
+"""
+import os
+import uuid
+import hashlib
+import logging
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta
+from decimal import Decimal
+from functools import partial
+from threading import Lock
+from typing import Any, Dict, Optional, Tuple
+
+from sqlalchemy.exc import IntegrityError
+
+from model import db, ReportJob, Event, Currency, CurrencyCode
+from rate_snapshot import rate_snapshots
+from .config import ReportConfig
+from .utils import FileManager
+
+logger = logging.getLogger(__name__)
+
+ACTIVE_STATUSES = ('queued', 'running')
+
+# Set in each pool process by _init_worker
+_worker_app = None
+
+
+def _init_worker():
+    """Process pool initializer: load the Flask app once per worker process"""
+    global _worker_app
+    from app import app
+    from chart_service import chart_service, warm_renderer
+    _worker_app = app
+    # Already off the web worker: draw charts in this process rather than a nested pool
+    chart_service.inline = True
+    warm_renderer(chart_service.style)
+
+
+# ===== REPORT SUMMARY =====
+def build_report_summary(job: ReportJob, report_data: Dict[str, Any]) -> Dict[str, Any]:
+    """Summary, currency conversion and chart data returned to the client when the job completes"""
+    target_currency_code = job.target_currency
+    target_currency = Currency.query.filter_by(code=CurrencyCode(target_currency_code), is_active=True).first()
+
+    total_revenue_ksh = report_data.get('total_revenue', 0)
+    total_tickets_sold = report_data.get('total_tickets_sold', 0)
+    actual_attendee_count = (report_data.get('attendee_count')
+                             or report_data.get('number_of_attendees')
+                             or report_data.get('total_attendees', 0))
+
+    # The same snapshot the saved report was built with, so figures agree with the PDF
+    snapshot = rate_snapshots.for_report(report_data)
+    if not snapshot.has(target_currency_code):
+        logger.warning(f"Report job {job.id}: no {target_currency_code} rate in snapshot {snapshot.id[:12]}")
+        target_currency_code = 'KES'
+    ksh_to_usd_rate, usd_to_target_rate = snapshot.legs.get(target_currency_code, (Decimal('1'), Decimal('1')))
+    overall_conversion_rate = snapshot.rate(target_currency_code)
+    converted_amount = snapshot.convert(total_revenue_ksh, target_currency_code)
+
+    revenue_by_ticket_type = report_data.get('revenue_by_ticket_type') or report_data.get('revenue_by_type', {})
+    if target_currency_code != 'KES' and revenue_by_ticket_type:
+        revenue_by_ticket_type = {
+            key: float(value) for key, value in snapshot.convert_many(revenue_by_ticket_type, target_currency_code).items()
+        }
+
+    chart_data = {
+        'tickets_sold_by_type': report_data.get('tickets_sold_by_type') or report_data.get('ticket_sales_by_type', {}),
+        'revenue_by_ticket_type': revenue_by_ticket_type,
+        'attendees_by_ticket_type': report_data.get('attendees_by_ticket_type') or report_data.get('attendee_breakdown', {}),
+        'payment_method_usage': report_data.get('payment_method_usage') or report_data.get('payment_methods', {}),
+        'daily_sales': report_data.get('daily_sales', {}),
+        'hourly_sales': report_data.get('hourly_sales', {}),
+        'sales_trends': report_data.get('sales_trends', []),
+    }
+    if not any([chart_data['tickets_sold_by_type'], chart_data['revenue_by_ticket_type'],
+                chart_data['attendees_by_ticket_type']]):
+        chart_data['tickets_sold_by_type'] = {'General': total_tickets_sold}
+        chart_data['revenue_by_ticket_type'] = {'General': float(converted_amount)}
+        chart_data['attendees_by_ticket_type'] = {'General': actual_attendee_count}
+
+    converted = float(converted_amount.quantize(Decimal('0.01')))
+    return {
+        'report_id': job.report_id,
+        'report_data_summary': {
+            'total_tickets_sold': total_tickets_sold,
+            'total_revenue_original': float(total_revenue_ksh),
+            'total_revenue_converted': converted,
+            'number_of_attendees': actual_attendee_count,
+            'original_currency': 'KES',
+            'target_currency': target_currency_code,
+            'currency_symbol': target_currency.symbol if target_currency else 'KSh'
+        },
+        'report_period': {
+            'start_date': job.start_date.isoformat(),
+            'end_date': job.end_date.isoformat(),
+            'is_single_day': job.is_single_day
+        },
+        'currency_conversion': {
+            'original_amount': float(total_revenue_ksh),
+            'original_currency': 'KES',
+            'converted_amount': converted,
+            'converted_currency': target_currency_code,
+            'conversion_steps': {
+                'ksh_to_usd_rate': float(ksh_to_usd_rate),
+                'usd_to_target_rate': float(usd_to_target_rate),
+                'overall_conversion_rate': float(overall_conversion_rate)
+            },
+            'rate_snapshot_id': snapshot.id,
+            'conversion_successful': target_currency_code != 'KES' or total_revenue_ksh == 0
+        },
+        'email_sent': False,
+        'chart_data': chart_data,
+        'has_detailed_data': bool(any([
+            report_data.get('tickets_sold_by_type'),
+            report_data.get('revenue_by_ticket_type'),
+            report_data.get('attendees_by_ticket_type')
+        ]))
+    }
+
+
+def build_email_report_data(job: ReportJob, report_data: Dict[str, Any], summary: Dict[str, Any]) -> Dict[str, Any]:
+    """Report data in the job's currency for the summary email"""
+    event = Event.query.get(job.event_id)
+    figures = summary['report_data_summary']
+    conversion = summary['currency_conversion']
+    target_currency_code = conversion['converted_currency']
+    overall_rate = conversion['conversion_steps']['overall_conversion_rate']
+    converted = target_currency_code != 'KES'
+
+    email_report_data = report_data.copy()
+    email_report_data.update({
+        'event_name': event.name if event else report_data.get('event_name'),
+        'currency_symbol': figures['currency_symbol'],
+        'total_revenue': figures['total_revenue_converted'],
+        'currency': target_currency_code,
+        'target_currency': target_currency_code,
+        'report_period_start': job.start_date.strftime('%Y-%m-%d'),
+        'report_period_end': job.end_date.strftime('%Y-%m-%d'),
+        'conversion_rate': overall_rate if overall_rate != 1 else None,
+        'base_currency': 'KES',
+        'base_currency_symbol': 'KSh',
+        'original_revenue': figures['total_revenue_original'] if converted else None,
+        'original_currency': 'KES' if converted else None,
+        'conversion_rate_used': overall_rate if overall_rate != 1 else None,
+        'currency_conversion_source': 'currencyapi.com (with fallback)',
+        'attendee_count': figures['number_of_attendees'],
+        'number_of_attendees': figures['number_of_attendees'],
+    })
+    if converted and email_report_data.get('revenue_by_type'):
+        email_report_data['revenue_by_type'] = summary['chart_data']['revenue_by_ticket_type']
+    return email_report_data
+
+
+# ===== JOB EXECUTION =====
+def _update_job(job_id: str, only_active: bool = False, **values):
+    query = ReportJob.query.filter(ReportJob.id == job_id)
+    if only_active:
+        query = query.filter(ReportJob.status.in_(ACTIVE_STATUSES))
+    updated = query.update(dict(values, updated_at=datetime.utcnow()), synchronize_session=False)
+    db.session.commit()
+    return updated
+
+
+def _fail_job(job_id: str, error: str):
+    try:
+        _update_job(job_id, only_active=True, status='failed', error=error[:2000], finished_at=datetime.utcnow())
+    except Exception as e:
+        db.session.rollback()
+        logger.error(f"Could not mark report job {job_id} as failed: {e}")
+
+
+def run_report_job(job_id: str, app=None):
+    """Entry point executed in the pool (or inline when REPORT_JOB_SYNC is set)"""
+    app = app or _worker_app
+    with app.app_context():
+        try:
+            # Claim the job; a second submission of the same id becomes a no-op
+            if not ReportJob.query.filter_by(id=job_id, status='queued').update(
+                    {'status': 'running', 'stage': 'starting', 'progress': 5,
+                     'started_at': datetime.utcnow(), 'updated_at': datetime.utcnow()},
+                    synchronize_session=False):
+                db.session.rollback()
+                return
+            db.session.commit()
+            _execute_report_job(ReportJob.query.get(job_id))
+        except Exception as e:
+            db.session.rollback()
+            logger.error(f"Report job {job_id} failed: {e}", exc_info=True)
+            _fail_job(job_id, str(e))
+        finally:
+            db.session.remove()
+
+
+def _execute_report_job(job: ReportJob):
+    from .services import ReportService  # ReportLab, pandas and charts load only where reports are built
+
+    progress = lambda percent, stage: _update_job(job.id, progress=percent, stage=stage)
+
+    report_service = ReportService(ReportConfig(include_email=job.send_email))
+    result = report_service.generate_complete_report(
+        event_id=job.event_id,
+        organizer_id=job.requested_by,
+        start_date=job.start_date,
+        end_date=job.end_date,
+        session=db.session,
+        ticket_type_id=job.ticket_type_id,
+        target_currency_code='KES',
+        send_email=False,
+        artifact_currency_code=job.target_currency,
+        progress=progress
+    )
+    if not result['success']:
+        raise RuntimeError(result.get('error') or 'Failed to generate report')
+    if not result.get('database_id'):
+        raise RuntimeError('Report generated but could not retrieve ID')
+
+    job.report_id = result['database_id']
+    summary = build_report_summary(job, result['report_data'])
+
+    if job.send_email and job.recipient_email:
+        progress(95, 'sending_email')
+        summary['email_sent'] = report_service.send_report_email(
+            report_data=build_email_report_data(job, result['report_data'], summary),
+            pdf_path='',
+            csv_path='',
+            recipient_email=job.recipient_email
+        )
+
+    _update_job(
+        job.id,
+        status='completed',
+        progress=100,
+        stage='completed',
+        report_id=result['database_id'],
+        pdf_path=result.get('pdf_path'),
+        csv_path=result.get('csv_path'),
+        result=summary,
+        finished_at=datetime.utcnow()
+    )
+    logger.info(f"Report job {job.id} completed for event {job.event_id} (report {result['database_id']})")
+
+
+# ===== QUEUE =====
+class ReportJobQueue:
+    """Persists report jobs and runs them in a per-worker process pool"""
+
+    def __init__(self):
+        self.app = None
+        self._executor = None
+        self._pid = None
+        self._lock = Lock()
+
+    def init_app(self, app):
+        self.app = app
+        app.config.setdefault('REPORT_JOB_WORKERS', 1)
+        app.config.setdefault('REPORT_JOB_SYNC', False)
+        app.config.setdefault('REPORT_JOB_TIMEOUT', 900)
+        app.config.setdefault('REPORT_JOB_RETENTION_HOURS', 24)
+
+    @staticmethod
+    def dedup_key(requested_by: int, event_id: int, start_date: datetime, end_date: datetime,
+                  ticket_type_id: Optional[int], target_currency: str, recipient_email: Optional[str] = None) -> str:
+        raw = (f"{requested_by}|{event_id}|{start_date.isoformat()}|{end_date.isoformat()}|"
+               f"{ticket_type_id or ''}|{target_currency}|{(recipient_email or '').lower()}")
+        return hashlib.sha1(raw.encode()).hexdigest()
+
+    @staticmethod
+    def _active_job(dedup_key: str) -> Optional[ReportJob]:
+        return ReportJob.query.filter(
+            ReportJob.dedup_key == dedup_key,
+            ReportJob.status.in_(ACTIVE_STATUSES)
+        ).first()
+
+    def enqueue(self, requested_by: int, event_id: int, start_date: datetime, end_date: datetime,
+                ticket_type_id: Optional[int] = None, target_currency: str = 'KES', is_single_day: bool = False,
+                send_email: bool = False, recipient_email: Optional[str] = None) -> Tuple[ReportJob, bool]:
+        """Queue a report job; returns (job, created) where created is False for a deduplicated request"""
+        key = self.dedup_key(requested_by, event_id, start_date, end_date, ticket_type_id, target_currency,
+                             recipient_email if send_email else None)
+        existing = self._active_job(key)
+        if existing:
+            return existing, False
+
+        job = ReportJob(
+            id=uuid.uuid4().hex,
+            requested_by=requested_by,
+            event_id=event_id,
+            ticket_type_id=ticket_type_id,
+            start_date=start_date,
+            end_date=end_date,
+            is_single_day=is_single_day,
+            target_currency=target_currency,
+            send_email=send_email,
+            recipient_email=recipient_email,
+            dedup_key=key,
+            status='queued',
+            stage='queued'
+        )
+        db.session.add(job)
+        try:
+            db.session.commit()
+        except IntegrityError:
+            # Another worker queued the same report between our check and insert
+            db.session.rollback()
+            existing = self._active_job(key)
+            if existing:
+                return existing, False
+            raise
+
+        self._submit(job.id)
+        if self.app.config['REPORT_JOB_SYNC']:
+            db.session.refresh(job)
+        return job, True
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        # One pool per gunicorn worker; spawned children don't inherit the web worker's threads
+        with self._lock:
+            if self._executor is None or self._pid != os.getpid():
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.app.config['REPORT_JOB_WORKERS'],
+                    mp_context=multiprocessing.get_context('spawn'),
+                    initializer=_init_worker
+                )
+                self._pid = os.getpid()
+            return self._executor
+
+    def _submit(self, job_id: str):
+        if self.app.config['REPORT_JOB_SYNC']:
+            run_report_job(job_id, self.app)
+            return
+        future = self._get_executor().submit(run_report_job, job_id)
+        future.add_done_callback(partial(self._on_done, job_id))
+
+    def _on_done(self, job_id: str, future):
+        error = future.exception()
+        if error is None:
+            return
+        # The pool process died (e.g. OOM) before the job could record its own failure
+        logger.error(f"Report job {job_id} worker crashed: {error}")
+        with self._lock:
+            self._executor = None
+        with self.app.app_context():
+            _fail_job(job_id, f"Report worker crashed: {error}")
+            db.session.remove()
+
+    def get(self, job_id: str) -> Optional[ReportJob]:
+        return ReportJob.query.get(job_id)
+
+    def cleanup(self) -> None:
+        """Fail jobs whose worker stopped reporting and drop expired jobs and their files"""
+        now = datetime.utcnow()
+        stale_before = now - timedelta(seconds=self.app.config['REPORT_JOB_TIMEOUT'])
+        stale = ReportJob.query.filter(
+            ReportJob.status.in_(ACTIVE_STATUSES),
+            ReportJob.updated_at < stale_before
+        ).update({'status': 'failed', 'error': 'Report job timed out', 'finished_at': now, 'updated_at': now},
+                 synchronize_session=False)
+
+        expired = ReportJob.query.filter(
+            ReportJob.status.in_(('completed', 'failed')),
+            ReportJob.finished_at < now - timedelta(hours=self.app.config['REPORT_JOB_RETENTION_HOURS'])
+        ).all()
+        for job in expired:
+            FileManager.cleanup_files([job.pdf_path, job.csv_path])
+            db.session.delete(job)
+        db.session.commit()
+
+        if stale or expired:
+            logger.info(f"Report job cleanup: {stale} timed out, {len(expired)} expired")
+
+    def shutdown(self, wait: bool = True):
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=wait)
+                self._executor = None
+
+
+# Initialize globally — must be attached via report_jobs.init_app(app)
+report_jobs = ReportJobQueue()
@@ -0,0 +1,233 @@
+"""
+Single-pass report aggregation.
+
+Replaces the per-metric DatabaseQueryService round trips used when building a
+report with two grouped statements on indexable predicates:
+
+1. sales  - paid tickets grouped by (ticket type, payment method); every sales
+            breakdown and total is rolled up from these few rows.
+2. scans  - scans of the event's tickets grouped by ticket type, with FILTER
+            clauses for the requested date range plus scan diagnostics.
+
+`payment_status == PaymentStatus.PAID` replaces `cast(payment_status, String)
+.ilike("paid")`, so the (event_id, payment_status, purchase_date) index applies.
+
+ReportIndexQuery lists saved reports for the history page from summary
+columns only, keyset-paginated on the (organizer_id, [event_id,] timestamp, id)
+indexes.
+"""
+import base64
+import logging
+from dataclasses import dataclass, field
+from datetime import datetime
+from decimal import Decimal
+from typing import Dict, List, Optional, Any, Tuple
+
+from sqlalchemy import func, tuple_
+
+from model import db, Ticket, TicketType, Transaction, Scan, PaymentStatus, Report, Event, Currency
+
+logger = logging.getLogger(__name__)
+
+
+def _label(value) -> str:
+    """Enum members are reported by value, matching DatabaseQueryService"""
+    return str(value.value) if hasattr(value, 'value') else str(value)
+
+
+@dataclass
+class EventReportAggregates:
+    """All figures needed by create_report_data for one event and date range"""
+    tickets_by_type: Dict[str, int] = field(default_factory=dict)
+    revenue_by_type: Dict[str, Decimal] = field(default_factory=dict)
+    payment_method_usage: Dict[str, int] = field(default_factory=dict)
+    attendees_by_type: Dict[str, int] = field(default_factory=dict)
+    total_tickets_sold: int = 0
+    total_revenue: Decimal = Decimal('0')
+    total_attendees: int = 0
+    event_scan_count: int = 0
+    scans_in_range: int = 0
+    first_scan_at: Optional[datetime] = None
+    last_scan_at: Optional[datetime] = None
+
+    @property
+    def attendance_rate(self) -> float:
+        if self.total_tickets_sold == 0:
+            return 0.0
+        return round(self.total_attendees / self.total_tickets_sold * 100, 2)
+
+    def scan_date_range(self):
+        if not self.event_scan_count:
+            return None
+        return (self.first_scan_at, self.last_scan_at)
+
+
+class ReportQueryEngine:
+    """Computes all event report breakdowns in two grouped queries"""
+
+    @staticmethod
+    def aggregate_event(event_id: int, start_date: datetime, end_date: datetime,
+                        ticket_type_id: Optional[int] = None) -> EventReportAggregates:
+        return ReportQueryEngine.aggregate_events([event_id], start_date, end_date, ticket_type_id)[event_id]
+
+    @staticmethod
+    def aggregate_events(event_ids: List[int], start_date: datetime, end_date: datetime,
+                         ticket_type_id: Optional[int] = None) -> Dict[int, EventReportAggregates]:
+        """Aggregates for several events over the same date range, still in two grouped queries"""
+        results = {event_id: EventReportAggregates() for event_id in event_ids}
+        if not event_ids:
+            return results
+
+        # 1) Sales: one row per (event, ticket type, payment method)
+        sales_query = (db.session.query(
+                           Ticket.event_id,
+                           TicketType.type_name,
+                           Transaction.payment_method,
+                           func.count(Ticket.id),
+                           func.coalesce(func.sum(Ticket.quantity), 0),
+                           func.coalesce(func.sum(TicketType.price * Ticket.quantity), 0)
+                       )
+                       .select_from(Ticket)
+                       .join(TicketType, Ticket.ticket_type_id == TicketType.id)
+                       .join(Transaction, Ticket.transaction_id == Transaction.id)
+                       .filter(
+                           Ticket.event_id.in_(event_ids),
+                           Ticket.payment_status == PaymentStatus.PAID,
+                           Ticket.purchase_date >= start_date,
+                           Ticket.purchase_date <= end_date
+                       ))
+        if ticket_type_id:
+            sales_query = sales_query.filter(Ticket.ticket_type_id == ticket_type_id)
+
+        for event_id, type_name, method, ticket_rows, quantity, revenue in sales_query.group_by(
+                Ticket.event_id, TicketType.type_name, Transaction.payment_method).all():
+            aggregates = results[event_id]
+            type_key = _label(type_name)
+            method_key = _label(method)
+            revenue = Decimal(str(revenue))
+            aggregates.tickets_by_type[type_key] = aggregates.tickets_by_type.get(type_key, 0) + ticket_rows
+            aggregates.revenue_by_type[type_key] = aggregates.revenue_by_type.get(type_key, Decimal('0')) + revenue
+            aggregates.payment_method_usage[method_key] = aggregates.payment_method_usage.get(method_key, 0) + ticket_rows
+            aggregates.total_tickets_sold += int(quantity)
+            aggregates.total_revenue += revenue
+
+        # 2) Scans: attendees per type in range, plus diagnostics over all of each event's scans
+        in_range = Scan.scanned_at.between(start_date, end_date)
+        scans_query = (db.session.query(
+                           Ticket.event_id,
+                           TicketType.type_name,
+                           func.count(Scan.ticket_id.distinct()).filter(in_range),
+                           func.count(Scan.id),
+                           func.count(Scan.id).filter(in_range),
+                           func.min(Scan.scanned_at),
+                           func.max(Scan.scanned_at)
+                       )
+                       .select_from(Scan)
+                       .join(Ticket, Scan.ticket_id == Ticket.id)
+                       .join(TicketType, Ticket.ticket_type_id == TicketType.id)
+                       .filter(Ticket.event_id.in_(event_ids)))
+        if ticket_type_id:
+            scans_query = scans_query.filter(Ticket.ticket_type_id == ticket_type_id)
+
+        for event_id, type_name, attendees, scans, scans_in_range, first_scan, last_scan in scans_query.group_by(
+                Ticket.event_id, TicketType.type_name).all():
+            aggregates = results[event_id]
+            if attendees:
+                aggregates.attendees_by_type[_label(type_name)] = attendees
+            # A ticket has exactly one type, so per-type distinct counts sum to the total
+            aggregates.total_attendees += attendees
+            aggregates.event_scan_count += scans
+            aggregates.scans_in_range += scans_in_range
+            if first_scan and (aggregates.first_scan_at is None or first_scan < aggregates.first_scan_at):
+                aggregates.first_scan_at = first_scan
+            if last_scan and (aggregates.last_scan_at is None or last_scan > aggregates.last_scan_at):
+                aggregates.last_scan_at = last_scan
+
+        logger.debug(f"Report aggregates for events {event_ids}: {results}")
+        return results
+
+    @staticmethod
+    def as_processed_data(aggregates: EventReportAggregates) -> Dict[str, Any]:
+        """Shape aggregates like DatabaseQueryService-based ReportDataProcessor output"""
+        return {
+            'total_tickets_sold': aggregates.total_tickets_sold,
+            'number_of_attendees': aggregates.total_attendees,
+            'total_revenue': aggregates.total_revenue,
+            'attendance_rate': aggregates.attendance_rate,
+            'tickets_by_type': dict(aggregates.tickets_by_type),
+            'revenue_by_type': {k: float(v) for k, v in aggregates.revenue_by_type.items()},
+            'attendees_by_type': dict(aggregates.attendees_by_type),
+            'payment_method_usage': dict(aggregates.payment_method_usage),
+        }
+
+
+class ReportIndexQuery:
+    """Report history listing: summary columns only, keyset-paginated on (timestamp, id)
+
+    report_data (JSONB) is never read here; clients fetch it per report from
+    /reports/<id> when a row is opened.
+    """
+
+    @staticmethod
+    def encode_cursor(timestamp: datetime, report_id: int) -> str:
+        raw = f"{timestamp.isoformat()}|{report_id}"
+        return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+    @staticmethod
+    def decode_cursor(cursor: str) -> Tuple[datetime, int]:
+        """Raises ValueError for a malformed cursor"""
+        try:
+            raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode()
+            timestamp, report_id = raw.rsplit('|', 1)
+            return datetime.fromisoformat(timestamp), int(report_id)
+        except Exception as e:
+            raise ValueError(f"Invalid cursor: {cursor}") from e
+
+    @staticmethod
+    def page(owner_id: Optional[int] = None, event_id: Optional[int] = None,
+             scope: Optional[str] = None, start_date: Optional[datetime] = None,
+             end_date: Optional[datetime] = None, cursor: Optional[str] = None,
+             limit: int = 20) -> Tuple[List[Any], Optional[str]]:
+        """One page of report summaries, newest first, and the cursor for the next page
+
+        owner_id is the generating user's id (Report.organizer_id references
+        user.id); None lists every organizer's reports (admin).
+        """
+        query = db.session.query(
+            Report.id,
+            Report.event_id,
+            Event.name.label('event_name'),
+            Report.ticket_type_id,
+            Report.report_scope,
+            Report.report_date,
+            Report.timestamp,
+            Report.total_tickets_sold,
+            Report.number_of_attendees,
+            Report.total_revenue,
+            Currency.code.label('base_currency'),
+            Report.rate_snapshot_id
+        ).join(
+            Event, Event.id == Report.event_id
+        ).outerjoin(
+            Currency, Currency.id == Report.base_currency_id
+        )
+
+        if owner_id is not None:
+            query = query.filter(Report.organizer_id == owner_id)
+        if event_id:
+            query = query.filter(Report.event_id == event_id)
+        if scope:
+            query = query.filter(Report.report_scope == scope)
+        if start_date and end_date:
+            query = query.filter(Report.timestamp.between(start_date, end_date))
+        if cursor:
+            timestamp, report_id = ReportIndexQuery.decode_cursor(cursor)
+            query = query.filter(tuple_(Report.timestamp, Report.id) < tuple_(timestamp, report_id))
+
+        # One extra row tells us whether another page exists without a COUNT(*)
+        rows = query.order_by(Report.timestamp.desc(), Report.id.desc()).limit(limit + 1).all()
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            next_cursor = ReportIndexQuery.encode_cursor(rows[-1].timestamp, rows[-1].id)
+        return rows, next_cursor
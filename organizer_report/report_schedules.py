@@ -0,0 +1,198 @@
+"""
+Scheduled, pre-generated organizer reports.
+
+Organizers subscribe to a daily or weekly report per event. A batch job
+(registered with the shared job scheduler) picks up subscriptions that are
+due - they fall due at REPORT_SCHEDULE_HOUR, server local time, so the work
+happens off-peak - and generates them with ReportService.generate_complete_report.
+
+Due subscriptions are grouped by organizer and frequency: each group shares one
+ReportQueryEngine.aggregate_events pass over all of its events, and the whole
+batch shares one exchange rate snapshot. The rendered PDF is put into the
+artifact store, so the dashboard's latest report and its export link are served
+without recomputing anything.
+"""
+import logging
+from collections import defaultdict
+from datetime import datetime, time, timedelta
+from typing import TYPE_CHECKING, Dict, List, Optional, Tuple
+
+from model import db, ReportSubscription, Report
+from rate_snapshot import rate_snapshots
+from .artifact_store import artifact_store
+from .config import ReportConfig
+from .report_queries import ReportQueryEngine
+from .utils import DateUtils, FileManager
+
+if TYPE_CHECKING:
+    from .services import ReportService
+
+logger = logging.getLogger(__name__)
+
+FREQUENCIES = {
+    'daily': timedelta(days=1),
+    'weekly': timedelta(weeks=1),
+}
+
+
+class ReportScheduler:
+    """Manages report subscriptions and generates due reports in bulk"""
+
+    def __init__(self):
+        self.app = None
+
+    def init_app(self, app):
+        self.app = app
+        app.config.setdefault('REPORT_SCHEDULE_HOUR', 2)
+        app.config.setdefault('REPORT_SCHEDULE_INTERVAL', 900)
+        app.config.setdefault('REPORT_SCHEDULE_BATCH_SIZE', 200)
+
+    # ===== SCHEDULE =====
+    def next_run_at(self, frequency: str, after: datetime) -> datetime:
+        """Next off-peak slot strictly after `after` (one period later for weekly)"""
+        slot = datetime.combine(after.date(), time(self.app.config['REPORT_SCHEDULE_HOUR']))
+        if slot <= after:
+            slot += timedelta(days=1)
+        return slot if frequency == 'daily' else slot + FREQUENCIES[frequency] - timedelta(days=1)
+
+    @staticmethod
+    def report_period(frequency: str, run_at: datetime) -> Tuple[datetime, datetime]:
+        """The full days covered by a run: yesterday, or the seven days up to yesterday"""
+        end_date = DateUtils.adjust_end_date(run_at.date() - timedelta(days=1))
+        start_date = datetime.combine(end_date.date() - FREQUENCIES[frequency] + timedelta(days=1), time.min)
+        return start_date, end_date
+
+    # ===== SUBSCRIPTIONS =====
+    def subscribe(self, user_id: int, event_id: int, frequency: str,
+                  target_currency: str = 'KES') -> ReportSubscription:
+        if frequency not in FREQUENCIES:
+            raise ValueError(f"Unsupported frequency '{frequency}'. Use one of: {', '.join(FREQUENCIES)}")
+
+        subscription = ReportSubscription.query.filter_by(
+            user_id=user_id, event_id=event_id, frequency=frequency
+        ).first()
+        if subscription is None:
+            subscription = ReportSubscription(user_id=user_id, event_id=event_id, frequency=frequency)
+            db.session.add(subscription)
+        if not subscription.is_active or subscription.next_run_at is None:
+            subscription.next_run_at = self.next_run_at(frequency, datetime.now())
+        subscription.target_currency = target_currency
+        subscription.is_active = True
+        db.session.commit()
+        return subscription
+
+    @staticmethod
+    def unsubscribe(subscription: ReportSubscription) -> None:
+        subscription.is_active = False
+        db.session.commit()
+
+    @staticmethod
+    def latest_report(event_id: int, user_id: Optional[int] = None,
+                      frequency: Optional[str] = None) -> Tuple[Optional[ReportSubscription], Optional[Report]]:
+        """Most recently generated scheduled report for an event"""
+        query = ReportSubscription.query.filter(
+            ReportSubscription.event_id == event_id,
+            ReportSubscription.last_report_id.isnot(None)
+        )
+        if user_id is not None:
+            query = query.filter(ReportSubscription.user_id == user_id)
+        if frequency:
+            query = query.filter(ReportSubscription.frequency == frequency)
+        subscription = query.order_by(ReportSubscription.last_run_at.desc()).first()
+        if subscription is None:
+            return None, None
+        return subscription, subscription.last_report
+
+    # ===== BATCH =====
+    def run_due(self, now: Optional[datetime] = None) -> int:
+        """Generate every due subscription's report; returns the number generated"""
+        now = now or datetime.now()
+        due = ReportSubscription.query.filter(
+            ReportSubscription.is_active.is_(True),
+            ReportSubscription.next_run_at <= now
+        ).order_by(
+            ReportSubscription.user_id, ReportSubscription.event_id
+        ).limit(self.app.config['REPORT_SCHEDULE_BATCH_SIZE']).all()
+        if not due:
+            return 0
+
+        # Captured once and kept on flask.g, so every report in the batch uses the same rates
+        snapshot = rate_snapshots.current()
+        logger.info(f"Scheduled reports: {len(due)} due, using rate snapshot {snapshot.id[:12]}")
+
+        groups: Dict[Tuple[int, str], List[ReportSubscription]] = defaultdict(list)
+        for subscription in due:
+            groups[(subscription.user_id, subscription.frequency)].append(subscription)
+
+        from .services import ReportService  # ReportLab, pandas and charts load only when reports are due
+
+        report_service = ReportService(ReportConfig(include_email=False))
+        generated = 0
+        for (user_id, frequency), subscriptions in groups.items():
+            start_date, end_date = self.report_period(frequency, now)
+            aggregates = ReportQueryEngine.aggregate_events(
+                [subscription.event_id for subscription in subscriptions], start_date, end_date
+            )
+            for subscription in subscriptions:
+                if self._generate(report_service, subscription, start_date, end_date,
+                                  aggregates[subscription.event_id], now):
+                    generated += 1
+
+        logger.info(f"Scheduled reports: generated {generated} of {len(due)} in "
+                    f"{(datetime.now() - now).total_seconds():.1f}s")
+        return generated
+
+    def _generate(self, report_service: 'ReportService', subscription: ReportSubscription,
+                  start_date: datetime, end_date: datetime, aggregates, now: datetime) -> bool:
+        subscription_id = subscription.id
+        result = report_service.generate_complete_report(
+            event_id=subscription.event_id,
+            organizer_id=subscription.user_id,
+            start_date=start_date,
+            end_date=end_date,
+            session=db.session,
+            target_currency_code='KES',
+            artifact_currency_code=subscription.target_currency,
+            aggregates=aggregates,
+            report_scope=f"scheduled_{subscription.frequency}"
+        )
+        try:
+            if result['success'] and result.get('database_id'):
+                self._store_pdf(result['database_id'], subscription.target_currency, result.get('pdf_path'))
+            subscription = ReportSubscription.query.get(subscription_id)
+            subscription.last_run_at = now
+            subscription.next_run_at = self.next_run_at(subscription.frequency, now)
+            if result['success']:
+                subscription.last_report_id = result.get('database_id')
+                subscription.last_error = None
+            else:
+                subscription.last_error = (result.get('error') or 'Failed to generate report')[:2000]
+                logger.warning(f"Scheduled report {subscription_id} failed: {subscription.last_error}")
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            logger.error(f"Could not record scheduled report {subscription_id}: {e}")
+            return False
+        finally:
+            FileManager.cleanup_files([result.get('pdf_path'), result.get('csv_path')])
+        return bool(result['success'])
+
+    @staticmethod
+    def _store_pdf(report_id: int, currency: str, pdf_path: Optional[str]) -> None:
+        """Keep the rendered PDF so the first dashboard export is a cache hit"""
+        if not pdf_path or not artifact_store.root:
+            return
+        from .report_generators import PDFReportGenerator
+        report = Report.query.get(report_id)
+        if not report or not report.report_data:
+            return
+        digest = artifact_store.content_digest(report.report_data, report.rate_snapshot_id)
+        try:
+            with open(pdf_path, 'rb') as f:
+                artifact_store.put(report_id, digest, 'pdf', currency, PDFReportGenerator.TEMPLATE_VERSION, f.read())
+        except OSError as e:
+            logger.warning(f"Could not store scheduled PDF for report {report_id}: {e}")
+
+
+# Initialize globally — must be attached via report_schedules.init_app(app)
+report_schedules = ReportScheduler()
@@ -1,4 +1,4 @@
-from typing import Dict, List, Any, Optional, Tuple
+from typing import Callable, Dict, List, Any, Optional, Tuple
 from datetime import datetime
 from decimal import Decimal
 from model import db, Ticket, TicketType, Transaction, Scan, Event, User, Report, Organizer, Currency, ExchangeRate, PaymentStatus
@@ -7,12 +7,13 @@ from email_utils import send_email_with_attachment
 from .report_generators import ChartGenerator
 from .report_generators import PDFReportGenerator
 from .report_generators import CSVReportGenerator
+from .report_queries import ReportQueryEngine, EventReportAggregates
 from sqlalchemy import func, cast, String
 import logging
 import os
 import json
-import time
-from currency_routes import get_exchange_rate, convert_ksh_to_target_currency, rate_cache
+from exchange_rates import exchange_rates
+from rate_snapshot import rate_snapshots
 
 logger = logging.getLogger(__name__)
 
@@ -276,31 +277,12 @@ class EnhancedCurrencyConverter:
 
     @staticmethod
     def convert_amount(amount: Decimal, from_currency: str, to_currency: str) -> Decimal:
-        """Convert amount using the integrated currency exchange service"""
+        """Convert amount with the current request's exchange rate snapshot"""
         if from_currency == to_currency:
             return amount
         try:
             amount = Decimal(str(amount))
-            if from_currency.upper() == 'KES':
-                if to_currency.upper() == 'KES':
-                    return amount
-                converted_amount, _, _ = convert_ksh_to_target_currency(amount, to_currency)
-                return converted_amount.quantize(Decimal('0.01'))
-            elif to_currency.upper() == 'KES':
-                rate = get_exchange_rate(from_currency, 'KES')
-                if rate == 0:
-                    logger.error(f"Exchange rate for {from_currency} to KES is zero.")
-                    return amount
-                kes_amount = amount * rate
-                return kes_amount.quantize(Decimal('0.01'))
-            else:
-                source_to_kes_rate = get_exchange_rate(from_currency, 'KES')
-                if source_to_kes_rate == 0:
-                    logger.error(f"Exchange rate for {from_currency} to KES is zero.")
-                    return amount
-                kes_amount = amount * source_to_kes_rate
-                converted_amount, _, _ = convert_ksh_to_target_currency(kes_amount, to_currency)
-                return converted_amount.quantize(Decimal('0.01'))
+            return rate_snapshots.current().convert(amount, to_currency.upper(), from_currency.upper())
         except Exception as e:
             logger.error(f"Currency conversion error from {from_currency} to {to_currency}: {e}")
             return amount.quantize(Decimal('0.01'))
@@ -308,30 +290,20 @@ class EnhancedCurrencyConverter:
 class ReportDataProcessor:
     @staticmethod
     def process_report_data(report_data: Dict[str, Any], event_id: int, start_date: datetime, end_date: datetime) -> Dict[str, Any]:
-        """Process comprehensive report data using all available DatabaseQueryService methods."""
-        total_tickets_sold = DatabaseQueryService.get_total_tickets_sold(event_id, start_date, end_date)
-        total_attendees = DatabaseQueryService.get_total_attendees(event_id, start_date, end_date)
-        total_revenue = DatabaseQueryService.get_total_revenue(event_id, start_date, end_date)
-        attendance_rate = DatabaseQueryService.get_attendance_rate(event_id, start_date, end_date)
-        tickets_by_type = DatabaseQueryService.get_tickets_sold_by_type(event_id, start_date, end_date)
-        revenue_by_type = DatabaseQueryService.get_revenue_by_type(event_id, start_date, end_date)
-        attendees_by_type = DatabaseQueryService.get_attendees_by_type(event_id, start_date, end_date)
-        payment_methods = DatabaseQueryService.get_payment_method_usage(event_id, start_date, end_date)
+        """Process comprehensive report data from a single ReportQueryEngine pass."""
+        aggregates = ReportQueryEngine.aggregate_event(event_id, start_date, end_date)
+        total_tickets_sold = aggregates.total_tickets_sold
+        total_attendees = aggregates.total_attendees
+        total_revenue = aggregates.total_revenue
+        attendance_rate = aggregates.attendance_rate
         base_currency_code = DatabaseQueryService.get_event_base_currency(event_id)
         processed_data = {
-            'total_tickets_sold': total_tickets_sold,
-            'number_of_attendees': total_attendees,
-            'total_revenue': total_revenue,
-            'attendance_rate': attendance_rate,
-            'tickets_by_type': dict(tickets_by_type),
-            'revenue_by_type': {k: float(v) for k, v in revenue_by_type},
-            'attendees_by_type': dict(attendees_by_type),
-            'payment_method_usage': dict(payment_methods),
+            **ReportQueryEngine.as_processed_data(aggregates),
             'base_currency_code': base_currency_code,
             'report_start_date': start_date.isoformat(),
             'report_end_date': end_date.isoformat(),
             'currency_conversion_source': 'currencyapi.com',
-            'conversion_cache_status': f"{len(rate_cache.cache)} rates cached",
+            'conversion_cache_status': f"{len(exchange_rates.matrix().rates)} rates cached",
             'scan_statistics': {},
             'data_integrity': {'valid': True, 'issues': [], 'recommendations': []},
             'no_show_rate': round(100 - attendance_rate, 2) if attendance_rate is not None else 100.0,
@@ -406,7 +378,6 @@ class ReportService:
         self.pdf_generator = PDFReportGenerator(self.config)
         self.db_service = DatabaseQueryService()
         self.currency_converter = EnhancedCurrencyConverter()
-        self._processing_cache = {}  # Simple in-memory cache to prevent duplicate processing
 
     def _sanitize_report_data(self, data: Dict[str, Any]) -> Dict[str, Any]:
         """Sanitize data to ensure all keys and values are database-compatible"""
@@ -442,11 +413,11 @@ class ReportService:
                 sanitized[str_key] = str(value)
         return sanitized
 
-    def _generate_charts(self, report_data: Dict[str, Any]) -> List[str]:
-        """Generate charts based on report data and return list of chart file paths"""
+    def _generate_charts(self, report_data: Dict[str, Any]) -> List[bytes]:
+        """Generate charts based on report data and return them as PNG bytes"""
         if not self.chart_generator:
             return []
-        chart_paths = []
+        chart_images = []
         try:
             if report_data.get('tickets_by_type'):
                 tickets_chart = self.chart_generator.create_pie_chart(
@@ -454,7 +425,7 @@ class ReportService:
                     title="Tickets Sold by Type"
                 )
                 if tickets_chart:
-                    chart_paths.append(tickets_chart)
+                    chart_images.append(tickets_chart)
             if report_data.get('revenue_by_type'):
                 revenue_chart = self.chart_generator.create_bar_chart(
                     data=report_data['revenue_by_type'],
@@ -463,14 +434,14 @@ class ReportService:
                     ylabel=f"Revenue ({report_data.get('currency_symbol', '$')})"
                 )
                 if revenue_chart:
-                    chart_paths.append(revenue_chart)
+                    chart_images.append(revenue_chart)
             if report_data.get('payment_method_usage'):
                 payment_chart = self.chart_generator.create_pie_chart(
                     data=report_data['payment_method_usage'],
                     title="Payment Method Usage"
                 )
                 if payment_chart:
-                    chart_paths.append(payment_chart)
+                    chart_images.append(payment_chart)
             if report_data.get('attendees_by_type'):
                 attendees_chart = self.chart_generator.create_bar_chart(
                     data=report_data['attendees_by_type'],
@@ -479,9 +450,9 @@ class ReportService:
                     ylabel="Number of Attendees"
                 )
                 if attendees_chart:
-                    chart_paths.append(attendees_chart)
-            logger.info(f"Generated {len(chart_paths)} charts for event {report_data['event_id']}")
-            return chart_paths
+                    chart_images.append(attendees_chart)
+            logger.info(f"Generated {len(chart_images)} charts for event {report_data['event_id']}")
+            return chart_images
         except Exception as e:
             logger.error(f"Error generating charts: {e}")
             return []
@@ -544,224 +515,157 @@ class ReportService:
             logger.error(f"Error in data validation: {e}")
             return report_data
 
-    def _check_duplicate_processing(self, event_id: int, date_key: str) -> bool:
-        """Check if we're already processing this request to prevent duplicates"""
-        cache_key = f"{event_id}_{date_key}"
-        current_time = time.time()
-        
-        if cache_key in self._processing_cache:
-            last_processed = self._processing_cache[cache_key]
-            if current_time - last_processed < 10:  # 10 seconds cooldown
-                logger.warning(f"Duplicate processing detected for {cache_key}, skipping")
-                return True
-        
-        self._processing_cache[cache_key] = current_time
-        return False
-
     def create_report_data(self, event_id: int, start_date: datetime, end_date: datetime,
                           ticket_type_id: Optional[int] = None,
-                          target_currency_code: Optional[str] = None) -> Dict[str, Any]:
+                          target_currency_code: Optional[str] = None,
+                          aggregates: Optional[EventReportAggregates] = None) -> Dict[str, Any]:
+        logger.info(f"=== CREATING REPORT DATA ===")
+        logger.info(f"Event ID: {event_id}, Date Range: {start_date} to {end_date}")
         
-        date_key = f"{start_date.strftime('%Y%m%d')}_{end_date.strftime('%Y%m%d')}"
+        event = Event.query.get(event_id)
+        if not event:
+            raise ValueError(f"Event with ID {event_id} not found")
         
-        # Check for duplicate processing
-        if self._check_duplicate_processing(event_id, date_key):
-            raise ValueError("Report generation already in progress, please wait")
+        base_currency_code = self.db_service.get_event_base_currency(event_id)
+        display_currency_code = target_currency_code or base_currency_code
+        base_currency_info = self.currency_converter.get_currency_info(base_currency_code)
         
-        try:
-            logger.info(f"=== CREATING REPORT DATA ===")
-            logger.info(f"Event ID: {event_id}, Date Range: {start_date} to {end_date}")
-            
-            event = Event.query.get(event_id)
-            if not event:
-                raise ValueError(f"Event with ID {event_id} not found")
-            
-            # Enhanced debugging section
-            logger.debug("=== DATABASE INVESTIGATION ===")
-            # Check if tickets exist for this event
-            ticket_count = db.session.query(func.count(Ticket.id)).filter(Ticket.event_id == event_id).scalar()
-            logger.debug(f"Total tickets in database for event {event_id}: {ticket_count}")
-            
-            # Check if scans exist
-            scan_count = db.session.query(func.count(Scan.id)).scalar()
-            logger.debug(f"Total scans in database: {scan_count}")
-            
-            # Check if there are scans for tickets of this event
-            event_scan_count = (db.session.query(func.count(Scan.id))
-                               .join(Ticket, Scan.ticket_id == Ticket.id)
-                               .filter(Ticket.event_id == event_id)
-                               .scalar())
-            logger.debug(f"Scans for event {event_id} tickets: {event_scan_count}")
-            
-            # Check scans in date range specifically
-            scans_in_range = (db.session.query(func.count(Scan.id))
-                             .join(Ticket, Scan.ticket_id == Ticket.id)
-                             .filter(Ticket.event_id == event_id)
-                             .filter(Scan.scanned_at.between(start_date, end_date))
-                             .scalar())
-            logger.debug(f"Scans in requested date range ({start_date} to {end_date}): {scans_in_range}")
-            
-            # Check scan date ranges
-            if event_scan_count > 0:
-                scan_date_range = (db.session.query(
-                                    func.min(Scan.scanned_at),
-                                    func.max(Scan.scanned_at)
-                                  )
-                                  .join(Ticket, Scan.ticket_id == Ticket.id)
-                                  .filter(Ticket.event_id == event_id)
-                                  .first())
-                logger.debug(f"Scan date range for event {event_id}: {scan_date_range}")
-                logger.debug(f"Requested date range: {start_date} to {end_date}")
-            
-            logger.debug("=== END DATABASE INVESTIGATION ===")
-            
-            base_currency_code = self.db_service.get_event_base_currency(event_id)
-            display_currency_code = target_currency_code or base_currency_code
-            base_currency_info = self.currency_converter.get_currency_info(base_currency_code)
-            display_currency_info = self.currency_converter.get_currency_info(display_currency_code)
-            
-            logger.debug("Fetching raw database data...")
-            tickets_sold_data = self.db_service.get_tickets_sold_by_type(event_id, start_date, end_date)
-            logger.debug(f"Raw tickets_sold_data: {tickets_sold_data}")
-            
-            revenue_data = self.db_service.get_revenue_by_type(event_id, start_date, end_date)
-            logger.debug(f"Raw revenue_data: {revenue_data}")
-            
-            attendees_data = self.db_service.get_attendees_by_type(event_id, start_date, end_date)
-            logger.debug(f"Raw attendees_data: {attendees_data}")
-            
-            payment_methods = self.db_service.get_payment_method_usage(event_id, start_date, end_date)
-            logger.debug(f"Raw payment_methods: {payment_methods}")
-            
-            tickets_sold_by_type = dict(tickets_sold_data)
-            attendees_by_ticket_type = dict(attendees_data)
-            payment_method_usage = dict(payment_methods)
-            
-            total_revenue_base = self.db_service.get_total_revenue(event_id, start_date, end_date)
-            logger.debug(f"Total revenue (base currency): {total_revenue_base}")
-            
-            total_revenue_display = self.currency_converter.convert_amount(
-                total_revenue_base, base_currency_code, display_currency_code
-            )
-            logger.debug(f"Total revenue (display currency): {total_revenue_display}")
-            
-            revenue_by_ticket_type = {}
-            for ticket_type, revenue in revenue_data:
-                converted_revenue = self.currency_converter.convert_amount(
-                    revenue, base_currency_code, display_currency_code
-                )
-                revenue_by_ticket_type[ticket_type] = float(converted_revenue)
-            
-            total_tickets_sold = self.db_service.get_total_tickets_sold(event_id, start_date, end_date)
-            logger.debug(f"Total tickets sold: {total_tickets_sold}")
-            
-            total_attendees = self.db_service.get_total_attendees(event_id, start_date, end_date)
-            logger.debug(f"Total attendees from DB service: {total_attendees}")
-            
-            # IMPROVED FALLBACK LOGIC: If no scans but tickets sold, provide more context
-            if total_attendees == 0 and total_tickets_sold > 0:
-                logger.warning("⚠️ No attendees found but tickets were sold - investigating...")
-                
-                if event_scan_count == 0:
-                    logger.warning("🔍 No scans recorded for this event at all")
-                    logger.warning("💡 This could mean:")
-                    logger.warning("   1. Event hasn't started yet")
-                    logger.warning("   2. Scanning system not used")
-                    logger.warning("   3. Data integrity issue")
-                elif scans_in_range == 0 and event_scan_count > 0:
-                    logger.warning("🔍 Scans exist for this event but not in the requested date range")
-                    logger.warning("💡 Check if date range is correct or if scans are on different dates")
-            
-            # Calculate attendance rate
-            attendance_rate = 0.0
-            if total_tickets_sold > 0:
-                attendance_rate = (total_attendees / total_tickets_sold * 100)
-                logger.debug(f"Calculated attendance rate: {attendance_rate}%")
-            else:
-                logger.info("No tickets sold for this date range - attendance rate set to 0%")
-            
-            # Handle empty breakdowns
-            if total_attendees > 0 and not attendees_by_ticket_type:
-                logger.warning("Have total attendees but no breakdown - creating default breakdown")
-                attendees_by_ticket_type = {'General': total_attendees}
-            
-            if total_tickets_sold > 0 and not tickets_sold_by_type:
-                logger.warning("Have total tickets but no breakdown - creating default breakdown")
-                tickets_sold_by_type = {'General': total_tickets_sold}
+        # One rate snapshot converts every figure in the report
+        snapshot = rate_snapshots.current()
+        if not (snapshot.has(base_currency_code) and snapshot.has(display_currency_code)):
+            logger.warning(f"No rate for {base_currency_code} -> {display_currency_code} in snapshot "
+                           f"{snapshot.id[:12]}; reporting in {base_currency_code}")
+            display_currency_code = base_currency_code
+        display_currency_info = self.currency_converter.get_currency_info(display_currency_code)
+        
+        # All breakdowns, totals and scan diagnostics in two grouped queries (unless batched by the caller)
+        if aggregates is None:
+            aggregates = ReportQueryEngine.aggregate_event(event_id, start_date, end_date)
+        logger.debug(f"Report aggregates: {aggregates}")
+        
+        event_scan_count = aggregates.event_scan_count
+        scans_in_range = aggregates.scans_in_range
+        scan_date_range = aggregates.scan_date_range()
+        
+        tickets_sold_by_type = dict(aggregates.tickets_by_type)
+        attendees_by_ticket_type = dict(aggregates.attendees_by_type)
+        payment_method_usage = dict(aggregates.payment_method_usage)
+        
+        total_revenue_base = aggregates.total_revenue
+        logger.debug(f"Total revenue (base currency): {total_revenue_base}")
+        
+        total_revenue_display = snapshot.convert(total_revenue_base, display_currency_code, base_currency_code)
+        logger.debug(f"Total revenue (display currency): {total_revenue_display}")
+        
+        revenue_by_ticket_type = {
+            ticket_type: float(revenue)
+            for ticket_type, revenue in snapshot.convert_many(
+                aggregates.revenue_by_type, display_currency_code, base_currency_code
+            ).items()
+        }
+        
+        total_tickets_sold = aggregates.total_tickets_sold
+        total_attendees = aggregates.total_attendees
+        logger.debug(f"Total tickets sold: {total_tickets_sold}, attendees: {total_attendees}")
+        
+        # IMPROVED FALLBACK LOGIC: If no scans but tickets sold, provide more context
+        if total_attendees == 0 and total_tickets_sold > 0:
+            logger.warning("⚠️ No attendees found but tickets were sold - investigating...")
             
-            # Build report data
-            report_data = {
-                'event_id': event_id,
-                'event_name': event.name,
-                'event_date': event.event_date.isoformat() if hasattr(event, 'event_date') and event.event_date else 'N/A',
-                'event_location': getattr(event, 'location', 'N/A'),
-                'filter_start_date': start_date.strftime('%Y-%m-%d'),
-                'filter_end_date': end_date.strftime('%Y-%m-%d'),
-                'total_tickets_sold': total_tickets_sold,
-                'total_revenue': float(total_revenue_display),
-                'number_of_attendees': total_attendees,
-                'attendance_rate': round(attendance_rate, 2),
-                'tickets_by_type': tickets_sold_by_type,
-                'revenue_by_type': revenue_by_ticket_type,
-                'attendees_by_type': attendees_by_ticket_type,
-                'payment_method_usage': payment_method_usage,
-                'currency': display_currency_info['code'],
-                'currency_symbol': display_currency_info['symbol'],
-                'base_currency': base_currency_info['code'],
-                'base_currency_symbol': base_currency_info['symbol'],
-                'currency_conversion_source': 'currencyapi.com (with fallback)',
-                'conversion_cache_entries': len(rate_cache.cache),
-                # Debug info
-                'debug_info': {
-                    'total_tickets_in_db': ticket_count,
-                    'total_scans_in_db': scan_count,
-                    'event_scans_count': event_scan_count,
-                    'scans_in_date_range': scans_in_range,
-                    'scan_date_range_check': scan_date_range if event_scan_count > 0 else None,
-                    'requested_date_range': f"{start_date} to {end_date}"
-                }
+            if event_scan_count == 0:
+                logger.warning("🔍 No scans recorded for this event at all")
+                logger.warning("💡 This could mean:")
+                logger.warning("   1. Event hasn't started yet")
+                logger.warning("   2. Scanning system not used")
+                logger.warning("   3. Data integrity issue")
+            elif scans_in_range == 0 and event_scan_count > 0:
+                logger.warning("🔍 Scans exist for this event but not in the requested date range")
+                logger.warning("💡 Check if date range is correct or if scans are on different dates")
+        
+        # Calculate attendance rate
+        attendance_rate = 0.0
+        if total_tickets_sold > 0:
+            attendance_rate = (total_attendees / total_tickets_sold * 100)
+            logger.debug(f"Calculated attendance rate: {attendance_rate}%")
+        else:
+            logger.info("No tickets sold for this date range - attendance rate set to 0%")
+        
+        # Handle empty breakdowns
+        if total_attendees > 0 and not attendees_by_ticket_type:
+            logger.warning("Have total attendees but no breakdown - creating default breakdown")
+            attendees_by_ticket_type = {'General': total_attendees}
+        
+        if total_tickets_sold > 0 and not tickets_sold_by_type:
+            logger.warning("Have total tickets but no breakdown - creating default breakdown")
+            tickets_sold_by_type = {'General': total_tickets_sold}
+        
+        # Build report data
+        report_data = {
+            'event_id': event_id,
+            'event_name': event.name,
+            'event_date': event.event_date.isoformat() if hasattr(event, 'event_date') and event.event_date else 'N/A',
+            'event_location': getattr(event, 'location', 'N/A'),
+            'filter_start_date': start_date.strftime('%Y-%m-%d'),
+            'filter_end_date': end_date.strftime('%Y-%m-%d'),
+            'total_tickets_sold': total_tickets_sold,
+            'total_revenue': float(total_revenue_display),
+            'number_of_attendees': total_attendees,
+            'attendance_rate': round(attendance_rate, 2),
+            'tickets_by_type': tickets_sold_by_type,
+            'revenue_by_type': revenue_by_ticket_type,
+            'attendees_by_type': attendees_by_ticket_type,
+            'payment_method_usage': payment_method_usage,
+            'currency': display_currency_info['code'],
+            'currency_symbol': display_currency_info['symbol'],
+            'base_currency': base_currency_info['code'],
+            'base_currency_symbol': base_currency_info['symbol'],
+            'currency_conversion_source': 'currencyapi.com (with fallback)',
+            'conversion_cache_entries': len(exchange_rates.matrix().rates),
+            'rate_snapshot_id': snapshot.id,
+            'rate_snapshot_captured_at': snapshot.captured_at.isoformat(),
+            # Debug info
+            'debug_info': {
+                'event_scans_count': event_scan_count,
+                'scans_in_date_range': scans_in_range,
+                'scan_date_range_check': scan_date_range,
+                'requested_date_range': f"{start_date} to {end_date}"
             }
-            
-            # Handle currency conversion info
-            if base_currency_code != display_currency_code:
-                report_data['original_revenue'] = float(total_revenue_base)
-                report_data['original_currency'] = base_currency_info['code']
-                report_data['conversion_rate_used'] = float(
-                    self.currency_converter.convert_amount(Decimal('1'), base_currency_code, display_currency_code)
-                )
-            
-            # Handle ticket type filtering
-            if ticket_type_id:
-                ticket_type = TicketType.query.get(ticket_type_id)
-                if ticket_type:
-                    report_data['ticket_type_id'] = ticket_type_id
-                    report_data['ticket_type_name'] = ticket_type.type_name
-                    report_data['report_scope'] = 'ticket_type_summary'
-                else:
-                    report_data['report_scope'] = 'event_summary'
+        }
+        
+        # Handle currency conversion info
+        if base_currency_code != display_currency_code:
+            report_data['original_revenue'] = float(total_revenue_base)
+            report_data['original_currency'] = base_currency_info['code']
+            report_data['conversion_rate_used'] = float(
+                snapshot.cross_rate(base_currency_code, display_currency_code)
+            )
+        
+        # Handle ticket type filtering
+        if ticket_type_id:
+            ticket_type = TicketType.query.get(ticket_type_id)
+            if ticket_type:
+                report_data['ticket_type_id'] = ticket_type_id
+                report_data['ticket_type_name'] = ticket_type.type_name
+                report_data['report_scope'] = 'ticket_type_summary'
             else:
                 report_data['report_scope'] = 'event_summary'
-            
-            logger.info(f"=== REPORT DATA CREATED ===")
-            logger.info(f"Final attendee count: {report_data['number_of_attendees']}")
-            logger.info(f"Final attendance rate: {report_data['attendance_rate']}%")
-            logger.info(f"Attendees by type: {report_data['attendees_by_type']}")
-            
-            # Additional diagnostic info
-            if total_attendees == 0 and total_tickets_sold > 0:
-                logger.warning("⚠️ ATTENTION: Zero attendees with non-zero ticket sales")
-                logger.warning(f"📊 Tickets sold: {total_tickets_sold}")
-                logger.warning(f"📅 Date range: {start_date} to {end_date}")
-                logger.warning(f"🎫 Event scans available: {event_scan_count}")
-                logger.warning(f"🎫 Scans in date range: {scans_in_range}")
-            
-            return self._sanitize_report_data(report_data)
-            
-        finally:
-            # Clean up processing cache entry
-            cache_key = f"{event_id}_{date_key}"
-            if cache_key in self._processing_cache:
-                del self._processing_cache[cache_key]
+        else:
+            report_data['report_scope'] = 'event_summary'
+        
+        logger.info(f"=== REPORT DATA CREATED ===")
+        logger.info(f"Final attendee count: {report_data['number_of_attendees']}")
+        logger.info(f"Final attendance rate: {report_data['attendance_rate']}%")
+        logger.info(f"Attendees by type: {report_data['attendees_by_type']}")
+        
+        # Additional diagnostic info
+        if total_attendees == 0 and total_tickets_sold > 0:
+            logger.warning("⚠️ ATTENTION: Zero attendees with non-zero ticket sales")
+            logger.warning(f"📊 Tickets sold: {total_tickets_sold}")
+            logger.warning(f"📅 Date range: {start_date} to {end_date}")
+            logger.warning(f"🎫 Event scans available: {event_scan_count}")
+            logger.warning(f"🎫 Scans in date range: {scans_in_range}")
+        
+        return self._sanitize_report_data(report_data)
 
     def save_report_to_database(self, report_data: Dict[str, Any], organizer_id: int) -> Optional[Report]:
         try:
@@ -782,6 +686,7 @@ class ReportService:
                 existing_report.number_of_attendees = report_data.get('number_of_attendees', 0)
                 existing_report.report_data = self._sanitize_report_data(report_data)
                 existing_report.ticket_type_id = report_data.get('ticket_type_id')
+                existing_report.rate_snapshot_id = report_data.get('rate_snapshot_id')
                 
                 try:
                     db.session.commit()
@@ -813,6 +718,7 @@ class ReportService:
                 total_revenue=Decimal(str(report_data.get('total_revenue', 0))),
                 number_of_attendees=report_data.get('number_of_attendees', 0),
                 report_data=sanitized_report_data,
+                rate_snapshot_id=report_data.get('rate_snapshot_id'),
                 report_date=report_date
             )
             
@@ -831,16 +737,32 @@ class ReportService:
     def generate_complete_report(self, event_id: int, organizer_id: int, start_date: datetime,
                                 end_date: datetime, session, ticket_type_id: Optional[int] = None,
                                 target_currency_code: Optional[str] = None,
-                                send_email: bool = False, recipient_email: str = None) -> Dict[str, Any]:
-        chart_paths = []
+                                send_email: bool = False, recipient_email: str = None,
+                                artifact_currency_code: Optional[str] = None,
+                                progress: Optional[Callable[[int, str], None]] = None,
+                                aggregates: Optional[EventReportAggregates] = None,
+                                report_scope: Optional[str] = None) -> Dict[str, Any]:
+        """Build, save and render a report.
+
+        artifact_currency_code renders the PDF in a different currency from the
+        saved figures; progress(percent, stage) is called as each step starts.
+        aggregates lets batch callers pass figures from ReportQueryEngine.aggregate_events;
+        report_scope keeps scheduled reports apart from on-demand ones saved the same day.
+        """
+        chart_images = []
         pdf_path = None
         csv_path = None
+        progress = progress or (lambda percent, stage: None)
         
         try:
+            progress(10, 'collecting_data')
             report_data = self.create_report_data(
-                event_id, start_date, end_date, ticket_type_id, target_currency_code
+                event_id, start_date, end_date, ticket_type_id, target_currency_code, aggregates
             )
+            if report_scope:
+                report_data['report_scope'] = report_scope
             
+            progress(30, 'saving_report')
             saved_report = self.save_report_to_database(report_data, organizer_id)
             if saved_report:
                 report_data['database_id'] = saved_report.id
@@ -848,18 +770,20 @@ class ReportService:
             pdf_path, csv_path = FileManager.generate_unique_paths(event_id)
             
             if self.config.include_charts and self.chart_generator:
-                chart_paths = self._generate_charts(report_data)
-                logger.info(f"Generated {len(chart_paths)} charts for event {event_id}")
+                progress(45, 'rendering_charts')
+                chart_images = self._generate_charts(report_data)
             
+            progress(65, 'rendering_pdf')
             pdf_path = self.pdf_generator.generate_pdf(
                 report_data=report_data,
-                chart_paths=chart_paths,
+                chart_images=chart_images,
                 output_path=pdf_path,
                 session=session,
                 event_id=event_id,
-                target_currency=target_currency_code or "KES"
+                target_currency=artifact_currency_code or target_currency_code or "KES"
             )
             
+            progress(85, 'writing_csv')
             csv_path = CSVReportGenerator.generate_csv(
                 report_data=report_data,
                 output_path=csv_path,
@@ -869,6 +793,7 @@ class ReportService:
             
             email_sent = False
             if send_email and recipient_email and self.config.include_email:
+                progress(95, 'sending_email')
                 email_sent = self.send_report_email(
                     report_data, pdf_path, csv_path, recipient_email
                 )
@@ -878,7 +803,7 @@ class ReportService:
                 'report_data': report_data,
                 'pdf_path': pdf_path,
                 'csv_path': csv_path,
-                'chart_paths': chart_paths,
+                'chart_count': len(chart_images),
                 'email_sent': email_sent,
                 'database_id': report_data.get('database_id'),
                 'currency_info': {
@@ -896,12 +821,9 @@ class ReportService:
                 'report_data': None,
                 'pdf_path': None,
                 'csv_path': None,
-                'chart_paths': [],
+                'chart_count': 0,
                 'email_sent': False
             }
-        finally:
-            if chart_paths:
-                FileManager.cleanup_files(chart_paths)
 
 
     def send_report_email(self, report_data: Dict[str, Any], pdf_path: str,
@@ -1,20 +1,16 @@
 import logging
 from datetime import datetime, time
-from typing import Optional, Tuple, Dict
-from decimal import Decimal
+from typing import Optional, Tuple
 import tempfile
 import os
 
-# FIXED: Add the missing imports
-from model import Currency, ExchangeRate
-
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 def send_email_with_attachment(recipient, subject, body, attachments=None, is_html=False):
-    logger.info(f"Sending email to {recipient} with subject '{subject}' and {len(attachments or [])} attachments.")
-    return True
+    from email_utils import send_email_with_attachment as queue_email
+    return queue_email(recipient, subject, body, attachments=attachments, is_html=is_html)
 
 class DateUtils:
     @staticmethod
@@ -34,31 +30,6 @@ class DateUtils:
         else:
             return datetime.combine(end_date, time(23, 59, 59, 999999))
 
-class CurrencyConverter:
-    @staticmethod
-    def convert_amount(amount: Decimal, from_currency_id: int, to_currency_id: int) -> Decimal:
-        if from_currency_id == to_currency_id:
-            return amount
-        rate = ExchangeRate.query.filter_by(
-            from_currency_id=from_currency_id,
-            to_currency_id=to_currency_id,
-            is_active=True
-        ).order_by(ExchangeRate.effective_date.desc()).first()
-        if rate:
-            return amount * rate.rate
-        logger.warning(f"No exchange rate found from currency {from_currency_id} to {to_currency_id}")
-        return amount
-
-    @staticmethod
-    def get_currency_info(currency_id: int) -> Dict[str, str]:
-        currency = Currency.query.get(currency_id)
-        if currency:
-            return {
-                'code': currency.code,
-                'symbol': currency.symbol or '$'
-            }
-        return {'code': 'USD', 'symbol': '$'}
-
 class FileManager:
     @staticmethod
     def generate_unique_paths(event_id: int) -> Tuple[str, str]:
@@ -80,18 +51,18 @@ class FileManager:
 class AuthorizationMixin:
     @staticmethod
     def get_current_user():
-        from flask_jwt_extended import get_jwt_identity
-        from model import User
-        
-        current_user_id = get_jwt_identity()
-        return User.query.get(current_user_id)
+        from principal import current_principal
+        return current_principal()
     
     @staticmethod
     def check_organizer_access(user):
         from model import Organizer
+        from principal import Principal
         
         if not user:
             return False
+        if isinstance(user, Principal):
+            return user.organizer_id is not None
         
         # Check if user is an organizer
         organizer = Organizer.query.filter_by(user_id=user.id).first()
@@ -100,6 +71,7 @@ class AuthorizationMixin:
     @staticmethod
     def check_event_ownership(event, user):
         from model import Organizer, UserRole
+        from principal import Principal
         
         if not user or not event:
             return False
@@ -109,6 +81,8 @@ class AuthorizationMixin:
             return True
         
         # Check if user owns the event through organizer profile
+        if isinstance(user, Principal):
+            return user.organizer_id is not None and event.organizer_id == user.organizer_id
         organizer = Organizer.query.filter_by(user_id=user.id).first()
         if organizer and event.organizer_id == organizer.id:
             return True
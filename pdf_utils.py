@@ -2,17 +2,17 @@ import csv
 import io
 import logging
 import os
-import tempfile
 from datetime import datetime
 from typing import Dict, Any, Optional, List
 
-import matplotlib.pyplot as plt
 from reportlab.lib import colors
 from reportlab.lib.enums import TA_CENTER, TA_LEFT
 from reportlab.lib.pagesizes import A4
 from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
 from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Image
 
+from chart_service import chart_service
+
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
@@ -225,7 +225,10 @@ def generate_sample_data_for_testing(event_id: int = 1) -> Dict:
         "filter_end_date": "2024-07-31"
     }
 
-def generate_graph_image(report: Dict, path: str = "report_graph.png") -> str:
+GRAPH_OPTIONS = {'title': 'Revenue by Ticket Type', 'currency_symbol': '$', 'dpi': 300}
+
+def render_graph_image(report: Dict) -> Optional[bytes]:
+    """Revenue donut for a report as PNG bytes, rendered (or served from cache) by the chart service"""
     try:
         processed_report = validate_and_process_report_data(report)
         revenue_data = processed_report.get("revenue_by_ticket_type", {})
@@ -238,131 +241,36 @@ def generate_graph_image(report: Dict, path: str = "report_graph.png") -> str:
         filtered_data = {k: v for k, v in revenue_data.items() if isinstance(v, (int, float)) and v > 0}
         if not filtered_data:
             logger.warning("No positive revenue data found for chart generation")
-            return create_no_data_chart(processed_report, path)
-
-        labels = [label.upper() for label in filtered_data.keys()]
-        values = list(filtered_data.values())
-        chart_colors = [COLORS_BY_TICKET_MATPLOTLIB.get(label, FALLBACK_COLOR_MATPLOTLIB) for label in labels]
-
-        fig, ax = plt.subplots(figsize=(8, 8), facecolor='#1e1e1e')
-        ax.set_facecolor('#1e1e1e')
-
-        def make_autopct(values):
-            def autopct_func(pct):
-                absolute = int(pct/100.*sum(values))
-                return f'{pct:.1f}%\n(${absolute:.0f})' if pct > 5 else ''
-            return autopct_func
-
-        wedges, texts, autotexts = ax.pie(
-            values,
-            labels=labels,
-            colors=chart_colors,
-            autopct=make_autopct(values),
-            startangle=90,
-            pctdistance=0.85,
-            textprops={'color': '#cccccc', 'fontsize': 10, 'weight': 'bold'},
-            wedgeprops={'linewidth': 2, 'edgecolor': '#2a2a2a'}
-        )
-
-        centre_circle = plt.Circle((0, 0), 0.65, fc='#2a2a2a', linewidth=2, edgecolor='#1e1e1e')
-        fig.gca().add_artist(centre_circle)
-
-        total_revenue = sum(values)
-        ax.text(0, 0, f'Total Revenue\n${total_revenue:,.2f}', ha='center', va='center',
-                color='#ffffff', fontsize=12, weight='bold')
-
-        ax.axis('equal')
-        plt.title('Revenue by Ticket Type', color='#ffffff', fontsize=18, weight='bold', pad=20)
-        plt.tight_layout()
-
-        plt.savefig(path, transparent=False, dpi=300, bbox_inches='tight',
-                    facecolor=fig.get_facecolor(), edgecolor='none')
-        logger.info(f"Graph image successfully saved to {path}")
+            return chart_service.render(
+                'no_data_donut', {'total_tickets': processed_report.get('total_tickets_sold', 0)}, GRAPH_OPTIONS
+            )
+
+        labels = [str(label).upper() for label in filtered_data.keys()]
+        chart_data = {
+            'labels': labels,
+            'values': [float(v) for v in filtered_data.values()],
+            'colors': [COLORS_BY_TICKET_MATPLOTLIB.get(label, FALLBACK_COLOR_MATPLOTLIB) for label in labels]
+        }
+        image = chart_service.render('revenue_donut', chart_data, GRAPH_OPTIONS)
+        if not image:
+            raise ValueError("Chart rendering failed")
+        return image
 
     except Exception as e:
         logger.error(f"Error generating graph image: {e}")
-        return create_error_chart(path, str(e))
-    finally:
-        plt.close('all')
-
-    return path if os.path.exists(path) and os.path.getsize(path) > 0 else ""
-
-def create_no_data_chart(report: Dict, path: str) -> str:
-    try:
-        fig, ax = plt.subplots(figsize=(8, 8), facecolor='#1e1e1e')
-        ax.set_facecolor('#1e1e1e')
-
-        circle = plt.Circle((0, 0), 0.8, fc='#404040', linewidth=3, edgecolor='#606060')
-        ax.add_patch(circle)
-
-        ax.text(0, 0.1, "No Revenue Data", ha='center', va='center',
-                color='#ffffff', fontsize=16, weight='bold')
-        ax.text(0, -0.1, "Available", ha='center', va='center',
-                color='#cccccc', fontsize=12)
-
-        total_tickets = report.get('total_tickets_sold', 0)
-        if total_tickets > 0:
-            ax.text(0, -0.3, f"Tickets Sold: {total_tickets}", ha='center', va='center',
-                    color='#99ccff', fontsize=10)
-
-        ax.set_xlim(-1.2, 1.2)
-        ax.set_ylim(-1.2, 1.2)
-        ax.axis('equal')
-        ax.axis('off')
+        return chart_service.render('error_donut', {}, GRAPH_OPTIONS)
 
-        plt.title('Revenue by Ticket Type', color='#ffffff', fontsize=18, weight='bold', pad=20)
-        plt.tight_layout()
-
-        plt.savefig(path, transparent=False, dpi=300, bbox_inches='tight',
-                    facecolor=fig.get_facecolor(), edgecolor='none')
-        logger.info(f"No data chart saved to {path}")
-
-        return path
-
-    except Exception as e:
-        logger.error(f"Error creating no data chart: {e}")
-        return create_error_chart(path, "No data available")
-    finally:
-        plt.close('all')
-
-def create_error_chart(path: str, error_message: str = "Error generating chart") -> str:
-    try:
-        fig, ax = plt.subplots(figsize=(8, 8), facecolor='#1e1e1e')
-        ax.set_facecolor('#1e1e1e')
-
-        ax.text(0, 0.1, "Chart Generation Error", ha='center', va='center',
-                color='#ff6b6b', fontsize=14, weight='bold')
-        ax.text(0, -0.1, "Please check data format", ha='center', va='center',
-                color='#ff9999', fontsize=10)
-
-        triangle = plt.Polygon([[-0.1, -0.4], [0.1, -0.4], [0, -0.6]],
-                              closed=True, fill=True, color='#ff6b6b')
-        ax.add_patch(triangle)
-        ax.text(0, -0.5, '!', ha='center', va='center',
-                color='#1e1e1e', fontsize=12, weight='bold')
-
-        ax.set_xlim(-1, 1)
-        ax.set_ylim(-1, 1)
-        ax.axis('equal')
-        ax.axis('off')
-
-        plt.title('Revenue by Ticket Type', color='#ffffff', fontsize=18, weight='bold', pad=20)
-        plt.tight_layout()
-
-        plt.savefig(path, transparent=False, dpi=300, bbox_inches='tight',
-                    facecolor=fig.get_facecolor())
-        logger.info(f"Error chart saved to {path}")
-
-        return path
-
-    except Exception as fallback_error:
-        logger.error(f"Error creating fallback chart: {fallback_error}")
+def generate_graph_image(report: Dict, path: str = "report_graph.png") -> str:
+    image = render_graph_image(report)
+    if not image:
         return ""
-    finally:
-        plt.close('all')
+    with open(path, 'wb') as f:
+        f.write(image)
+    logger.info(f"Graph image successfully saved to {path}")
+    return path
 
 def generate_pdf_with_graph(report: Dict, event_id: int, pdf_path: str = "ticket_report.pdf",
-                            graph_path: str = "report_graph.png") -> str:
+                            graph_path: Optional[str] = None) -> str:
     if not isinstance(report, dict):
         logger.error("Report parameter must be a dictionary")
         return ""
@@ -370,14 +278,15 @@ def generate_pdf_with_graph(report: Dict, event_id: int, pdf_path: str = "ticket
     processed_report = validate_and_process_report_data(report)
     logger.info(f"Generating PDF for processed report with keys: {list(processed_report.keys())}")
 
-    if not os.path.exists(graph_path) or os.path.getsize(graph_path) == 0:
-        logger.info(f"Graph image not found at {graph_path}, generating new one")
+    graph_image = None
+    if graph_path and os.path.exists(graph_path) and os.path.getsize(graph_path) > 0:
+        with open(graph_path, 'rb') as f:
+            graph_image = f.read()
+    else:
         try:
-            generated_graph_path = generate_graph_image(processed_report, graph_path)
-            graph_path = generated_graph_path if generated_graph_path else None
+            graph_image = render_graph_image(processed_report)
         except Exception as e:
             logger.error(f"Failed to generate graph image for PDF: {e}")
-            graph_path = None
 
     try:
         doc = SimpleDocTemplate(
@@ -469,9 +378,9 @@ def generate_pdf_with_graph(report: Dict, event_id: int, pdf_path: str = "ticket
         revenue_data = processed_report.get("revenue_by_ticket_type", {})
         has_revenue_data = bool(revenue_data and any(isinstance(v, (int, float)) and v > 0 for v in revenue_data.values()))
 
-        if graph_path and os.path.exists(graph_path) and os.path.getsize(graph_path) > 0:
+        if graph_image:
             try:
-                img = Image(graph_path)
+                img = Image(io.BytesIO(graph_image))
                 img.drawWidth = min(400, A4[0] - 144)
                 img.drawHeight = min(400, A4[0] - 144)
                 img.hAlign = 'CENTER'
@@ -483,7 +392,7 @@ def generate_pdf_with_graph(report: Dict, event_id: int, pdf_path: str = "ticket
                     elements.append(Spacer(1, 12))
 
             except Exception as e:
-                logger.error(f"Failed to embed graph from {graph_path}: {e}")
+                logger.error(f"Failed to embed graph image: {e}")
                 elements.append(Paragraph("📊 Chart visualization unavailable", styles['CustomBodyText']))
                 elements.append(Spacer(1, 12))
         else:
@@ -547,7 +456,6 @@ class PDFReportGenerator:
     def generate_pdf_report(report_data: Dict, config=None) -> str:
         event_id = report_data.get("event_id", 0)
         pdf_path = f"report_{event_id}.pdf"
-        graph_path = f"report_graph_{event_id}.png"
 
         # Format the report data to match what your PDFReportGenerator expects
         formatted_data = format_report_data_for_pdf(report_data, event_id)
@@ -557,7 +465,7 @@ class PDFReportGenerator:
         logger.info(f"Formatted data keys: {list(formatted_data.keys())}")
         logger.info(f"Revenue data: {formatted_data.get('revenue_by_ticket_type', {})}")
 
-        return generate_pdf_with_graph(formatted_data, event_id, pdf_path, graph_path)
+        return generate_pdf_with_graph(formatted_data, event_id, pdf_path)
 
 class CSVExporter:
     @staticmethod
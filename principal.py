@@ -0,0 +1,154 @@
+"""
+Authenticated principal for the current request.
+
+Resources used to begin with `User.query.get(get_jwt_identity())`, often
+followed by `Organizer.query.filter_by(user_id=...)`: two queries before any
+real work, on every call. `current_principal()` resolves the caller's id,
+role, contact fields and organizer id once per request (kept on flask.g) from
+a small per-worker TTL cache keyed by user id and the token's `ver` claim, so
+most authenticated requests resolve the caller without touching the
+database. `current_user()` returns the ORM User for code that has to modify
+or traverse it, loaded at most once per request.
+
+A role change bumps `User.token_version`; tokens issued afterwards carry the
+new version and miss every worker's cache immediately. Profile edits call
+`principals.invalidate(user_id)` for this worker, and PRINCIPAL_CACHE_TTL
+bounds how long any other worker serves the old attributes.
+"""
+import logging
+import time
+from dataclasses import dataclass
+from functools import wraps
+from threading import Lock
+from typing import Dict, Optional, Tuple
+
+from flask import g
+from flask_jwt_extended import get_jwt, get_jwt_identity, verify_jwt_in_request
+
+from model import db, User, UserRole, Organizer
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class Principal:
+    """The authenticated caller; `id`, `role` and `email` read like the User columns"""
+    id: int
+    email: str
+    full_name: Optional[str]
+    phone_number: Optional[str]
+    role: UserRole
+    ai_enabled: bool
+    organizer_id: Optional[int]
+    token_version: int
+
+    def has_role(self, *roles: UserRole) -> bool:
+        return self.role in roles
+
+    @property
+    def is_admin(self) -> bool:
+        return self.role == UserRole.ADMIN
+
+
+class PrincipalCache:
+    """Per-worker TTL cache of principals by user id"""
+
+    def __init__(self, ttl: int = 30, max_entries: int = 10000):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries: Dict[int, Tuple[float, Principal]] = {}
+        self._lock = Lock()
+
+    def init_app(self, app):
+        app.config.setdefault('PRINCIPAL_CACHE_TTL', self.ttl)
+        app.config.setdefault('PRINCIPAL_CACHE_SIZE', self.max_entries)
+        self.ttl = app.config['PRINCIPAL_CACHE_TTL']
+        self.max_entries = app.config['PRINCIPAL_CACHE_SIZE']
+
+    @staticmethod
+    def _load(user_id: int) -> Optional[Principal]:
+        row = db.session.query(
+            User.id, User.email, User.full_name, User.phone_number, User.role,
+            User.ai_enabled, User.token_version, Organizer.id
+        ).outerjoin(Organizer, Organizer.user_id == User.id).filter(User.id == user_id).first()
+        if row is None:
+            return None
+        user_id, email, full_name, phone_number, role, ai_enabled, token_version, organizer_id = row
+        return Principal(
+            id=user_id, email=email, full_name=full_name, phone_number=phone_number, role=role,
+            ai_enabled=bool(ai_enabled), organizer_id=organizer_id, token_version=token_version or 0
+        )
+
+    def get(self, user_id: int, token_version: Optional[int] = None) -> Optional[Principal]:
+        """Cached principal, reloaded when expired or older than the presented token"""
+        cached = self._entries.get(user_id)
+        if cached is not None:
+            loaded_at, principal = cached
+            if time.monotonic() - loaded_at < self.ttl and (
+                    token_version is None or principal.token_version >= token_version):
+                return principal
+
+        principal = self._load(user_id)
+        with self._lock:
+            if principal is None:
+                self._entries.pop(user_id, None)
+                return None
+            if len(self._entries) >= self.max_entries and user_id not in self._entries:
+                # Dicts keep insertion order, so this drops the oldest load
+                self._entries.pop(next(iter(self._entries)))
+            self._entries[user_id] = (time.monotonic(), principal)
+        return principal
+
+    def invalidate(self, user_id: int) -> None:
+        """Forget a user in this worker (after a profile edit or deletion)"""
+        with self._lock:
+            self._entries.pop(int(user_id), None)
+
+    def bump_version(self, user: User) -> None:
+        """Record a role or organizer change; the caller commits"""
+        user.token_version = (user.token_version or 0) + 1
+        self.invalidate(user.id)
+
+
+# Initialize globally — must be attached via principals.init_app(app)
+principals = PrincipalCache()
+
+
+# ===== REQUEST ACCESSORS =====
+def current_principal() -> Optional[Principal]:
+    """The caller of the current request, or None when unauthenticated or unknown"""
+    if 'principal' not in g:
+        identity = get_jwt_identity()
+        principal = None
+        if identity is not None:
+            try:
+                principal = principals.get(int(identity), get_jwt().get('ver'))
+            except (TypeError, ValueError):
+                logger.warning(f"Unusable JWT identity: {identity!r}")
+        g.principal = principal
+    return g.principal
+
+
+def current_user() -> Optional[User]:
+    """The caller's User row, loaded once per request"""
+    if 'current_user' not in g:
+        principal = current_principal()
+        g.current_user = db.session.get(User, principal.id) if principal else None
+    return g.current_user
+
+
+def principal_required(*roles: UserRole, message: str = "Access denied"):
+    """jwt_required that also resolves the principal; 403 outside `roles` (404 for unknown users when no roles)"""
+    def decorator(fn):
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            verify_jwt_in_request()
+            principal = current_principal()
+            if principal is None and not roles:
+                return {"message": "User not found"}, 404
+            if principal is None or (roles and principal.role not in roles):
+                return {"message": message}, 403
+            return fn(*args, **kwargs)
+        return wrapper
+    return decorator
@@ -0,0 +1,229 @@
+"""
+Request quotas shared by every gunicorn worker.
+
+Limits are token buckets: "20 per minute" is a bucket of 20 tokens refilled
+at 20 tokens a minute. The default backend keeps the buckets in the
+`rate_limit_buckets` table and takes a token with a single upsert (refill,
+check and decrement happen under the row lock), so both workers - and any
+other host on the same database - draw from the same bucket. The memory
+backend keeps buckets in-process and is only meant for development and tests.
+
+HTTP endpoints, the AI event assistant, the currency API fetch and M-Pesa STK
+pushes all go through the `quotas` service. If the backend fails the call is
+allowed and the error logged, so a limiter problem never takes the API down.
+"""
+import logging
+import re
+import time
+from dataclasses import dataclass
+from datetime import timedelta
+from functools import lru_cache, wraps
+from threading import Lock
+from typing import Callable, Dict, Optional, Tuple, Union
+
+from flask import request
+from sqlalchemy import case, func
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+
+from model import db, RateLimitBucket
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+PERIODS = {'second': 1, 'minute': 60, 'hour': 3600, 'day': 86400}
+_LIMIT_PATTERN = re.compile(r'^\s*(\d+)\s*(?:per|/)\s*(\d+)?\s*(second|minute|hour|day)s?\s*$', re.IGNORECASE)
+
+
+@dataclass(frozen=True)
+class Limit:
+    """`amount` requests per `period` seconds"""
+    amount: int
+    period: int
+
+    @staticmethod
+    @lru_cache(maxsize=128)
+    def parse(spec: str) -> 'Limit':
+        """Parse "20 per minute", "5 per 10 minutes" or "100/hour" """
+        match = _LIMIT_PATTERN.match(spec)
+        if not match:
+            raise ValueError(f"Invalid rate limit '{spec}'")
+        amount, multiple, unit = match.groups()
+        return Limit(int(amount), int(multiple or 1) * PERIODS[unit.lower()])
+
+    @property
+    def refill_rate(self) -> float:
+        """Tokens added per second"""
+        return self.amount / self.period
+
+    def __str__(self):
+        for unit, seconds in sorted(PERIODS.items(), key=lambda item: -item[1]):
+            if self.period % seconds == 0:
+                count = self.period // seconds
+                return f"{self.amount} per {unit}" if count == 1 else f"{self.amount} per {count} {unit}s"
+        return f"{self.amount} per {self.period} seconds"
+
+
+@dataclass(frozen=True)
+class QuotaResult:
+    allowed: bool
+    limit: Limit
+    remaining: int
+    retry_after: float  # seconds until a token is available again; 0 when allowed
+
+    @property
+    def headers(self) -> Dict[str, str]:
+        headers = {'X-RateLimit-Limit': str(self.limit), 'X-RateLimit-Remaining': str(self.remaining)}
+        if not self.allowed:
+            headers['Retry-After'] = str(max(int(self.retry_after + 0.999), 1))
+        return headers
+
+
+class RateLimitExceeded(Exception):
+    """Raised by QuotaService.check when a bucket is empty"""
+
+    def __init__(self, scope: str, result: QuotaResult):
+        self.scope = scope
+        self.result = result
+        self.retry_after = result.retry_after
+        super().__init__(f"Rate limit exceeded: {result.limit}")
+
+
+# ===== BACKENDS =====
+class PostgresBuckets:
+    """Buckets in the rate_limit_buckets table, one atomic upsert per take"""
+    name = 'postgres'
+
+    def consume(self, key: str, capacity: int, rate: float, cost: int) -> Tuple[float, bool]:
+        table = RateLimitBucket.__table__
+        now = func.localtimestamp()
+        refilled = func.least(
+            float(capacity),
+            table.c.tokens + func.extract('epoch', now - table.c.updated_at) * rate
+        )
+        allowed = refilled >= cost
+        first_allowed = capacity >= cost
+        stmt = pg_insert(table).values(
+            key=key, tokens=float(capacity - cost if first_allowed else capacity),
+            allowed=first_allowed, updated_at=now
+        )
+        # SET expressions see the row as it was, so the refill, check and take are one step
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[table.c.key],
+            set_={'tokens': refilled - case((allowed, cost), else_=0), 'allowed': allowed, 'updated_at': now}
+        ).returning(table.c.tokens, table.c.allowed)
+        # Own connection and transaction, so the caller's session is never committed here
+        with db.engine.begin() as connection:
+            tokens, granted = connection.execute(stmt).one()
+        return tokens, granted
+
+    def purge(self, idle_seconds: int) -> int:
+        with db.engine.begin() as connection:
+            result = connection.execute(RateLimitBucket.__table__.delete().where(
+                RateLimitBucket.updated_at < func.localtimestamp() - timedelta(seconds=idle_seconds)
+            ))
+        return result.rowcount
+
+
+class MemoryBuckets:
+    """Per-process buckets; each worker enforces the limit on its own"""
+    name = 'memory'
+
+    def __init__(self):
+        self._buckets: Dict[str, Tuple[float, float]] = {}
+        self._lock = Lock()
+
+    def consume(self, key: str, capacity: int, rate: float, cost: int) -> Tuple[float, bool]:
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated = self._buckets.get(key, (float(capacity), now))
+            tokens = min(float(capacity), tokens + (now - updated) * rate)
+            allowed = tokens >= cost
+            if allowed:
+                tokens -= cost
+            self._buckets[key] = (tokens, now)
+        return tokens, allowed
+
+    def purge(self, idle_seconds: int) -> int:
+        cutoff = time.monotonic() - idle_seconds
+        with self._lock:
+            idle = [key for key, (_, updated) in self._buckets.items() if updated < cutoff]
+            for key in idle:
+                del self._buckets[key]
+        return len(idle)
+
+
+BACKENDS = {'postgres': PostgresBuckets, 'memory': MemoryBuckets}
+
+
+# ===== SERVICE =====
+class QuotaService:
+    """Token-bucket quotas on a pluggable backend shared by every limiter in the app"""
+
+    def __init__(self, backend: str = 'postgres', enabled: bool = True, idle_seconds: int = 86400):
+        self.enabled = enabled
+        self.idle_seconds = idle_seconds
+        self.backend = BACKENDS[backend]()
+
+    def init_app(self, app):
+        app.config.setdefault('RATELIMIT_ENABLED', self.enabled)
+        app.config.setdefault('RATELIMIT_BACKEND', self.backend.name)
+        app.config.setdefault('RATELIMIT_IDLE_SECONDS', self.idle_seconds)
+        self.enabled = app.config['RATELIMIT_ENABLED']
+        backend = app.config['RATELIMIT_BACKEND']
+        if backend not in BACKENDS:
+            raise ValueError(f"Unknown RATELIMIT_BACKEND '{backend}'. Use one of: {', '.join(BACKENDS)}")
+        self.backend = BACKENDS[backend]()
+        self.idle_seconds = app.config['RATELIMIT_IDLE_SECONDS']
+
+    def consume(self, scope: str, identity, limit: Union[str, Limit], cost: int = 1) -> QuotaResult:
+        """Take `cost` tokens from the scope's bucket for `identity`"""
+        limit = Limit.parse(limit) if isinstance(limit, str) else limit
+        if not self.enabled:
+            return QuotaResult(True, limit, limit.amount, 0.0)
+        try:
+            tokens, allowed = self.backend.consume(f"{scope}:{identity}", limit.amount, limit.refill_rate, cost)
+        except Exception as e:
+            logger.error(f"Rate limit backend '{self.backend.name}' failed for {scope}; allowing request: {e}")
+            return QuotaResult(True, limit, limit.amount, 0.0)
+        retry_after = 0.0 if allowed else (cost - tokens) / limit.refill_rate
+        return QuotaResult(allowed, limit, max(int(tokens), 0), retry_after)
+
+    def check(self, scope: str, identity, limit: Union[str, Limit], cost: int = 1) -> QuotaResult:
+        """Like consume, but raises RateLimitExceeded when the bucket is empty"""
+        result = self.consume(scope, identity, limit, cost)
+        if not result.allowed:
+            raise RateLimitExceeded(scope, result)
+        return result
+
+    def limit(self, spec: str, scope: Optional[str] = None, key_func: Optional[Callable[[], str]] = None):
+        """Decorator for views and Resource methods; answers 429 with Retry-After when exceeded"""
+        def decorator(func):
+            # In a Resource's `decorators`, func is the as_view closure (qualname View.as_view.<locals>.view),
+            # which as_view has already named after the endpoint; methods and plain views keep their qualname
+            name = func.__name__ if '<locals>' in func.__qualname__ else func.__qualname__
+            bucket_scope = scope or f"http:{func.__module__}.{name}"
+
+            @wraps(func)
+            def wrapper(*args, **kwargs):
+                identity = key_func() if key_func else (request.remote_addr or 'unknown')
+                result = self.consume(bucket_scope, identity, spec)
+                if not result.allowed:
+                    return {
+                        "error": "Rate limit exceeded",
+                        "status": 429,
+                        "retry_after": int(result.headers['Retry-After'])
+                    }, 429, result.headers
+                return func(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    def purge(self) -> int:
+        """Drop buckets idle long enough to have refilled completely (scheduled job)"""
+        removed = self.backend.purge(self.idle_seconds)
+        if removed:
+            logger.info(f"Removed {removed} idle rate limit buckets")
+        return removed
+
+
+# Initialize globally — must be attached via quotas.init_app(app)
+quotas = QuotaService()
@@ -0,0 +1,186 @@
+"""
+Exchange rate snapshots for reports.
+
+A report converts all of its figures with one immutable set of KES-based
+rates, captured once per request or report job (kept on flask.g) instead of
+looking a rate up for every value. Snapshots are persisted under a hash of
+their rates, and the id is saved with the report so later renders and
+exports reproduce exactly the same conversions.
+"""
+import hashlib
+import json
+import logging
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import datetime
+from decimal import Decimal, ROUND_HALF_UP
+from threading import Lock
+from types import MappingProxyType
+from typing import Any, Dict, Mapping, Optional, Tuple, TypeVar
+
+from flask import g, has_app_context
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+
+from model import db, Currency, ExchangeRateSnapshot
+from currency_routes import get_fallback_rate
+from exchange_rates import exchange_rates, RateMatrix
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+BASE_CURRENCY = 'KES'
+CENT = Decimal('0.01')
+
+K = TypeVar('K')
+
+
+@dataclass(frozen=True)
+class RateSnapshot:
+    """KES → currency rates as (KES→USD, USD→currency) legs, matching convert_ksh_to_target_currency"""
+    id: str
+    captured_at: datetime
+    legs: Mapping[str, Tuple[Decimal, Decimal]]
+
+    def has(self, code: str) -> bool:
+        return code == BASE_CURRENCY or code in self.legs
+
+    def rate(self, code: str) -> Decimal:
+        """KES → code; raises KeyError when the snapshot has no rate for code"""
+        if code == BASE_CURRENCY:
+            return Decimal('1')
+        kes_to_usd, usd_to_target = self.legs[code]
+        return kes_to_usd * usd_to_target
+
+    def cross_rate(self, from_code: str, to_code: str) -> Decimal:
+        if from_code == to_code:
+            return Decimal('1')
+        return self.rate(to_code) / self.rate(from_code)
+
+    def convert(self, amount: Any, to_code: str, from_code: str = BASE_CURRENCY) -> Decimal:
+        return (Decimal(str(amount)) * self.cross_rate(from_code, to_code)).quantize(CENT, ROUND_HALF_UP)
+
+    def convert_many(self, amounts: Mapping[K, Any], to_code: str,
+                     from_code: str = BASE_CURRENCY) -> Dict[K, Decimal]:
+        """Convert a mapping of figures with a single rate lookup"""
+        rate = self.cross_rate(from_code, to_code)
+        return {key: (Decimal(str(value)) * rate).quantize(CENT, ROUND_HALF_UP) for key, value in amounts.items()}
+
+    def conversion_rates(self, code: str) -> Dict[str, Any]:
+        """Rates behind a KES → code conversion, for display alongside converted figures"""
+        kes_to_usd, usd_to_target = self.legs.get(code, (Decimal('1'), Decimal('1')))
+        return {
+            'ksh_to_usd': float(kes_to_usd),
+            'usd_to_target': float(usd_to_target),
+            'overall_rate': float(self.rate(code)),
+            'rate_snapshot_id': self.id
+        }
+
+
+class RateSnapshotService:
+    """Captures, persists and reloads rate snapshots"""
+
+    LOADED_CACHE_SIZE = 32
+
+    def __init__(self):
+        self._loaded: "OrderedDict[str, RateSnapshot]" = OrderedDict()
+        self._lock = Lock()
+
+    @staticmethod
+    def snapshot_id(serialized_rates: Dict[str, list]) -> str:
+        raw = json.dumps(serialized_rates, sort_keys=True, separators=(',', ':'))
+        return hashlib.sha256(raw.encode()).hexdigest()
+
+    @staticmethod
+    def _build(snapshot_id: str, captured_at: datetime, serialized_rates: Dict[str, list]) -> RateSnapshot:
+        legs = {code: (Decimal(kes_to_usd), Decimal(usd_to_target))
+                for code, (kes_to_usd, usd_to_target) in serialized_rates.items()}
+        return RateSnapshot(id=snapshot_id, captured_at=captured_at, legs=MappingProxyType(legs))
+
+    def _remember(self, snapshot: RateSnapshot) -> None:
+        with self._lock:
+            self._loaded[snapshot.id] = snapshot
+            self._loaded.move_to_end(snapshot.id)
+            while len(self._loaded) > self.LOADED_CACHE_SIZE:
+                self._loaded.popitem(last=False)
+
+    @staticmethod
+    def _leg(matrix: RateMatrix, from_code: str, to_code: str) -> Decimal:
+        """One conversion leg from the rate matrix, with get_exchange_rate's fallback table"""
+        try:
+            return matrix.cross_rate(from_code, to_code)
+        except KeyError:
+            return get_fallback_rate(from_code, to_code)
+
+    def capture(self) -> RateSnapshot:
+        """Read the rate table once and persist the rates of every active currency as a snapshot"""
+        codes = [code.value for code, in db.session.query(Currency.code).filter(Currency.is_active.is_(True))]
+        matrix = exchange_rates.matrix()  # one read for the whole snapshot, not one per currency
+        kes_to_usd = self._leg(matrix, BASE_CURRENCY, 'USD')
+
+        serialized = {}
+        for code in codes:
+            if code == BASE_CURRENCY:
+                continue
+            try:
+                usd_to_target = self._leg(matrix, 'USD', code)
+                serialized[code] = [str(kes_to_usd), str(usd_to_target)]
+            except Exception as e:
+                logger.warning(f"Rate snapshot: no rate for {code}, leaving it out: {e}")
+
+        snapshot_id = self.snapshot_id(serialized)
+        with self._lock:
+            known = self._loaded.get(snapshot_id)
+        if known:
+            return known
+
+        captured_at = datetime.utcnow()
+        try:
+            # Own transaction so capturing never commits the caller's pending changes
+            with db.engine.begin() as connection:
+                connection.execute(pg_insert(ExchangeRateSnapshot).values(
+                    id=snapshot_id,
+                    base_currency=BASE_CURRENCY,
+                    rates=serialized,
+                    source='currencyapi.com (with fallback)',
+                    captured_at=captured_at
+                ).on_conflict_do_nothing(index_elements=['id']))
+        except Exception as e:
+            logger.error(f"Failed to persist rate snapshot {snapshot_id}: {e}")
+
+        snapshot = self._build(snapshot_id, captured_at, serialized)
+        self._remember(snapshot)
+        logger.info(f"Captured rate snapshot {snapshot_id[:12]} for {len(serialized)} currencies")
+        return snapshot
+
+    def current(self) -> RateSnapshot:
+        """The snapshot for this request or job, captured on first use"""
+        if not has_app_context():
+            return self.capture()
+        snapshot = g.get('rate_snapshot')
+        if snapshot is None:
+            snapshot = g.rate_snapshot = self.capture()
+        return snapshot
+
+    def get(self, snapshot_id: str) -> Optional[RateSnapshot]:
+        with self._lock:
+            snapshot = self._loaded.get(snapshot_id)
+        if snapshot:
+            return snapshot
+        record = ExchangeRateSnapshot.query.get(snapshot_id)
+        if not record:
+            return None
+        snapshot = self._build(record.id, record.captured_at, record.rates)
+        self._remember(snapshot)
+        return snapshot
+
+    def for_report(self, report_data: Dict[str, Any]) -> RateSnapshot:
+        """The snapshot a saved report was converted with, or the current one for new reports"""
+        snapshot_id = report_data.get('rate_snapshot_id')
+        snapshot = self.get(snapshot_id) if snapshot_id else None
+        if snapshot_id and not snapshot:
+            logger.warning(f"Rate snapshot {snapshot_id} not found; converting with current rates")
+        return snapshot or self.current()
+
+
+# Snapshots are immutable, so one loader per process is shared by all threads
+rate_snapshots = RateSnapshotService()
@@ -8,6 +8,7 @@ from flask_restful import Resource
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from model import Category, User, UserRole, db, AICategoryInsight
 from ai.category_assistant import category_assistant
+from category_analytics import category_analytics
 import logging
 
 logger = logging.getLogger(__name__)
@@ -17,9 +18,18 @@ class CategoryResource(Resource):
     def get(self):
         """Get all categories with optional AI insights"""
         include_insights = request.args.get('include_insights', 'false').lower() == 'true'
+        include_trending = request.args.get('include_trending', 'false').lower() == 'true'
         
+        # Counts and scores come from the analytics snapshot (refreshed by a scheduled job)
         categories = Category.query.all()
-        result = {'categories': [category.as_dict() for category in categories]}
+        snapshots = category_analytics.get_snapshots()
+        result = {'categories': []}
+        for category in categories:
+            snapshot = snapshots.get(category.id)
+            cat_dict = category.as_dict(snapshot=snapshot)
+            if include_trending:
+                cat_dict['trending_events'] = (snapshot.trending_events or []) if snapshot else []
+            result['categories'].append(cat_dict)
         
         if include_insights:
             try:
@@ -170,7 +180,9 @@ class CategoryDetailResource(Resource):
         
         include_insights = request.args.get('include_insights', 'false').lower() == 'true'
         
-        result = category.as_dict()
+        snapshot = category_analytics.get_snapshot(category_id)
+        result = category.as_dict(snapshot=snapshot)
+        result['trending_events'] = (snapshot.trending_events or []) if snapshot else []
         
         if include_insights:
             insights_data = category_assistant.generate_category_insights(category_id)
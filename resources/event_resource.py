@@ -6,10 +6,12 @@ from model import (db, Event, User, UserRole, Organizer, Category, Partner,
                    EventCollaboration, CollaborationType, CollaborationManager,
                    AIEventDraft, AIEventManager)
 from flask_jwt_extended import jwt_required, get_jwt_identity, get_jwt
-import cloudinary.uploader
 import logging
 from sqlalchemy.exc import OperationalError, SQLAlchemyError
 from sqlalchemy import func, distinct
+from media_pipeline import media_pipeline
+from stats_engine import stats_engine
+from principal import current_principal
 
 # Import the comprehensive event assistant
 from ai.event_assistant import comprehensive_event_assistant
@@ -32,9 +34,7 @@ class EventResource(Resource):
         try:
             from flask_jwt_extended import verify_jwt_in_request
             verify_jwt_in_request(optional=True)  # Optional authentication
-            identity = get_jwt_identity()
-            if identity:
-                user = User.query.get(identity)
+            user = current_principal()
         except:
             # No authentication or invalid token - continue as public user
             pass
@@ -50,8 +50,7 @@ class EventResource(Resource):
                 
                 # If user is an organizer, check if they own the event
                 if user and user.role == UserRole.ORGANIZER:
-                    organizer = Organizer.query.filter_by(user_id=user.id).first()
-                    if organizer and event.organizer_id != organizer.id:
+                    if user.organizer_id is not None and event.organizer_id != user.organizer_id:
                         return {"error": "Access denied. You can only view your own events"}, 403
                 
                 # Return event with or without collaborators based on request
@@ -100,11 +99,10 @@ class EventResource(Resource):
             if is_dashboard:
                 # Dashboard view - apply role-based access and advanced filters
                 if user and user.role == UserRole.ORGANIZER and not show_all:
-                    organizer = Organizer.query.filter_by(user_id=user.id).first()
-                    if not organizer:
+                    if user.organizer_id is None:
                         return {"error": "Organizer profile not found"}, 404
                     
-                    query = query.filter(Event.organizer_id == organizer.id)
+                    query = query.filter(Event.organizer_id == user.organizer_id)
                 elif user and user.role == UserRole.ADMIN:
                     # Admin can see all events in dashboard
                     pass
@@ -255,6 +253,7 @@ class EventResource(Resource):
                         'location': event.location,
                         'amenities': event.amenities or [],
                         'image': event.image,
+                        'image_thumbnail': event.image_thumbnail,
                         'category': event.event_category.name if event.event_category else None,
                         'category_id': event.category_id,
                         'featured': event.featured,
@@ -513,6 +512,7 @@ class EventResource(Resource):
 
     def _handle_ai_enhanced_form_creation(self, organizer, data, files):
         """Handle form-based creation with AI enhancement"""
+        staged_image = None
         try:
             # Extract user input for AI processing
             user_input = {
@@ -553,15 +553,18 @@ class EventResource(Resource):
                     draft.description_source = 'user'
                     draft.description_confidence = 1.0
                 
-                # Handle file upload
-                image_url = self._handle_file_upload(files.get('file'))
-                if image_url:
-                    draft.suggested_image_url = image_url
+                # Stage the image; it is processed and uploaded once the event exists
+                staged_image = self._stage_image_upload(files.get('file'))
+                if staged_image:
+                    draft.suggested_image_url = media_pipeline.placeholder_url
                 
                 db.session.commit()
                 
                 # Publish the enhanced draft
                 event = AIEventManager.publish_draft(draft.id)
+                stats_engine.record_event_created(event)
+                media_job = media_pipeline.submit(staged_image, 'event', event.id)
+                staged_image = None  # owned by the media pipeline from here on
                 
                 return {
                     "message": "Event created successfully with AI enhancement",
@@ -569,7 +572,8 @@ class EventResource(Resource):
                     "id": event.id,
                     "ai_assisted": True,
                     "ai_confidence": event.ai_confidence_score,
-                    "ai_generated_fields": event.ai_generated_fields
+                    "ai_generated_fields": event.ai_generated_fields,
+                    "media": media_job
                 }, 201
             else:
                 # Fall back to manual creation if AI fails
@@ -577,6 +581,7 @@ class EventResource(Resource):
                 
         except Exception as e:
             logger.error(f"AI-enhanced creation failed, falling back to manual: {e}")
+            media_pipeline.discard(staged_image)  # the manual path stages the upload again
             return self._handle_manual_form_creation(organizer, data, files)
 
     def _handle_manual_form_creation(self, organizer, data, files):
@@ -587,9 +592,6 @@ class EventResource(Resource):
             if field not in data:
                 return {"message": f"Missing field: {field}"}, 400
 
-        # Handle file upload
-        image_url = self._handle_file_upload(files.get('file'))
-
         # Parse dates and times
         try:
             event_date = datetime.strptime(data["date"], "%Y-%m-%d").date()
@@ -611,6 +613,13 @@ class EventResource(Resource):
             if not category:
                 return {"message": "Invalid category ID"}, 400
 
+        # Stage the image; the background pipeline uploads it after the event is saved
+        try:
+            staged_image = self._stage_image_upload(files.get('file'))
+        except ValueError as e:
+            return {"error": str(e)}, 400
+        image_url = media_pipeline.placeholder_url if staged_image else None
+
         # Create Event instance
         event = Event(
             name=data["name"],
@@ -631,19 +640,24 @@ class EventResource(Resource):
             event.validate_datetime()
             db.session.add(event)
             db.session.commit()
+            stats_engine.record_event_created(event)
+            media_job = media_pipeline.submit(staged_image, 'event', event.id)
             
             return {
                 "message": "Event created successfully",
                 "event": event.as_dict(),
                 "id": event.id,
-                "ai_assisted": False
+                "ai_assisted": False,
+                "media": media_job
             }, 201
             
         except ValueError as e:
             db.session.rollback()
+            media_pipeline.discard(staged_image)
             return {"error": str(e)}, 400
         except Exception as e:
             db.session.rollback()
+            media_pipeline.discard(staged_image)
             return {"error": f"Failed to create event: {str(e)}"}, 500
 
     def _handle_json_creation(self, organizer, data):
@@ -698,6 +712,7 @@ class EventResource(Resource):
             event.validate_datetime()
             db.session.add(event)
             db.session.commit()
+            stats_engine.record_event_created(event)
             
             return {
                 "message": "Event created successfully",
@@ -877,19 +892,21 @@ class EventResource(Resource):
             except (json.JSONDecodeError, ValueError) as e:
                 return {"error": f"Invalid amenities format: {str(e)}"}, 400
 
-        # Handle file if present
+        # Stage file if present; the current image stays until the new one is uploaded
+        staged_image = None
         if "file" in files:
-            file = files["file"]
-            if file and allowed_file(file.filename):
-                upload_result = cloudinary.uploader.upload(
-                    file,
-                    folder="event_images",
-                    resource_type="auto"
-                )
-                event.image = upload_result.get("secure_url")
+            try:
+                staged_image = self._stage_image_upload(files["file"])
+            except ValueError as e:
+                return {"error": str(e)}, 400
 
-        db.session.commit()
-        return {"message": "Update successful", "event": event.as_dict()}, 200
+        try:
+            db.session.commit()
+        except Exception:
+            media_pipeline.discard(staged_image)
+            raise
+        media_job = media_pipeline.submit(staged_image, 'event', event.id)
+        return {"message": "Update successful", "event": event.as_dict(), "media": media_job}, 200
 
     def _apply_ai_updates(self, event, updates, user_id):
         """Apply AI-proposed updates to an event"""
@@ -941,22 +958,12 @@ class EventResource(Resource):
 
     # ===== HELPER METHODS =====
 
-    def _handle_file_upload(self, file):
-        """Handle file upload to cloudinary"""
+    def _stage_image_upload(self, file):
+        """Stage an event image for the background media pipeline"""
         if file and file.filename != '':
             if not allowed_file(file.filename):
                 raise ValueError("Invalid file type. Allowed types: PNG, JPG, JPEG, GIF, WEBP")
-
-            try:
-                upload_result = cloudinary.uploader.upload(
-                    file,
-                    folder="event_images",
-                    resource_type="auto"
-                )
-                return upload_result.get('secure_url')
-            except Exception as e:
-                logger.error(f"Error uploading event image: {str(e)}")
-                raise ValueError("Failed to upload event image")
+            return media_pipeline.stage(file, "event_images")
         return None
 
     def _parse_amenities(self, amenities_data):
@@ -1045,13 +1052,16 @@ class EventResource(Resource):
         if 'category_id' in data:
             event.category_id = data['category_id']
             
-        # Handle file upload
-        if 'file' in files:
-            image_url = self._handle_file_upload(files['file'])
-            if image_url:
-                event.image = image_url
-                
-        db.session.commit()
+        # Stage file upload; patched onto the event by the media pipeline
+        staged_image = self._stage_image_upload(files['file']) if 'file' in files else None
+
+        try:
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            media_pipeline.discard(staged_image)
+            raise
+        media_pipeline.submit(staged_image, 'event', event.id)
         return event
 
 # ... (rest of your existing resource classes remain unchanged - EventsByLocationResource, CitiesResource, StatsResource, EventLikeResource, OrganizerEventsResource)
@@ -1135,6 +1145,7 @@ class EventsByLocationResource(Resource):
                         'location': event.location,
                         'amenities': event.amenities or [],
                         'image': event.image,
+                        'image_thumbnail': event.image_thumbnail,
                         'category': event.event_category.name if event.event_category else None,
                         'featured': event.featured,
                         'organizer': {
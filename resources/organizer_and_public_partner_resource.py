@@ -10,7 +10,6 @@ from datetime import datetime
 from flask import request
 from flask_restful import Resource
 from flask_jwt_extended import jwt_required, get_jwt_identity
-import cloudinary.uploader
 from sqlalchemy.exc import SQLAlchemyError
 from sqlalchemy import text
 from model import (
@@ -19,6 +18,7 @@ from model import (
     AIPartnerMatchRecommendation
 )
 from ai.partner_assistant import partner_assistant
+from media_pipeline import media_pipeline
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -572,8 +572,8 @@ class PartnerManagementResource(Resource):
                     }
                 }, 409
             
-            # Handle file upload (Cloudinary)
-            logo_url = None
+            # Stage logo; uploaded by the background media pipeline after the partner is saved
+            staged_logo = None
             if "file" in files:
                 file = files["file"]
                 if file and file.filename != "":
@@ -582,15 +582,10 @@ class PartnerManagementResource(Resource):
                             "message": "Invalid file type. Allowed: PNG, JPG, JPEG, GIF, WEBP"
                         }, 400
                     try:
-                        upload_result = cloudinary.uploader.upload(
-                            file,
-                            folder="partner_logos",
-                            resource_type="auto"
-                        )
-                        logo_url = upload_result.get("secure_url")
-                    except Exception as e:
-                        logger.error(f"Error uploading partner logo: {str(e)}")
-                        return {"message": "Failed to upload partner logo"}, 500
+                        staged_logo = media_pipeline.stage(file, "partner_logos")
+                    except ValueError as e:
+                        return {"message": str(e)}, 400
+            logo_url = media_pipeline.placeholder_url if staged_logo else None
             
             # Create partner record
             partner = Partner(
@@ -606,6 +601,7 @@ class PartnerManagementResource(Resource):
             try:
                 db.session.add(partner)
                 db.session.commit()
+                media_job = media_pipeline.submit(staged_logo, 'partner', partner.id)
                 
                 # Optionally enhance description with AI
                 enhanced_description = None
@@ -619,6 +615,7 @@ class PartnerManagementResource(Resource):
                     "action": "partner_created",
                     "message": "Partner created successfully",
                     "partner": partner.as_dict(),
+                    "media": media_job,
                     "ai_actions": {
                         "enhance_description": f"POST /partners/{partner.id}/ai/enhance-description",
                         "analyze": f"POST /partners/{partner.id}/ai/analyze"
@@ -631,6 +628,7 @@ class PartnerManagementResource(Resource):
                 return response, 201
             except SQLAlchemyError as e:
                 db.session.rollback()
+                media_pipeline.discard(staged_logo)
                 return {"message": f"Database error: {str(e)}"}, 500
         
         else:
@@ -900,23 +898,6 @@ class PartnerManagementResource(Resource):
                 "contact_email", "contact_person"
             ]
             
-            # Handle logo file upload
-            if "file" in files:
-                file = files["file"]
-                if file and file.filename != "":
-                    if not allowed_file(file.filename):
-                        return {"message": "Invalid file type. Allowed: PNG, JPG, JPEG, GIF, WEBP"}, 400
-                    try:
-                        upload_result = cloudinary.uploader.upload(
-                            file,
-                            folder="partner_logos",
-                            resource_type="auto"
-                        )
-                        partner.logo_url = upload_result.get("secure_url")
-                    except Exception as e:
-                        logger.error(f"Error uploading partner logo: {str(e)}")
-                        return {"message": "Failed to upload partner logo"}, 500
-            
             # Prevent duplicate company names
             if "company_name" in data and data["company_name"] != partner.company_name:
                 existing = Partner.query.filter_by(
@@ -931,18 +912,37 @@ class PartnerManagementResource(Resource):
                         "existing_partner": existing.as_dict()
                     }, 409
             
+            # Stage logo file; the current logo stays until the new one is uploaded
+            staged_logo = None
+            if "file" in files:
+                file = files["file"]
+                if file and file.filename != "":
+                    if not allowed_file(file.filename):
+                        return {"message": "Invalid file type. Allowed: PNG, JPG, JPEG, GIF, WEBP"}, 400
+                    try:
+                        staged_logo = media_pipeline.stage(file, "partner_logos")
+                    except ValueError as e:
+                        return {"message": str(e)}, 400
+            
             # Update text fields
             for field in updatable_fields:
                 if field in data:
                     setattr(partner, field, data[field])
             
             partner.updated_at = datetime.utcnow()
-            db.session.commit()
+            try:
+                db.session.commit()
+            except Exception:
+                db.session.rollback()
+                media_pipeline.discard(staged_logo)
+                raise
+            media_job = media_pipeline.submit(staged_logo, 'partner', partner.id)
             
             return {
                 "action": "partner_updated",
                 "message": "Partner updated successfully",
                 "partner": partner.as_dict(),
+                "media": media_job,
                 "ai_actions": {
                     "enhance_description": f"PUT /partners/{partner_id} with action='enhance_description'",
                     "analyze": f"POST /partners/{partner_id}/ai/analyze"
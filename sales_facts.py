@@ -0,0 +1,266 @@
+"""
+Sales fact pipeline.
+
+Payment confirmation and ticket scans append rows to `sales_facts` and bump
+hourly/daily buckets in `sales_rollups`, keyed by (event, ticket type, payment
+method, currency). Organizer summaries, admin reports and stats read the
+rollups, so their cost grows with the number of buckets rather than tickets.
+`flask backfill-sales-facts` rebuilds facts and rollups from ticket history.
+"""
+import logging
+from collections import defaultdict
+from datetime import datetime
+from decimal import Decimal
+from typing import Dict, Iterable, List, Optional
+
+import click
+from sqlalchemy import func, cast, literal, select, String, text
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+
+from model import (db, SalesFact, SalesRollup, Ticket, TicketType, Transaction, Scan, Currency,
+                   Event, PaymentStatus)
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+SALE = 'sale'
+ATTENDANCE = 'attendance'
+GRANULARITIES = ('hour', 'day')
+PAID_STATUSES = [PaymentStatus.COMPLETED, PaymentStatus.PAID]
+
+FACT_COLUMNS = ['kind', 'ticket_id', 'event_id', 'ticket_type_id', 'transaction_id', 'payment_method',
+                'currency_code', 'quantity', 'amount', 'occurred_at', 'recorded_at']
+
+
+def bucket_start(moment: datetime, granularity: str) -> datetime:
+    """Python equivalent of date_trunc(granularity, moment)"""
+    if granularity == 'hour':
+        return moment.replace(minute=0, second=0, microsecond=0)
+    return moment.replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+class SalesFactService:
+    """Writes sales/attendance facts and serves report totals from the rollups"""
+
+    def init_app(self, app):
+        @app.cli.command('backfill-sales-facts')
+        def backfill_command():
+            """Build sales facts and rollups from existing tickets and scans."""
+            facts, buckets = self.backfill()
+            click.echo(f"Inserted {facts} missing facts; rebuilt {buckets} rollup buckets")
+
+    # ===== FACT SOURCES =====
+    @staticmethod
+    def _sale_facts_select(recorded_at: datetime):
+        return select(
+            literal(SALE),
+            Ticket.id,
+            Ticket.event_id,
+            Ticket.ticket_type_id,
+            Ticket.transaction_id,
+            Transaction.payment_method,
+            func.coalesce(cast(Currency.code, String), 'KES'),
+            Ticket.quantity,
+            func.coalesce(TicketType.price * Ticket.quantity, 0),
+            Ticket.purchase_date,
+            literal(recorded_at)
+        ).select_from(Ticket).join(
+            TicketType, Ticket.ticket_type_id == TicketType.id
+        ).join(
+            Transaction, Ticket.transaction_id == Transaction.id
+        ).outerjoin(
+            Currency, TicketType.currency_id == Currency.id
+        ).where(Ticket.payment_status.in_(PAID_STATUSES))
+
+    @staticmethod
+    def _attendance_facts_select(recorded_at: datetime):
+        first_scans = select(
+            Scan.ticket_id.label('ticket_id'),
+            func.min(Scan.scanned_at).label('scanned_at')
+        ).group_by(Scan.ticket_id).subquery()
+
+        return select(
+            literal(ATTENDANCE),
+            Ticket.id,
+            Ticket.event_id,
+            Ticket.ticket_type_id,
+            Ticket.transaction_id,
+            Transaction.payment_method,
+            func.coalesce(cast(Currency.code, String), 'KES'),
+            Ticket.quantity,
+            literal(0),
+            first_scans.c.scanned_at,
+            literal(recorded_at)
+        ).select_from(Ticket).join(
+            first_scans, first_scans.c.ticket_id == Ticket.id
+        ).join(
+            TicketType, Ticket.ticket_type_id == TicketType.id
+        ).join(
+            Transaction, Ticket.transaction_id == Transaction.id
+        ).outerjoin(
+            Currency, TicketType.currency_id == Currency.id
+        )
+
+    def _insert_facts(self, source) -> List:
+        """Insert facts from a select, skipping ones already recorded; returns the new rows"""
+        stmt = pg_insert(SalesFact).from_select(FACT_COLUMNS, source).on_conflict_do_nothing(
+            constraint='uq_sales_fact_kind_ticket'
+        ).returning(
+            SalesFact.kind, SalesFact.event_id, SalesFact.ticket_type_id, SalesFact.payment_method,
+            SalesFact.currency_code, SalesFact.quantity, SalesFact.amount, SalesFact.occurred_at
+        )
+        return db.session.execute(stmt).all()
+
+    # ===== INCREMENTAL WRITES =====
+    def _apply_to_rollups(self, facts: Iterable) -> None:
+        buckets: Dict[tuple, Dict[str, object]] = defaultdict(
+            lambda: {"tickets_sold": 0, "quantity_sold": 0, "revenue": Decimal('0'), "attendees": 0}
+        )
+        for fact in facts:
+            for granularity in GRANULARITIES:
+                key = (granularity, bucket_start(fact.occurred_at, granularity), fact.event_id,
+                       fact.ticket_type_id, fact.payment_method, fact.currency_code)
+                bucket = buckets[key]
+                if fact.kind == SALE:
+                    bucket["tickets_sold"] += 1
+                    bucket["quantity_sold"] += fact.quantity
+                    bucket["revenue"] += Decimal(str(fact.amount))
+                else:
+                    bucket["attendees"] += 1
+
+        if not buckets:
+            return
+
+        now = datetime.utcnow()
+        rows = [
+            dict(granularity=key[0], bucket_start=key[1], event_id=key[2], ticket_type_id=key[3],
+                 payment_method=key[4], currency_code=key[5], updated_at=now, **values)
+            for key, values in buckets.items()
+        ]
+        stmt = pg_insert(SalesRollup).values(rows)
+        stmt = stmt.on_conflict_do_update(
+            constraint='uq_sales_rollup_bucket',
+            set_={
+                "tickets_sold": SalesRollup.tickets_sold + stmt.excluded.tickets_sold,
+                "quantity_sold": SalesRollup.quantity_sold + stmt.excluded.quantity_sold,
+                "revenue": SalesRollup.revenue + stmt.excluded.revenue,
+                "attendees": SalesRollup.attendees + stmt.excluded.attendees,
+                "updated_at": stmt.excluded.updated_at
+            }
+        )
+        db.session.execute(stmt)
+
+    def _record(self, source, description: str) -> None:
+        try:
+            self._apply_to_rollups(self._insert_facts(source))
+            db.session.commit()
+        except Exception as e:
+            # Reporting must never break payments or scanning; a backfill catches up
+            db.session.rollback()
+            logger.error(f"Failed to record {description}: {e}")
+
+    def record_sales(self, tickets) -> None:
+        """Append sale facts for newly paid tickets (idempotent per ticket)"""
+        ticket_ids = [ticket.id for ticket in tickets]
+        if ticket_ids:
+            source = self._sale_facts_select(datetime.utcnow()).where(Ticket.id.in_(ticket_ids))
+            self._record(source, f"sale facts for tickets {ticket_ids}")
+
+    def record_attendance(self, ticket) -> None:
+        """Append the attendance fact for a ticket's first scan"""
+        source = self._attendance_facts_select(datetime.utcnow()).where(Ticket.id == ticket.id)
+        self._record(source, f"attendance fact for ticket {ticket.id}")
+
+    # ===== BACKFILL =====
+    def backfill(self):
+        """Insert any missing facts, then rebuild every rollup bucket from the facts"""
+        started = datetime.utcnow()
+        inserted = len(self._insert_facts(self._sale_facts_select(started)))
+        inserted += len(self._insert_facts(self._attendance_facts_select(started)))
+
+        # Block incremental writers so no bucket is counted twice or lost during the rebuild
+        db.session.execute(text(f"LOCK TABLE {SalesRollup.__tablename__} IN EXCLUSIVE MODE"))
+        db.session.execute(SalesRollup.__table__.delete())
+
+        is_sale = SalesFact.kind == SALE
+        for granularity in GRANULARITIES:
+            bucket = func.date_trunc(granularity, SalesFact.occurred_at)
+            source = select(
+                literal(granularity),
+                bucket,
+                SalesFact.event_id,
+                SalesFact.ticket_type_id,
+                SalesFact.payment_method,
+                SalesFact.currency_code,
+                func.count(SalesFact.id).filter(is_sale),
+                func.coalesce(func.sum(SalesFact.quantity).filter(is_sale), 0),
+                func.coalesce(func.sum(SalesFact.amount).filter(is_sale), 0),
+                func.count(SalesFact.id).filter(SalesFact.kind == ATTENDANCE),
+                literal(started)
+            ).group_by(
+                bucket, SalesFact.event_id, SalesFact.ticket_type_id,
+                SalesFact.payment_method, SalesFact.currency_code
+            )
+            db.session.execute(SalesRollup.__table__.insert().from_select(
+                ['granularity', 'bucket_start', 'event_id', 'ticket_type_id', 'payment_method', 'currency_code',
+                 'tickets_sold', 'quantity_sold', 'revenue', 'attendees', 'updated_at'],
+                source
+            ))
+
+        buckets = db.session.query(func.count(SalesRollup.id)).scalar()
+        db.session.commit()
+
+        elapsed = (datetime.utcnow() - started).total_seconds()
+        logger.info(f"Sales facts backfilled: {inserted} new facts, {buckets} rollup buckets in {elapsed:.2f}s")
+        return inserted, buckets
+
+    # ===== READS =====
+    @staticmethod
+    def event_totals(event_ids: Optional[List[int]] = None, organizer_id: Optional[int] = None,
+                     start_date: Optional[datetime] = None, end_date: Optional[datetime] = None) -> Dict[int, dict]:
+        """Per-event tickets sold, quantity, revenue and attendees from the rollups
+
+        Day buckets are used unless the range has sub-day boundaries, in which
+        case hour buckets keep the answer exact to the hour. `end_date` is
+        exclusive: a bucket counts when it starts before it, so an end at
+        midnight stops at the previous day.
+        """
+        bounds = [d for d in (start_date, end_date) if d is not None]
+        granularity = 'hour' if any(d != bucket_start(d, 'day') for d in bounds) else 'day'
+
+        query = db.session.query(
+            SalesRollup.event_id,
+            func.sum(SalesRollup.tickets_sold),
+            func.sum(SalesRollup.quantity_sold),
+            func.sum(SalesRollup.revenue),
+            func.sum(SalesRollup.attendees)
+        ).filter(SalesRollup.granularity == granularity)
+
+        if event_ids is not None:
+            if not event_ids:
+                return {}
+            query = query.filter(SalesRollup.event_id.in_(event_ids))
+        if organizer_id is not None:
+            query = query.join(Event, Event.id == SalesRollup.event_id).filter(Event.organizer_id == organizer_id)
+        if start_date is not None:
+            query = query.filter(SalesRollup.bucket_start >= bucket_start(start_date, granularity))
+        if end_date is not None:
+            query = query.filter(SalesRollup.bucket_start < end_date)
+
+        return {
+            event_id: {
+                "tickets_sold": int(tickets or 0),
+                "quantity_sold": int(quantity or 0),
+                "revenue": Decimal(str(revenue or 0)),
+                "attendees": int(attendees or 0)
+            }
+            for event_id, tickets, quantity, revenue, attendees in query.group_by(SalesRollup.event_id)
+        }
+
+    @staticmethod
+    def empty_totals() -> dict:
+        return {"tickets_sold": 0, "quantity_sold": 0, "revenue": Decimal('0'), "attendees": 0}
+
+
+# Initialize globally — must be attached via sales_facts.init_app(app)
+sales_facts = SalesFactService()
@@ -3,9 +3,11 @@ from itsdangerous import URLSafeSerializer
 from config import Config
 from flask import request, jsonify
 from flask_restful import Resource
-from flask_jwt_extended import jwt_required, get_jwt_identity
+from flask_jwt_extended import jwt_required
 from datetime import datetime
 from model import db, Ticket, Scan, User, Event, TicketType, UserRole, PaymentStatus
+from sales_facts import sales_facts
+from principal import current_principal
 import logging
 
 # Configure logging
@@ -20,8 +22,7 @@ class TicketValidationResource(Resource):
         Only users with the "SECURITY" role can perform this action.
         """
         try:
-            identity = get_jwt_identity()
-            user = User.query.get(identity)
+            user = current_principal()
 
             if not user or str(user.role).upper() != "SECURITY":
                 return {"message": "Only security personnel can scan tickets"}, 403
@@ -62,6 +63,7 @@ class TicketValidationResource(Resource):
             ticket.scanned = True
             db.session.add(scan_entry)
             db.session.commit()
+            sales_facts.record_attendance(ticket)
 
             # Get additional data for the response
             event = Event.query.get(ticket.event_id)
@@ -113,8 +115,7 @@ class TicketVerificationResource(Resource):
     @jwt_required()
     def post(self, ticket_id):
         try:
-            identity = get_jwt_identity()
-            user = User.query.get(identity)
+            user = current_principal()
 
             # if not user or str(user.role).upper() != "SECURITY":
             #     return {"message": "Only security personnel can verify tickets"}, 403
@@ -167,6 +168,7 @@ class TicketVerificationResource(Resource):
             ticket.scanned = True
             db.session.add(scan_entry)
             db.session.commit()
+            sales_facts.record_attendance(ticket)
 
             # Get additional data for the response
             event = Event.query.get(ticket.event_id)
@@ -0,0 +1,131 @@
+"""
+Background job scheduler shared by the periodic aggregation jobs.
+
+Jobs run on an APScheduler BackgroundScheduler that is started lazily inside
+each gunicorn worker (threads don't survive the --preload fork). Every run is
+wrapped in an app context and a Postgres advisory lock, so when several
+workers schedule the same job only one of them executes it at a time. Jobs
+can also be triggered from cron with `flask run-job <name>`.
+"""
+import os
+import zlib
+import logging
+from datetime import datetime
+from threading import Lock
+from typing import Callable, Dict
+
+import click
+from apscheduler.schedulers.background import BackgroundScheduler
+from sqlalchemy import text
+
+from model import db
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+class JobScheduler:
+    """Registry of periodic jobs with single-flight execution across workers"""
+
+    def __init__(self):
+        self.app = None
+        self._jobs: Dict[str, dict] = {}
+        self._scheduler = None
+        self._pid = None
+        self._lock = Lock()
+
+    def init_app(self, app):
+        self.app = app
+        app.config.setdefault('SCHEDULER_ENABLED', True)
+        app.before_request(self._ensure_started)
+
+        @app.cli.command('run-job')
+        @click.argument('name')
+        def run_job_command(name):
+            """Run a registered background job once."""
+            if name not in self._jobs:
+                raise click.BadParameter(f"Unknown job '{name}'. Available: {', '.join(sorted(self._jobs))}")
+            ran = self.run_now(name)
+            click.echo(f"Job '{name}' {'completed' if ran else 'skipped (already running elsewhere)'}")
+
+    def add_job(self, name: str, func: Callable, seconds: int, run_on_start: bool = False):
+        """Register a job to run every `seconds` seconds"""
+        self._jobs[name] = {'func': func, 'seconds': seconds, 'run_on_start': run_on_start}
+
+    def _ensure_started(self):
+        if self._pid == os.getpid() or not self.app.config['SCHEDULER_ENABLED']:
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._scheduler = BackgroundScheduler(daemon=True)
+            for name, job in self._jobs.items():
+                # APScheduler treats an explicit next_run_time=None as "paused"
+                extra = {'next_run_time': datetime.now()} if job['run_on_start'] else {}
+                self._scheduler.add_job(
+                    self.run_now,
+                    'interval',
+                    args=[name],
+                    seconds=job['seconds'],
+                    id=name,
+                    coalesce=True,
+                    max_instances=1,
+                    **extra
+                )
+            self._scheduler.start()
+            self._pid = os.getpid()
+            logger.info(f"Background scheduler started in worker {self._pid} with jobs: {list(self._jobs)}")
+
+    def run_now(self, name: str) -> bool:
+        """Run a job immediately; returns False if another worker holds its lock"""
+        job = self._jobs[name]
+        with self.app.app_context():
+            with advisory_lock(name) as acquired:
+                if not acquired:
+                    logger.debug(f"Job '{name}' is already running in another worker")
+                    return False
+                try:
+                    job['func']()
+                    return True
+                except Exception as e:
+                    db.session.rollback()
+                    logger.error(f"Background job '{name}' failed: {e}")
+                    return False
+                finally:
+                    db.session.remove()
+
+    def shutdown(self):
+        with self._lock:
+            if self._scheduler is not None:
+                self._scheduler.shutdown(wait=False)
+                self._scheduler = None
+                self._pid = None
+
+
+class advisory_lock:
+    """Session-level pg_try_advisory_lock held for the duration of a job"""
+
+    def __init__(self, name: str):
+        self.key = zlib.crc32(name.encode())
+        self.conn = None
+        self.acquired = False
+
+    def __enter__(self) -> bool:
+        if db.engine.dialect.name != 'postgresql':
+            return True
+        self.conn = db.engine.connect()
+        self.acquired = bool(self.conn.execute(text("SELECT pg_try_advisory_lock(:key)"), {'key': self.key}).scalar())
+        return self.acquired
+
+    def __exit__(self, exc_type, exc, tb):
+        if self.conn is not None:
+            try:
+                if self.acquired:
+                    self.conn.execute(text("SELECT pg_advisory_unlock(:key)"), {'key': self.key})
+            finally:
+                self.conn.close()
+        return False
+
+
+# Initialize globally — must be attached via job_scheduler.init_app(app)
+job_scheduler = JobScheduler()
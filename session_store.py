@@ -0,0 +1,199 @@
+"""
+Server-side session storage.
+
+The Flask session only carries OAuth state between the Google redirect and
+the callback, but the browser sends the session cookie with every API call.
+The session interface is chosen with SESSION_BACKEND:
+
+- postgres (default): sessions live in the `server_sessions` table, shared by
+  every worker and instance. The cookie holds only a random id; the row is
+  read the first time a request actually touches the session and written
+  only when it changed, so ordinary API requests never hit the table.
+  Expired rows are deleted in batches by a scheduled job.
+- cookie: Flask's signed cookie session. Stateless, nothing stored
+  server-side; suits deployments that only need the OAuth round trip.
+- flask_session: the previous Flask-Session setup driven by SESSION_TYPE
+  (filesystem or redis), kept for local development.
+"""
+import logging
+import secrets
+from datetime import datetime
+from typing import Optional
+
+from flask.sessions import SecureCookieSessionInterface, SessionInterface, SessionMixin
+from sqlalchemy import select
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from werkzeug.datastructures import CallbackDict
+
+from model import db, ServerSession
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+def _new_sid() -> str:
+    return secrets.token_urlsafe(32)
+
+
+def _loads_first(name):
+    """Wrap a dict method so the row is read before the session is used"""
+    method = getattr(CallbackDict, name)
+
+    def wrapper(self, *args, **kwargs):
+        self._ensure_loaded()
+        return method(self, *args, **kwargs)
+    wrapper.__name__ = name
+    return wrapper
+
+
+class LazyServerSession(CallbackDict, SessionMixin):
+    """Session whose stored data is fetched on first access"""
+
+    def __init__(self, sid: str, loader=None):
+        def on_update(session):
+            session.modified = True
+        super().__init__(None, on_update)
+        self.sid = sid
+        self.new = loader is None
+        self.modified = False
+        self._loader = loader
+
+    def _ensure_loaded(self):
+        if self._loader is None:
+            return
+        loader, self._loader = self._loader, None
+        data = loader(self.sid)
+        if data is None:
+            # Unknown or expired id: start a fresh session under a new one
+            self.sid = _new_sid()
+            self.new = True
+        else:
+            dict.update(self, data)  # bypasses on_update, so loading doesn't mark it modified
+
+    @property
+    def loaded(self) -> bool:
+        return self._loader is None
+
+
+for _name in ('__getitem__', '__setitem__', '__delitem__', '__contains__', '__iter__', '__len__',
+              '__repr__', '__eq__', 'get', 'keys', 'values', 'items', 'pop', 'popitem',
+              'setdefault', 'update', 'clear', 'copy'):
+    setattr(LazyServerSession, _name, _loads_first(_name))
+
+
+class PostgresSessionInterface(SessionInterface):
+    """Sessions in the server_sessions table, read lazily and written only when modified"""
+    serializer = SecureCookieSessionInterface.serializer
+
+    def _load(self, sid: str) -> Optional[dict]:
+        try:
+            with db.engine.connect() as connection:
+                data = connection.execute(
+                    select(ServerSession.data).where(
+                        ServerSession.sid == sid,
+                        ServerSession.expires_at > datetime.utcnow()
+                    )
+                ).scalar()
+        except Exception as e:
+            logger.error(f"Could not read session: {e}")
+            return None
+        return self.serializer.loads(data) if data is not None else None
+
+    def open_session(self, app, request):
+        sid = request.cookies.get(self.get_cookie_name(app))
+        if not sid or len(sid) > 64:
+            return LazyServerSession(_new_sid())
+        return LazyServerSession(sid, loader=self._load)
+
+    def save_session(self, app, session, response):
+        if not session.modified:
+            return  # untouched, or only read: nothing to write and the cookie is unchanged
+
+        name = self.get_cookie_name(app)
+        domain = self.get_cookie_domain(app)
+        path = self.get_cookie_path(app)
+        # Own connection and transaction, so the request's db.session is left alone
+        try:
+            with db.engine.begin() as connection:
+                if not session:
+                    if not session.new:
+                        connection.execute(ServerSession.__table__.delete().where(ServerSession.sid == session.sid))
+                    response.delete_cookie(name, domain=domain, path=path)
+                    return
+
+                expires_at = datetime.utcnow() + app.permanent_session_lifetime
+                stmt = pg_insert(ServerSession).values(
+                    sid=session.sid, data=self.serializer.dumps(dict(session)), expires_at=expires_at
+                )
+                connection.execute(stmt.on_conflict_do_update(
+                    index_elements=['sid'],
+                    set_={'data': stmt.excluded.data, 'expires_at': stmt.excluded.expires_at}
+                ))
+        except Exception as e:
+            logger.error(f"Could not save session: {e}")
+            return
+
+        response.set_cookie(
+            name, session.sid,
+            expires=self.get_expiration_time(app, session),
+            httponly=self.get_cookie_httponly(app),
+            domain=domain,
+            path=path,
+            secure=self.get_cookie_secure(app),
+            samesite=self.get_cookie_samesite(app)
+        )
+        response.vary.add('Cookie')
+
+
+class SessionStore:
+    """Selects the session backend and cleans up expired server-side sessions"""
+
+    BACKENDS = ('postgres', 'cookie', 'flask_session')
+
+    def __init__(self, backend: str = 'postgres', cleanup_batch_size: int = 1000):
+        self.backend = backend
+        self.cleanup_batch_size = cleanup_batch_size
+
+    def init_app(self, app):
+        app.config.setdefault('SESSION_BACKEND', self.backend)
+        app.config.setdefault('SESSION_CLEANUP_INTERVAL', 3600)
+        app.config.setdefault('SESSION_CLEANUP_BATCH_SIZE', self.cleanup_batch_size)
+        self.cleanup_batch_size = app.config['SESSION_CLEANUP_BATCH_SIZE']
+        self.use(app, app.config['SESSION_BACKEND'])
+
+    def use(self, app, backend: str):
+        """Switch the app's session interface (also used to degrade to cookies without a database)"""
+        if backend not in self.BACKENDS:
+            raise ValueError(f"Unknown SESSION_BACKEND '{backend}'. Use one of: {', '.join(self.BACKENDS)}")
+        if backend == 'postgres':
+            app.session_interface = PostgresSessionInterface()
+        elif backend == 'cookie':
+            app.session_interface = SecureCookieSessionInterface()
+        else:
+            from flask_session import Session
+            Session(app)
+        app.config['SESSION_BACKEND'] = self.backend = backend
+        logger.info(f"Session backend: {backend}")
+
+    def purge_expired(self) -> int:
+        """Delete expired sessions a batch at a time (scheduled job); returns the number removed"""
+        if self.backend != 'postgres':
+            return 0
+        table = ServerSession.__table__
+        removed = 0
+        while True:
+            expired = select(table.c.sid).where(
+                table.c.expires_at <= datetime.utcnow()
+            ).limit(self.cleanup_batch_size)
+            with db.engine.begin() as connection:
+                deleted = connection.execute(table.delete().where(table.c.sid.in_(expired))).rowcount
+            removed += deleted
+            if deleted < self.cleanup_batch_size:
+                break
+        if removed:
+            logger.info(f"Removed {removed} expired sessions")
+        return removed
+
+
+# Initialize globally — must be attached via session_store.init_app(app)
+session_store = SessionStore()
@@ -1,19 +1,17 @@
 from flask import jsonify, request, current_app
 from flask_restful import Resource
 from flask_jwt_extended import jwt_required, get_jwt_identity, verify_jwt_in_request
-from flask_limiter import Limiter
 from flask_limiter.util import get_remote_address
-from model import db, User, Event, TicketType, Organizer, UserRole, PaymentStatus, Transaction, Ticket
-import psutil
+from model import UserRole
 import logging
 import hashlib
 import time
-from datetime import datetime, timedelta
-from sqlalchemy import func, text
+from datetime import datetime
 from functools import wraps
-from config import Config
-import calendar
-import redis
+from stats_engine import stats_engine
+from health_monitor import health_sampler
+from principal import current_principal
+from rate_limits import quotas
 
 
 # Configure logging with security events
@@ -24,13 +22,6 @@ logging.basicConfig(
 logger = logging.getLogger(__name__)
 security_logger = logging.getLogger('security')
 
-# Initialize rate limiter
-limiter = Limiter(
-    key_func=get_remote_address,
-    default_limits=["100 per hour"],
-    storage_uri=Config.REDIS_URL if hasattr(Config, 'REDIS_URL') else "memory://"
-)
-
 # Security configuration
 SECURITY_CONFIG = {
     'MAX_FAILED_ATTEMPTS': 5,
@@ -60,8 +51,8 @@ def validate_user_session(f):
             verify_jwt_in_request()
             identity = get_jwt_identity()
             
-            # Check if user exists and is active
-            user = User.query.get(identity)
+            # Check if user exists and is active (resolved once per request, usually from cache)
+            user = current_principal()
             if not user:
                 security_audit_log(
                     identity, 'INVALID_USER_ACCESS_ATTEMPT', 
@@ -121,7 +112,7 @@ def sanitize_system_data(data):
 
 class UnifiedStatsResource(Resource):
     """Unified stats endpoint that handles all user roles with proper authorization."""
-    decorators = [limiter.limit("20 per minute"), validate_user_session]
+    decorators = [quotas.limit("20 per minute"), validate_user_session]
     
     def get(self):
         """Get statistics based on user role with enhanced security."""
@@ -129,7 +120,7 @@ class UnifiedStatsResource(Resource):
         
         try:
             identity = get_jwt_identity()
-            user = User.query.get(identity)
+            user = current_principal()
             
             # Security audit log
             security_audit_log(
@@ -178,20 +169,13 @@ class UnifiedStatsResource(Resource):
     def _get_attendee_stats(self):
         """Minimal stats for attendees - public information only."""
         try:
-            today = datetime.utcnow().date()
-            
-            # Only basic, non-sensitive platform metrics
-            total_events = db.session.query(func.count(Event.id)).scalar()
-            upcoming_events = db.session.query(func.count(Event.id)).filter(
-                Event.date >= today
-            ).scalar()
+            # Only basic, non-sensitive platform metrics, shared by every request
+            platform, computed_at = stats_engine.get('platform')
             
             return {
                 "userRole": "attendee",
-                "platformStats": {
-                    "totalEvents": total_events or 0,
-                    "upcomingEvents": upcoming_events or 0,
-                },
+                "platformStats": platform,
+                "metricsComputedAt": computed_at.isoformat() if computed_at else None,
                 "lastUpdated": datetime.utcnow().isoformat(),
                 "apiVersion": "2.0"
             }
@@ -202,53 +186,25 @@ class UnifiedStatsResource(Resource):
     def _get_organizer_stats(self, user):
         """Stats for organizers - their own data only with data isolation."""
         try:
-            organizer = db.session.query(Organizer).filter_by(user_id=user.id).first()
-            if not organizer:
+            if user.organizer_id is None:
                 return {"error": "Organizer profile not found"}, 404
             
-            today = datetime.utcnow().date()
-            
-            # Platform stats (non-sensitive)
-            total_events = db.session.query(func.count(Event.id)).scalar()
-            upcoming_events = db.session.query(func.count(Event.id)).filter(
-                Event.date >= today
-            ).scalar()
-            
-            # Organizer's own stats only - strict data isolation
-            organizer_events = db.session.query(func.count(Event.id)).filter(
-                Event.organizer_id == organizer.id
-            ).scalar()
+            # Platform stats (non-sensitive) from the shared snapshot
+            platform, computed_at = stats_engine.get('platform')
             
-            organizer_upcoming = db.session.query(func.count(Event.id)).filter(
-                Event.organizer_id == organizer.id,
-                Event.date >= today
-            ).scalar()
-            
-            # Fixed revenue calculation with explicit joins and select_from
-            organizer_revenue = db.session.query(
-                func.coalesce(func.sum(Transaction.amount_paid), 0)
-            ).select_from(Transaction).join(
-                Ticket, Transaction.id == Ticket.transaction_id
-            ).join(
-                TicketType, Ticket.ticket_type_id == TicketType.id
-            ).join(
-                Event, TicketType.event_id == Event.id
-            ).filter(
-                Event.organizer_id == organizer.id,
-                Transaction.payment_status.in_([PaymentStatus.COMPLETED, PaymentStatus.PAID])
-            ).scalar()
+            # Organizer's own counters only - strict data isolation
+            organizer_stats = stats_engine.organizer_stats(user.organizer_id)
             
             return {
                 "userRole": "organizer",
-                "platformStats": {
-                    "totalEvents": total_events or 0,
-                    "upcomingEvents": upcoming_events or 0,
-                },
+                "platformStats": platform,
                 "organizerStats": {
-                    "myEvents": organizer_events or 0,
-                    "myUpcomingEvents": organizer_upcoming or 0,
-                    "myRevenue": float(organizer_revenue or 0),
+                    "myEvents": organizer_stats.event_count,
+                    "myUpcomingEvents": organizer_stats.upcoming_events,
+                    "myRevenue": float(organizer_stats.revenue or 0),
                 },
+                "metricsComputedAt": computed_at.isoformat() if computed_at else None,
+                "organizerStatsUpdatedAt": organizer_stats.updated_at.isoformat(),
                 "lastUpdated": datetime.utcnow().isoformat(),
                 "apiVersion": "2.0"
             }
@@ -257,47 +213,25 @@ class UnifiedStatsResource(Resource):
             logger.error(f"Error fetching organizer stats: {e}")
             return {"error": "Unable to fetch statistics"}, 500
 
-    def _get_admin_basic_stats(self):
-        """Basic admin stats with security controls."""
+    def _get_admin_basic_stats(self, snapshot=None):
+        """Basic admin stats with security controls; `snapshot` is an already fetched stats_engine.get('admin')."""
         try:
-            # System metrics (sanitized)
-            cpu = psutil.cpu_percent(interval=0.1)
-            memory = psutil.virtual_memory()
-            disk = psutil.disk_usage('/')
-            
-            # Database stats with separate queries to avoid join issues
-            total_users = db.session.query(func.count(User.id)).scalar()
-            total_events = db.session.query(func.count(Event.id)).scalar()
-            total_organizers = db.session.query(func.count(Organizer.id)).scalar()
+            # System metrics (sanitized) from the background health sample
+            system = health_sampler.latest()["system"]
             
-            # Active users (last 30 days)
-            thirty_days_ago = datetime.utcnow() - timedelta(days=30)
-            active_users = db.session.query(func.count(User.id)).filter(
-                User.created_at >= thirty_days_ago
-            ).scalar()
-            
-            # Fixed revenue calculation - separate query
-            total_revenue = db.session.query(
-                func.coalesce(func.sum(Transaction.amount_paid), 0)
-            ).filter(
-                Transaction.payment_status.in_([PaymentStatus.PAID, PaymentStatus.COMPLETED])
-            ).scalar()
+            # Business metrics from the shared stats snapshot (recomputed in the background when stale)
+            admin_stats, computed_at = snapshot or stats_engine.get('admin')
             
             stats = {
                 "userRole": "admin",
                 "systemHealth": {
-                    "cpuLoad": round(cpu, 1),
-                    "memoryUsage": round(memory.percent, 1),
-                    "diskUsage": round((disk.used / disk.total) * 100, 1),
-                    "status": "healthy" if cpu < 80 and memory.percent < 80 else "warning"
-                },
-                "businessMetrics": {
-                    "totalUsers": total_users or 0,
-                    "activeUsers": active_users or 0,
-                    "totalEvents": total_events or 0,
-                    "totalOrganizers": total_organizers or 0,
-                    "totalRevenue": float(total_revenue or 0),
+                    "cpuLoad": system["cpu"],
+                    "memoryUsage": system["memory"],
+                    "diskUsage": system["disk"],
+                    "status": "healthy" if system["cpu"] < 80 and system["memory"] < 80 else "warning"
                 },
+                "businessMetrics": admin_stats["businessMetrics"],
+                "metricsComputedAt": computed_at.isoformat() if computed_at else None,
                 "lastUpdated": datetime.utcnow().isoformat(),
                 "apiVersion": "2.0"
             }
@@ -311,17 +245,16 @@ class UnifiedStatsResource(Resource):
     def _get_admin_detailed_stats(self):
         """Detailed admin stats with comprehensive metrics."""
         try:
-            # Get basic stats first
-            basic_stats = self._get_admin_basic_stats()
-            if "error" in basic_stats:
+            # One snapshot read serves both the basic and the detailed metrics
+            snapshot = stats_engine.get('admin')
+            basic_stats = self._get_admin_basic_stats(snapshot)
+            if isinstance(basic_stats, tuple):
                 return basic_stats
             
-            # Add detailed metrics
+            admin_stats, _ = snapshot
             detailed_metrics = {
-                "revenueByMonth": self._get_revenue_by_month(),
-                "transactionMetrics": self._get_transaction_metrics(),
-                "eventMetrics": self._get_event_metrics(),
-                "userGrowth": self._get_user_growth_stats()
+                key: admin_stats[key]
+                for key in ("revenueByMonth", "transactionMetrics", "eventMetrics", "userGrowth")
             }
             
             # Merge basic and detailed stats
@@ -334,144 +267,15 @@ class UnifiedStatsResource(Resource):
             logger.error(f"Error fetching admin detailed stats: {e}")
             return {"error": "Unable to fetch detailed statistics"}, 500
 
-    def _get_revenue_by_month(self):
-        """Get revenue breakdown by month for current year."""
-        try:
-            current_year = datetime.now().year
-            revenue_by_month = []
-
-            for month in range(1, 13):
-                start_date = datetime(current_year, month, 1)
-                last_day = calendar.monthrange(current_year, month)[1]
-                end_date = datetime(current_year, month, last_day, 23, 59, 59)
-
-                # Fixed: use explicit select_from to avoid join ambiguity
-                monthly_revenue = db.session.query(
-                    func.coalesce(func.sum(Transaction.amount_paid), 0)
-                ).select_from(Transaction).filter(
-                    Transaction.timestamp >= start_date,
-                    Transaction.timestamp <= end_date,
-                    Transaction.payment_status.in_([PaymentStatus.PAID, PaymentStatus.COMPLETED])
-                ).scalar()
-
-                revenue_by_month.append({
-                    "month": f"{current_year}-{month:02}",
-                    "revenue": float(monthly_revenue or 0)
-                })
-
-            return revenue_by_month
-        except Exception as e:
-            logger.error(f"Error calculating monthly revenue: {e}")
-            return []
-
-    def _get_transaction_metrics(self):
-        """Get transaction-related metrics."""
-        try:
-            # Use explicit select_from for all transaction queries
-            total_transactions = db.session.query(
-                func.count(Transaction.id)
-            ).select_from(Transaction).scalar()
-            
-            successful_transactions = db.session.query(
-                func.count(Transaction.id)
-            ).select_from(Transaction).filter(
-                Transaction.payment_status.in_([PaymentStatus.PAID, PaymentStatus.COMPLETED])
-            ).scalar()
-            
-            pending_transactions = db.session.query(
-                func.count(Transaction.id)
-            ).select_from(Transaction).filter(
-                Transaction.payment_status == PaymentStatus.PENDING
-            ).scalar()
-            
-            failed_transactions = db.session.query(
-                func.count(Transaction.id)
-            ).select_from(Transaction).filter(
-                Transaction.payment_status.in_([PaymentStatus.FAILED, PaymentStatus.CANCELLED])
-            ).scalar()
-            
-            return {
-                "totalTransactions": total_transactions or 0,
-                "successfulTransactions": successful_transactions or 0,
-                "pendingTransactions": pending_transactions or 0,
-                "failedTransactions": failed_transactions or 0,
-                "successRate": round((successful_transactions / max(total_transactions, 1)) * 100, 2)
-            }
-        except Exception as e:
-            logger.error(f"Error calculating transaction metrics: {e}")
-            return {}
-
-    def _get_event_metrics(self):
-        """Get event-related metrics."""
-        try:
-            today = datetime.utcnow().date()
-            
-            # Use explicit select_from for all event queries
-            active_events = db.session.query(
-                func.count(Event.id)
-            ).select_from(Event).filter(
-                Event.start_date <= today,
-                Event.end_date >= today
-            ).scalar()
-            
-            past_events = db.session.query(
-                func.count(Event.id)
-            ).select_from(Event).filter(
-                Event.end_date < today
-            ).scalar()
-            
-            future_events = db.session.query(
-                func.count(Event.id)
-            ).select_from(Event).filter(
-                Event.start_date > today
-            ).scalar()
-            
-            return {
-                "activeEvents": active_events or 0,
-                "pastEvents": past_events or 0,
-                "futureEvents": future_events or 0
-            }
-        except Exception as e:
-            logger.error(f"Error calculating event metrics: {e}")
-            return {}
-
-    def _get_user_growth_stats(self):
-        """Get user growth statistics."""
-        try:
-            # Users registered in last 7 days
-            seven_days_ago = datetime.utcnow() - timedelta(days=7)
-            weekly_users = db.session.query(
-                func.count(User.id)
-            ).select_from(User).filter(
-                User.created_at >= seven_days_ago
-            ).scalar()
-            
-            # Users registered in last 30 days
-            thirty_days_ago = datetime.utcnow() - timedelta(days=30)
-            monthly_users = db.session.query(
-                func.count(User.id)
-            ).select_from(User).filter(
-                User.created_at >= thirty_days_ago
-            ).scalar()
-            
-            return {
-                "newUsersThisWeek": weekly_users or 0,
-                "newUsersThisMonth": monthly_users or 0
-            }
-        except Exception as e:
-            logger.error(f"Error calculating user growth: {e}")
-            return {}
-
 
 class SystemHealthResource(Resource):
     """Dedicated system health endpoint for monitoring - ADMIN ONLY."""
-    decorators = [limiter.limit("30 per minute"), validate_user_session]
+    decorators = [quotas.limit("30 per minute"), validate_user_session]
     
     def get(self):
         """Get system health metrics (admin only)."""
         try:
-            identity = get_jwt_identity()
-            user = User.query.get(identity)
+            user = current_principal()
             
             # Strict admin-only access control
             if user.role != UserRole.ADMIN:
@@ -489,38 +293,23 @@ class SystemHealthResource(Resource):
                 'admin_health_check'
             )
             
-            # System metrics
-            cpu = psutil.cpu_percent(interval=0.1)
-            memory = psutil.virtual_memory()
-            disk = psutil.disk_usage('/')
-            
-            # Database connection test
-            db_healthy = True
-            try:
-                db.session.execute(text("SELECT 1")).fetchone()
-            except Exception:
-                db_healthy = False
+            # Latest background sample for this worker - nothing is probed on the request thread
+            sample = health_sampler.latest()
             
             health_status = {
-                "overall": "healthy",
-                "timestamp": datetime.utcnow().isoformat(),
-                "system": {
-                    "cpu": round(cpu, 1),
-                    "memory": round(memory.percent, 1),
-                    "disk": round((disk.used / disk.total) * 100, 1)
-                },
+                "overall": "unhealthy" if sample["stale"] else sample["overall"],
+                "timestamp": sample["sampled_at"],
+                "sampleAgeSeconds": sample["age_seconds"],
+                "system": sample["system"],
                 "services": {
-                    "database": "healthy" if db_healthy else "unhealthy",
+                    "database": "healthy" if sample["database"]["ok"] else "unhealthy",
                     "redis": "unknown"  # Add Redis check if needed
-                }
+                },
+                "database": sample["database"],
+                "llm": sample["llm"],
+                "caches": sample["caches"]
             }
             
-            # Determine overall health
-            if cpu > 90 or memory.percent > 90 or not db_healthy:
-                health_status["overall"] = "unhealthy"
-            elif cpu > 80 or memory.percent > 80:
-                health_status["overall"] = "warning"
-            
             status_code = 200 if health_status["overall"] in ["healthy", "warning"] else 503
             return health_status, status_code
             
@@ -0,0 +1,306 @@
+"""
+Dashboard stats engine.
+
+The admin dashboard figures (monthly revenue, transaction, event and user
+counts) are computed in three grouped statements - `date_trunc` for the
+monthly series, `COUNT(*) FILTER (WHERE ...)` for the counters - and stored
+in `stats_snapshots`, which every worker reads.
+
+Reads are stale-while-revalidate: a snapshot younger than STATS_CACHE_TTL is
+served as is; an older one (up to STATS_CACHE_MAX_STALE) is still served
+immediately while a background thread recomputes it. Only the worker holding
+the key's advisory lock recomputes, so a burst of dashboard loads triggers
+one aggregation. Requests only wait when there is no usable snapshot at all.
+
+UnifiedStatsResource is reduced to lookups: platform-wide counters are one
+shared snapshot for every role, and each organizer's own counters live in
+`organizer_stats`, recomputed set-based by the stats job and bumped
+incrementally when an event is created or deleted and when a payment is
+confirmed.
+"""
+import logging
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from threading import Lock
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import func, extract
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+
+from model import (db, User, Event, Organizer, Transaction, PaymentStatus, Ticket, TicketType,
+                   SalesRollup, StatsSnapshot, OrganizerStats)
+from scheduler import advisory_lock
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+PAID_STATUSES = [PaymentStatus.PAID, PaymentStatus.COMPLETED]
+FAILED_STATUSES = [PaymentStatus.FAILED, PaymentStatus.CANCELLED]
+
+
+# ===== AGGREGATIONS =====
+def compute_admin_stats() -> Dict[str, Any]:
+    """Business metrics and detailed admin breakdowns in three statements"""
+    now = datetime.utcnow()
+    today = now.date()
+    current_year = datetime.now().year
+    paid = Transaction.payment_status.in_(PAID_STATUSES)
+
+    # 1) Paid revenue per month of the current year
+    month = func.date_trunc('month', Transaction.timestamp)
+    monthly = dict(db.session.query(
+        month, func.coalesce(func.sum(Transaction.amount_paid), 0)
+    ).filter(
+        paid, extract('year', Transaction.timestamp) == current_year
+    ).group_by(month).all())
+    revenue_by_month = [{
+        "month": f"{current_year}-{number:02}",
+        "revenue": float(monthly.get(datetime(current_year, number, 1), 0))
+    } for number in range(1, 13)]
+
+    # 2) Transaction counters and total revenue
+    transactions = db.session.query(
+        func.count(Transaction.id),
+        func.count(Transaction.id).filter(paid),
+        func.count(Transaction.id).filter(Transaction.payment_status == PaymentStatus.PENDING),
+        func.count(Transaction.id).filter(Transaction.payment_status.in_(FAILED_STATUSES)),
+        func.coalesce(func.sum(Transaction.amount_paid).filter(paid), 0)
+    ).one()
+    total_transactions, successful, pending, failed, total_revenue = transactions
+
+    # 3) Event, user and organizer counters as one-row subqueries
+    events = db.session.query(
+        func.count(Event.id).label('total'),
+        func.count(Event.id).filter(Event.date == today).label('active'),
+        func.count(Event.id).filter(Event.date < today).label('past'),
+        func.count(Event.id).filter(Event.date > today).label('future')
+    ).subquery()
+    users = db.session.query(
+        func.count(User.id).label('total'),
+        func.count(User.id).filter(User.created_at >= now - timedelta(days=7)).label('week'),
+        func.count(User.id).filter(User.created_at >= now - timedelta(days=30)).label('month')
+    ).subquery()
+    organizers = db.session.query(func.count(Organizer.id).label('total')).subquery()
+    counts = db.session.query(
+        events.c.total, events.c.active, events.c.past, events.c.future,
+        users.c.total, users.c.week, users.c.month, organizers.c.total
+    ).one()
+    (total_events, active_events, past_events, future_events,
+     total_users, weekly_users, monthly_users, total_organizers) = counts
+
+    return {
+        "businessMetrics": {
+            "totalUsers": total_users,
+            "activeUsers": monthly_users,
+            "totalEvents": total_events,
+            "totalOrganizers": total_organizers,
+            "totalRevenue": float(total_revenue),
+        },
+        "revenueByMonth": revenue_by_month,
+        "transactionMetrics": {
+            "totalTransactions": total_transactions,
+            "successfulTransactions": successful,
+            "pendingTransactions": pending,
+            "failedTransactions": failed,
+            "successRate": round((successful / max(total_transactions, 1)) * 100, 2)
+        },
+        "eventMetrics": {
+            "activeEvents": active_events,
+            "pastEvents": past_events,
+            "futureEvents": future_events
+        },
+        "userGrowth": {
+            "newUsersThisWeek": weekly_users,
+            "newUsersThisMonth": monthly_users
+        }
+    }
+
+
+def compute_platform_stats() -> Dict[str, Any]:
+    """Public platform counters shown to every role"""
+    today = datetime.utcnow().date()
+    total_events, upcoming_events = db.session.query(
+        func.count(Event.id),
+        func.count(Event.id).filter(Event.date >= today)
+    ).one()
+    return {"totalEvents": total_events, "upcomingEvents": upcoming_events}
+
+
+class StatsEngine:
+    """Shared stats snapshots with stale-while-revalidate reads"""
+
+    def __init__(self, ttl: int = 60, max_stale: int = 3600):
+        self.app = None
+        self.ttl = ttl
+        self.max_stale = max_stale
+        self.computations: Dict[str, Callable[[], Dict[str, Any]]] = {}
+        self._executor = None
+        self._pending = set()
+        self._lock = Lock()
+
+    def init_app(self, app):
+        self.app = app
+        self.ttl = app.config.get('STATS_CACHE_TTL', self.ttl)
+        self.max_stale = app.config.get('STATS_CACHE_MAX_STALE', self.max_stale)
+        app.config.setdefault('STATS_REFRESH_INTERVAL', 900)
+
+    def register(self, key: str, compute: Callable[[], Dict[str, Any]]) -> None:
+        self.computations[key] = compute
+
+    # ===== REFRESH =====
+    def refresh(self, key: str) -> Tuple[Dict[str, Any], datetime]:
+        """Recompute a snapshot now and store it for every worker"""
+        computed_at = datetime.utcnow()
+        data = self.computations[key]()
+        stmt = pg_insert(StatsSnapshot).values(key=key, data=data, computed_at=computed_at)
+        db.session.execute(stmt.on_conflict_do_update(
+            index_elements=['key'],
+            set_={'data': stmt.excluded.data, 'computed_at': stmt.excluded.computed_at}
+        ))
+        db.session.commit()
+        logger.info(f"Stats '{key}' recomputed in {(datetime.utcnow() - computed_at).total_seconds():.2f}s")
+        return data, computed_at
+
+    def refresh_all(self) -> int:
+        """Scheduled job: recompute every snapshot and all organizer counters"""
+        for key in self.computations:
+            self.refresh(key)
+        return self.refresh_organizers()
+
+    def _revalidate(self, key: str) -> None:
+        try:
+            with self.app.app_context():
+                with advisory_lock(f"stats:{key}") as acquired:
+                    if not acquired:
+                        return  # another worker is already recomputing it
+                    snapshot = StatsSnapshot.query.get(key)
+                    if snapshot and datetime.utcnow() - snapshot.computed_at < timedelta(seconds=self.ttl):
+                        return  # refreshed while this task was queued
+                    self.refresh(key)
+        except Exception as e:
+            logger.error(f"Background refresh of stats '{key}' failed: {e}")
+        finally:
+            with self._lock:
+                self._pending.discard(key)
+
+    def _schedule(self, key: str) -> None:
+        with self._lock:
+            if key in self._pending:
+                return
+            self._pending.add(key)
+            if self._executor is None:
+                # Created lazily so the thread starts in the worker, not the preloading master
+                self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='stats-refresh')
+        self._executor.submit(self._revalidate, key)
+
+    # ===== READ =====
+    def get(self, key: str) -> Tuple[Dict[str, Any], Optional[datetime]]:
+        """Snapshot data and when it was computed; only blocks when nothing usable is stored"""
+        snapshot = StatsSnapshot.query.get(key)
+        if snapshot is not None:
+            age = datetime.utcnow() - snapshot.computed_at
+            if age < timedelta(seconds=self.ttl):
+                return snapshot.data, snapshot.computed_at
+            if age < timedelta(seconds=self.max_stale):
+                self._schedule(key)
+                return snapshot.data, snapshot.computed_at
+        return self.refresh(key)
+
+
+    # ===== ORGANIZER COUNTERS =====
+    @staticmethod
+    def refresh_organizers(organizer_ids: Optional[List[int]] = None) -> int:
+        """Recompute organizer counters in one grouped statement; returns the number of organizers written"""
+        computed_at = datetime.utcnow()
+        today = computed_at.date()
+        revenue = db.session.query(
+            SalesRollup.event_id.label('event_id'),
+            func.sum(SalesRollup.revenue).label('revenue')
+        ).filter(SalesRollup.granularity == 'day').group_by(SalesRollup.event_id).subquery()
+
+        query = db.session.query(
+            Organizer.id,
+            func.count(Event.id),
+            func.count(Event.id).filter(Event.date >= today),
+            func.coalesce(func.sum(revenue.c.revenue), 0)
+        ).outerjoin(
+            Event, Event.organizer_id == Organizer.id
+        ).outerjoin(
+            revenue, revenue.c.event_id == Event.id
+        ).group_by(Organizer.id)
+        if organizer_ids is not None:
+            query = query.filter(Organizer.id.in_(organizer_ids))
+
+        rows = [{
+            "organizer_id": organizer_id, "event_count": event_count, "upcoming_events": upcoming,
+            "revenue": organizer_revenue, "computed_at": computed_at, "updated_at": computed_at
+        } for organizer_id, event_count, upcoming, organizer_revenue in query.all()]
+        if rows:
+            stmt = pg_insert(OrganizerStats).values(rows)
+            db.session.execute(stmt.on_conflict_do_update(
+                index_elements=['organizer_id'],
+                set_={column: stmt.excluded[column] for column in rows[0] if column != 'organizer_id'}
+            ))
+        db.session.commit()
+        return len(rows)
+
+    def organizer_stats(self, organizer_id: int) -> OrganizerStats:
+        """An organizer's counters, computed inline the first time they are asked for"""
+        stats = OrganizerStats.query.get(organizer_id)
+        if stats is None:
+            self.refresh_organizers([organizer_id])
+            stats = OrganizerStats.query.get(organizer_id)
+        return stats
+
+    @staticmethod
+    def _bump(organizer_id: int, **deltas) -> None:
+        OrganizerStats.query.filter_by(organizer_id=organizer_id).update({
+            **{getattr(OrganizerStats, column): getattr(OrganizerStats, column) + delta
+               for column, delta in deltas.items()},
+            OrganizerStats.updated_at: datetime.utcnow()
+        }, synchronize_session=False)
+
+    def record_event_created(self, event) -> None:
+        self._record_event(event.organizer_id, event.date, 1)
+
+    def record_event_deleted(self, organizer_id: int, event_date) -> None:
+        """Called after the delete is committed, with values read before it"""
+        self._record_event(organizer_id, event_date, -1)
+
+    def _record_event(self, organizer_id: int, event_date, delta: int) -> None:
+        try:
+            upcoming = delta if event_date and event_date >= datetime.utcnow().date() else 0
+            self._bump(organizer_id, event_count=delta, upcoming_events=upcoming)
+            db.session.commit()
+        except Exception as e:
+            # Stats must never break event management; the next refresh catches up
+            db.session.rollback()
+            logger.error(f"Failed to update stats for organizer {organizer_id}: {e}")
+
+    def record_sales(self, tickets: Iterable) -> None:
+        """Add newly confirmed tickets' revenue to their organizers' counters"""
+        try:
+            ticket_ids = [ticket.id for ticket in tickets]
+            if not ticket_ids:
+                return
+            per_organizer = Counter(dict(db.session.query(
+                Event.organizer_id,
+                func.coalesce(func.sum(TicketType.price * Ticket.quantity), 0)
+            ).select_from(Ticket).join(
+                Event, Event.id == Ticket.event_id
+            ).join(
+                TicketType, TicketType.id == Ticket.ticket_type_id
+            ).filter(Ticket.id.in_(ticket_ids)).group_by(Event.organizer_id).all()))
+            for organizer_id, amount in per_organizer.items():
+                self._bump(organizer_id, revenue=amount)
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            logger.error(f"Failed to apply incremental organizer revenue: {e}")
+
+
+# Initialize globally — must be attached via stats_engine.init_app(app)
+stats_engine = StatsEngine()
+stats_engine.register('admin', compute_admin_stats)
+stats_engine.register('platform', compute_platform_stats)
@@ -0,0 +1,25 @@
+"""
+UserDirectory.estimate_total runs its EXPLAIN through exec_driver_sql, so
+the statement has to be fully rendered: no postcompile placeholders and no
+enum objects left as parameters.
+"""
+from sqlalchemy.dialects import postgresql
+
+from model import UserRole
+from user_directory import user_directory
+
+
+def test_explain_sql_inlines_role_filter():
+    sql = user_directory.explain_sql(postgresql.dialect(), roles=[UserRole.ORGANIZER, UserRole.SECURITY])
+
+    assert sql.startswith("EXPLAIN (FORMAT JSON) SELECT")
+    assert "POSTCOMPILE" not in sql
+    assert "'ORGANIZER'" in sql and "'SECURITY'" in sql
+
+
+def test_explain_sql_inlines_escaped_search():
+    sql = user_directory.explain_sql(postgresql.dialect(), search="50%_o'brien", roles=[UserRole.ADMIN])
+
+    assert "%(" not in sql  # no pyformat parameters left for the driver
+    assert "o''brien" in sql
+    assert "'ADMIN'" in sql
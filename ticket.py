@@ -2,17 +2,20 @@ from flask import request, jsonify
 from flask_restful import Resource
 from sqlalchemy import func
 from flask_jwt_extended import jwt_required, get_jwt_identity
-from model import db, Ticket, Event, TicketType, User, Transaction, PaymentStatus, UserRole, PaymentMethod, TransactionTicket, Organizer
+from model import db, Ticket, Event, TicketType, User, Transaction, PaymentStatus, UserRole, PaymentMethod, TransactionTicket
 from config import Config
 # Import Paystack functionalities
 from paystack import initialize_paystack_payment, refund_paystack_payment
 # Import M-Pesa functionalities
 from mpesa_intergration import STKPush, normalize_phone_number, RefundTransaction, get_access_token
-from email_utils import mail
+from mail_dispatcher import mail_dispatcher
+from category_analytics import category_analytics
+from sales_facts import sales_facts
+from stats_engine import stats_engine
+from principal import current_principal
 import mimetypes
 from flask_mail import Message
 from itsdangerous import URLSafeSerializer
-import qrcode
 import logging
 import os
 from datetime import datetime
@@ -60,6 +63,7 @@ def complete_ticket_operation(transaction):
             raise ValueError("No tickets found for this transaction")
 
         tickets = []
+        paid_tickets = []
         qr_attachments = []
 
         # Update all tickets status and generate QR code attachments
@@ -71,6 +75,7 @@ def complete_ticket_operation(transaction):
 
             # Update ticket status
             ticket.payment_status = PaymentStatus.PAID
+            paid_tickets.append(ticket)
 
             # Generate QR code attachment for this ticket
             qr_filename, qr_data = generate_qr_attachment(ticket)
@@ -87,6 +92,11 @@ def complete_ticket_operation(transaction):
 
         db.session.commit()
 
+        # Feed category counters, the sales rollups and organizer stats incrementally
+        category_analytics.record_sales(paid_tickets)
+        sales_facts.record_sales(paid_tickets)
+        stats_engine.record_sales(paid_tickets)
+
         # Send confirmation email with QR code attachments
         if tickets:
             user = User.query.get(tickets[0].user_id)
@@ -101,6 +111,8 @@ def complete_ticket_operation(transaction):
 
 def generate_qr_attachment(ticket):
     """Generate QR code file with enhanced security and visual appeal"""
+    import qrcode  # pulls in Pillow; only needed once a payment completes
+
     try:
         # Check if ticket has qr_code data, fallback to ticket ID
         qr_code_data = getattr(ticket, 'qr_code', None) or str(ticket.id)
@@ -506,13 +518,13 @@ If you have any questions, please contact our support team."""
                 headers=[("Content-ID", f"<qr_{ticket.id}>")]
             )
 
-        # Try to send the email
+        # Queue the email; the mail dispatcher delivers it in the background
         try:
-            mail.send(msg)
-            logger.info(f"Confirmation email sent to {user.email} with {len(qr_attachments)} tickets")
+            mail_dispatcher.enqueue(msg)
+            logger.info(f"Confirmation email queued for {user.email} with {len(qr_attachments)} tickets")
             return True
         except Exception as e:
-            logger.error(f"Error sending confirmation email to {user.email}: {e}")
+            logger.error(f"Error queueing confirmation email to {user.email}: {e}")
             return False
 
     except Exception as e:
@@ -524,8 +536,7 @@ class TicketResource(Resource):
     def get(self, ticket_id=None):
         """Get tickets based on user role and requirements."""
         try:
-            identity = get_jwt_identity()
-            user = User.query.get(identity)
+            user = current_principal()
             if not user:
                 return {"error": "User not found"}, 404
             # If requesting a specific ticket
@@ -618,9 +629,8 @@ class TicketResource(Resource):
     def _get_organizer_tickets(self, user):
         """Organizer can see tickets for their events grouped by type (only paid tickets)."""
         try:
-            # First, get the organizer profile for this user
-            organizer = Organizer.query.filter_by(user_id=user.id).first()
-            if not organizer:
+            # The principal already carries the organizer profile id
+            if user.organizer_id is None:
                 return {
                     "role": "organizer",
                     "my_events_tickets": []
@@ -643,7 +653,7 @@ class TicketResource(Resource):
                 TicketType, Ticket.ticket_type_id == TicketType.id
             ).filter(
                 Ticket.payment_status == PaymentStatus.PAID,
-                Event.organizer_id == organizer.id  # Filter by events created by this organizer
+                Event.organizer_id == user.organizer_id  # Filter by events created by this organizer
             ).group_by(
                 Event.id, Event.name, Event.date, Event.location,
                 TicketType.id, TicketType.type_name, TicketType.price
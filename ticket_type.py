@@ -1,14 +1,74 @@
-from flask import request, jsonify
+from functools import wraps
+from flask import request, jsonify, after_this_request
 from flask_restful import Resource
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from sqlalchemy import func
-from model import db, Event, TicketType, User, TicketTypeEnum, UserRole, Organizer
+from sqlalchemy.orm import joinedload
+from decimal import Decimal
+from model import db, Event, TicketType, User, TicketTypeEnum, UserRole, Organizer, Currency, CurrencyCode
+from exchange_rates import exchange_rates
 import logging
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+DISPLAY_CURRENCY_HEADER = 'X-Display-Currency'
+
+def get_display_currency():
+    """Currency requested with ?currency= or the X-Display-Currency header; None when not requested"""
+    code = (request.args.get('currency') or request.headers.get(DISPLAY_CURRENCY_HEADER) or '').strip().upper()
+    if not code:
+        return None
+    if code == 'KSH':
+        code = 'KES'
+    try:
+        currency = Currency.query.filter_by(code=CurrencyCode(code), is_active=True).first()
+    except ValueError:
+        currency = None
+    if not currency:
+        raise ValueError(f"Unsupported display currency '{code}'")
+    return currency
+
+def vary_on_display_currency(view):
+    """Send Vary: X-Display-Currency on every response of the view, localized or not, errors included,
+    so a shared cache never serves one currency's response to a request for another"""
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        @after_this_request
+        def add_vary(response):
+            response.vary.add(DISPLAY_CURRENCY_HEADER)
+            return response
+        return view(*args, **kwargs)
+    return wrapper
+
+def localize_prices(ticket_types, display_currency):
+    """
+    Convert every ticket type's price into the display currency in one batch
+    against this worker's cached rate matrix. Returns the converted prices
+    (None when rates are unavailable) and the display currency info.
+    """
+    matrix = exchange_rates.matrix()
+    kes_id = matrix.ids.get('KES')
+    try:
+        converted = matrix.convert_many(
+            [ticket_type.price for ticket_type in ticket_types],
+            [ticket_type.currency_id or kes_id for ticket_type in ticket_types],
+            display_currency.id
+        )
+        prices = [float(price.quantize(Decimal('0.01'))) for price in converted]
+    except (KeyError, TypeError) as e:
+        logger.warning(f"No rate to display prices in {display_currency.code.value}: {e}")
+        prices = [None] * len(ticket_types)
+
+    return prices, {
+        "code": display_currency.code.value,
+        "symbol": display_currency.symbol,
+        "rates_version": matrix.version,
+        "rates_as_of": matrix.effective_at.isoformat() if matrix.effective_at else None,
+        "available": None not in prices
+    }
+
 class TicketTypeResource(Resource):
     @jwt_required()
     def post(self):
@@ -191,12 +251,28 @@ class TicketTypeResource(Resource):
             return {"error": "An internal error occurred"}, 500
 
 class PublicTicketTypeResource(Resource):
+    decorators = [vary_on_display_currency]
+
     def get(self, event_id):
         """Public: Get all ticket types for a specific event (for attendees to view and purchase)."""
-        ticket_types = TicketType.query.filter_by(event_id=event_id).all()
-        return {"ticket_types": [tt.as_dict() for tt in ticket_types]}, 200
+        try:
+            display_currency = get_display_currency()
+        except ValueError as e:
+            return {"error": str(e)}, 400
+
+        ticket_types = TicketType.query.options(joinedload(TicketType.currency)).filter_by(event_id=event_id).all()
+        if not display_currency:
+            return {"ticket_types": [tt.as_dict() for tt in ticket_types]}, 200
+
+        prices, currency_info = localize_prices(ticket_types, display_currency)
+        return {
+            "ticket_types": [{**tt.as_dict(), "display_price": price} for tt, price in zip(ticket_types, prices)],
+            "display_currency": currency_info
+        }, 200
 
 class LowestPriceTicketResource(Resource):
+    decorators = [vary_on_display_currency]
+
     @jwt_required()
     def get(self, event_id=None):
         """Get the lowest price ticket type for events (accessible to all logged-in users)."""
@@ -207,6 +283,11 @@ class LowestPriceTicketResource(Resource):
             if not user:
                 return {"error": "User not found"}, 404
 
+            try:
+                display_currency = get_display_currency()
+            except ValueError as e:
+                return {"error": str(e)}, 400
+
             if event_id:
                 # Get lowest price ticket for a specific event
                 lowest_ticket = TicketType.query.filter_by(event_id=event_id).order_by(TicketType.price.asc()).first()
@@ -225,6 +306,10 @@ class LowestPriceTicketResource(Resource):
                         "remaining_quantity": lowest_ticket.quantity
                     }
                 }
+                if display_currency:
+                    prices, result["display_currency"] = localize_prices([lowest_ticket], display_currency)
+                    result["lowest_price_ticket"]["display_price"] = prices[0]
+                    return result, 200
                 return result, 200
             
             else:
@@ -236,7 +321,7 @@ class LowestPriceTicketResource(Resource):
                 ).group_by(TicketType.event_id).subquery()
                 
                 # Join with the original table to get complete ticket information
-                lowest_tickets = db.session.query(TicketType).join(
+                lowest_tickets = db.session.query(TicketType).options(joinedload(TicketType.currency)).join(
                     subquery,
                     (TicketType.event_id == subquery.c.event_id) & 
                     (TicketType.price == subquery.c.min_price)
@@ -262,6 +347,12 @@ class LowestPriceTicketResource(Resource):
                         }
                     })
                 
+                if display_currency:
+                    # Every price on the page is converted in one batch with the same rates
+                    prices, currency_info = localize_prices(list(events_lowest_tickets.values()), display_currency)
+                    for entry, price in zip(result, prices):
+                        entry["lowest_price_ticket"]["display_price"] = price
+                    return {"events_lowest_prices": result, "display_currency": currency_info}, 200
                 return {"events_lowest_prices": result}, 200
 
         except Exception as e:
@@ -0,0 +1,139 @@
+"""
+User directory for the admin user lists and search.
+
+The admin user endpoints used to load every user row (three `ilike('%q%')`
+filters, no limit) and serialize them all on every call. The directory
+pages through users with a keyset on `user.id` (`cursor` is the last id of
+the previous page), so each page costs one index range scan however deep
+the admin has scrolled. Substring search keeps its ILIKE semantics and is
+served by pg_trgm GIN indexes on name, email and phone.
+
+Totals are estimates: the planner's row estimate for the filtered query, or
+`pg_class.reltuples` when unfiltered, instead of a COUNT(*) over the whole
+table on each page. Full lists for download go through `export_rows`, which
+streams from a server-side cursor into csv_export.
+"""
+import json
+import logging
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from sqlalchemy import or_, select, text
+
+from csv_export import stream_rows
+from model import db, User, UserRole
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+USER_EXPORT_HEADER = ['User ID', 'Email', 'Full Name', 'Role', 'Phone', 'Created At', 'AI Enabled']
+
+
+def parse_roles(value: Optional[str]) -> Optional[List[UserRole]]:
+    """Comma-separated role names from a query string; raises ValueError for unknown roles"""
+    if not value:
+        return None
+    return [User.validate_role(role.strip()) for role in value.split(',') if role.strip()]
+
+
+def _like_pattern(search: str) -> str:
+    escaped = search.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+    return f"%{escaped}%"
+
+
+class UserDirectory:
+    """Keyset-paginated, index-backed user listing with estimated totals and streamed export"""
+
+    def __init__(self, page_size: int = 50, max_page_size: int = 200):
+        self.page_size = page_size
+        self.max_page_size = max_page_size
+
+    def init_app(self, app):
+        self.page_size = app.config.get('USER_DIRECTORY_PAGE_SIZE', self.page_size)
+        self.max_page_size = app.config.get('USER_DIRECTORY_MAX_PAGE_SIZE', self.max_page_size)
+
+    @staticmethod
+    def _statement(search: Optional[str] = None, roles: Optional[Sequence[UserRole]] = None):
+        statement = select(
+            User.id, User.email, User.full_name, User.role, User.phone_number, User.created_at, User.ai_enabled
+        )
+        search = (search or '').strip()
+        if search:
+            pattern = _like_pattern(search)
+            statement = statement.where(or_(
+                User.full_name.ilike(pattern, escape='\\'),
+                User.email.ilike(pattern, escape='\\'),
+                User.phone_number.ilike(pattern, escape='\\')
+            ))
+        if roles:
+            statement = statement.where(User.role.in_(roles))
+        return statement
+
+    @staticmethod
+    def _as_dict(row) -> Dict[str, Any]:
+        """Same fields as User.as_dict plus is_organizer"""
+        return {
+            "id": row.id,
+            "email": row.email,
+            "full_name": row.full_name,
+            "role": row.role.value,
+            "phone_number": row.phone_number,
+            "created_at": row.created_at.isoformat(),
+            "ai_enabled": row.ai_enabled,
+            "is_organizer": row.role == UserRole.ORGANIZER
+        }
+
+    def explain_sql(self, dialect, search: Optional[str] = None,
+                    roles: Optional[Sequence[UserRole]] = None) -> str:
+        """EXPLAIN for the filtered listing with values inlined, so it runs without bind processing"""
+        # literal_binds expands the role IN list and renders enums by name; plain str() would leave
+        # __[POSTCOMPILE_role_1] and UserRole params that the driver can't send
+        compiled = self._statement(search, roles).compile(dialect=dialect, compile_kwargs={"literal_binds": True})
+        return f"EXPLAIN (FORMAT JSON) {compiled}"
+
+    def clamp(self, limit: Optional[int]) -> int:
+        return min(max(limit or self.page_size, 1), self.max_page_size)
+
+    def page(self, search: Optional[str] = None, roles: Optional[Sequence[UserRole]] = None,
+             cursor: Optional[int] = None, limit: Optional[int] = None) -> Tuple[List[Dict[str, Any]], Optional[int]]:
+        """One page of users after `cursor`, ordered by id; returns (users, next_cursor)"""
+        limit = self.clamp(limit)
+        statement = self._statement(search, roles)
+        if cursor:
+            statement = statement.where(User.id > cursor)
+        # One extra row tells us whether another page exists without counting
+        rows = db.session.execute(statement.order_by(User.id).limit(limit + 1)).all()
+        has_next = len(rows) > limit
+        rows = rows[:limit]
+        return [self._as_dict(row) for row in rows], (rows[-1].id if has_next else None)
+
+    def estimate_total(self, search: Optional[str] = None,
+                       roles: Optional[Sequence[UserRole]] = None) -> Optional[int]:
+        """Planner estimate of matching users; None when no estimate is available (e.g. SQLite)"""
+        try:
+            # Own connection, so a failed catalog query can't abort the request's transaction
+            with db.engine.connect() as connection:
+                if not (search or '').strip() and not roles:
+                    estimate = connection.execute(
+                        text("SELECT reltuples::bigint FROM pg_class WHERE oid = '\"user\"'::regclass")
+                    ).scalar()
+                else:
+                    plan = connection.exec_driver_sql(self.explain_sql(connection.dialect, search, roles)).scalar()
+                    if isinstance(plan, str):
+                        plan = json.loads(plan)
+                    estimate = plan[0]['Plan']['Plan Rows']
+        except Exception as e:
+            logger.debug(f"User count estimate unavailable: {e}")
+            return None
+        # reltuples is -1 for a table that has never been analyzed
+        return max(int(estimate), 0) if estimate is not None and estimate >= 0 else None
+
+    def export_rows(self, search: Optional[str] = None,
+                    roles: Optional[Sequence[UserRole]] = None) -> Iterator[Sequence[Any]]:
+        """Header plus every matching user, read through a server-side cursor"""
+        yield USER_EXPORT_HEADER
+        for row in stream_rows(self._statement(search, roles).order_by(User.id)):
+            yield row[:-1] + ('Yes' if row[-1] else 'No',)
+
+
+# Initialize globally — must be attached via user_directory.init_app(app)
+user_directory = UserDirectory()